@@ -13,6 +13,7 @@ import argparse
 import numpy
 import time
 from collections import deque
+from multiprocessing.pool import ThreadPool
 from scipy.fftpack import fft
 import matplotlib
 matplotlib.use('Agg')
@@ -130,6 +131,38 @@ def GenerateLocations(lsl_locs, frequencies, ntime, nchan, npol, grid_size=64, g
     
 
 
+###############################################################
+
+######################## CPU Backend ##########################
+
+def BuildCI4Table():
+    '''Lookup table mapping each ci4 byte to its complex64 value.
+
+    The real part is held in the high nibble and the imaginary part
+    in the low nibble, both as signed 4-bit integers.'''
+    byte = numpy.arange(256, dtype=numpy.uint8).view(numpy.int8)
+    real = numpy.right_shift(byte, 4)
+    imag = numpy.right_shift(numpy.left_shift(byte, 4), 4)
+    return (real + 1j*imag).astype(numpy.complex64)
+
+CI4_TABLE = BuildCI4Table()
+
+def UnpackCPU(idata, phases, out=None):
+    '''Unpack a (time,chan,pol,stand) ci4 gulp and apply the phasing terms.'''
+    udata = numpy.take(CI4_TABLE, idata, out=out)
+    udata *= phases
+    return udata
+
+def GridIndices(lx, ly, grid_size):
+    '''Flattened grid cell of every stand for each channel and polarisation.
+
+    Mirrors the integer truncation applied to the GPU location maps;
+    stands that fall off the grid are given an index of -1.'''
+    ix = lx[0].astype(numpy.int32).transpose(1,0,2)
+    iy = ly[0].astype(numpy.int32).transpose(1,0,2)
+    valid = (ix >= 0) & (ix < grid_size) & (iy >= 0) & (iy < grid_size)
+    return numpy.where(valid, iy*grid_size + ix, -1)
+
 ###############################################################
 
 ######################### EPIC ################################
@@ -596,7 +629,7 @@ class MOFFCorrelatorOp(object):
     def __init__(self, log, iring, oring, antennas, grid_size, grid_resolution, 
                  ntime_gulp=2500, accumulation_time=10000, core=-1, gpu=-1, 
                  remove_autocorrs = False, benchmark=False, profile=False, 
-                 *args, **kwargs):
+                 cpu=False, nthreads=1, *args, **kwargs):
         self.log = log
         self.iring = iring
         self.oring = oring
@@ -620,6 +653,8 @@ class MOFFCorrelatorOp(object):
         self.benchmark = benchmark
         self.newflag = True
         self.profile = profile
+        self.cpu = cpu
+        self.nthreads = max(1, nthreads)
         
         self.bind_proclog = ProcLog(type(self).__name__+"/bind")
         self.in_proclog   = ProcLog(type(self).__name__+"/in")
@@ -632,20 +667,71 @@ class MOFFCorrelatorOp(object):
         self.out_proclog.update({'nring':1, 'ring0':self.oring.name})
         self.size_proclog.update({'nseq_per_gulp': self.ntime_gulp})
 
-        if self.gpu != -1:
-            BFSetGPU(self.gpu)
-            
         self.ant_extent = 1
-        self.antgridmap = bifrost.ndarray(numpy.ones(shape=(self.ant_extent,self.ant_extent),dtype=numpy.complex64),space='cuda')
-        self.antgridmap = self.antgridmap.copy(space='cuda',order='C')
+        if not self.cpu:
+            if self.gpu != -1:
+                BFSetGPU(self.gpu)
+            
+            self.antgridmap = bifrost.ndarray(numpy.ones(shape=(self.ant_extent,self.ant_extent),dtype=numpy.complex64),space='cuda')
+            self.antgridmap = self.antgridmap.copy(space='cuda',order='C')
 
         self.shutdown_event = threading.Event()
 
     def shutdown(self):
         self.shutdown_event.set()
 
+    def build_header(self, ihdr, npol, sampling_length):
+        ohdr = ihdr.copy()
+        ohdr['nbit'] = 64
+
+
+        ohdr['npol'] = npol**2 # Because of cross multiplying shenanigans
+        ohdr['grid_size_x'] = self.grid_size
+        ohdr['grid_size_y'] = self.grid_size
+        ohdr['axes'] = 'time,chan,pol,gridy,gridx'
+        ohdr['sampling_length_x'] = sampling_length
+        ohdr['sampling_length_y'] = sampling_length
+        ohdr['accumulation_time'] = self.accumulation_time
+        ohdr['FS'] = FS
+        ohdr['latitude'] = lwasv.lat * 180. / numpy.pi
+        ohdr['longitude'] = lwasv.lon * 180. / numpy.pi
+        ohdr['telescope'] = 'LWA-SV'
+        ohdr['data_units'] = 'UNCALIB'
+        if ohdr['npol'] == 1:
+            ohdr['pols'] = ['xx']
+        elif ohdr['npol'] == 2:
+            ohdr['pols'] = ['xx', 'yy']
+        elif ohdr['npol'] == 4:
+            ohdr['pols'] = ['xx', 'xy', 'yx', 'yy']
+        else:
+            raise ValueError('Cannot write fits file without knowing polarization list')
+        return json.dumps(ohdr)
+
+    def build_phases(self, freq, nchan, npol, nstand):
+        # Phases are Nchan x Npol x Nstand
+        phases = numpy.zeros((nchan, npol, nstand), dtype=numpy.complex64)
+        for i in xrange(nstand):
+            ## X
+            a = self.antennas[2*i + 0]
+            delay = a.cable.delay(freq) - a.stand.z / speedOfLight
+            phases[:,0,i] = numpy.exp(2j*numpy.pi*freq*delay)
+            phases[:,0,i] /= numpy.sqrt(a.cable.gain(freq))
+            if npol == 2:
+                ## Y
+                a = self.antennas[2*i + 1]
+                delay = a.cable.delay(freq) - a.stand.z / speedOfLight
+                phases[:,1,i] = numpy.exp(2j*numpy.pi*freq*delay)
+                phases[:,1,i] /= numpy.sqrt(a.cable.gain(freq))
+            ## Explicit outrigger masking - we probably want to do
+            ## away with this at some point
+            if a.stand.id == 256:
+                phases[:,:,i] = 0.0
+        return phases
+
 
     def main(self):
+        if self.cpu:
+            return self.main_cpu()
         if self.core != -1:
             bifrost.affinity.set_core(self.core)
         if self.gpu != -1:
@@ -688,51 +774,10 @@ class MOFFCorrelatorOp(object):
                     self.lz = bifrost.ndarray(lz.astype(numpy.int32), space='cuda')
     
 
-                ohdr = ihdr.copy()
-                ohdr['nbit'] = 64
-
-
-                ohdr['npol'] = npol**2 # Because of cross multiplying shenanigans
-                ohdr['grid_size_x'] = self.grid_size
-                ohdr['grid_size_y'] = self.grid_size
-                ohdr['axes'] = 'time,chan,pol,gridy,gridx'
-                ohdr['sampling_length_x'] = sampling_length
-                ohdr['sampling_length_y'] = sampling_length
-                ohdr['accumulation_time'] = self.accumulation_time
-                ohdr['FS'] = FS
-                ohdr['latitude'] = lwasv.lat * 180. / numpy.pi
-                ohdr['longitude'] = lwasv.lon * 180. / numpy.pi
-                ohdr['telescope'] = 'LWA-SV'
-                ohdr['data_units'] = 'UNCALIB'
-                if ohdr['npol'] == 1:
-                    ohdr['pols'] = ['xx']
-                elif ohdr['npol'] == 2:
-                    ohdr['pols'] = ['xx', 'yy']
-                elif ohdr['npol'] == 4:
-                    ohdr['pols'] = ['xx', 'xy', 'yx', 'yy']
-                else:
-                    raise ValueError('Cannot write fits file without knowing polarization list')
-                ohdr_str = json.dumps(ohdr)
+                ohdr_str = self.build_header(ihdr, npol, sampling_length)
 
                 # Setup the phasing terms for zenith
-                # Phases are Nchan x Npol x Nstand
-                phases = numpy.zeros((itshape[1], itshape[2], itshape[3]), dtype=numpy.complex64)
-                for i in xrange(nstand):
-                    ## X
-                    a = self.antennas[2*i + 0]
-                    delay = a.cable.delay(freq) - a.stand.z / speedOfLight
-                    phases[:,0,i] = numpy.exp(2j*numpy.pi*freq*delay)
-                    phases[:,0,i] /= numpy.sqrt(a.cable.gain(freq))
-                    if npol == 2:
-                        ## Y
-                        a = self.antennas[2*i + 1]
-                        delay = a.cable.delay(freq) - a.stand.z / speedOfLight
-                        phases[:,1,i] = numpy.exp(2j*numpy.pi*freq*delay)
-                        phases[:,1,i] /= numpy.sqrt(a.cable.gain(freq))
-                    ## Explicit outrigger masking - we probably want to do
-                    ## away with this at some point
-                    if a.stand.id == 256:
-                        phases[:,:,i] = 0.0
+                phases = self.build_phases(freq, nchan, npol, nstand)
                 phases = bifrost.ndarray(phases)
                 try:
                     copy_array(gphases, phases)
@@ -968,6 +1013,181 @@ class MOFFCorrelatorOp(object):
                             break
 
 
+    def grid_and_transform_cpu(self, task):
+        '''Grid one channel/polarisation of a gulp and take its inverse 2D FFT.'''
+        c, p = task
+        grid = self.cpu_gdata[c,p].reshape(self.ntime_gulp, self.grid_size*self.grid_size)
+        grid[...] = 0
+        idx = self.cpu_gridind[c,p]
+        valid = idx >= 0
+        numpy.add.at(grid, (slice(None), idx[valid]), self.cpu_udata[:,c,p,valid])
+        grid = grid.reshape(self.ntime_gulp, self.grid_size, self.grid_size)
+        # bifrost's inverse transform is unnormalised
+        grid[...] = numpy.fft.ifft2(grid, axes=(1,2)) * self.grid_size**2
+
+    def cross_multiply_cpu(self, task):
+        '''Accumulate one channel/cross-polarisation product over the gulp.'''
+        c, p = task
+        npol = self.cpu_gdata.shape[1]
+        a = self.cpu_gdata[c,p/npol]
+        b = self.cpu_gdata[c,p%npol]
+        self.cpu_image[c,p] += numpy.sum(a*b.conj(), axis=0)
+        if self.remove_autocorrs == True:
+            ua = self.cpu_udata[:,c,p/npol,:]
+            ub = self.cpu_udata[:,c,p%npol,:]
+            self.cpu_autocorrs[c,p] += numpy.sum(ua*ub.conj(), axis=0)
+
+    def main_cpu(self):
+        if self.core != -1:
+            bifrost.affinity.set_core(self.core)
+        self.bind_proclog.update({'ncore': 1,
+                                  'core0': bifrost.affinity.get_core(),
+                                  'ngpu': 0,})
+
+        pool = ThreadPool(self.nthreads)
+        runtime_history = deque([], 50)
+        accum = 0
+        with self.oring.begin_writing() as oring:
+            for iseq in self.iring.read(guarantee=True):
+                ihdr = json.loads(iseq.header.tostring())
+                self.sequence_proclog.update(ihdr)
+                self.log.info('MOFFCorrelatorOp: Config - %s' % ihdr)
+                chan0 = ihdr['chan0']
+                nchan = ihdr['nchan']
+                nstand = ihdr['nstand']
+                npol = ihdr['npol']
+                self.newflag = True
+                accum = 0
+                
+                igulp_size = self.ntime_gulp * nchan * nstand * npol * 1 # ci4
+                itshape = (self.ntime_gulp,nchan,npol,nstand)
+                
+                freq = (chan0 + numpy.arange(nchan))*CHAN_BW
+                sampling_length, lx, ly, lz, sll = GenerateLocations(self.locations, freq, 
+                                                                     self.ntime_gulp, nchan, npol, 
+                                                                     grid_size=self.grid_size,
+                                                                     grid_resolution=self.grid_resolution)
+                self.cpu_gridind = GridIndices(lx, ly, self.grid_size)
+
+                ohdr_str = self.build_header(ihdr, npol, sampling_length)
+
+                # Setup the phasing terms for zenith
+                phases = self.build_phases(freq, nchan, npol, nstand)
+
+                # Work buffers, reused for every gulp in the sequence
+                self.cpu_udata = numpy.empty(itshape, dtype=numpy.complex64)
+                self.cpu_gdata = numpy.empty((nchan,npol,self.ntime_gulp,self.grid_size,self.grid_size),
+                                             dtype=numpy.complex64)
+                self.cpu_image = numpy.zeros((nchan,npol**2,self.grid_size,self.grid_size),
+                                             dtype=numpy.complex64)
+                self.cpu_autocorrs = numpy.zeros((nchan,npol**2,nstand), dtype=numpy.complex64)
+                grid_tasks = [(c,p) for c in xrange(nchan) for p in xrange(npol)]
+                cross_tasks = [(c,p) for c in xrange(nchan) for p in xrange(npol**2)]
+
+                oshape = (1,nchan,npol**2,self.grid_size,self.grid_size)
+                ogulp_size = nchan * npol**2 * self.grid_size * self.grid_size * 8
+                self.iring.resize(igulp_size)
+                self.oring.resize(ogulp_size,buffer_factor=5)
+                prev_time = time.time()
+                with oring.begin_sequence(time_tag=iseq.time_tag,header=ohdr_str) as oseq:
+                    iseq_spans = iseq.read(igulp_size)
+                    while not self.iring.writing_ended():
+                        reset_sequence = False
+
+                        if self.profile:
+                            spani = 0
+
+                        for ispan in iseq_spans:
+                            if ispan.size < igulp_size:
+                                continue # Ignore final gulp
+                            curr_time = time.time()
+                            acquire_time = curr_time - prev_time
+                            prev_time = curr_time
+
+                            if self.benchmark == True:
+                                print(" ------------------ ")
+                                time1 = time.time()
+
+                            ###### Correlator #######
+                            ## Unpack and phase
+                            idata = ispan.data_view(numpy.uint8).reshape(itshape)
+                            UnpackCPU(idata, phases, out=self.cpu_udata)
+                            if self.benchmark == True:
+                                time1c = time.time()
+                                print("  Unpack and phase-up time: %f" % (time1c-time1))
+
+                            ## Grid the Antennas and inverse transform
+                            pool.map(self.grid_and_transform_cpu, grid_tasks)
+                            if self.benchmark == True:
+                                timefft2 = time.time()
+                                print("  Grid and FFT time: %f"%(timefft2 - time1c))
+
+                            if self.newflag is True:
+                                self.cpu_image[...] = 0
+                                self.cpu_autocorrs[...] = 0
+                                self.newflag=False
+
+                            ## Cross multiply and accumulate over time
+                            pool.map(self.cross_multiply_cpu, cross_tasks)
+
+                            # Increment
+                            accum += 1e3 * self.ntime_gulp / CHAN_BW
+
+                            if accum >= self.accumulation_time:
+
+                                if self.remove_autocorrs == True:
+                                    # The autocorrelations all grid onto the
+                                    # centre pixel, whose unnormalised inverse
+                                    # transform is flat across the image.
+                                    autocorr_g = self.cpu_autocorrs.sum(axis=2)
+                                    self.cpu_image -= autocorr_g[:,:,None,None]
+
+                                curr_time = time.time()
+                                process_time = curr_time - prev_time
+                                prev_time = curr_time
+                                
+                                with oseq.reserve(ogulp_size) as ospan:
+                                    odata = ospan.data_view(numpy.complex64).reshape(oshape)
+                                    odata[...] = self.cpu_image.reshape(oshape)
+                                    
+                                curr_time = time.time()
+                                reserve_time = curr_time - prev_time
+                                prev_time = curr_time
+                                
+                                self.newflag = True
+                                accum = 0
+                                    
+                            else:
+                                process_time = 0.0
+                                reserve_time = 0.0
+
+                            curr_time = time.time()
+                            process_time += curr_time - prev_time
+                            prev_time = curr_time
+
+                            if self.benchmark == True:
+                                time2=time.time()
+                                print("-> CPU Time Taken: %f"%(time2-time1))
+
+                                runtime_history.append(time2-time1)
+                                print("-> Average CPU Time Taken: %f (%i samples)" % (1.0*sum(runtime_history)/len(runtime_history), len(runtime_history)))
+                            if self.profile:
+                                spani += 1
+                                if spani >= 10:
+                                    sys.exit()
+                                    break
+
+                            self.perf_proclog.update({'acquire_time': acquire_time,
+                                                      'reserve_time': reserve_time,
+                                                      'process_time': process_time,})
+
+                        # Reset to move on to the next input sequence?
+                        if not reset_sequence:
+                            break
+        pool.close()
+        pool.join()
+
+
 class SaveOp(object):
     def __init__(self, log, iring, filename, grid_size, core=-1, gpu=-1, cpu=False,
                  profile=False, ints_per_file=1, out_dir='', *args, **kwargs):
@@ -1002,12 +1222,17 @@ class SaveOp(object):
     def main(self):
         if self.core != -1:
             bifrost.affinity.set_core(self.core)
-        if self.gpu != -1:
-            BFSetGPU(self.gpu)
-        self.bind_proclog.update({'ncore': 1,
-                                  'core0': bifrost.affinity.get_core(),
-                                  'ngpu': 1,
-                                  'gpu0': BFGetGPU(),})
+        if self.cpu:
+            self.bind_proclog.update({'ncore': 1,
+                                      'core0': bifrost.affinity.get_core(),
+                                      'ngpu': 0,})
+        else:
+            if self.gpu != -1:
+                BFSetGPU(self.gpu)
+            self.bind_proclog.update({'ncore': 1,
+                                      'core0': bifrost.affinity.get_core(),
+                                      'ngpu': 1,
+                                      'gpu0': BFGetGPU(),})
 
 
         fileid = 0
@@ -1041,7 +1266,10 @@ class SaveOp(object):
                 prev_time = curr_time
 
                 idata = ispan.data_view(numpy.complex64).reshape(ishape)
-                itemp = idata.copy(space='cuda_host')
+                if self.cpu:
+                    itemp = numpy.array(idata)
+                else:
+                    itemp = idata.copy(space='cuda_host')
                 image.append(itemp)
                 nints += 1
                 if nints >= self.ints_per_file:
@@ -1131,6 +1359,8 @@ def main():
     parser.add_argument('--profile', action='store_true', help = 'Run cProfile on ALL threads. Produces trace for each individual thread')
     parser.add_argument('--ints_per_file', type=int, default=1, help='Number of integrations per output FITS file. Default is 1.')
     parser.add_argument('--out_dir', type=str, default='', help='Directory for output files. Default is current directory.')
+    parser.add_argument('--cpu', action='store_true', help = 'Run the correlator and imager on the CPU instead of the GPU')
+    parser.add_argument('--nthreads', type=int, default=4, help='Number of threads used by the CPU correlator. Default is 4.')
 
     args = parser.parse_args()
     # Logging Setup
@@ -1180,10 +1410,16 @@ def main():
 
     # Setup Rings
 
-    fcapture_ring = Ring(name="capture",space="cuda_host")
-    fdomain_ring = Ring(name="fengine", space="cuda_host")
-    transpose_ring = Ring(name="transpose", space="cuda_host")
-    gridandfft_ring = Ring(name="gridandfft", space="cuda")
+    if args.cpu:
+        fcapture_ring = Ring(name="capture",space="system")
+        fdomain_ring = Ring(name="fengine", space="system")
+        transpose_ring = Ring(name="transpose", space="system")
+        gridandfft_ring = Ring(name="gridandfft", space="system")
+    else:
+        fcapture_ring = Ring(name="capture",space="cuda_host")
+        fdomain_ring = Ring(name="fengine", space="cuda_host")
+        transpose_ring = Ring(name="transpose", space="cuda_host")
+        gridandfft_ring = Ring(name="gridandfft", space="cuda")
     image_ring = Ring(name="image", space="system")
 
 
@@ -1227,9 +1463,9 @@ def main():
                                 accumulation_time=args.accumulate, 
                                 remove_autocorrs=args.removeautocorrs,
                                 core=cores.pop(0), gpu=gpus.pop(0),benchmark=args.benchmark,
-                                profile=args.profile))
+                                profile=args.profile, cpu=args.cpu, nthreads=args.nthreads))
     ops.append(SaveOp(log, gridandfft_ring, "EPIC_", args.imagesize, out_dir=args.out_dir,
-                         core=cores.pop(0), gpu=gpus.pop(0), cpu=False,
+                         core=cores.pop(0), gpu=gpus.pop(0), cpu=args.cpu,
                          ints_per_file=args.ints_per_file, profile=args.profile))
 
     threads= [threading.Thread(target=op.main) for op in ops]
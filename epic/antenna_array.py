@@ -1,11 +1,31 @@
 import numpy as NP
 import numpy.ma as MA
 import multiprocessing as MP
+from multiprocessing.pool import ThreadPool
+import threading
 import itertools as IT
 import copy
+import collections
+import contextlib
+import os
+import hashlib
 import h5py
 import scipy.constants as FCNST
 import scipy.sparse as SpM
+from scipy.spatial import cKDTree
+try:
+    import scipy.fft as SCFFT
+except ImportError:
+    import scipy.fftpack as SCFFT
+    scipy_fft_workers = False
+else:
+    scipy_fft_workers = True
+try:
+    import pyfftw
+except ImportError:
+    pyfftw_module_found = False
+else:
+    pyfftw_module_found = True
 from astropy.io import fits
 import matplotlib.pyplot as PLT
 import progressbar as PGB
@@ -33,6 +53,66 @@ def unwrap_antenna_update(args, **kwargs):
 def unwrap_interferometer_update(args, **kwargs):
     return Interferometer.update_pp(*args, **kwargs)
 
+shared_buffers = {} # Shared memory buffers in worker processes
+shared_arrays = {} # Numpy views of shared memory arrays in worker processes
+
+def init_shared_arrays(buffers):
+    shared_buffers.clear()
+    shared_buffers.update(buffers)
+
+def attach_shared_arrays(layout):
+    for name in layout:
+        shape, dtype = layout[name]
+        shared_arrays[name] = NP.frombuffer(shared_buffers[name], dtype=dtype, count=int(NP.prod(shape))).reshape(shape)
+
+def shared_pool_task(args):
+    func, layout, item = args
+    attach_shared_arrays(layout)
+    return func(item)
+
+def shared_antenna_FT(start, stop):
+    Et = shared_arrays['Et']  # n_ant x nsamples x npol
+    Ef = shared_arrays['Ef']  # n_ant x 2*nsamples x npol
+    nsamples = Et.shape[1]
+    for ai in xrange(start, stop):
+        for pi in xrange(Et.shape[2]):
+            Et_padded = NP.pad(Et[ai,:,pi], (0,nsamples), 'constant', constant_values=(0,0))
+            Ef[ai,:,pi] = DSP.FT1D(Et_padded, ax=0, use_real=False, inverse=False, shift=True)
+    return (start, stop)
+
+def shared_antenna_FT_arg_splitter(args, **kwargs):
+    return shared_antenna_FT(*args, **kwargs)
+
+def shared_interferometer_FX(start, stop):
+    Ef = shared_arrays['Ef']  # n_ant x nchan x npol
+    antind = shared_arrays['antind']  # n_bl x 2
+    Vf = shared_arrays['Vf']  # n_bl x 4 x nchan
+    Vt = shared_arrays['Vt']  # n_bl x 4 x nchan
+    ind1 = antind[start:stop,0]
+    ind2 = antind[start:stop,1]
+    for ci,(pi1,pi2) in enumerate([(0,0), (0,1), (1,0), (1,1)]):
+        Vf[start:stop,ci,:] = Ef[ind1,:,pi1] * Ef[ind2,:,pi2].conjugate()
+        for bi in xrange(start, stop):
+            Vt[bi,ci,:] = DSP.FT1D(NP.fft.fftshift(Vf[bi,ci,:]), inverse=True, shift=True, verbose=False)
+    return (start, stop)
+
+def shared_interferometer_FX_arg_splitter(args, **kwargs):
+    return shared_interferometer_FX(*args, **kwargs)
+
+def shared_interferometer_stack(start, stop):
+    Ef = shared_arrays['Ef_stack']  # n_t x n_ant x nchan x npol
+    antind = shared_arrays['antind']  # n_bl x 2
+    Vf = shared_arrays['Vf_stack']  # n_bl x 4 x n_t x nchan
+    Vt = shared_arrays['Vt_stack']  # n_bl x 4 x n_t x nchan
+    for bi in xrange(start, stop):
+        for ci,(pi1,pi2) in enumerate([(0,0), (0,1), (1,0), (1,1)]):
+            Vf[bi,ci,:,:] = Ef[:,antind[bi,0],:,pi1] * Ef[:,antind[bi,1],:,pi2].conjugate()
+            Vt[bi,ci,:,:] = DSP.FT1D(NP.fft.fftshift(Vf[bi,ci,:,:]), ax=1, inverse=True, shift=True, verbose=False)
+    return (start, stop)
+
+def shared_interferometer_stack_arg_splitter(args, **kwargs):
+    return shared_interferometer_stack(*args, **kwargs)
+
 def antenna_grid_mapping(gridind_raveled, values, bins=None):
     if bins is None:
         raise ValueError('Input parameter bins must be specified')
@@ -91,6 +171,177 @@ def baseline_grid_mapper(gridind_raveled, values, bins, label, outq):
     # print MP.current_process().name
     outq.put(outdict)
 
+def grid_scatter_add(gridind_raveled, values, size):
+
+    """
+    --------------------------------------------------------------------------
+    Accumulate complex values onto a flattened grid in a single pass. The real
+    and imaginary parts are interleaved and summed together with one call to
+    numpy.bincount so that repeated grid indices are accumulated correctly.
+
+    Inputs:
+
+    gridind_raveled 
+                [numpy array] Raveled indices of the grid locations to which 
+                the values are to be added. Must be of the same size as 
+                values
+
+    values      [numpy array] Complex values to be accumulated at the grid
+                locations specified by gridind_raveled
+
+    size        [integer] Number of elements in the flattened grid
+
+    Output:
+
+    Complex numpy array of shape (size,) containing the accumulated values
+    --------------------------------------------------------------------------
+    """
+
+    gridind_raveled = NP.asarray(gridind_raveled, dtype=NP.intp).ravel()
+    values = NP.ascontiguousarray(values, dtype=NP.complex128).ravel()
+    if gridind_raveled.size != values.size:
+        raise ValueError('Input parameters gridind_raveled and values must have the same size')
+    reim_ind = 2 * gridind_raveled.reshape(-1,1) + NP.arange(2).reshape(1,-1)
+    return NP.bincount(reim_ind.ravel(), weights=values.view(NP.float64), minlength=2*size).view(NP.complex128)
+
+def lookup_file_digest(lkpfile):
+
+    """
+    --------------------------------------------------------------------------
+    Returns a digest of the contents of an aperture lookup table file so that
+    keys of on-disk caches change when the file is edited in place.
+
+    Inputs:
+
+    lkpfile     [string] Full path to the lookup table file. If set to None, 
+                or if the file does not exist, an empty string is returned
+
+    Output:
+
+    Hexadecimal string
+    --------------------------------------------------------------------------
+    """
+
+    if (lkpfile is None) or (not os.path.isfile(lkpfile)):
+        return ''
+    hashobj = hashlib.sha1()
+    with open(lkpfile, 'rb') as fileobj:
+        for chunk in iter(lambda: fileobj.read(1048576), ''):
+            hashobj.update(chunk)
+    return hashobj.hexdigest()
+
+def find_grid_footprints(xy, gridu, gridv, wavelength, distance_ULIM=NP.inf):
+
+    """
+    --------------------------------------------------------------------------
+    Determine the footprints of a set of elements (antennas or baselines) on
+    a regular aperture grid for every frequency channel. It returns the same 
+    quantities as LKP.find_NN() applied with flatten=True to the grid 
+    locations scaled by wavelength in every channel, but avoids constructing
+    the full nchan x nv x nu set of grid locations by querying a single k-d 
+    tree of the grid (in units of wavelength) once per channel
+
+    Inputs:
+
+    xy          [numpy array] Locations of the elements in the aperture plane.
+                It is of size nxy x 2 and has units of distance
+
+    gridu       [numpy array] u-locations (in units of wavelength) of the 
+                regular grid. It is of size nv x nu
+
+    gridv       [numpy array] v-locations (in units of wavelength) of the 
+                regular grid. It is of size nv x nu
+
+    wavelength  [numpy array] Wavelengths of the frequency channels. It is of
+                size nchan and has the same units of distance as xy
+
+    distance_ULIM
+                [scalar] Upper bound on distance between the element and grid
+                locations in the aperture plane. It has the same units as xy.
+                Default=NP.inf means all grid locations are included
+
+    Outputs:
+
+    Tuple (indNN_list, xyind, fvu_gridind) where indNN_list is a list of nxy
+    numpy arrays containing the raveled indices (in f-v-u order) of the grid 
+    locations within the footprint of each element, and xyind and 
+    fvu_gridind are flattened numpy arrays of element indices and the 
+    corresponding raveled grid indices, ordered by element and then by 
+    frequency channel
+    --------------------------------------------------------------------------
+    """
+
+    xy = NP.asarray(xy, dtype=NP.float64).reshape(-1,2)
+    wavelength = NP.asarray(wavelength, dtype=NP.float64).reshape(-1)
+    nxy = xy.shape[0]
+    gridlocs = NP.hstack((gridu.reshape(-1,1), gridv.reshape(-1,1)))
+    nvu = gridlocs.shape[0]
+    if NP.isfinite(distance_ULIM):
+        gridtree = cKDTree(gridlocs)
+
+    xyind = []
+    fvu_gridind = []
+    for ci in xrange(wavelength.size):
+        if NP.isfinite(distance_ULIM):
+            nnlist = gridtree.query_ball_point(xy / wavelength[ci], distance_ULIM / wavelength[ci])
+            counts = NP.asarray([len(nn) for nn in nnlist], dtype=NP.int64)
+            vu_gridind = NP.fromiter(IT.chain.from_iterable(nnlist), dtype=NP.int64, count=NP.sum(counts))
+        else:
+            counts = nvu + NP.zeros(nxy, dtype=NP.int64)
+            vu_gridind = NP.tile(NP.arange(nvu, dtype=NP.int64), nxy)
+        xyind += [NP.repeat(NP.arange(nxy, dtype=NP.int64), counts)]
+        fvu_gridind += [ci * nvu + vu_gridind]
+    xyind = NP.concatenate(xyind)
+    fvu_gridind = NP.concatenate(fvu_gridind)
+
+    # Reorder by element while retaining the channel order within each one
+
+    sortind = NP.argsort(xyind, kind='mergesort')
+    xyind = xyind[sortind]
+    fvu_gridind = fvu_gridind[sortind]
+    indNN_list = NP.split(fvu_gridind, NP.cumsum(NP.bincount(xyind, minlength=nxy))[:-1])
+
+    return (indNN_list, xyind, fvu_gridind)
+
+def grid_footprint_locations(fvu_gridind, gridu, gridv, wavelength):
+
+    """
+    --------------------------------------------------------------------------
+    Determine the aperture plane locations and wavelengths of grid locations
+    given by raveled indices in f-v-u order, such as those returned by 
+    find_grid_footprints(), without constructing the full nchan x nv x nu set
+    of grid locations
+
+    Inputs:
+
+    fvu_gridind [numpy array] raveled indices (in f-v-u order) of the grid
+                locations
+
+    gridu       [numpy array] u-locations (in units of wavelength) of the 
+                regular grid. It is of size nv x nu
+
+    gridv       [numpy array] v-locations (in units of wavelength) of the 
+                regular grid. It is of size nv x nu
+
+    wavelength  [numpy array] Wavelengths of the frequency channels. It is of
+                size nchan
+
+    Outputs:
+
+    Tuple (xy, wl) where xy is a numpy array of size n_ind x 2 containing the
+    aperture plane locations of the grid locations in the same units as 
+    wavelength, and wl is a numpy array of size n_ind containing the 
+    wavelengths of their frequency channels
+    --------------------------------------------------------------------------
+    """
+
+    wavelength = NP.asarray(wavelength).reshape(-1)
+    find, vind, uind = NP.unravel_index(NP.asarray(fvu_gridind).ravel(), (wavelength.size,)+gridu.shape)
+    wl = wavelength[find]
+    xy = NP.hstack((gridu[vind,uind].reshape(-1,1), gridv[vind,uind].reshape(-1,1))) * wl.reshape(-1,1)
+
+    return (xy, wl)
+
 def find_1NN_arg_splitter(args, **kwargs):
     return LKP.find_1NN(*args, **kwargs)
 
@@ -260,6 +511,95 @@ def evalApertureResponse(wts_grid, ulocs, vlocs, pad=0, skypos=None):
 
 ################################################################################
 
+def columnar_E_fields(cdata, pol, antind=None, tselect=None, fselect=None,
+                      datapool=None):
+
+    """
+    --------------------------------------------------------------------------
+    Select electric fields and time weights from the columnar (array-backed)
+    buffers of an instance of class AntennaArray without looping over
+    antennas
+
+    Inputs:
+
+    cdata       [dictionary] columnar buffers. Read the docstring of attribute
+                columnar of class AntennaArray for details
+
+    pol         [string] polarization to select. Accepted values are 'P1' and
+                'P2'
+
+    antind      [scalar, list or numpy array] indices of antennas (along the
+                antenna axis of the buffers) to select. Default=None selects
+                all antennas
+
+    tselect     [scalar, list, numpy array] timestamp index for electric
+                fields selection in the stack. Default=None or -1 selects the
+                most recent timestamp. Ignored if datapool is set to 'current'
+
+    fselect     [scalar, list, numpy array] frequency channel indices.
+                Default=None selects all channels
+
+    datapool    [string] 'current' (or None, default) selects from the
+                current electric fields while 'stack' selects from the
+                stacked electric fields
+
+    Outputs:
+
+    Tuple (Ef, twts) where Ef is a complex numpy array of size
+    n_ts x n_ant x nchan and twts is a numpy array of size n_ts x n_ant x 1
+    containing the time weights (1.0 for unflagged and 0.0 for flagged)
+    ------------------------------------------------------------------------
+    """
+
+    if pol not in cdata['pols']:
+        raise ValueError('Invalid specification for input parameter pol')
+    pind = cdata['pols'].index(pol)
+
+    if antind is None:
+        antind = NP.arange(len(cdata['labels']))
+    else:
+        antind = NP.asarray(antind).astype(NP.int).ravel()
+
+    nchan = cdata['Ef_current'].shape[1]
+    if fselect is None:
+        chans = NP.arange(nchan)
+    else:
+        chans = NP.asarray(fselect).astype(NP.int).ravel()
+        if NP.any(chans < 0) or NP.any(chans >= nchan):
+            raise IndexError('Channel indices outside available range')
+
+    if datapool in [None, 'current']:
+        Ef = cdata['Ef_current'][NP.ix_(antind, chans, [pind])][NP.newaxis,:,:,0]
+        flags = cdata['flags_current'][antind,pind][NP.newaxis,:]
+    elif datapool == 'stack':
+        nstack = cdata['nstack']
+        if nstack == 0:
+            raise ValueError('Columnar stack has not been populated yet')
+        if tselect is None:
+            tsind = NP.asarray([nstack-1])
+        else:
+            tsind = NP.asarray(tselect).astype(NP.int).ravel()
+            if tsind.size == 1:
+                if (tsind[0] < -1) or (tsind[0] >= nstack):
+                    tsind = NP.asarray([-1])
+                if tsind[0] == -1:
+                    tsind = NP.asarray([nstack-1])
+            elif NP.any(tsind < 0) or NP.any(tsind >= nstack):
+                raise IndexError('Timestamp indices outside available range for the specified datapool')
+        if (fselect is None) and (antind.size == cdata['Ef'].shape[1]) and NP.all(antind == NP.arange(antind.size)) and (tsind.size == nstack) and NP.all(tsind == NP.arange(nstack)):
+            Ef = cdata['Ef'][:,:,:,pind] # Entire stack as a view without copying
+            flags = cdata['flags'][:,:,pind]
+        else:
+            Ef = cdata['Ef'][NP.ix_(tsind, antind, chans, [pind])][:,:,:,0]
+            flags = cdata['flags'][NP.ix_(tsind, antind, [pind])][:,:,0]
+    else:
+        raise ValueError('Invalid datapool specified')
+
+    twts = NP.logical_not(flags).astype(NP.float)[:,:,NP.newaxis]
+    return (Ef, twts)
+
+################################################################################
+
 class CrossPolInfo(object):
 
     """
@@ -517,6 +857,12 @@ class Interferometer(object):
                 under the polarization key is stored as numpy array with 
                 number of elements equal to the number of timestamps
 
+    stack_depth [NoneType or integer] Maximum number of most recent timestamps
+                held in Vt_stack, Vf_stack, flag_stack and timestamps. If None
+                (default), the stacks grow without bound. The stacks are held 
+                in preallocated instances of class StackBuffer and attributes
+                Vt_stack, Vf_stack and flag_stack are views into them
+
     Vf_avg      [dictionary] holds in keys 'P11', 'P12', 'P21', 'P22' for each
                 polarization the stacked and averaged complex visibility spectra
                 as a numpy array where the number of rows is the number of time
@@ -671,7 +1017,8 @@ class Interferometer(object):
     ----------------------------------------------------------------------------
     """
 
-    def __init__(self, antenna1, antenna2, corr_type=None, aperture=None):
+    def __init__(self, antenna1, antenna2, corr_type=None, aperture=None,
+                 stack_depth=None):
 
         """
         ------------------------------------------------------------------------
@@ -681,7 +1028,7 @@ class Interferometer(object):
         Class attributes initialized are:
         label, latitude, location, pol, t, timestamp, f0, f, wts, wtspos, 
         wtspos_scale, gridinfo, blc, trc, timestamps, Vt_stack, Vf_stack, 
-        flag_stack, Vf_avg, twts, tbinsize, aperture
+        flag_stack, Vf_avg, twts, tbinsize, aperture, stack_depth
      
         Read docstring of class Antenna for details on these attributes.
         ------------------------------------------------------------------------
@@ -735,9 +1082,13 @@ class Interferometer(object):
 
         self.crosspol = CrossPolInfo(self.f.size)
 
+        self.stack_depth = stack_depth
         self.Vt_stack = {}
         self.Vf_stack = {}
         self.flag_stack = {}
+        self._Vt_buffer = {}
+        self._Vf_buffer = {}
+        self._flag_buffer = {}
 
         self.Vf_avg = {}
         self.twts = {}
@@ -749,9 +1100,12 @@ class Interferometer(object):
         self._gridinfo = {}
 
         for pol in ['P11', 'P12', 'P21', 'P22']:
+            self._Vt_buffer[pol] = StackBuffer(depth=stack_depth)
+            self._Vf_buffer[pol] = StackBuffer(depth=stack_depth)
+            self._flag_buffer[pol] = StackBuffer(depth=stack_depth, shape=(), dtype=NP.bool)
             self.Vt_stack[pol] = None
             self.Vf_stack[pol] = None
-            self.flag_stack[pol] = NP.asarray([])
+            self.flag_stack[pol] = self._flag_buffer[pol].view()
 
             self.Vf_avg[pol] = None
             self.twts[pol] = None
@@ -788,25 +1142,41 @@ class Interferometer(object):
 
     ############################################################################
 
-    def FX(self):
+    def FX(self, Vf=None, Vt=None):
 
         """
         ------------------------------------------------------------------------
         Computes the visibility spectrum using an FX operation, i.e., Fourier 
         transform (F) followed by multiplication (X). All four cross
         polarizations are computed.
+
+        Inputs:
+
+        Vf      [dictionary] Visibility spectra under the cross-polarization 
+                keys 'P11', 'P12', 'P21' and 'P22' already computed from the 
+                electric field spectra of the antennas, as in parallel 
+                processing by class InterferometerArray. Default=None means 
+                they are computed here
+
+        Vt      [dictionary] Visibility timeseries corresponding to input Vf
+                under the same keys. Used only if Vf is specified
         ------------------------------------------------------------------------
         """
 
         self.t = NP.hstack((self.A1.t.ravel(), self.A1.t.max()+self.A2.t.ravel()))
         self.f = self.f0 + self.channels()
 
-        self.crosspol.Vf['P11'] = self.A1.antpol.Ef['P1'] * self.A2.antpol.Ef['P1'].conjugate()
-        self.crosspol.Vf['P12'] = self.A1.antpol.Ef['P1'] * self.A2.antpol.Ef['P2'].conjugate()
-        self.crosspol.Vf['P21'] = self.A1.antpol.Ef['P2'] * self.A2.antpol.Ef['P1'].conjugate()
-        self.crosspol.Vf['P22'] = self.A1.antpol.Ef['P2'] * self.A2.antpol.Ef['P2'].conjugate()
+        if Vf is None:
+            self.crosspol.Vf['P11'] = self.A1.antpol.Ef['P1'] * self.A2.antpol.Ef['P1'].conjugate()
+            self.crosspol.Vf['P12'] = self.A1.antpol.Ef['P1'] * self.A2.antpol.Ef['P2'].conjugate()
+            self.crosspol.Vf['P21'] = self.A1.antpol.Ef['P2'] * self.A2.antpol.Ef['P1'].conjugate()
+            self.crosspol.Vf['P22'] = self.A1.antpol.Ef['P2'] * self.A2.antpol.Ef['P2'].conjugate()
+            self.f2t()
+        else:
+            for cpol in ['P11', 'P12', 'P21', 'P22']:
+                self.crosspol.Vf[cpol] = Vf[cpol]
+                self.crosspol.Vt[cpol] = Vt[cpol]
 
-        self.f2t()
         self.crosspol._init_data_on = False
         self.update_flags(flags=None, stack=False, verify=True)
 
@@ -913,10 +1283,10 @@ class Interferometer(object):
         ind1 = NP.in1d(ts1, common_ts, assume_unique=True)
         ind2 = NP.in1d(ts2, common_ts, assume_unique=True)
 
-        self.Vf_stack['P11'] = self.A1.Ef_stack['P1'][ind1,:] * self.A2.Ef_stack['P1'][ind2,:].conjugate()
-        self.Vf_stack['P12'] = self.A1.Ef_stack['P1'][ind1,:] * self.A2.Ef_stack['P2'][ind2,:].conjugate()
-        self.Vf_stack['P21'] = self.A1.Ef_stack['P2'][ind1,:] * self.A2.Ef_stack['P1'][ind2,:].conjugate()
-        self.Vf_stack['P22'] = self.A1.Ef_stack['P2'][ind1,:] * self.A2.Ef_stack['P2'][ind2,:].conjugate()
+        self._set_stack('Vf', 'P11', self.A1.Ef_stack['P1'][ind1,:] * self.A2.Ef_stack['P1'][ind2,:].conjugate())
+        self._set_stack('Vf', 'P12', self.A1.Ef_stack['P1'][ind1,:] * self.A2.Ef_stack['P2'][ind2,:].conjugate())
+        self._set_stack('Vf', 'P21', self.A1.Ef_stack['P2'][ind1,:] * self.A2.Ef_stack['P1'][ind2,:].conjugate())
+        self._set_stack('Vf', 'P22', self.A1.Ef_stack['P2'][ind1,:] * self.A2.Ef_stack['P2'][ind2,:].conjugate())
 
         self.f2t_on_stack()
 
@@ -938,14 +1308,14 @@ class Interferometer(object):
         ind1 = NP.in1d(ts1, common_ts, assume_unique=True)
         ind2 = NP.in1d(ts2, common_ts, assume_unique=True)
 
-        self.flag_stack['P11'] = NP.logical_or(self.A1.flag_stack['P1'][ind1],
-                                               self.A2.flag_stack['P1'][ind2])
-        self.flag_stack['P12'] = NP.logical_or(self.A1.flag_stack['P1'][ind1],
-                                               self.A2.flag_stack['P2'][ind2])
-        self.flag_stack['P21'] = NP.logical_or(self.A1.flag_stack['P2'][ind1],
-                                               self.A2.flag_stack['P1'][ind2])
-        self.flag_stack['P22'] = NP.logical_or(self.A1.flag_stack['P2'][ind1],
-                                               self.A2.flag_stack['P2'][ind2])
+        self._set_stack('flag', 'P11', NP.logical_or(self.A1.flag_stack['P1'][ind1],
+                                                     self.A2.flag_stack['P1'][ind2]))
+        self._set_stack('flag', 'P12', NP.logical_or(self.A1.flag_stack['P1'][ind1],
+                                                     self.A2.flag_stack['P2'][ind2]))
+        self._set_stack('flag', 'P21', NP.logical_or(self.A1.flag_stack['P2'][ind1],
+                                                     self.A2.flag_stack['P1'][ind2]))
+        self._set_stack('flag', 'P22', NP.logical_or(self.A1.flag_stack['P2'][ind1],
+                                                     self.A2.flag_stack['P2'][ind2]))
 
     ############################################################################
     
@@ -973,10 +1343,10 @@ class Interferometer(object):
         ind1 = NP.in1d(ts1, common_ts, assume_unique=True)
         ind2 = NP.in1d(ts2, common_ts, assume_unique=True)
 
-        self.Vt_stack['P11'] = DSP.XC(self.A1.Et_stack['P1'], self.A2.Et_stack['P1'], shift=False)
-        self.Vt_stack['P12'] = DSP.XC(self.A1.Et_stack['P1'], self.A2.Et_stack['P2'], shift=False)
-        self.Vt_stack['P21'] = DSP.XC(self.A1.Et_stack['P2'], self.A2.Et_stack['P1'], shift=False)
-        self.Vt_stack['P22'] = DSP.XC(self.A1.Et_stack['P2'], self.A2.Et_stack['P2'], shift=False)
+        self._set_stack('Vt', 'P11', DSP.XC(self.A1.Et_stack['P1'], self.A2.Et_stack['P1'], shift=False))
+        self._set_stack('Vt', 'P12', DSP.XC(self.A1.Et_stack['P1'], self.A2.Et_stack['P2'], shift=False))
+        self._set_stack('Vt', 'P21', DSP.XC(self.A1.Et_stack['P2'], self.A2.Et_stack['P1'], shift=False))
+        self._set_stack('Vt', 'P22', DSP.XC(self.A1.Et_stack['P2'], self.A2.Et_stack['P2'], shift=False))
 
         self.t2f_on_stack()
 
@@ -991,9 +1361,9 @@ class Interferometer(object):
         ------------------------------------------------------------------------
         """
         for pol in ['P11', 'P12', 'P21', 'P22']:
-            self.Vt_stack[pol] = DSP.FT1D(NP.fft.fftshift(self.Vf_stack[pol]),
-                                          ax=1, inverse=True, shift=True,
-                                          verbose=False)
+            self._set_stack('Vt', pol, DSP.FT1D(NP.fft.fftshift(self.Vf_stack[pol]),
+                                                ax=1, inverse=True, shift=True,
+                                                verbose=False))
 
     ############################################################################
 
@@ -1007,8 +1377,8 @@ class Interferometer(object):
         """
 
         for pol in ['P11', 'P12', 'P21', 'P22']:
-            self.Vf_stack[pol] = DSP.FT1D(NP.fft.ifftshift(self.Vt_stack[pol]),
-                                          ax=1, shift=True, verbose=False)
+            self._set_stack('Vf', pol, DSP.FT1D(NP.fft.ifftshift(self.Vt_stack[pol]),
+                                                ax=1, shift=True, verbose=False))
 
     ############################################################################
 
@@ -1300,13 +1670,77 @@ class Interferometer(object):
         # Stack on to last value or update last value in stack
         for pol in ['P11', 'P12', 'P21', 'P22']: 
             if stack is True:
-                self.flag_stack[pol] = NP.append(self.flag_stack[pol], self.crosspol.flag[pol])
+                self._flag_buffer[pol].append(self.crosspol.flag[pol])
             else:
-                if self.flag_stack[pol].size > 0:
-                    self.flag_stack[pol][-1] = self.crosspol.flag[pol]
-                # else:
-                #     self.flag_stack[pol] = NP.asarray(self.crosspol.flag[pol]).reshape(-1)
-            self.flag_stack[pol] = self.flag_stack[pol].astype(NP.bool)
+                if len(self._flag_buffer[pol]) > 0:
+                    self._flag_buffer[pol].update_last(self.crosspol.flag[pol])
+            self.flag_stack[pol] = self._flag_buffer[pol].view()
+
+    ############################################################################
+
+    def _set_stack(self, qty, pol, records):
+
+        """
+        ------------------------------------------------------------------------
+        Replaces the contents of a stack of visibilities or flags under the 
+        specified polarization by the given records so that subsequent 
+        appends continue from them. Not meant to be accessed directly by the
+        user.
+
+        Inputs:
+
+        qty     [string] stack to be replaced. Accepted values are 'Vt', 'Vf'
+                and 'flag'
+
+        pol     [string] cross-polarization. Accepted values are 'P11', 'P12',
+                'P21' and 'P22'
+
+        records [numpy array] records in chronological order of size 
+                n_timestamps x nchan (or n_timestamps in case of flags)
+        ------------------------------------------------------------------------
+        """
+
+        buf = getattr(self, '_{0}_buffer'.format(qty))[pol]
+        buf.reset(records)
+        getattr(self, '{0}_stack'.format(qty))[pol] = buf.view()
+
+    ############################################################################
+
+    def _push_stack(self, pol, stack=True, init=True):
+
+        """
+        ------------------------------------------------------------------------
+        Appends the current visibilities under the specified polarization to 
+        the end of the stack or overwrites the last record in the stack. Not
+        meant to be accessed directly by the user.
+
+        Inputs:
+
+        pol     [string] cross-polarization. Accepted values are 'P11', 'P12',
+                'P21' and 'P22'
+
+        stack   [boolean] If True (default), appends the current visibilities
+                to the stack. If False, overwrites the last record in the 
+                stack
+
+        init    [boolean] If True (default), the stack is initialized with the 
+                current visibilities if it is empty. If False, an empty stack
+                is left as is
+        ------------------------------------------------------------------------
+        """
+
+        if self.Vt_stack[pol] is None:
+            if not init:
+                return
+            stack = True
+        if stack:
+            self._Vt_buffer[pol].append(self.crosspol.Vt[pol].ravel())
+            self._Vf_buffer[pol].append(self.crosspol.Vf[pol].ravel())
+        else:
+            self._Vt_buffer[pol].update_last(self.crosspol.Vt[pol].ravel())
+            self._Vf_buffer[pol].update_last(self.crosspol.Vf[pol].ravel())
+        self.Vt_stack[pol] = self._Vt_buffer[pol].view()
+        self.Vf_stack[pol] = self._Vf_buffer[pol].view()
 
     ############################################################################
 
@@ -1422,6 +1856,8 @@ class Interferometer(object):
                 print 'Interferometer timestamp does not match with the component antenna timestamp(s). Update for interferometer {0} will be skipped.'.format(self.label)
         else:
             self.timestamps += [copy.deepcopy(self.timestamp)]
+            if self.stack_depth is not None:
+                del self.timestamps[:-self.stack_depth]
             if t is not None:
                 self.t = t
                 self.f = self.f0 + self.channels()     
@@ -1439,16 +1875,7 @@ class Interferometer(object):
     
             self.update_flags(flags=None, stack=stack, verify=True)  # Re-check flags and stack
             for pol in ['P11', 'P12', 'P21', 'P22']:
-                if self.Vt_stack[pol] is None:
-                    self.Vt_stack[pol] = copy.deepcopy(self.crosspol.Vt[pol].reshape(1,-1))
-                    self.Vf_stack[pol] = copy.deepcopy(self.crosspol.Vf[pol].reshape(1,-1))
-                else:
-                    if stack:
-                        self.Vt_stack[pol] = NP.vstack((self.Vt_stack[pol], self.crosspol.Vt[pol].reshape(1,-1)))
-                        self.Vf_stack[pol] = NP.vstack((self.Vf_stack[pol], self.crosspol.Vf[pol].reshape(1,-1)))
-                    else:
-                        self.Vt_stack[pol][-1,:] = copy.deepcopy(self.crosspol.Vt[pol].reshape(1,-1))
-                        self.Vf_stack[pol][-1,:] = copy.deepcopy(self.crosspol.Vf[pol].reshape(1,-1))
+                self._push_stack(pol, stack=stack, init=True)
 
             blc_orig = NP.copy(self.blc)
             trc_orig = NP.copy(self.trc)
@@ -1613,6 +2040,13 @@ class Interferometer(object):
                        operation) and 'XF' (for XF operation). Default=None 
                        means no correlating operation is to be performed after 
                        updates.
+
+            FX_out     [tuple] Visibility spectra and timeseries, each a 
+                       dictionary under the cross-polarization keys, already 
+                       computed from the antenna electric fields. Used in 
+                       place of the FX operation if do_correlate is set to 
+                       'FX'. Set by member function update() of class 
+                       InterferometerArray in parallel processing
     
             stack      [boolean] If True (default), appends the updated flag 
                        and data to the end of the stack as a function of 
@@ -1641,6 +2075,7 @@ class Interferometer(object):
         verify_flags = True
         Vt = None
         do_correlate = None
+        FX_out = None
         wtsinfo = None
         gridfunc_freq = None
         ref_freq = None
@@ -1659,6 +2094,7 @@ class Interferometer(object):
             if 'stack' in update_dict: stack = update_dict['stack']
             if 'verify_flags' in update_dict: verify_flags = update_dict['verify_flags']            
             if 'do_correlate' in update_dict: do_correlate = update_dict['do_correlate']
+            if 'FX_out' in update_dict: FX_out = update_dict['FX_out']
             if 'wtsinfo' in update_dict: wtsinfo = update_dict['wtsinfo']
             if 'gridfunc_freq' in update_dict: gridfunc_freq = update_dict['gridfunc_freq']
             if 'ref_freq' in update_dict: ref_freq = update_dict['ref_freq']
@@ -1675,6 +2111,8 @@ class Interferometer(object):
                 print 'Interferometer timestamp does not match with the component antenna timestamp(s). Update for interferometer {0} will be skipped.'.format(self.label)
         else:
             self.timestamps += [copy.deepcopy(self.timestamp)]
+            if self.stack_depth is not None:
+                del self.timestamps[:-self.stack_depth]
             if t is not None:
                 self.t = t
                 self.f = self.f0 + self.channels()     
@@ -1683,7 +2121,10 @@ class Interferometer(object):
     
             if do_correlate is not None:
                 if do_correlate == 'FX':
-                    self.FX()
+                    if FX_out is None:
+                        self.FX()
+                    else:
+                        self.FX(Vf=FX_out[0], Vt=FX_out[1])
                 elif do_correlate == 'XF':
                     self.XF()
                 else:
@@ -1692,17 +2133,7 @@ class Interferometer(object):
 
             for pol in ['P11', 'P12', 'P21', 'P22']:
                 if not self.crosspol._init_data_on:
-                    if self.Vt_stack[pol] is None:
-                        if stack:
-                            self.Vt_stack[pol] = copy.deepcopy(self.crosspol.Vt[pol].reshape(1,-1))
-                            self.Vf_stack[pol] = copy.deepcopy(self.crosspol.Vf[pol].reshape(1,-1))
-                    else:
-                        if stack:
-                            self.Vt_stack[pol] = NP.vstack((self.Vt_stack[pol], self.crosspol.Vt[pol].reshape(1,-1)))
-                            self.Vf_stack[pol] = NP.vstack((self.Vf_stack[pol], self.crosspol.Vf[pol].reshape(1,-1)))
-                        else:
-                            self.Vt_stack[pol][-1,:] = copy.deepcopy(self.crosspol.Vt[pol].reshape(1,-1))
-                            self.Vf_stack[pol][-1,:] = copy.deepcopy(self.crosspol.Vf[pol].reshape(1,-1))
+                    self._push_stack(pol, stack=stack, init=stack)
 
             blc_orig = NP.copy(self.blc)
             trc_orig = NP.copy(self.trc)
@@ -1929,6 +2360,8 @@ class Interferometer(object):
                 print 'Interferometer timestamp does not match with the component antenna timestamp(s). Update for interferometer {0} will be skipped.'.format(self.label)
         else:
             self.timestamps += [copy.deepcopy(self.timestamp)]
+            if self.stack_depth is not None:
+                del self.timestamps[:-self.stack_depth]
             if t is not None:
                 self.t = t
                 self.f = self.f0 + self.channels()     
@@ -1946,16 +2379,7 @@ class Interferometer(object):
     
             self.update_flags(flags=None, stack=stack, verify=True)  # Re-check flags and stack
             for pol in ['P11', 'P12', 'P21', 'P22']:
-                if self.Vt_stack[pol] is None:
-                    self.Vt_stack[pol] = copy.deepcopy(self.crosspol.Vt[pol].reshape(1,-1))
-                    self.Vf_stack[pol] = copy.deepcopy(self.crosspol.Vf[pol].reshape(1,-1))
-                else:
-                    if stack:
-                        self.Vt_stack[pol] = NP.vstack((self.Vt_stack[pol], self.crosspol.Vt[pol].reshape(1,-1)))
-                        self.Vf_stack[pol] = NP.vstack((self.Vf_stack[pol], self.crosspol.Vf[pol].reshape(1,-1)))
-                    else:
-                        self.Vt_stack[pol][-1,:] = copy.deepcopy(self.crosspol.Vt[pol].reshape(1,-1))
-                        self.Vf_stack[pol][-1,:] = copy.deepcopy(self.crosspol.Vf[pol].reshape(1,-1))
+                self._push_stack(pol, stack=stack, init=True)
     
             blc_orig = NP.copy(self.blc)
             trc_orig = NP.copy(self.trc)
@@ -2138,7 +2562,10 @@ class Interferometer(object):
         if tbinsize is None:   # Average visibilities across all timestamps
             for pol in ['P11', 'P12', 'P21', 'P22']:
                 unflagged_ind = NP.logical_not(self.flag_stack[pol])
-                Vf_acc[pol] = NP.nansum(self.Vf_stack[pol][unflagged_ind,:], axis=0, keepdims=True)
+                if NP.all(unflagged_ind): # Read the stack directly without copying
+                    Vf_acc[pol] = NP.nansum(self.Vf_stack[pol], axis=0, keepdims=True)
+                else:
+                    Vf_acc[pol] = NP.nansum(self.Vf_stack[pol][unflagged_ind,:], axis=0, keepdims=True)
                 twts[pol] = NP.sum(unflagged_ind).astype(NP.float).reshape(-1,1)
                 # twts[pol] = NP.asarray(len(self.timestamps) - NP.sum(self.flag_stack[pol])).reshape(-1,1)
             self.tbinsize = tbinsize
@@ -2492,6 +2919,12 @@ class InterferometerArray(object):
                   visibilities and interferometer array illumination 
                   respectively
 
+    pool          [NoneType or instance of class SharedArrayPool] long-lived 
+                  pool of worker processes and shared memory arrays used in 
+                  parallel processing. It is created on first use and retained
+                  for subsequent calls until member function closePool() is 
+                  invoked
+
     Member Functions:
 
     __init__()      Initializes an instance of class InterferometerArray
@@ -2527,6 +2960,9 @@ class InterferometerArray(object):
                     attribute antenna_array which is an instance of class 
                     AntennaArray
 
+    closePool()     Shuts down the worker processes of the pool used in 
+                    parallel processing and drops its shared memory arrays
+
     FX()            Computes the Fourier transform of the cross-correlated time 
                     series of the interferometer pairs in the interferometer 
                     array to compute the visibility spectra
@@ -2611,7 +3047,7 @@ class InterferometerArray(object):
         Class attributes initialized are:
         antenna_array, interferometers, timestamp, t, f, f0, blc, trc, grid_blc,
         grid_trc, gridx, gridy, grid_ready, grid_illumination, grid_Vf, 
-        ordered_labels, grid_mapper
+        ordered_labels, grid_mapper, pool
         ------------------------------------------------------------------------
         """
 
@@ -2632,6 +3068,7 @@ class InterferometerArray(object):
         self.ordered_labels = [] # Usually output from member function baseline_vectors() or get_visibilities()
         self.grid_mapper = {}
         self.bl2grid_mapper = {}  # contains the sparse mapping matrix
+        self.pool = None
 
         for pol in ['P11', 'P12', 'P21', 'P22']:
             self.grid_mapper[pol] = {}
@@ -3096,13 +3533,135 @@ class InterferometerArray(object):
 
     ############################################################################
 
+    def _getPool(self, nproc=None):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the long-lived pool of worker processes in attribute pool, 
+        creating it if it does not exist or if a different number of 
+        processes is requested. Not meant to be accessed directly by the user.
+
+        Input:
+
+        nproc      [integer] specifies number of independent processes to 
+                   spawn. Default = None, means automatically determines the 
+                   number of process cores in the system and use one less than 
+                   that. Read docstring of class SharedArrayPool for details
+        ------------------------------------------------------------------------
+        """
+
+        if self.pool is not None:
+            if (nproc is not None) and (min(max(nproc, 1), max(MP.cpu_count()-1, 1)) != self.pool.nproc):
+                self.closePool()
+        if self.pool is None:
+            self.pool = SharedArrayPool(nproc=nproc)
+        return self.pool
+
+    ############################################################################
+
+    def closePool(self):
+
+        """
+        ------------------------------------------------------------------------
+        Shuts down the worker processes of the pool used in parallel 
+        processing once they have finished their pending tasks and drops the
+        pool together with its shared memory arrays. Results of parallel 
+        processing are copies and remain valid. A new pool is created on the
+        next call with parallel processing
+        ------------------------------------------------------------------------
+        """
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.release()
+            self.pool = None
+
+    ############################################################################
+
+    def _sharedAntennaIndices(self, labels):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the antennas in the given interferometers and the indices of 
+        the two antennas of each interferometer into that list of antennas. 
+        Used in setting up shared memory arrays for parallel processing. Not 
+        meant to be accessed directly by the user.
+
+        Input:
+
+        labels     [list] interferometer labels
+
+        Output:
+
+        Tuple (antennas, antind) where antennas is a list of instances of 
+        class Antenna and antind is a numpy array of size n_bl x 2
+        ------------------------------------------------------------------------
+        """
+
+        antennas = []
+        index = {}
+        antind = NP.empty((len(labels),2), dtype=NP.int)
+        for bi,label in enumerate(labels):
+            for i,ant in enumerate([self.interferometers[label].A1, self.interferometers[label].A2]):
+                if id(ant) not in index:
+                    index[id(ant)] = len(antennas)
+                    antennas += [ant]
+                antind[bi,i] = index[id(ant)]
+        return (antennas, antind)
+
+    ############################################################################
+
+    def _sharedFX(self, labels, nproc=None):
+
+        """
+        ------------------------------------------------------------------------
+        Computes the visibility spectra and timeseries of the given 
+        interferometers from the current electric field spectra of their 
+        antennas in the worker processes of attribute pool. The spectra are 
+        placed in a shared memory array once and ranges of interferometers 
+        are processed in place. Not meant to be accessed directly by the user.
+
+        Inputs:
+
+        labels     [list] interferometer labels
+
+        nproc      [integer] Number of worker processes. Read docstring of 
+                   member function FX()
+
+        Output:
+
+        Tuple (Vf, Vt) of complex numpy arrays of size n_bl x 4 x nchan 
+        ordered as the cross-polarizations 'P11', 'P12', 'P21' and 'P22'. 
+        They are copies owned by the caller
+        ------------------------------------------------------------------------
+        """
+
+        antennas, antind = self._sharedAntennaIndices(labels)
+        nchan = NP.asarray(antennas[0].antpol.Ef['P1']).size
+        pool = self._getPool(nproc=nproc)
+        Ef = pool.allocate('Ef', (len(antennas), nchan, 2), NP.complex128)
+        pool.allocate('antind', antind.shape, antind.dtype)[...] = antind
+        Vf = pool.allocate('Vf', (len(labels), 4, nchan), NP.complex128)
+        Vt = pool.allocate('Vt', (len(labels), 4, nchan), NP.complex128)
+        for ai,ant in enumerate(antennas):
+            for pi,pol in enumerate(['P1', 'P2']):
+                Ef[ai,:,pi] = NP.asarray(ant.antpol.Ef[pol]).ravel()
+        pool.map(shared_interferometer_FX_arg_splitter, pool.ranges(len(labels)))
+        return (NP.copy(Vf), NP.copy(Vt))
+
+    ############################################################################
+
     def FX(self, parallel=False, nproc=None):
 
         """
         ------------------------------------------------------------------------
         Computes the Fourier transform of the cross-correlated time series of 
         the interferometer pairs in the interferometer array to compute the 
-        visibility spectra
+        visibility spectra. In parallel processing, the electric field spectra
+        of the antennas are placed in a shared memory array once and the 
+        worker processes of attribute pool compute visibilities of ranges of 
+        interferometers in place. Visibilities of the interferometers are then
+        views into a copy of the results made once per call.
 
         Inputs:
 
@@ -3137,18 +3696,11 @@ class InterferometerArray(object):
             for label in self.interferometers:
                 self.interferometers[label].FX()
         elif parallel or (nproc is not None):
-            if nproc is None:
-                nproc = max(MP.cpu_count()-1, 1) 
-            else:
-                nproc = min(nproc, max(MP.cpu_count()-1, 1))
-            pool = MP.Pool(processes=nproc)
-            updated_interferometers = pool.map(unwrap_interferometer_FX, IT.izip(self.interferometers.values()))
-            pool.close()
-            pool.join()
-
-            for interferometer in updated_interferometers: 
-                self.interferometers[interferometer.label] = interferometer
-            del updated_interferometers
+            labels = sorted(self.interferometers.keys())
+            Vf, Vt = self._sharedFX(labels, nproc=nproc)
+            cpols = ['P11', 'P12', 'P21', 'P22']
+            for bi,label in enumerate(labels):
+                self.interferometers[label].FX(Vf={cpol: Vf[bi,ci,:] for ci,cpol in enumerate(cpols)}, Vt={cpol: Vt[bi,ci,:] for ci,cpol in enumerate(cpols)})
 
     ############################################################################
 
@@ -3390,25 +3942,60 @@ class InterferometerArray(object):
                   cores in the system, it will be reset to number of process 
                   cores in the system minus one to avoid locking the system out 
                   for other processes
+
+        In parallel processing, if all the antennas share the same timestamps,
+        their stacked electric fields are placed in a shared memory array once
+        and the worker processes of attribute pool compute stacked 
+        visibilities of ranges of interferometers in place. The stacked 
+        visibilities are then copied into the stack buffers of the 
+        interferometers. Otherwise, the interferometers are sent to the worker
+        processes.
         ------------------------------------------------------------------------
         """
 
         if parallel:
-            if nproc is None:
-                nproc = max(MP.cpu_count()-1, 1) 
+            pool = self._getPool(nproc=nproc)
+            labels = sorted(self.interferometers.keys())
+            antennas, antind = self._sharedAntennaIndices(labels)
+            common_timestamps = all([ant.timestamps == antennas[0].timestamps for ant in antennas])
+            if common_timestamps and (len(antennas[0].timestamps) > 0):
+                ntimes = len(antennas[0].timestamps)
+                flag_stack = NP.empty((ntimes, len(antennas), 2), dtype=NP.bool)
+                for ai,ant in enumerate(antennas):
+                    for pi,pol in enumerate(['P1', 'P2']):
+                        flag_stack[:,ai,pi] = ant.flag_stack[pol]
+                if on_data:
+                    nchan = antennas[0].Ef_stack['P1'].shape[1]
+                    Ef = pool.allocate('Ef_stack', (ntimes, len(antennas), nchan, 2), NP.complex128)
+                    pool.allocate('antind', antind.shape, antind.dtype)[...] = antind
+                    Vf = pool.allocate('Vf_stack', (len(labels), 4, ntimes, nchan), NP.complex128)
+                    Vt = pool.allocate('Vt_stack', (len(labels), 4, ntimes, nchan), NP.complex128)
+                    for ai,ant in enumerate(antennas):
+                        for pi,pol in enumerate(['P1', 'P2']):
+                            Ef[:,ai,:,pi] = ant.Ef_stack[pol]
+                    pool.map(shared_interferometer_stack_arg_splitter, pool.ranges(len(labels)))
+
+                for bi,label in enumerate(labels):
+                    interferometer = self.interferometers[label]
+                    interferometer.timestamps = copy.copy(antennas[0].timestamps)
+                    for ci,(pi1,pi2) in enumerate([(0,0), (0,1), (1,0), (1,1)]):
+                        cpol = ['P11', 'P12', 'P21', 'P22'][ci]
+                        if on_data:
+                            interferometer._set_stack('Vf', cpol, Vf[bi,ci,:,:])
+                            interferometer._set_stack('Vt', cpol, Vt[bi,ci,:,:])
+                        if on_flags:
+                            interferometer._set_stack('flag', cpol, NP.logical_or(flag_stack[:,antind[bi,0],pi1], flag_stack[:,antind[bi,1],pi2]))
+                    if on_data:
+                        interferometer.t = NP.hstack((interferometer.A1.t.ravel(), interferometer.A1.t.max()+interferometer.A2.t.ravel()))
+                        interferometer.f = interferometer.f0 + interferometer.channels()
             else:
-                nproc = min(nproc, max(MP.cpu_count()-1, 1))
-
-            list_of_perform_flag_stack = [on_flags] * len(self.interferometers)
-            list_of_perform_data_stack = [on_data] * len(self.interferometers)
+                list_of_perform_flag_stack = [on_flags] * len(self.interferometers)
+                list_of_perform_data_stack = [on_data] * len(self.interferometers)
 
-            pool = MP.Pool(processes=nproc)
-            updated_interferometers = pool.map(unwrap_interferometer_stack, IT.izip(self.interferometers.values(), list_of_perform_flag_stack, list_of_perform_data_stack))
-            pool.close()
-            pool.join()
-            for interferometer in updated_interferometers: 
-                self.interferometers[interferometer.label] = interferometer
-            del updated_interferometers
+                updated_interferometers = pool.map(unwrap_interferometer_stack, IT.izip(self.interferometers.values(), list_of_perform_flag_stack, list_of_perform_data_stack))
+                for interferometer in updated_interferometers: 
+                    self.interferometers[interferometer.label] = interferometer
+                del updated_interferometers
         else:
             for label in self.interferometers:
                 self.interferometers[label].stack(on_flags=on_flags, on_data=on_data)
@@ -4816,29 +5403,22 @@ class InterferometerArray(object):
             self.grid_illumination[cpol] = NP.zeros((self.gridu.shape + (self.f.size,)), dtype=NP.complex_)
             self.grid_Vf[cpol] = NP.zeros((self.gridu.shape + (self.f.size,)), dtype=NP.complex_)
     
-            nlabels = len(self.grid_mapper[cpol]['per_bl2grid'])
-            loopcount = 0
-            num_unflagged = 0
-            sum_twts = 0.0
-            if verbose:
-                progress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Antennas '.format(nlabels), PGB.ETA()], maxval=nlabels).start()
-
-            for bi, per_bl2grid_info in enumerate(self.grid_mapper[cpol]['per_bl2grid']):
-                bllabel = per_bl2grid_info['label']
-                if per_bl2grid_info['twts'] > 0.0:
-                    num_unflagged += 1
-                    sum_twts += per_bl2grid_info['twts']
-                    vuf_gridind_unraveled = (per_bl2grid_info['v_gridind'],per_bl2grid_info['u_gridind'],per_bl2grid_info['f_gridind'])
-                    self.grid_illumination[cpol][vuf_gridind_unraveled] += per_bl2grid_info['per_bl_per_freq_norm_wts'] * per_bl2grid_info['illumination']
-                    self.grid_Vf[cpol][vuf_gridind_unraveled] += per_bl2grid_info['per_bl_per_freq_norm_wts'] * per_bl2grid_info['Vf'] * per_bl2grid_info['illumination']
-                    # self.grid_illumination[cpol][vuf_gridind_unraveled] += per_bl2grid_info['per_bl_per_freq_norm_wts'] * per_bl2grid_info['illumination'] * per_bl2grid_info['twts']
-                    # self.grid_Vf[cpol][vuf_gridind_unraveled] += per_bl2grid_info['per_bl_per_freq_norm_wts'] * per_bl2grid_info['Vf'] * per_bl2grid_info['twts']
-
-                if verbose:
-                    progress.update(loopcount+1)
-                    loopcount += 1
-            if verbose:
-                progress.finish()
+            # Flags are applied as a per-baseline mask on the concatenated 
+            # baseline-to-grid mapping and all contributions are accumulated 
+            # with a single scatter-add
+
+            all_bl2grid = self.grid_mapper[cpol]['all_bl2grid']
+            if 'Vf' not in all_bl2grid:
+                raise KeyError('Gridded visibilities not found. Run grid_convolve_new() first.')
+            bltwts = NP.asarray([per_bl2grid_info['twts'] for per_bl2grid_info in self.grid_mapper[cpol]['per_bl2grid']]).ravel()
+            unflagged = bltwts[all_bl2grid['blind']] > 0.0
+            num_unflagged = NP.sum(bltwts > 0.0)
+            sum_twts = NP.sum(bltwts[bltwts > 0.0])
+            vuf_gridind = NP.ravel_multi_index((all_bl2grid['v_gridind'][unflagged], all_bl2grid['u_gridind'][unflagged], all_bl2grid['f_gridind'][unflagged]), self.grid_illumination[cpol].shape)
+            wtd_illumination = all_bl2grid['per_bl_per_freq_norm_wts'][unflagged] * all_bl2grid['illumination'][unflagged]
+            gridsize = self.grid_illumination[cpol].size
+            self.grid_illumination[cpol] += grid_scatter_add(vuf_gridind, wtd_illumination, gridsize).reshape(self.grid_illumination[cpol].shape)
+            self.grid_Vf[cpol] += grid_scatter_add(vuf_gridind, wtd_illumination * all_bl2grid['Vf'][unflagged], gridsize).reshape(self.grid_Vf[cpol].shape)
             # self.grid_illumination[cpol] *= num_unflagged/sum_twts
             # self.grid_Vf[cpol] *= num_unflagged/sum_twts
 
@@ -6245,7 +6825,12 @@ class InterferometerArray(object):
                     no correlating operation is to be performed after updates.
 
         parallel    [boolean] specifies if parallelization is to be invoked. 
-                    False (default) means only serial processing
+                    False (default) means only serial processing. In parallel
+                    processing, the FX operation of the interferometer updates
+                    is performed on shared memory arrays in the worker 
+                    processes of attribute pool. The rest of the updates are 
+                    applied in this process, so that interferometers are not
+                    sent between processes
 
         nproc       [integer] specifies number of independent processes to 
                     spawn. Default = None, means automatically determines the 
@@ -6290,7 +6875,6 @@ class InterferometerArray(object):
                     interferometer_level_updates['interferometers'] = [interferometer_level_updates['interferometers']]
                 if parallel:
                     list_of_interferometer_updates = []
-                    list_of_interferometers = []
 
                 if verbose:
                     progress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Interferometers '.format(len(interferometer_level_updates['interferometers'])), PGB.ETA()], maxval=len(interferometer_level_updates['interferometers'])).start()
@@ -6352,7 +6936,6 @@ class InterferometerArray(object):
                                 # self.interferometers[dictitem['label']].update_old(dictitem['label'], dictitem['Vt'], dictitem['t'], dictitem['timestamp'], dictitem['location'], dictitem['wtsinfo'], dictitem['flags'], dictitem['gridfunc_freq'], dictitem['ref_freq'], dictitem['do_correlate'], verbose)
                                 self.interferometers[dictitem['label']].update(dictitem, verbose)                                
                             else:
-                                list_of_interferometers += [self.interferometers[dictitem['label']]]
                                 list_of_interferometer_updates += [dictitem]
 
                             if 'gric_action' in dictitem:
@@ -6367,19 +6950,14 @@ class InterferometerArray(object):
                     progress.finish()
                     
                 if parallel:
-                    if nproc is None:
-                        nproc = max(MP.cpu_count()-1, 1) 
-                    else:
-                        nproc = min(nproc, max(MP.cpu_count()-1, 1))
-                    pool = MP.Pool(processes=nproc)
-                    updated_interferometers = pool.map(unwrap_interferometer_update, IT.izip(list_of_interferometers, list_of_interferometer_updates))
-                    pool.close()
-                    pool.join()
-
-                    # Necessary to make the returned and updated interferometers current, otherwise they stay unrelated
-                    for interferometer in updated_interferometers: 
-                        self.interferometers[interferometer.label] = interferometer
-                    del updated_interferometers
+                    FX_indices = [i for i,dictitem in enumerate(list_of_interferometer_updates) if dictitem['do_correlate'] == 'FX']
+                    if len(FX_indices) > 0:
+                        Vf, Vt = self._sharedFX([list_of_interferometer_updates[i]['label'] for i in FX_indices], nproc=nproc)
+                        cpols = ['P11', 'P12', 'P21', 'P22']
+                        for bi,i in enumerate(FX_indices):
+                            list_of_interferometer_updates[i] = dict(list_of_interferometer_updates[i], FX_out=({cpol: Vf[bi,ci,:] for ci,cpol in enumerate(cpols)}, {cpol: Vt[bi,ci,:] for ci,cpol in enumerate(cpols)}))
+                    for dictitem in list_of_interferometer_updates:
+                        self.interferometers[dictitem['label']].update(dictitem, verbose)
 
 ################################################################################
         
@@ -6488,6 +7066,23 @@ class Image(object):
     extfile      [string] external filename under which images and associated 
                  info will be stored
 
+    extwriter    [instance of class ExtFileWriter] Writer keeping the external
+                 file open if opened by member function open_extwriter(), 
+                 else None
+
+    accumulator  [instance of class ImageAccumulator] In-memory running sums
+                 of the accumulate datapool if opened by member function 
+                 open_accumulator(), else None
+
+    psf_cache    [dictionary] Synthesized beam products, weights and sum of 
+                 weights of MOFF imaging with grid_map_method set to 'sparse'
+                 cached per polarization by member function imagr(). They are
+                 reused while the gridded illumination of the antenna array 
+                 (see attribute grid_illumination_cache of class 
+                 AntennaArray), weighting and padding do not change. Under 
+                 each polarization is a dictionary with keys 'key' and 'psf'
+                 (see input psf of member function imagr_block())
+
     Member Functions:
 
     __init__()   Initializes an instance of class Image which manages 
@@ -6500,6 +7095,34 @@ class Image(object):
                  appropriate electric field quantities associated with the 
                  antenna array.
 
+    imagr_block()
+                 Imaging engine for MOFF imaging that inverse fourier 
+                 transforms given gridded electric fields and aperture 
+                 illumination without modifying the image object
+
+    set_products()
+                 Places imaging products evaluated by imagr_block() under the
+                 corresponding attributes of the image object
+
+    evalApertureProducts()
+                 Evaluates the aperture plane weights and visibilities from 
+                 the synthesized beam and image where not evaluated by imaging
+
+    open_extwriter()
+                 Opens a writer keeping the external file open with 
+                 accumulations held in memory between writes
+
+    close_extwriter()
+                 Writes the pending accumulations and closes the writer
+
+    open_extfile()
+                 Context manager yielding the writer if open or else the 
+                 external file
+
+    init_extfile()
+                 Creates the image-plane and aperture-plane datasets in the 
+                 external file if not already created
+
     stack()      Stacks current images and UV-grid information onto a stack
 
     accumulate_inplace()
@@ -6507,6 +7130,20 @@ class Image(object):
                  gridded visibilities and aperture plane weights in the 
                  external file.
 
+    write_accumulated()
+                 Adds given images, beams, gridded visibilities and aperture
+                 plane weights to the accumulate datapool in the external file
+
+    open_accumulator()
+                 Opens an accumulator holding the running sums in memory
+
+    flush_accumulator()
+                 Writes the running sums of the accumulator to the external 
+                 file
+
+    close_accumulator()
+                 Writes the running sums and removes the accumulator
+
     reset_extfile()
                  Reset/initialize the extfile under specified datapool(s)
 
@@ -6582,6 +7219,9 @@ class Image(object):
         self.measured_type = None
         self.antenna_array = None
         self.interferometer_array = None
+        self.extwriter = None
+        self.accumulator = None
+        self.psf_cache = {}
         self.autocorr_set = False
         self.autocorr_removed = False
 
@@ -7015,6 +7655,7 @@ class Image(object):
 
     def imagr(self, pol=None, weighting='natural', pad=0, stack=True,
               grid_map_method='sparse', cal_loop=False, nproc=None,
+              fft_backend=None, fft_nthreads=None, products=None,
               verbose=True):
 
         """
@@ -7068,7 +7709,25 @@ class Image(object):
                   If nproc is set to a value more than the number of process
                   cores in the system, it will be reset to number of process 
                   cores in the system minus one to avoid locking the system out 
-                  for other processes
+                  for other processes. In case of MOFF imaging with 
+                  grid_map_method set to 'sparse', it is also the number of 
+                  threads used in the sparse gridding (one if set to None)
+
+        fft_backend
+                  [string] Applicable only in case of MOFF imaging. Backend 
+                  with which the FFTs are performed using cached plans and 
+                  work buffers. Accepted values are 'numpy', 'scipy' and 
+                  'pyfftw'. Default=None means 'numpy'. See member function 
+                  imagr_block()
+
+        fft_nthreads
+                  [integer] Number of threads used by the FFT backend. If set
+                  to None (default), nproc is used
+
+        products  [list] Applicable only in case of MOFF imaging. Imaging 
+                  products to be evaluated among 'holimg', 'holbeam', 'img',
+                  'beam', 'wts_vuf' and 'vis_vuf'. If set to None (default), 
+                  all are evaluated. See member function imagr_block()
 
         verbose   [boolean] If True (default), prints diagnostic and progress
                   messages. If False, suppress printing such messages.
@@ -7101,11 +7760,14 @@ class Image(object):
                     if grid_map_method == 'regular':
                         self.antenna_array.make_grid_cube_new(pol=apol, verbose=verbose)
                     elif grid_map_method == 'sparse':
-                        self.antenna_array.applyMappingMatrix(pol=apol, cal_loop=cal_loop, verbose=verbose)
+                        if nproc is None:
+                            nthreads = 1
+                        else:
+                            nthreads = min(max(nproc, 1), max(MP.cpu_count()-1, 1))
+                        self.antenna_array.applyMappingMatrix(pol=apol, cal_loop=cal_loop, nthreads=nthreads, verbose=verbose)
                     else:
                         raise ValueError('Invalid value specified for input parameter grid_map_method')
 
-                    self.grid_wts[apol] = NP.zeros(self.gridu.shape+(self.f.size,))
                     if apol in self.antenna_array.grid_illumination:
                         if SpM.issparse(self.antenna_array.grid_illumination[apol]):
                             self.grid_illumination[apol] = self.antenna_array.grid_illumination[apol].A.reshape(self.gridu.shape+(self.f.size,))
@@ -7114,74 +7776,18 @@ class Image(object):
                             self.grid_illumination[apol] = self.antenna_array.grid_illumination[apol]
                             self.grid_Ef[apol] = self.antenna_array.grid_Ef[apol]
                     
-                    if verbose: print 'Preparing to Inverse Fourier Transform...'
-                    if weighting == 'uniform':
-                        self.grid_wts[apol][NP.abs(self.grid_illumination[apol]) > 0.0] = 1.0/NP.abs(self.grid_illumination[apol][NP.abs(self.grid_illumination[apol]) > 0.0])
-                    else:
-                        self.grid_wts[apol][NP.abs(self.grid_illumination[apol]) > 0.0] = 1.0
-
-                    sum_wts = NP.sum(NP.abs(self.grid_wts[apol] * self.grid_illumination[apol]), axis=(0,1), keepdims=True)
+                    psf = None
+                    if grid_map_method == 'sparse':
+                        illum_cache = self.antenna_array.grid_illumination_cache.get(apol, None)
+                        if illum_cache is not None:
+                            psfkey = (illum_cache['version'], weighting, pad)
+                            if (apol not in self.psf_cache) or (self.psf_cache[apol]['key'] != psfkey):
+                                self.psf_cache[apol] = {'key': psfkey, 'psf': {}}
+                            psf = self.psf_cache[apol]['psf']
 
-                    if nproc is None:
-                        nproc = max(MP.cpu_count()-1, 1) 
-                    else:
-                        nproc = min(nproc, max(MP.cpu_count()-1, 1))
-                    if nproc > 1:
-                        s_list = [(2**(pad+1) * self.gridu.shape[0], 2**(pad+1) * self.gridv.shape[1])] * nproc
-                        axes_list = [(0,1)] * nproc 
-                        for qty in ['psf', 'image']:
-                            if qty == 'psf':
-                                qtylist = NP.array_split(self.grid_wts[apol]*self.grid_illumination[apol], nproc, axis=2)
-                            else:
-                                qtylist = NP.array_split(self.grid_wts[apol]*self.grid_Ef[apol], nproc, axis=2)
-                            pool = MP.Pool(processes=nproc)
-                            outqtylist = pool.map(DSP.unwrap_FFT2D, IT.izip(qtylist, s_list, axes_list))
-                            pool.close()
-                            pool.join()
-                            if qty == 'psf':
-                                syn_beam = NP.concatenate(tuple(outqtylist), axis=2)
-                            else:
-                                dirty_image = NP.concatenate(tuple(outqtylist), axis=2)
-                        del outqtylist
-                    else:
-                        syn_beam = NP.fft.fft2(self.grid_wts[apol]*self.grid_illumination[apol], s=[2**(pad+1) * self.gridu.shape[0], 2**(pad+1) * self.gridv.shape[1]], axes=(0,1))
-                        dirty_image = NP.fft.fft2(self.grid_wts[apol]*self.grid_Ef[apol], s=[2**(pad+1) * self.gridu.shape[0], 2**(pad+1) * self.gridv.shape[1]], axes=(0,1))
-                    self.gridl, self.gridm = NP.meshgrid(NP.fft.fftshift(NP.fft.fftfreq(2**(pad+1) * self.gridu.shape[1], du)), NP.fft.fftshift(NP.fft.fftfreq(2**(pad+1) * self.gridv.shape[0], dv)))
-
-                    self.holbeam[apol] = NP.fft.fftshift(syn_beam/sum_wts, axes=(0,1))
-                    self.holimg[apol] = NP.fft.fftshift(dirty_image/sum_wts, axes=(0,1))
-                    syn_beam = NP.abs(syn_beam)**2
-                    sum_wts2 = sum_wts**2
-                    dirty_image = NP.abs(dirty_image)**2
-                    self.beam[apol] = NP.fft.fftshift(syn_beam/sum_wts2, axes=(0,1))
-                    self.img[apol] = NP.fft.fftshift(dirty_image/sum_wts2, axes=(0,1))
-
-                    if nproc > 1:
-                        s_list = [None] * nproc
-                        axes_list = [(0,1)] * nproc
-                        for qty in ['wts', 'vis']:
-                            if qty == 'wts':
-                                qtylist = NP.array_split(syn_beam/sum_wts2, nproc, axis=2)
-                            else:
-                                qtylist = NP.array_split(dirty_image/sum_wts2, nproc, axis=2)
-                            pool = MP.Pool(processes=nproc)
-                            outqtylist = pool.map(DSP.unwrap_IFFT2D, IT.izip(qtylist, s_list, axes_list))
-                            pool.close()
-                            pool.join()
-                            qty_vuf = NP.concatenate(tuple(outqtylist), axis=2)
-                            qty_vuf = NP.fft.ifftshift(qty_vuf, axes=(0,1)) # Shift array to be centered
-                            if qty == 'wts':
-                                self.wts_vuf[apol] = qty_vuf[qty_vuf.shape[0]/2-self.gridv.shape[0]:qty_vuf.shape[0]/2+self.gridv.shape[0], qty_vuf.shape[1]/2-self.gridu.shape[1]:qty_vuf.shape[1]/2+self.gridu.shape[1], :]
-                            else:
-                                self.vis_vuf[apol] = qty_vuf[qty_vuf.shape[0]/2-self.gridv.shape[0]:qty_vuf.shape[0]/2+self.gridv.shape[0], qty_vuf.shape[1]/2-self.gridu.shape[1]:qty_vuf.shape[1]/2+self.gridu.shape[1], :]
-                    else:
-                        qty_vuf = NP.fft.ifft2(syn_beam/sum_wts2, axes=(0,1)) # Inverse FT
-                        qty_vuf = NP.fft.ifftshift(qty_vuf, axes=(0,1)) # Shift array to be centered
-                        # self.wts_vuf[apol] = qty_vuf[self.gridv.shape[0]:3*self.gridv.shape[0],self.gridu.shape[1]:3*self.gridu.shape[1],:]
-                        self.wts_vuf[apol] = qty_vuf[qty_vuf.shape[0]/2-self.gridv.shape[0]:qty_vuf.shape[0]/2+self.gridv.shape[0], qty_vuf.shape[1]/2-self.gridu.shape[1]:qty_vuf.shape[1]/2+self.gridu.shape[1], :]
-                        qty_vuf = NP.fft.ifft2(dirty_image/sum_wts2, axes=(0,1)) # Inverse FT
-                        qty_vuf = NP.fft.ifftshift(qty_vuf, axes=(0,1)) # Shift array to be centered
-                        self.vis_vuf[apol] = qty_vuf[qty_vuf.shape[0]/2-self.gridv.shape[0]:qty_vuf.shape[0]/2+self.gridv.shape[0], qty_vuf.shape[1]/2-self.gridu.shape[1]:qty_vuf.shape[1]/2+self.gridu.shape[1], :]
+                    if verbose: print 'Preparing to Inverse Fourier Transform...'
+                    imgproducts = self.imagr_block(self.grid_Ef[apol], self.grid_illumination[apol], weighting=weighting, pad=pad, nproc=nproc, fft_backend=fft_backend, fft_nthreads=fft_nthreads, products=products, psf=psf)
+                    self.set_products(apol, imgproducts)
                        
         if self.measured_type == 'visibility':
             if pol is None: pol = ['P11', 'P12', 'P21', 'P22']
@@ -7249,7 +7855,363 @@ class Image(object):
 
         # self.evalAutoCorr(datapool='current', forceeval=False)
 
-        with h5py.File(self.extfile, 'a') as fext:
+        self.init_extfile(pol)
+
+        # Call stack() if required
+        if stack:
+            self.stack(pol=pol)
+        else:
+            self.accumulate_inplace(pol=pol)
+
+    ############################################################################
+        
+    def imagr_block(self, grid_Ef, grid_illumination, weighting='natural',
+                    pad=0, nproc=None, fft_backend=None, fft_nthreads=None,
+                    products=None, psf=None):
+
+        """
+        ------------------------------------------------------------------------
+        Imaging engine for MOFF imaging that inverse fourier transforms the 
+        given gridded electric fields and aperture illumination without 
+        reference to the attributes holding the gridded quantities. It does 
+        not modify the image object and hence can be applied to different 
+        snapshots concurrently. Used by member function imagr()
+
+        Inputs:
+
+        grid_Ef   [numpy array] Complex gridded electric fields of size 
+                  nv x nu x nchan
+
+        grid_illumination
+                  [numpy array] Complex gridded aperture illumination of size
+                  nv x nu x nchan
+
+        weighting [string] indicates weighting scheme. Default='natural'. 
+                  Accepted values are 'natural' and 'uniform'
+
+        pad       [integer] indicates the amount of padding before imaging. 
+                  The output image will be of size 2**(pad+1) times the size 
+                  of the antenna array grid along u- and v-axes. Value must 
+                  not be negative. Default=0
+
+        nproc     [integer] specifies number of threads across which the 
+                  channels are transformed. Default = None, means 
+                  automatically determines the number of process cores in the
+                  system and use one less than that to avoid locking the 
+                  system for other processes. If nproc is set to a value more
+                  than the number of process cores in the system, it will be 
+                  reset to number of process cores in the system minus one 
+
+        fft_backend
+                  [string] Backend with which the FFTs are performed using 
+                  the cached plans and work buffers of class FFTPlanner. 
+                  Accepted values are 'numpy', 'scipy' and 'pyfftw'. 
+                  Default=None means 'numpy'
+
+        fft_nthreads
+                  [integer] Number of threads used by the FFT backend. If set
+                  to None (default), nproc is used. Applies only if 
+                  fft_backend is set
+
+        products  [list] Imaging products to be evaluated. Accepted values in
+                  the list are 'holimg', 'holbeam', 'img', 'beam', 'wts_vuf' 
+                  and 'vis_vuf'. The transforms not needed by the selected
+                  products are skipped. If 'wts_vuf' and 'vis_vuf' are not 
+                  selected, they are evaluated from the (accumulated) beam 
+                  and image when required by member function 
+                  evalApertureProducts(). If set to None (default), all the 
+                  products are evaluated
+
+        psf       [dictionary] Cache of the quantities that depend only on the
+                  gridded illumination, weighting and padding, namely the
+                  weights under key 'grid_wts', the sum of weights under key
+                  'sum_wts' and the selected products among 'holbeam', 'beam'
+                  and 'wts_vuf'. If it holds all of these, they are used 
+                  (copies of the products) instead of being evaluated and the
+                  synthesized beam is not transformed. Otherwise it is 
+                  cleared and filled in with the evaluated quantities. The 
+                  caller must ensure that it was filled from the same 
+                  gridded illumination, weighting and padding. Default=None
+                  means no caching
+
+        Outputs:
+
+        Dictionary with keys 'grid_wts', 'gridl', 'gridm' and the selected 
+        products holding the quantities that member function imagr() places 
+        under the attributes of the same names for the polarization being 
+        imaged
+        ------------------------------------------------------------------------
+        """
+
+        if not isinstance(pad, int):
+            raise TypeError('Input keyword pad must be an integer')
+        elif pad < 0:
+            raise ValueError('Input keyword pad must not be negative')
+
+        du = self.gridu[0,1] - self.gridu[0,0]
+        dv = self.gridv[1,0] - self.gridv[0,0]
+
+        if products is None:
+            products = ['holimg', 'holbeam', 'img', 'beam', 'wts_vuf', 'vis_vuf']
+        elif not isinstance(products, list):
+            raise TypeError('Input products must be a list')
+        for prod in products:
+            if prod not in ['holimg', 'holbeam', 'img', 'beam', 'wts_vuf', 'vis_vuf']:
+                raise ValueError('Invalid product {0} specified in input products'.format(prod))
+        eval_psf = any([prod in products for prod in ['holbeam', 'beam', 'wts_vuf']])
+        eval_image = any([prod in products for prod in ['holimg', 'img', 'vis_vuf']])
+
+        psf_prods = [prod for prod in ['holbeam', 'beam', 'wts_vuf'] if prod in products]
+        reuse_psf = (psf is not None) and all([key in psf for key in ['grid_wts', 'sum_wts']+psf_prods])
+
+        imgproducts = {}
+        if reuse_psf:
+            grid_wts = psf['grid_wts']
+            sum_wts = psf['sum_wts']
+            for prod in psf_prods:
+                imgproducts[prod] = NP.copy(psf[prod])
+            eval_psf = False
+        else:
+            grid_wts = NP.zeros(self.gridu.shape+(self.f.size,))
+            if weighting == 'uniform':
+                grid_wts[NP.abs(grid_illumination) > 0.0] = 1.0/NP.abs(grid_illumination[NP.abs(grid_illumination) > 0.0])
+            else:
+                grid_wts[NP.abs(grid_illumination) > 0.0] = 1.0
+
+            sum_wts = NP.sum(NP.abs(grid_wts * grid_illumination), axis=(0,1), keepdims=True)
+        imgproducts['grid_wts'] = grid_wts
+
+        if nproc is None:
+            nproc = max(MP.cpu_count()-1, 1)
+        else:
+            nproc = min(nproc, max(MP.cpu_count()-1, 1))
+        padshape = (2**(pad+1) * self.gridu.shape[0], 2**(pad+1) * self.gridv.shape[1])
+        if fft_backend is None:
+            fft_backend = 'numpy'
+        if fft_nthreads is None:
+            fft_nthreads = nproc
+        fftplanner = get_fft_planner(backend=fft_backend, nthreads=fft_nthreads)
+        if eval_psf:
+            syn_beam = fftplanner.fft2(grid_illumination, shape=padshape, wts=grid_wts, label='psf')
+        if eval_image:
+            dirty_image = fftplanner.fft2(grid_Ef, shape=padshape, wts=grid_wts, label='image')
+        imgproducts['gridl'], imgproducts['gridm'] = NP.meshgrid(NP.fft.fftshift(NP.fft.fftfreq(2**(pad+1) * self.gridu.shape[1], du)), NP.fft.fftshift(NP.fft.fftfreq(2**(pad+1) * self.gridv.shape[0], dv)))
+
+        sum_wts2 = sum_wts**2
+        if eval_psf and ('holbeam' in products):
+            imgproducts['holbeam'] = NP.fft.fftshift(syn_beam/sum_wts, axes=(0,1))
+        if 'holimg' in products:
+            imgproducts['holimg'] = NP.fft.fftshift(dirty_image/sum_wts, axes=(0,1))
+        if eval_psf:
+            syn_beam = NP.abs(syn_beam)**2
+            if 'beam' in products:
+                imgproducts['beam'] = NP.fft.fftshift(syn_beam/sum_wts2, axes=(0,1))
+        if eval_image:
+            dirty_image = NP.abs(dirty_image)**2
+            if 'img' in products:
+                imgproducts['img'] = NP.fft.fftshift(dirty_image/sum_wts2, axes=(0,1))
+
+        vuf_qtys = []
+        if ('wts_vuf' in products) and (not reuse_psf):
+            vuf_qtys += ['wts']
+        if 'vis_vuf' in products:
+            vuf_qtys += ['vis']
+        for qty in vuf_qtys:
+            if qty == 'wts':
+                qty_vuf = fftplanner.fft2(syn_beam/sum_wts2, label='psf', inverse=True) # Inverse FT in the work buffer of the forward FT
+            else:
+                qty_vuf = fftplanner.fft2(dirty_image/sum_wts2, label='image', inverse=True) # Inverse FT in the work buffer of the forward FT
+            qty_vuf = NP.fft.ifftshift(qty_vuf, axes=(0,1)) # Shift array to be centered
+            imgproducts[qty+'_vuf'] = qty_vuf[qty_vuf.shape[0]/2-self.gridv.shape[0]:qty_vuf.shape[0]/2+self.gridv.shape[0], qty_vuf.shape[1]/2-self.gridu.shape[1]:qty_vuf.shape[1]/2+self.gridu.shape[1], :]
+
+        if (psf is not None) and (not reuse_psf):
+            psf.clear()
+            psf['grid_wts'] = grid_wts
+            psf['sum_wts'] = sum_wts
+            for prod in psf_prods:
+                psf[prod] = NP.copy(imgproducts[prod])
+
+        return imgproducts
+
+    ############################################################################
+
+    def set_products(self, pol, products, timestamp=None):
+
+        """
+        ------------------------------------------------------------------------
+        Places imaging products evaluated by member function imagr_block() 
+        under the corresponding attributes of the image object
+
+        Inputs:
+
+        pol       [string] Polarization of the products. Accepted values are
+                  'P1' and 'P2'
+
+        products  [dictionary] Imaging products as returned by member function
+                  imagr_block(). Keys not present are left unchanged except 
+                  that attributes wts_vuf and vis_vuf are reset to None if 
+                  beam and img respectively are present without them, so 
+                  they are evaluated from the new products when required
+
+        timestamp [scalar] Timestamp of the products. If set to None (default)
+                  the attribute timestamp is left unchanged
+        ------------------------------------------------------------------------
+        """
+
+        if pol not in ['P1', 'P2']:
+            raise ValueError('Invalid specification for input parameter pol')
+
+        if not isinstance(products, dict):
+            raise TypeError('Input products must be a dictionary')
+
+        if ('img' in products) and ('vis_vuf' not in products):
+            self.vis_vuf[pol] = None
+        if ('beam' in products) and ('wts_vuf' not in products):
+            self.wts_vuf[pol] = None
+        for key, attr in [('grid_wts', self.grid_wts), ('holimg', self.holimg), ('holbeam', self.holbeam), ('img', self.img), ('beam', self.beam), ('wts_vuf', self.wts_vuf), ('vis_vuf', self.vis_vuf)]:
+            if key in products:
+                attr[pol] = products[key]
+        if 'gridl' in products:
+            self.gridl = products['gridl']
+        if 'gridm' in products:
+            self.gridm = products['gridm']
+        if timestamp is not None:
+            self.timestamp = timestamp
+
+    ############################################################################
+
+    def evalApertureProducts(self, pol=None, qtys=None, fft_backend=None,
+                             fft_nthreads=None):
+
+        """
+        ------------------------------------------------------------------------
+        Evaluates the aperture plane weights and visibilities (attributes 
+        wts_vuf and vis_vuf) from the synthesized beam and image (attributes
+        beam and img) for the polarizations where they have not been 
+        evaluated by imaging. The transforms are linear, so these may be 
+        accumulated images and beams. Applicable only to MOFF imaging
+
+        Inputs:
+
+        pol       [string or list] Polarization(s). Accepted values are 'P1' 
+                  and 'P2' or None (default) for both
+
+        qtys      [dictionary] Quantities under keys 'img', 'beam', 'wts_vuf'
+                  and 'vis_vuf', each a dictionary with polarizations as 
+                  keys, in which the missing 'wts_vuf' and 'vis_vuf' are 
+                  evaluated. Default=None means the attributes of the same 
+                  names
+
+        fft_backend
+                  [string] Backend with which the FFTs are performed using 
+                  cached plans and work buffers. Accepted values are 'numpy',
+                  'scipy' and 'pyfftw'. Default=None means 'numpy'
+
+        fft_nthreads
+                  [integer] Number of threads used by the FFT backend. 
+                  Default=None means 1
+        ------------------------------------------------------------------------
+        """
+
+        if self.measured_type != 'E-field':
+            return
+        if pol is None:
+            pol = ['P1', 'P2']
+        elif isinstance(pol, str):
+            pol = [pol]
+
+        if qtys is None:
+            qtys = {'img': self.img, 'beam': self.beam, 'wts_vuf': self.wts_vuf, 'vis_vuf': self.vis_vuf}
+        if fft_backend is None:
+            fft_backend = 'numpy'
+        fftplanner = get_fft_planner(backend=fft_backend, nthreads=fft_nthreads)
+        for apol in pol:
+            if apol not in ['P1', 'P2']:
+                continue
+            for qty, imgqty in [(qtys['wts_vuf'], qtys['beam']), (qtys['vis_vuf'], qtys['img'])]:
+                if (qty.get(apol, None) is None) and (imgqty.get(apol, None) is not None):
+                    qty_vuf = fftplanner.fft2(NP.fft.ifftshift(imgqty[apol], axes=(0,1)), label='vuf', inverse=True) # Inverse FT
+                    qty_vuf = NP.fft.ifftshift(qty_vuf, axes=(0,1)) # Shift array to be centered
+                    qty[apol] = qty_vuf[qty_vuf.shape[0]/2-self.gridv.shape[0]:qty_vuf.shape[0]/2+self.gridv.shape[0], qty_vuf.shape[1]/2-self.gridu.shape[1]:qty_vuf.shape[1]/2+self.gridu.shape[1], :]
+
+    ############################################################################
+
+    def open_extwriter(self, flush_interval=1):
+
+        """
+        ------------------------------------------------------------------------
+        Opens an instance of class ExtFileWriter on the external file under 
+        attribute extwriter. Thereafter the external file is kept open and 
+        accessed through it, and the in-place accumulations are held in 
+        memory and written every flush_interval snapshots and before the
+        accumulated quantities are read. Member function close_extwriter() 
+        must be called before the external file is accessed otherwise
+
+        Inputs:
+
+        flush_interval 
+                  [integer] Number of snapshots accumulated by member function
+                  accumulate_inplace() between writes. Default=1
+        ------------------------------------------------------------------------
+        """
+
+        if self.extfile is None:
+            raise ValueError('External file not specified. Cannot open writer')
+        if self.extwriter is not None:
+            self.close_extwriter()
+        self.extwriter = ExtFileWriter(self.extfile, flush_interval=flush_interval)
+
+    ############################################################################
+
+    def close_extwriter(self):
+
+        """
+        ------------------------------------------------------------------------
+        Writes the pending accumulations and closes the writer of the 
+        external file under attribute extwriter if it is open
+        ------------------------------------------------------------------------
+        """
+
+        if self.extwriter is not None:
+            self.extwriter.close()
+            self.extwriter = None
+
+    ############################################################################
+
+    @contextlib.contextmanager
+    def open_extfile(self):
+
+        """
+        ------------------------------------------------------------------------
+        Context manager yielding the writer under attribute extwriter if it is
+        open, or else the external file opened in append mode and closed on 
+        exit
+        ------------------------------------------------------------------------
+        """
+
+        if self.extwriter is not None:
+            yield self.extwriter
+        else:
+            with h5py.File(self.extfile, 'a') as fext:
+                yield fext
+
+    ############################################################################
+
+    def init_extfile(self, pol):
+
+        """
+        ------------------------------------------------------------------------
+        Creates the image-plane and aperture-plane datasets in the external 
+        file if they have not been created already. Requires the attributes
+        gridl and gridm to have been set by imaging
+
+        Inputs:
+
+        pol       [list] Polarizations for which the datasets are created
+        ------------------------------------------------------------------------
+        """
+
+        with self.open_extfile() as fext:
             if 'image-plane' not in fext:
                 planes = ['image-plane', 'aperture-plane']
                 arraytypes = ['stack', 'accumulate', 'avg']
@@ -7324,14 +8286,8 @@ class Image(object):
                                         for reim in reim_list:
                                             dset = fext.create_dataset('{0}/{1}/{2}/{3}/{4}/{5}'.format(plane,qtytype,subqty,arraytype,p,reim), shape=(1,), maxshape=(None,), dtype=valdt, compression='gzip', compression_opts=9)
 
-        # Call stack() if required
-        if stack:
-            self.stack(pol=pol)
-        else:
-            self.accumulate_inplace(pol=pol)
-
     ############################################################################
-        
+
     def stack(self, pol=None):
 
         """
@@ -7361,9 +8317,13 @@ class Image(object):
                 pol = p
             else:
                 raise TypeError('Input pol must be a string or list specifying polarization(s)')
+
+            self.evalApertureProducts(pol=pol)
     
-            if self.extfile is not None:
-                with h5py.File(self.extfile, 'a') as fext:
+            if (self.extfile is not None) and (self.extwriter is not None):
+                self._stack_extwriter(pol)
+            elif self.extfile is not None:
+                with self.open_extfile() as fext:
                     planes = ['image-plane', 'aperture-plane']
                     arraytypes = ['stack']
                     reim_list = ['real', 'imag']
@@ -7468,12 +8428,67 @@ class Image(object):
 
     ############################################################################
 
-    def accumulate_inplace(self, pol=None, verbose=True):
+    def _stack_extwriter(self, pol):
+
+        """
+        ------------------------------------------------------------------------
+        Appends the current images and UV-grid information to the stack in 
+        the external file through the writer under attribute extwriter, so 
+        that the stacked datasets are resized and written once per flush of 
+        the writer. Used by member function stack(). Not meant to be accessed
+        directly by the user.
+
+        Inputs:
+
+        pol     [list] Polarizations to be stacked
+        ------------------------------------------------------------------------
+        """
+
+        fext = self.extwriter
+        fext.append('image-plane/stack/timestamps', [self.timestamp])
+        l_ind = fext['image-plane/l_ind'].value
+        m_ind = fext['image-plane/m_ind'].value
+        mlf_ind = NP.ix_(m_ind, l_ind, NP.arange(self.f.size)) # m (row) first
+        for p in pol:
+            fext.append('image-plane/image/stack/{0}'.format(p), [NP.rollaxis(self.img[p][mlf_ind], 2, start=0)], placeholder=True)
+            fext.append('image-plane/psf/stack/{0}'.format(p), [NP.rollaxis(self.beam[p][mlf_ind], 2, start=0)], placeholder=True)
+
+        plane = 'aperture-plane'
+        qtytype = 'xcorr'
+        arraytype = 'stack'
+        fext.append('{0}/{1}/{2}/timestamps'.format(plane,qtytype,arraytype), [self.timestamp])
+        for p in pol:
+            wts_vuf = NP.rollaxis(self.wts_vuf[p], 2, start=0)
+            xcorr_shape_3D = wts_vuf.shape
+            wts_vuf = wts_vuf.reshape(wts_vuf.shape[0], -1)
+            xcorr_shape_2D = wts_vuf.shape
+            sprow, spcol = NP.where(NP.abs(wts_vuf) > 1e-10)
+            vis_vuf = NP.rollaxis(self.vis_vuf[p], 2,start=0)
+            vis_vuf = vis_vuf.reshape(vis_vuf.shape[0], -1)
+            if '{0}/{1}/shape2D/{2}/{3}'.format(plane,qtytype,arraytype,p) not in fext:
+                fext.create_dataset('{0}/{1}/shape2D/{2}/{3}'.format(plane,qtytype,arraytype,p), data=NP.asarray(xcorr_shape_2D))
+            if '{0}/{1}/shape3D/{2}/{3}'.format(plane,qtytype,arraytype,p) not in fext:
+                fext.create_dataset('{0}/{1}/shape3D/{2}/{3}'.format(plane,qtytype,arraytype,p), data=NP.asarray(xcorr_shape_3D))
+            fext.append('{0}/{1}/freqind/{2}/{3}'.format(plane,qtytype,arraytype,p), [NP.copy(sprow)], placeholder=True)
+            fext.append('{0}/{1}/ij/{2}/{3}'.format(plane,qtytype,arraytype,p), [NP.copy(spcol)], placeholder=True)
+            for subqty,qty in [('wts', wts_vuf), ('vals', vis_vuf)]:
+                fext.append('{0}/{1}/{2}/{3}/{4}/real'.format(plane,qtytype,subqty,arraytype,p), [qty[sprow,spcol].real], placeholder=True)
+                fext.append('{0}/{1}/{2}/{3}/{4}/imag'.format(plane,qtytype,subqty,arraytype,p), [qty[sprow,spcol].imag], placeholder=True)
+
+        for p in pol:
+            fext.add('twts/{0}'.format(p), 1.0)
+        fext.tick()
+
+    ############################################################################
+
+    def accumulate_inplace(self, pol=None, timestamps=None, verbose=True):
 
         """
         ------------------------------------------------------------------------
         Accumulates (adds) in-place the image, synthesized beam, gridded 
-        visibilities and aperture plane weights in the external file.
+        visibilities and aperture plane weights in the external file, or in
+        the running sums of attribute accumulator if it has been opened by 
+        member function open_accumulator()
 
         Inputs:
 
@@ -7483,12 +8498,25 @@ class Image(object):
                 information on all polarizations appropriate for MOFF or FX 
                 are accumulated
 
+        timestamps
+                [list] Timestamps whose images, synthesized beams, gridded 
+                visibilities and aperture plane weights have already been 
+                summed into the current attributes. All of them are recorded
+                as accumulated. Default=None means the current attributes 
+                hold only the attribute timestamp
+
         verbose [boolean] If True (default), prints diagnostic and progress
                 messages. If False, suppress printing such messages.
         ------------------------------------------------------------------------
         """
 
-        if self.timestamp not in self.timestamps:
+        if timestamps is None:
+            timestamps = [self.timestamp]
+        elif not isinstance(timestamps, (list, NP.ndarray)):
+            raise TypeError('Input timestamps must be a list')
+        timestamps = [tstamp for tstamp in timestamps if tstamp not in self.timestamps]
+
+        if len(timestamps) > 0:
             if pol is None:
                 if self.measured_type == 'E-field':
                     pol = ['P1', 'P2']
@@ -7501,168 +8529,288 @@ class Image(object):
                 pol = p
             else:
                 raise TypeError('Input pol must be a string or list specifying polarization(s)')
-    
-            if self.extfile is not None:
-                with h5py.File(self.extfile, 'a') as fext:
-                    planes = ['image-plane', 'aperture-plane']
-                    arraytypes = ['accumulate']
-                    reim_list = ['real', 'imag']
-                    for plane in planes:
-                        if plane == 'image-plane':
-                            for arraytype in arraytypes:
-                                tdset = fext['{0}/{1}/timestamps'.format(plane,arraytype)]
-                                tdset.resize(tdset.size+1, axis=0)
-                                tdset[-1] = self.timestamp
-
-                            qtytypes = ['image', 'psf']
-                            for lm in ['l', 'm']:
-                                dset = fext['{0}/{1}_ind'.format(plane, lm)]
-                                if lm == 'l':
-                                    l_ind = dset.value
-                                else:
-                                    m_ind = dset.value
-                            mlf_ind = NP.ix_(m_ind, l_ind, NP.arange(self.f.size)) # m (row) first
-                        else:
-                            qtytypes = ['xcorr']
-                            subqtytypes = ['wts', 'vals']
-                            for qtytype in qtytypes:
-                                for arraytype in arraytypes:
-                                    tdset = fext['{0}/{1}/{2}/timestamps'.format(plane,qtytype,arraytype)]
-                                    tdset.resize(tdset.size+1, axis=0)
-                                    tdset[-1] = self.timestamp
 
-                        for qtytype in qtytypes:
-                            for arraytype in arraytypes:
-                                for p in pol:
-                                    if plane == 'image-plane':
-                                        dset = fext['{0}/{1}/{2}/{3}'.format(plane,qtytype,arraytype,p)]
-                                        if qtytype == 'image':
-                                            dset[...] += NP.rollaxis(self.img[p][mlf_ind], 2, start=0)
-                                        else:
-                                            dset[...] += NP.rollaxis(self.beam[p][mlf_ind], 2, start=0)
-                                    else:
-                                        new_wts_vuf = NP.rollaxis(self.wts_vuf[p], 2, start=0)
-                                        xcorr_shape_3D = new_wts_vuf.shape
-                                        new_wts_vuf = new_wts_vuf.reshape(new_wts_vuf.shape[0], -1)
-                                        xcorr_shape_2D = new_wts_vuf.shape
-                                        new_sprow, new_spcol = NP.where(NP.abs(new_wts_vuf) > 1e-10)
-                                        new_vis_vuf = NP.rollaxis(self.vis_vuf[p], 2,start=0)
-                                        new_vis_vuf = new_vis_vuf.reshape(new_vis_vuf.shape[0], -1)
-                                        new_csc_wts_vuf = SpM.csc_matrix((new_wts_vuf[new_sprow,new_spcol], (new_sprow, new_spcol)), shape=xcorr_shape_2D)
-                                        new_csc_vis_vuf = SpM.csc_matrix((new_vis_vuf[new_sprow,new_spcol], (new_sprow, new_spcol)), shape=xcorr_shape_2D)
-                                        if '{0}/{1}/shape2D/{2}/{3}'.format(plane,qtytype,arraytype,p) not in fext:
-                                            dset = fext.create_dataset('{0}/{1}/shape2D/{2}/{3}'.format(plane,qtytype,arraytype,p), data=NP.asarray(xcorr_shape_2D))
-                                        if '{0}/{1}/shape3D/{2}/{3}'.format(plane,qtytype,arraytype,p) not in fext:
-                                            dset = fext.create_dataset('{0}/{1}/shape3D/{2}/{3}'.format(plane,qtytype,arraytype,p), data=NP.asarray(xcorr_shape_3D))
-                                        for rowcol in ['freqind', 'ij']:
-                                            dset = fext['{0}/{1}/{2}/{3}/{4}'.format(plane,qtytype,rowcol,arraytype,p)]
-                                            if dset[-1].size == 0:
-                                                if rowcol == 'freqind':
-                                                    dset[-1] = NP.copy(new_sprow)
-                                                else:
-                                                    dset[-1] = NP.copy(new_spcol)
-                                            else:
-                                                if rowcol == 'freqind':
-                                                    acc_sprow = NP.copy(dset[-1])
-                                                else:
-                                                    acc_spcol = NP.copy(dset[-1])
-                                        for subqty in subqtytypes:
-                                            for reim in ['real', 'imag']:
-                                                dset = fext['{0}/{1}/{2}/{3}/{4}/{5}'.format(plane,qtytype,subqty,arraytype,p,reim)]
-                                                if dset[-1].size == 0:
-                                                    if subqty == 'wts':
-                                                        if reim == 'real':
-                                                            dset[-1] = NP.copy(new_wts_vuf[new_sprow, new_spcol].real)
-                                                        else:
-                                                            dset[-1] = NP.copy(new_wts_vuf[new_sprow, new_spcol].imag)
-                                                    else:
-                                                        if reim == 'real':
-                                                            dset[-1] = NP.copy(new_vis_vuf[new_sprow, new_spcol].real)
-                                                        else:
-                                                            dset[-1] = NP.copy(new_vis_vuf[new_sprow, new_spcol].imag)
-                                                    just_set = True
-                                                else:
-                                                    if reim == 'real':
-                                                        acc_qty = dset[-1].astype(NP.complex128)
-                                                    else:
-                                                        acc_qty += 1j * dset[-1]
-                                                    just_set = False
-                                            if (dset[-1].size > 0) and not just_set:
-                                                acc_spmat = SpM.csc_matrix((acc_qty, (acc_sprow, acc_spcol)), shape=xcorr_shape_2D)
-                                                if subqty == 'wts':
-                                                    acc_spmat += new_csc_wts_vuf
-                                                    new_acc_sprow, new_acc_spcol = NP.where((NP.abs(acc_spmat) > 1e-10).toarray())
-                                                    for rowcol in ['freqind', 'ij']:
-                                                        dset = fext['{0}/{1}/{2}/{3}/{4}'.format(plane,qtytype,rowcol,arraytype,p)]
-                                                        if rowcol == 'freqind':
-                                                            dset[-1] = NP.copy(new_acc_sprow)
-                                                        else:
-                                                            dset[-1] = NP.copy(new_acc_spcol)
-                                                else:
-                                                    acc_spmat += new_csc_vis_vuf
-                                                for reim in ['real', 'imag']:
-                                                    dset = fext['{0}/{1}/{2}/{3}/{4}/{5}'.format(plane,qtytype,subqty,arraytype,p,reim)]
-                                                    if reim == 'real':
-                                                        dset[-1] = acc_spmat[new_acc_sprow, new_acc_spcol].real.A.ravel()
-                                                    else:
-                                                        dset[-1] = acc_spmat[new_acc_sprow, new_acc_spcol].imag.A.ravel()
-                                                    
-                    for p in pol:
-                        dset = fext['twts/{0}'.format(p)]
-                        dset[...] += 1.0
-            self.timestamps += [self.timestamp]
+            if self.accumulator is not None:
+                qtys = {'img': self.img, 'beam': self.beam}
+                if self.measured_type != 'E-field':
+                    qtys['wts_vuf'] = self.wts_vuf
+                    qtys['vis_vuf'] = self.vis_vuf
+                self.accumulator.add(pol, timestamps, qtys)
+                if self.accumulator.due():
+                    self.flush_accumulator()
+            else:
+                self.write_accumulated(pol, timestamps)
+            self.timestamps += timestamps
             if verbose:
-                print '\nIn-place accumulation of image, beam, visibility, and synthesis aperture weights completed for timestamp {0:.7f}.\n'.format(self.timestamp)
+                print '\nIn-place accumulation of image, beam, visibility, and synthesis aperture weights completed for timestamp {0:.7f}.\n'.format(timestamps[-1])
 
     ############################################################################
 
-    def average(self, pol=None, datapool='accumulate', autocorr_op='rmfit',
-                verbose=True):
+    def write_accumulated(self, pol, timestamps, qtys=None, twts=None):
 
         """
         ------------------------------------------------------------------------
-        Averages the image, synthesized beam, gridded visibilities, aperture 
-        plane weights, autocorrelation data and weights in the external file,
-        with optional removal of autocorrelation weights and data.
+        Adds the given image, synthesized beam, gridded visibilities and 
+        aperture plane weights to the accumulate datapool in the external 
+        file and records the timestamps and time weights. Used by member 
+        functions accumulate_inplace() and flush_accumulator()
 
         Inputs:
 
-        pol     [string] indicates which polarization information to be saved. 
-                Allowed values are 'P1', 'P2' in case of MOFF or 'P11', 'P12', 
-                'P21', 'P22' in case of FX or None (default). If None, 
-                information on all polarizations appropriate for MOFF or FX 
-                are accumulated
+        pol     [list] Polarizations to be written
 
-        datapool 
-                [string] Data pool from which values will be used in the 
-                averaging. Accepted values are 'accumulate' (default) and 
-                'stack'. 
+        timestamps
+                [list] Timestamps whose quantities have been summed in qtys
 
-        autocorr_op
-                [string] indicates if autocorrelation weights and data are to
-                be removed. Accepted values are 'rmfit' (fit and remove an
-                estimate of autocorr weights and data), 'mask' (mask the 
-                footprint of autocorr weights to zero) , and 'none' (keep the
-                autocorr weights and data without any modification). 
-                Default='rmfit'.
+        qtys    [dictionary] Quantities under keys 'img', 'beam', 'wts_vuf' 
+                and 'vis_vuf', each a dictionary with polarizations as keys.
+                In case of MOFF imaging, 'wts_vuf' and 'vis_vuf' not found 
+                are evaluated from 'beam' and 'img' respectively. 
+                Default=None means the attributes of the same names
 
-        verbose [boolean] If True (default), prints diagnostic and progress
-                messages. If False, suppress printing such messages.
+        twts    [dictionary] Time weights to be added with polarizations as 
+                keys. Default=None means the number of timestamps
         ------------------------------------------------------------------------
         """
 
-        if pol is None:
-            if self.measured_type == 'E-field':
-                pol = ['P1', 'P2']
-            else:
-                pol = ['P11', 'P12', 'P21', 'P22']
-        elif isinstance(pol, str):
-            pol = [pol]
-        elif isinstance(pol, list):
-            p = [item for item in pol if item in ['P1', 'P2', 'P11', 'P12', 'P21', 'P22']]
-            pol = p
+        if qtys is None:
+            qtys = {'img': self.img, 'beam': self.beam, 'wts_vuf': self.wts_vuf, 'vis_vuf': self.vis_vuf}
         else:
-            raise TypeError('Input pol must be a string or list specifying polarization(s)')
+            qtys = dict([('wts_vuf', {}), ('vis_vuf', {})] + qtys.items())
+        if twts is None:
+            twts = {p: float(len(timestamps)) for p in pol}
+
+        self.evalApertureProducts(pol=pol, qtys=qtys)
+
+        if self.extfile is not None:
+            with self.open_extfile() as fext:
+                planes = ['image-plane', 'aperture-plane']
+                arraytypes = ['accumulate']
+                reim_list = ['real', 'imag']
+                for plane in planes:
+                    if plane == 'image-plane':
+                        for arraytype in arraytypes:
+                            if self.extwriter is not None:
+                                self.extwriter.append('{0}/{1}/timestamps'.format(plane,arraytype), timestamps)
+                            else:
+                                tdset = fext['{0}/{1}/timestamps'.format(plane,arraytype)]
+                                tdset.resize(tdset.size+len(timestamps), axis=0)
+                                tdset[-len(timestamps):] = timestamps
+
+                        qtytypes = ['image', 'psf']
+                        for lm in ['l', 'm']:
+                            dset = fext['{0}/{1}_ind'.format(plane, lm)]
+                            if lm == 'l':
+                                l_ind = dset.value
+                            else:
+                                m_ind = dset.value
+                        mlf_ind = NP.ix_(m_ind, l_ind, NP.arange(self.f.size)) # m (row) first
+                    else:
+                        qtytypes = ['xcorr']
+                        subqtytypes = ['wts', 'vals']
+                        for qtytype in qtytypes:
+                            for arraytype in arraytypes:
+                                if self.extwriter is not None:
+                                    self.extwriter.append('{0}/{1}/{2}/timestamps'.format(plane,qtytype,arraytype), timestamps)
+                                else:
+                                    tdset = fext['{0}/{1}/{2}/timestamps'.format(plane,qtytype,arraytype)]
+                                    tdset.resize(tdset.size+len(timestamps), axis=0)
+                                    tdset[-len(timestamps):] = timestamps
+
+                    for qtytype in qtytypes:
+                        for arraytype in arraytypes:
+                            for p in pol:
+                                if plane == 'image-plane':
+                                    if qtytype == 'image':
+                                        qty_fml = NP.rollaxis(qtys['img'][p][mlf_ind], 2, start=0)
+                                    else:
+                                        qty_fml = NP.rollaxis(qtys['beam'][p][mlf_ind], 2, start=0)
+                                    if self.extwriter is not None:
+                                        self.extwriter.add('{0}/{1}/{2}/{3}'.format(plane,qtytype,arraytype,p), qty_fml)
+                                    else:
+                                        dset = fext['{0}/{1}/{2}/{3}'.format(plane,qtytype,arraytype,p)]
+                                        dset[...] += qty_fml
+                                else:
+                                    new_wts_vuf = NP.rollaxis(qtys['wts_vuf'][p], 2, start=0)
+                                    xcorr_shape_3D = new_wts_vuf.shape
+                                    new_wts_vuf = new_wts_vuf.reshape(new_wts_vuf.shape[0], -1)
+                                    xcorr_shape_2D = new_wts_vuf.shape
+                                    new_sprow, new_spcol = NP.where(NP.abs(new_wts_vuf) > 1e-10)
+                                    new_vis_vuf = NP.rollaxis(qtys['vis_vuf'][p], 2,start=0)
+                                    new_vis_vuf = new_vis_vuf.reshape(new_vis_vuf.shape[0], -1)
+                                    new_csc_wts_vuf = SpM.csc_matrix((new_wts_vuf[new_sprow,new_spcol], (new_sprow, new_spcol)), shape=xcorr_shape_2D)
+                                    new_csc_vis_vuf = SpM.csc_matrix((new_vis_vuf[new_sprow,new_spcol], (new_sprow, new_spcol)), shape=xcorr_shape_2D)
+                                    if '{0}/{1}/shape2D/{2}/{3}'.format(plane,qtytype,arraytype,p) not in fext:
+                                        dset = fext.create_dataset('{0}/{1}/shape2D/{2}/{3}'.format(plane,qtytype,arraytype,p), data=NP.asarray(xcorr_shape_2D))
+                                    if '{0}/{1}/shape3D/{2}/{3}'.format(plane,qtytype,arraytype,p) not in fext:
+                                        dset = fext.create_dataset('{0}/{1}/shape3D/{2}/{3}'.format(plane,qtytype,arraytype,p), data=NP.asarray(xcorr_shape_3D))
+                                    for rowcol in ['freqind', 'ij']:
+                                        dset = fext['{0}/{1}/{2}/{3}/{4}'.format(plane,qtytype,rowcol,arraytype,p)]
+                                        if dset[-1].size == 0:
+                                            if rowcol == 'freqind':
+                                                dset[-1] = NP.copy(new_sprow)
+                                            else:
+                                                dset[-1] = NP.copy(new_spcol)
+                                        else:
+                                            if rowcol == 'freqind':
+                                                acc_sprow = NP.copy(dset[-1])
+                                            else:
+                                                acc_spcol = NP.copy(dset[-1])
+                                    for subqty in subqtytypes:
+                                        for reim in ['real', 'imag']:
+                                            dset = fext['{0}/{1}/{2}/{3}/{4}/{5}'.format(plane,qtytype,subqty,arraytype,p,reim)]
+                                            if dset[-1].size == 0:
+                                                if subqty == 'wts':
+                                                    if reim == 'real':
+                                                        dset[-1] = NP.copy(new_wts_vuf[new_sprow, new_spcol].real)
+                                                    else:
+                                                        dset[-1] = NP.copy(new_wts_vuf[new_sprow, new_spcol].imag)
+                                                else:
+                                                    if reim == 'real':
+                                                        dset[-1] = NP.copy(new_vis_vuf[new_sprow, new_spcol].real)
+                                                    else:
+                                                        dset[-1] = NP.copy(new_vis_vuf[new_sprow, new_spcol].imag)
+                                                just_set = True
+                                            else:
+                                                if reim == 'real':
+                                                    acc_qty = dset[-1].astype(NP.complex128)
+                                                else:
+                                                    acc_qty += 1j * dset[-1]
+                                                just_set = False
+                                        if (dset[-1].size > 0) and not just_set:
+                                            acc_spmat = SpM.csc_matrix((acc_qty, (acc_sprow, acc_spcol)), shape=xcorr_shape_2D)
+                                            if subqty == 'wts':
+                                                acc_spmat += new_csc_wts_vuf
+                                                new_acc_sprow, new_acc_spcol = NP.where((NP.abs(acc_spmat) > 1e-10).toarray())
+                                                for rowcol in ['freqind', 'ij']:
+                                                    dset = fext['{0}/{1}/{2}/{3}/{4}'.format(plane,qtytype,rowcol,arraytype,p)]
+                                                    if rowcol == 'freqind':
+                                                        dset[-1] = NP.copy(new_acc_sprow)
+                                                    else:
+                                                        dset[-1] = NP.copy(new_acc_spcol)
+                                            else:
+                                                acc_spmat += new_csc_vis_vuf
+                                            for reim in ['real', 'imag']:
+                                                dset = fext['{0}/{1}/{2}/{3}/{4}/{5}'.format(plane,qtytype,subqty,arraytype,p,reim)]
+                                                if reim == 'real':
+                                                    dset[-1] = acc_spmat[new_acc_sprow, new_acc_spcol].real.A.ravel()
+                                                else:
+                                                    dset[-1] = acc_spmat[new_acc_sprow, new_acc_spcol].imag.A.ravel()
+                                                
+                for p in pol:
+                    if self.extwriter is not None:
+                        self.extwriter.add('twts/{0}'.format(p), twts[p])
+                    else:
+                        dset = fext['twts/{0}'.format(p)]
+                        dset[...] += twts[p]
+            if self.extwriter is not None:
+                self.extwriter.tick()
+
+    ############################################################################
+
+    def open_accumulator(self, checkpoint_interval=None, precision='single'):
+
+        """
+        ------------------------------------------------------------------------
+        Opens an instance of class ImageAccumulator under attribute 
+        accumulator. Thereafter member function accumulate_inplace() adds to 
+        the running sums in memory which are written to the accumulate 
+        datapool of the external file every checkpoint_interval snapshots 
+        and before averaging
+
+        Inputs:
+
+        checkpoint_interval
+                  [integer] Number of snapshots after which the running sums 
+                  are written. Default=None means only before averaging
+
+        precision [string] Precision of the running sums. Accepted values are
+                  'single' (default) and 'double'
+        ------------------------------------------------------------------------
+        """
+
+        self.close_accumulator()
+        self.accumulator = ImageAccumulator(checkpoint_interval=checkpoint_interval, precision=precision)
+
+    ############################################################################
+
+    def flush_accumulator(self):
+
+        """
+        ------------------------------------------------------------------------
+        Writes the running sums held under attribute accumulator to the 
+        accumulate datapool of the external file and resets them
+        ------------------------------------------------------------------------
+        """
+
+        if self.accumulator is not None:
+            if len(self.accumulator) > 0:
+                pol, timestamps, sums, twts = self.accumulator.pop()
+                self.write_accumulated(pol, timestamps, qtys=sums, twts=twts)
+
+    ############################################################################
+
+    def close_accumulator(self):
+
+        """
+        ------------------------------------------------------------------------
+        Writes the running sums and removes the accumulator
+        ------------------------------------------------------------------------
+        """
+
+        if self.accumulator is not None:
+            self.flush_accumulator()
+            self.accumulator = None
+
+    ############################################################################
+
+    def average(self, pol=None, datapool='accumulate', autocorr_op='rmfit',
+                verbose=True):
+
+        """
+        ------------------------------------------------------------------------
+        Averages the image, synthesized beam, gridded visibilities, aperture 
+        plane weights, autocorrelation data and weights in the external file,
+        with optional removal of autocorrelation weights and data.
+
+        Inputs:
+
+        pol     [string] indicates which polarization information to be saved. 
+                Allowed values are 'P1', 'P2' in case of MOFF or 'P11', 'P12', 
+                'P21', 'P22' in case of FX or None (default). If None, 
+                information on all polarizations appropriate for MOFF or FX 
+                are accumulated
+
+        datapool 
+                [string] Data pool from which values will be used in the 
+                averaging. Accepted values are 'accumulate' (default) and 
+                'stack'. 
+
+        autocorr_op
+                [string] indicates if autocorrelation weights and data are to
+                be removed. Accepted values are 'rmfit' (fit and remove an
+                estimate of autocorr weights and data), 'mask' (mask the 
+                footprint of autocorr weights to zero) , and 'none' (keep the
+                autocorr weights and data without any modification). 
+                Default='rmfit'.
+
+        verbose [boolean] If True (default), prints diagnostic and progress
+                messages. If False, suppress printing such messages.
+        ------------------------------------------------------------------------
+        """
+
+        if pol is None:
+            if self.measured_type == 'E-field':
+                pol = ['P1', 'P2']
+            else:
+                pol = ['P11', 'P12', 'P21', 'P22']
+        elif isinstance(pol, str):
+            pol = [pol]
+        elif isinstance(pol, list):
+            p = [item for item in pol if item in ['P1', 'P2', 'P11', 'P12', 'P21', 'P22']]
+            pol = p
+        else:
+            raise TypeError('Input pol must be a string or list specifying polarization(s)')
     
         if not isinstance(datapool, str):
             raise TypeError('Input datapool must be a string')
@@ -7675,8 +8823,11 @@ class Image(object):
         if autocorr_op.lower() not in ['rmfit', 'mask', 'none']:
             raise ValueError('Invalid value specified for input autocorr_op')
 
+        if datapool == 'accumulate':
+            self.flush_accumulator()
+
         if self.extfile is not None:
-            with h5py.File(self.extfile, 'a') as fext:
+            with self.open_extfile() as fext:
                 plane = 'aperture-plane'
                 reim_list = ['real', 'imag']
                 qtytypes = ['xcorr']
@@ -7831,9 +8982,12 @@ class Image(object):
         else:
             raise TypeError('Input datapool has invalid type')
 
+        if ('accumulate' in datapool) and (self.accumulator is not None):
+            self.accumulator.reset()
+
         pol = ['P1', 'P2']
         if self.extfile is not None:
-            with h5py.File(self.extfile, 'a') as fext:
+            with self.open_extfile() as fext:
                 planes = ['image-plane', 'aperture-plane']
                 reim_list = ['real', 'imag']
                 for p in pol:
@@ -8018,7 +9172,7 @@ class Image(object):
 
     def evalAutoCorr(self, pol=None, datapool='avg', forceeval_autowts=False,
                      forceeval_autocorr=True, nproc=None, save=True,
-                     verbose=True):
+                     autocorr=None, verbose=True):
 
         """
         ------------------------------------------------------------------------
@@ -8066,6 +9220,13 @@ class Image(object):
                   and data if an external file exists. It only applies when 
                   datapool='avg', otherwise it does not save to external file.
 
+        autocorr  [tuple] Auto-correlation weights and data on the UV-plane 
+                  as returned by member function makeAutoCorrCube() of class
+                  AntennaArray, if they have already been evaluated elsewhere
+                  (for instance, before the antenna array moved on to newer 
+                  timestamps). If specified, they are used instead of being 
+                  evaluated from the attribute antenna_array. Default=None
+
         verbose   [boolean] When set to True (default), print diagnostic 
                   messages, otherwise suppress messages
         ------------------------------------------------------------------------
@@ -8090,8 +9251,17 @@ class Image(object):
         if not isinstance(save, bool):
             raise TypeError('Input save must be boolean')
 
-        if forceeval_autowts or forceeval_autocorr or (not self.autocorr_set):
-            self.autocorr_wts_vuf, self.autocorr_data_vuf = self.antenna_array.makeAutoCorrCube(pol=pol, datapool=datapool, tbinsize=self.tbinsize, forceeval_autowts=forceeval_autowts, forceeval_autocorr=forceeval_autocorr, nproc=nproc)
+        if autocorr is not None:
+            if not isinstance(autocorr, tuple):
+                raise TypeError('Input autocorr must be a tuple')
+            if len(autocorr) != 2:
+                raise ValueError('Input autocorr must be a 2-element tuple')
+
+        if forceeval_autowts or forceeval_autocorr or (not self.autocorr_set) or (autocorr is not None):
+            if autocorr is None:
+                self.autocorr_wts_vuf, self.autocorr_data_vuf = self.antenna_array.makeAutoCorrCube(pol=pol, datapool=datapool, tbinsize=self.tbinsize, forceeval_autowts=forceeval_autowts, forceeval_autocorr=forceeval_autocorr, nproc=nproc)
+            else:
+                self.autocorr_wts_vuf, self.autocorr_data_vuf = autocorr
             self.autocorr_set = True
             if verbose:
                 print 'Determined auto-correlation weights and data...'
@@ -8099,7 +9269,7 @@ class Image(object):
             if save:
                 if datapool == 'avg':
                     if self.extfile is not None:
-                        with h5py.File(self.extfile, 'a') as fext:
+                        with self.open_extfile() as fext:
                             planes = ['aperture-plane']
                             arraytypes = ['avg']
                             reim_list = ['real', 'imag']
@@ -8658,14 +9828,1365 @@ class Image(object):
                 if verbose:
                     print "\t\tCreated separate extension HDUs of grid's voltage holograph spectra of \n\t\t\tsize {0[0]}x{0[1]}x{0[2]} for real and imaginary parts.".format(self.holograph_P2.shape)
 
-        if verbose:
-            print '\tNow writing FITS file to disk:\n\t\t{0}'.format(filename)
+        if verbose:
+            print '\tNow writing FITS file to disk:\n\t\t{0}'.format(filename)
+
+        hdu = fits.HDUList(hdulst)
+        hdu.writeto(filename, clobber=overwrite)
+
+        if verbose:
+            print '\tImage information written successfully to FITS file on disk:\n\t\t{0}\n'.format(filename)
+
+################################################################################
+
+class StackBuffer(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to hold a stack of records (such as electric field spectra,
+    visibilities or flags) along the time axis in preallocated memory. If a
+    depth is specified, it is a capacity-bounded ring buffer which retains
+    only the most recent records and memory stays flat. Otherwise, the
+    capacity is doubled whenever exhausted so that appending is amortized
+    O(1). The storage is mirrored (every record is written twice) so that
+    the records in chronological order are always available as a contiguous
+    view without copying.
+
+    Attributes:
+
+    depth    [NoneType or integer] Maximum number of most recent records held
+             in the stack. If None, the stack grows without bound
+
+    shape    [tuple] shape of each record. Determined from the first record
+             appended if not specified during initialization
+
+    dtype    [numpy dtype] datatype of the records. Determined from the 
+             first record appended if not specified during initialization
+
+    size     [integer] number of valid records in the stack
+
+    Member functions:
+
+    __init__()     Initializes an instance of class StackBuffer
+
+    __len__()      Returns the number of valid records in the stack
+
+    append()       Appends a record to the end of the stack
+
+    update_last()  Overwrites the last record in the stack
+
+    view()         Returns the records in chronological order as a view
+
+    reset()        Discards all records in the stack and optionally refills
+                   it with given records
+
+    Read the member function docstrings for details.
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, depth=None, shape=None, dtype=None):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the StackBuffer class.
+
+        Class attributes initialized are:
+        depth, shape, dtype, size
+
+        Read docstring of class StackBuffer for details on these attributes.
+        ------------------------------------------------------------------------
+        """
+
+        if depth is not None:
+            if not isinstance(depth, (int, NP.integer)):
+                raise TypeError('Input depth must be an integer')
+            if depth < 1:
+                raise ValueError('Input depth must be positive')
+            depth = int(depth)
+        if shape is not None:
+            if not isinstance(shape, tuple):
+                raise TypeError('Input shape must be a tuple')
+        self.depth = depth
+        self.shape = shape
+        if dtype is not None:
+            dtype = NP.dtype(dtype)
+        self.dtype = dtype
+        self.size = 0
+        self._start = 0
+        self._buf = None
+
+    ############################################################################
+
+    def __len__(self):
+        return self.size
+
+    ############################################################################
+
+    def _allocate(self, capacity):
+        buf = NP.zeros((2*capacity,)+self.shape, dtype=self.dtype)
+        if self.size > 0:
+            buf[:self.size] = self._buf[self._start:self._start+self.size]
+            buf[capacity:capacity+self.size] = buf[:self.size]
+        self._buf = buf
+        self._start = 0
+
+    ############################################################################
+
+    def append(self, record):
+
+        """
+        ------------------------------------------------------------------------
+        Appends a record to the end of the stack. If the stack is full and a
+        depth has been specified, the oldest record is discarded.
+
+        Inputs:
+
+        record  [scalar or numpy array] record to be appended. Its shape must
+                match attribute shape
+        ------------------------------------------------------------------------
+        """
+
+        record = NP.asarray(record)
+        if self.shape is None:
+            self.shape = record.shape
+        if self.dtype is None:
+            self.dtype = record.dtype
+        record = record.reshape(self.shape)
+        if self._buf is None:
+            if self.depth is None:
+                self._allocate(1)
+            else:
+                self._allocate(self.depth)
+        capacity = self._buf.shape[0] / 2
+        if self.size == capacity:
+            if self.depth is None:
+                self._allocate(2*capacity)
+                capacity = 2 * capacity
+            else:
+                self._start = (self._start + 1) % capacity
+                self.size -= 1
+        pos = (self._start + self.size) % capacity
+        self._buf[pos] = record
+        self._buf[pos+capacity] = record
+        self.size += 1
+
+    ############################################################################
+
+    def update_last(self, record):
+
+        """
+        ------------------------------------------------------------------------
+        Overwrites the last record in the stack. If the stack is empty, the
+        record is appended.
+
+        Inputs:
+
+        record  [scalar or numpy array] record to overwrite the last record.
+                Its shape must match attribute shape
+        ------------------------------------------------------------------------
+        """
+
+        if self.size == 0:
+            self.append(record)
+            return
+        record = NP.asarray(record).reshape(self.shape)
+        capacity = self._buf.shape[0] / 2
+        pos = (self._start + self.size - 1) % capacity
+        self._buf[pos] = record
+        self._buf[pos+capacity] = record
+
+    ############################################################################
+
+    def view(self):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the records in chronological order as a contiguous view into
+        the internal storage without copying. The view is of size
+        size x shape and remains valid until the next record is appended
+
+        Outputs:
+
+        Numpy array of size n_records x shape. If no record has been stored
+        and the shape is unknown, None is returned
+        ------------------------------------------------------------------------
+        """
+
+        if self._buf is None:
+            if self.shape is None:
+                return None
+            return NP.empty((0,)+self.shape, dtype=self.dtype)
+        return self._buf[self._start:self._start+self.size]
+
+    ############################################################################
+
+    def reset(self, records=None):
+
+        """
+        ------------------------------------------------------------------------
+        Discards all records in the stack while retaining allocated memory. 
+        If records are given, the stack is refilled with them, retaining only
+        the most recent ones if a depth has been specified
+
+        Inputs:
+
+        records [NoneType or numpy array] records of size n_records x shape
+                to refill the stack with in chronological order. The shape 
+                of the records replaces attribute shape if different. 
+                Default=None leaves the stack empty
+        ------------------------------------------------------------------------
+        """
+
+        self.size = 0
+        self._start = 0
+        if records is None:
+            return
+        records = NP.asarray(records)
+        if self.dtype is None:
+            self.dtype = records.dtype
+        if self.shape != records.shape[1:]:
+            self.shape = records.shape[1:]
+            self._buf = None
+        if self.depth is not None:
+            records = records[-self.depth:]
+            capacity = self.depth
+        else:
+            capacity = max(records.shape[0], 1)
+        if (self._buf is None) or (self._buf.shape[0] / 2 < capacity):
+            self._allocate(capacity)
+        capacity = self._buf.shape[0] / 2
+        self._buf[:records.shape[0]] = records
+        self._buf[capacity:capacity+records.shape[0]] = records
+        self.size = records.shape[0]
+
+################################################################################
+
+class SharedArrayPool(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to manage a long-lived pool of worker processes together with numpy
+    arrays placed in shared memory. The worker processes are started once and
+    reused across calls. They have direct access to the shared arrays (under
+    the same names in the module-level dictionary shared_arrays) so that 
+    they operate on the data in place and only index ranges are passed 
+    between processes. The shared memory under a name grows by doubling and
+    is reused for any smaller shape, so that the worker processes are only 
+    restarted when it grows. Arrays returned by member function allocate() 
+    are owned by the pool and overwritten by the next call under the same 
+    name; results to be kept must be copied out of them.
+
+    Attributes:
+
+    nproc     [integer] Number of worker processes
+
+    Member functions:
+
+    __init__()     Initializes an instance of class SharedArrayPool
+
+    allocate()     Returns a numpy array in shared memory under a given name
+                   for use until the next call under that name
+
+    ranges()       Splits an axis into index ranges to be distributed among
+                   the worker processes
+
+    map()          Applies a function on a list of inputs in the worker 
+                   processes
+
+    close()        Shuts down the worker processes
+
+    release()      Drops the shared memory arrays
+
+    Read the member function docstrings for details.
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, nproc=None):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the SharedArrayPool class. The worker processes are started
+        on first use.
+
+        Class attributes initialized are:
+        nproc
+
+        Input:
+
+        nproc    [integer] specifies number of independent processes to spawn.
+                 Default = None, means automatically determines the number of 
+                 process cores in the system and use one less than that to 
+                 avoid locking the system for other processes. If nproc is set
+                 to a value more than the number of process cores in the 
+                 system, it will be reset to number of process cores in the 
+                 system minus one to avoid locking the system out for other 
+                 processes
+
+        Read docstring of class SharedArrayPool for details on these 
+        attributes.
+        ------------------------------------------------------------------------
+        """
+
+        if nproc is None:
+            nproc = max(MP.cpu_count()-1, 1) 
+        else:
+            if not isinstance(nproc, (int, NP.integer)):
+                raise TypeError('Input nproc must be an integer')
+            nproc = min(max(nproc, 1), max(MP.cpu_count()-1, 1))
+        self.nproc = nproc
+        self._buffers = {}
+        self._layout = {}
+        self._pool = None
+
+    ############################################################################
+
+    def __getstate__(self):
+
+        # Worker processes and shared memory are not carried over on copying
+        return {'nproc': self.nproc, '_buffers': {}, '_layout': {}, '_pool': None}
+
+    ############################################################################
+
+    def allocate(self, name, shape, dtype):
+
+        """
+        ------------------------------------------------------------------------
+        Returns a numpy array in shared memory under a given name. The shared
+        memory under that name is reused if it is large enough for the shape
+        and datatype, in which case the contents are left over from earlier 
+        use. Otherwise at least double the memory is allocated and the worker
+        processes are restarted on next use so that they see it. The array 
+        is only valid until the next call under the same name, so results 
+        to be retained by the caller must be copied.
+
+        Inputs:
+
+        name     [string] name under which the array is accessed by the worker
+                 processes
+
+        shape    [tuple] shape of the array
+
+        dtype    [numpy dtype] datatype of the array
+
+        Output:
+
+        Numpy array in shared memory
+        ------------------------------------------------------------------------
+        """
+
+        shape = tuple([int(n) for n in shape])
+        dtype = NP.dtype(dtype)
+        count = int(NP.prod(shape))
+        nbytes = max(count * dtype.itemsize, 1)
+        if (name not in self._buffers) or (len(self._buffers[name]) < nbytes):
+            if name in self._buffers:
+                nbytes = max(nbytes, 2*len(self._buffers[name]))
+            self._buffers[name] = MP.RawArray('b', nbytes)
+            self.close() # Worker processes started earlier do not see the new memory
+        self._layout[name] = (shape, dtype.str)
+        return NP.frombuffer(self._buffers[name], dtype=dtype, count=count).reshape(shape)
+
+    ############################################################################
+
+    def ranges(self, n):
+
+        """
+        ------------------------------------------------------------------------
+        Splits an axis of length n into contiguous index ranges, a few per 
+        worker process for load balancing
+
+        Input:
+
+        n        [integer] Length of the axis
+
+        Output:
+
+        List of tuples (start, stop) of index ranges
+        ------------------------------------------------------------------------
+        """
+
+        nranges = max(min(n, 4*self.nproc), 1)
+        bounds = NP.linspace(0, n, nranges+1).astype(NP.int)
+        return [(int(bounds[i]), int(bounds[i+1])) for i in xrange(nranges) if bounds[i+1] > bounds[i]]
+
+    ############################################################################
+
+    def map(self, func, iterable):
+
+        """
+        ------------------------------------------------------------------------
+        Applies a function on a list of inputs in the worker processes, 
+        starting them if necessary. The shared arrays are seen by the worker
+        processes with the shapes of their latest allocation
+
+        Inputs:
+
+        func     [function] Module-level function to be applied
+
+        iterable [iterable] Inputs to func
+
+        Output:
+
+        List of outputs of func
+        ------------------------------------------------------------------------
+        """
+
+        if self._pool is None:
+            self._pool = MP.Pool(processes=self.nproc, initializer=init_shared_arrays, initargs=(self._buffers,))
+        layout = dict(self._layout)
+        return self._pool.map(shared_pool_task, [(func, layout, item) for item in iterable])
+
+    ############################################################################
+
+    def close(self):
+
+        """
+        ------------------------------------------------------------------------
+        Shuts down the worker processes once they have finished their pending
+        tasks. They are started again on next use. The shared arrays are 
+        retained.
+        ------------------------------------------------------------------------
+        """
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    ############################################################################
+
+    def release(self):
+
+        """
+        ------------------------------------------------------------------------
+        Drops the shared memory arrays. The memory is freed once arrays 
+        returned by member function allocate() are no longer referenced. 
+        Must be called after member function close()
+        ------------------------------------------------------------------------
+        """
+
+        self._buffers = {}
+        self._layout = {}
+
+################################################################################
+
+class ExtFileWriter(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to write to the external HDF5 file of an instance of class Image 
+    through a file handle and dataset handles that are kept open across 
+    snapshots. Additions to datasets holding running sums and appends to 
+    datasets of timestamps and stacked quantities are held in memory and 
+    written together when flushed, either explicitly or every flush_interval
+    calls of member function tick(), so that the datasets are rewritten and 
+    resized once per flush instead of once per snapshot. Pending additions 
+    and appends to a dataset are written before the dataset is accessed 
+    through the writer.
+
+    Attributes:
+
+    extfile        [string] Name of the external HDF5 file
+
+    flush_interval [integer] Number of calls of member function tick() after
+                   which the pending additions and appends are written
+
+    fileobj        [h5py File] Open handle of the external file
+
+    Member functions:
+
+    __init__()     Initializes an instance of class ExtFileWriter
+
+    __getitem__()  Returns the cached handle of a dataset or group in the 
+                   file after writing its pending additions and appends
+
+    __contains__() Checks if a dataset or group exists in the file
+
+    create_dataset()
+                   Creates a dataset in the file and caches its handle
+
+    add()          Adds to the running sum held in memory for a dataset
+
+    append()       Appends values to be written at the end of a dataset
+
+    tick()         Counts a snapshot and flushes every flush_interval calls
+
+    flush()        Writes all pending additions and appends to the file
+
+    close()        Flushes and closes the file
+
+    Read the member function docstrings for details.
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, extfile, flush_interval=1):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the ExtFileWriter class and open the external file which
+        must already exist
+
+        Class attributes initialized are:
+        extfile, flush_interval, fileobj
+
+        Inputs:
+
+        extfile        [string] Name of the external HDF5 file
+
+        flush_interval [integer] Number of calls of member function tick() 
+                       after which the pending additions and appends are 
+                       written. Default=1
+        ------------------------------------------------------------------------
+        """
+
+        if not isinstance(extfile, basestring):
+            raise TypeError('Input extfile must be a string')
+        if not isinstance(flush_interval, int):
+            raise TypeError('Input flush_interval must be an integer')
+        if flush_interval < 1:
+            raise ValueError('Input flush_interval must be positive')
+
+        self.extfile = extfile
+        self.flush_interval = flush_interval
+        self.fileobj = h5py.File(extfile, 'a')
+        self._handles = {}
+        self._sums = {}
+        self._appends = {}
+        self._nticks = 0
+
+    ############################################################################
+
+    def __getitem__(self, path):
+        if (path in self._sums) or (path in self._appends):
+            self._flush_path(path)
+        return self._handle(path)
+
+    ############################################################################
+
+    def __contains__(self, path):
+        return (path in self._handles) or (path in self.fileobj)
+
+    ############################################################################
+
+    def _handle(self, path):
+        if path not in self._handles:
+            self._handles[path] = self.fileobj[path]
+        return self._handles[path]
+
+    ############################################################################
+
+    def create_dataset(self, path, **kwargs):
+
+        """
+        ------------------------------------------------------------------------
+        Creates a dataset in the file and caches its handle. Keyword inputs 
+        are passed on to h5py create_dataset()
+
+        Inputs:
+
+        path      [string] Path of the dataset in the file
+        ------------------------------------------------------------------------
+        """
+
+        self._handles[path] = self.fileobj.create_dataset(path, **kwargs)
+        return self._handles[path]
+
+    ############################################################################
+
+    def add(self, path, value):
+
+        """
+        ------------------------------------------------------------------------
+        Adds to the running sum held in memory for a dataset. The sum is 
+        added to the dataset when flushed
+
+        Inputs:
+
+        path      [string] Path of the dataset in the file
+
+        value     [scalar or numpy array] Value to be added. Must be 
+                  broadcastable to the shape of the dataset
+        ------------------------------------------------------------------------
+        """
+
+        if path in self._sums:
+            self._sums[path] = self._sums[path] + value
+        else:
+            self._sums[path] = NP.array(value, dtype=self._handle(path).dtype)
+
+    ############################################################################
+
+    def append(self, path, values, placeholder=False):
+
+        """
+        ------------------------------------------------------------------------
+        Appends values to be written at the end of a dataset resizable along
+        its first axis when flushed
+
+        Inputs:
+
+        path      [string] Path of the dataset in the file
+
+        values    [list or numpy array] Values to be appended along the first
+                  axis of the dataset
+
+        placeholder
+                  [boolean] If True, a dataset created with a single 
+                  placeholder record (filled with NaN, or empty in case of 
+                  variable length records) has the placeholder replaced by 
+                  the first value instead of being appended to. Default=False
+        ------------------------------------------------------------------------
+        """
+
+        self._handle(path)
+        if path not in self._appends:
+            self._appends[path] = ([], placeholder)
+        self._appends[path][0].extend(list(values))
+
+    ############################################################################
+
+    def _flush_path(self, path):
+        dset = self._handle(path)
+        if path in self._sums:
+            dset[...] += self._sums.pop(path)
+        if path in self._appends:
+            values, placeholder = self._appends.pop(path)
+            if len(values) > 0:
+                start = dset.shape[0]
+                if placeholder and (start == 1):
+                    record = dset[0]
+                    if dset.dtype.kind == 'O':
+                        start -= int(NP.asarray(record).size == 0)
+                    else:
+                        start -= int(NP.all(NP.isnan(record)))
+                dset.resize(start+len(values), axis=0)
+                if dset.dtype.kind == 'O': # Variable length records are written one by one
+                    for i,value in enumerate(values):
+                        dset[start+i] = value
+                else:
+                    dset[start:] = NP.asarray(values)
+
+    ############################################################################
+
+    def tick(self):
+
+        """
+        ------------------------------------------------------------------------
+        Counts a snapshot and flushes the pending additions and appends every
+        flush_interval calls
+        ------------------------------------------------------------------------
+        """
+
+        self._nticks += 1
+        if self._nticks >= self.flush_interval:
+            self.flush()
+
+    ############################################################################
+
+    def flush(self):
+
+        """
+        ------------------------------------------------------------------------
+        Writes all pending additions and appends to the file and flushes the
+        file to disk
+        ------------------------------------------------------------------------
+        """
+
+        for path in set(self._sums.keys() + self._appends.keys()):
+            self._flush_path(path)
+        self.fileobj.flush()
+        self._nticks = 0
+
+    ############################################################################
+
+    def close(self):
+
+        """
+        ------------------------------------------------------------------------
+        Flushes the pending additions and appends and closes the file
+        ------------------------------------------------------------------------
+        """
+
+        if self.fileobj is not None:
+            self.flush()
+            self._handles = {}
+            self.fileobj.close()
+            self.fileobj = None
+
+################################################################################
+
+class ImageAccumulator(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to hold in memory the running sums of the images, synthesized 
+    beams, aperture plane weights and visibilities of an instance of class 
+    Image along with the time weights and timestamps accumulated, so that 
+    they are written to the external file only at a checkpoint or when 
+    averaged, instead of a read-modify-write of the accumulated cubes in the
+    file every snapshot.
+
+    Attributes:
+
+    precision [string] Precision of the running sums. 'single' holds real 
+              quantities in float32 and complex quantities in complex64, 
+              'double' in float64 and complex128
+
+    checkpoint_interval
+              [integer] Number of snapshots after which the running sums are
+              due to be written. None means only when averaged
+
+    pol       [list] Polarizations accumulated
+
+    sums      [dictionary] Running sums under the keys of the quantities 
+              added among 'img', 'beam', 'wts_vuf' and 'vis_vuf', each a 
+              dictionary with polarizations as keys. In case of MOFF imaging 
+              only 'img' and 'beam' need to be accumulated since the aperture
+              plane quantities are linear in them
+
+    twts      [dictionary] Time weights accumulated with polarizations as 
+              keys
+
+    timestamps 
+              [list] Timestamps accumulated
+
+    nsnaps    [integer] Number of snapshots accumulated
+
+    Member functions:
+
+    __init__()     Initializes an instance of class ImageAccumulator
+
+    __len__()      Returns the number of timestamps accumulated
+
+    add()          Adds the quantities of one or more timestamps to the 
+                   running sums
+
+    due()          Checks if the running sums are due to be written
+
+    pop()          Returns the running sums and resets them
+
+    reset()        Resets the running sums
+
+    Read the member function docstrings for details.
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, checkpoint_interval=None, precision='single'):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the ImageAccumulator class
+
+        Class attributes initialized are:
+        precision, checkpoint_interval, pol, sums, twts, timestamps, nsnaps
+
+        Inputs:
+
+        checkpoint_interval
+                  [integer] Number of snapshots after which the running sums 
+                  are due to be written. Default=None means only when 
+                  averaged
+
+        precision [string] Precision of the running sums. Accepted values are
+                  'single' (default) and 'double'
+        ------------------------------------------------------------------------
+        """
+
+        if checkpoint_interval is not None:
+            if not isinstance(checkpoint_interval, int):
+                raise TypeError('Input checkpoint_interval must be an integer')
+            if checkpoint_interval < 1:
+                raise ValueError('Input checkpoint_interval must be positive')
+        if precision not in ['single', 'double']:
+            raise ValueError('Input precision must be set to "single" or "double"')
+
+        self.checkpoint_interval = checkpoint_interval
+        self.precision = precision
+        self.reset()
+
+    ############################################################################
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    ############################################################################
+
+    def reset(self):
+
+        """
+        ------------------------------------------------------------------------
+        Resets the running sums, time weights and timestamps
+        ------------------------------------------------------------------------
+        """
+
+        self.pol = []
+        self.sums = {}
+        self.twts = {}
+        self.timestamps = []
+        self.nsnaps = 0
+
+    ############################################################################
+
+    def add(self, pol, timestamps, qtys):
+
+        """
+        ------------------------------------------------------------------------
+        Adds the quantities of one or more timestamps to the running sums
+
+        Inputs:
+
+        pol       [list] Polarizations to be accumulated
+
+        timestamps
+                  [list] Timestamps whose quantities have been summed in qtys
+
+        qtys      [dictionary] Quantities under some or all of the keys 'img',
+                  'beam', 'wts_vuf' and 'vis_vuf', each a dictionary with 
+                  polarizations as keys as in the attributes of the same 
+                  names of class Image. The same keys must be given in every
+                  call and the shapes must match those accumulated so far. 
+                  The inputs are verified before the running sums are 
+                  modified
+        ------------------------------------------------------------------------
+        """
+
+        for qty in qtys:
+            if qty not in ['img', 'beam', 'wts_vuf', 'vis_vuf']:
+                raise KeyError('Invalid quantity {0} specified in input qtys'.format(qty))
+        if (len(self.timestamps) > 0) and (set(qtys.keys()) != set(self.sums.keys())):
+            raise ValueError('Quantities {0} in input qtys differ from quantities {1} accumulated so far'.format(sorted(qtys.keys()), sorted(self.sums.keys())))
+        for qty in qtys:
+            for p in pol:
+                if p not in qtys[qty]:
+                    raise ValueError('Polarization {0} not found under quantity {1} in input qtys'.format(p, qty))
+                if (qty in self.sums) and (p in self.sums[qty]):
+                    if NP.shape(qtys[qty][p]) != self.sums[qty][p].shape:
+                        raise ValueError('Shape {0} of quantity {1} under polarization {2} differs from shape {3} accumulated so far'.format(NP.shape(qtys[qty][p]), qty, p, self.sums[qty][p].shape))
+
+        for qty in qtys:
+            if qty not in self.sums:
+                self.sums[qty] = {}
+        for p in pol:
+            if p not in self.pol:
+                self.pol += [p]
+                self.twts[p] = 0.0
+            for qty in qtys:
+                if p in self.sums[qty]:
+                    self.sums[qty][p] += qtys[qty][p]
+                else:
+                    if NP.iscomplexobj(qtys[qty][p]):
+                        dtype = NP.complex64 if self.precision == 'single' else NP.complex128
+                    else:
+                        dtype = NP.float32 if self.precision == 'single' else NP.float64
+                    self.sums[qty][p] = NP.array(qtys[qty][p], dtype=dtype)
+            self.twts[p] += float(len(timestamps))
+        self.timestamps += list(timestamps)
+        self.nsnaps += 1
+
+    ############################################################################
+
+    def due(self):
+
+        """
+        ------------------------------------------------------------------------
+        Returns True if the number of snapshots accumulated has reached the 
+        checkpoint interval
+        ------------------------------------------------------------------------
+        """
+
+        if self.checkpoint_interval is None:
+            return False
+        return self.nsnaps >= self.checkpoint_interval
+
+    ############################################################################
+
+    def pop(self):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the running sums and resets them
+
+        Output:
+
+        Tuple (pol, timestamps, sums, twts) of the attributes of the same 
+        names before the reset
+        ------------------------------------------------------------------------
+        """
+
+        out = (self.pol, self.timestamps, self.sums, self.twts)
+        self.reset()
+        return out
+
+################################################################################
+
+fft_planners = {} # FFTPlanner instances shared across calls
+fft_planners_lock = threading.Lock()
+
+def get_fft_planner(backend='numpy', nthreads=1):
+
+    """
+    ----------------------------------------------------------------------------
+    Returns the instance of class FFTPlanner for the given backend and number
+    of threads, creating it on first use so that its plans and work buffers 
+    are reused across snapshots
+
+    Inputs:
+
+    backend   [string] FFT backend. Accepted values are 'numpy' (default),
+              'scipy' and 'pyfftw'
+
+    nthreads  [integer] Number of threads used in the transforms. Default=1
+    ----------------------------------------------------------------------------
+    """
+
+    if nthreads is None:
+        nthreads = 1
+    key = (backend, nthreads)
+    with fft_planners_lock:
+        if key not in fft_planners:
+            fft_planners[key] = FFTPlanner(backend=backend, nthreads=nthreads)
+        return fft_planners[key]
+
+################################################################################
+
+class FFTPlanner(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to perform 2D FFTs along the first two axes of cubes of size 
+    nv x nu x nchan with cached plans and zero-padded work buffers. The 
+    buffers (and plans in case of pyfftw) are cached per label and shape and 
+    per calling thread, so that the transforms of consecutive snapshots do 
+    not allocate new arrays and concurrent callers do not share buffers.
+
+    Attributes:
+
+    backend   [string] FFT backend. Accepted values are 'numpy', 'scipy' and
+              'pyfftw'
+
+    nthreads  [integer] Number of threads used in the transforms. With the
+              'numpy' backend (and 'scipy' without workers support) the 
+              channels are split into slabs transformed in a pool of threads
+
+    Member functions:
+
+    __init__()     Initializes an instance of class FFTPlanner
+
+    buffer()       Returns the cached work buffer for a label and shape
+
+    fft2()         Performs the zero-padded forward or inverse 2D FFT of a 
+                   cube in a cached work buffer
+
+    close()        Terminates the pool of threads
+
+    Read the member function docstrings for details.
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, backend='numpy', nthreads=1):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the FFTPlanner class
+
+        Class attributes initialized are:
+        backend, nthreads
+
+        Inputs:
+
+        backend   [string] FFT backend. Accepted values are 'numpy' (default),
+                  'scipy' and 'pyfftw'
+
+        nthreads  [integer] Number of threads used in the transforms. 
+                  Default=1
+        ------------------------------------------------------------------------
+        """
+
+        if backend not in ['numpy', 'scipy', 'pyfftw']:
+            raise ValueError('Input backend must be set to "numpy", "scipy" or "pyfftw"')
+        if (backend == 'pyfftw') and (not pyfftw_module_found):
+            raise ImportError('Module pyfftw not found. Cannot use pyfftw backend')
+        if not isinstance(nthreads, int):
+            raise TypeError('Input nthreads must be an integer')
+        if nthreads < 1:
+            raise ValueError('Input nthreads must be positive')
+
+        self.backend = backend
+        self.nthreads = nthreads
+        self._local = threading.local()
+        self._pool = None
+        self._pool_lock = threading.Lock() # Planner is shared by threads through get_fft_planner()
+
+    ############################################################################
+
+    def buffer(self, label, shape):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the complex work buffer cached for the given label and shape 
+        in the calling thread, allocating it (and planning its transforms in 
+        case of pyfftw) on first use
+
+        Inputs:
+
+        label     [string] Label distinguishing buffers of the same shape that
+                  are in use simultaneously
+
+        shape     [tuple] Shape of the buffer
+        ------------------------------------------------------------------------
+        """
+
+        if not hasattr(self._local, 'buffers'):
+            self._local.buffers = {}
+            self._local.plans = {}
+        key = (label, tuple(shape))
+        if key not in self._local.buffers:
+            if self.backend == 'pyfftw':
+                buf = pyfftw.empty_aligned(shape, dtype='complex128')
+                for direction in ['FFTW_FORWARD', 'FFTW_BACKWARD']:
+                    self._local.plans[key+(direction,)] = pyfftw.FFTW(buf, buf, axes=(0,1), direction=direction, flags=('FFTW_MEASURE',), threads=self.nthreads)
+            else:
+                buf = NP.empty(shape, dtype=NP.complex128)
+            self._local.buffers[key] = buf
+        return self._local.buffers[key]
+
+    ############################################################################
+
+    def fft2(self, inp, shape=None, wts=None, label='fft', inverse=False):
+
+        """
+        ------------------------------------------------------------------------
+        Performs the forward or inverse 2D FFT along the first two axes of the
+        input zero-padded at the end of these axes to the given shape, in 
+        place in the cached work buffer. The returned buffer is overwritten by
+        the next call with the same label and shape from the same thread and 
+        must be copied if it is to be retained
+
+        Inputs:
+
+        inp       [numpy array] Input array of size nv x nu x nchan
+
+        shape     [tuple] Size of the transform along the first two axes. If 
+                  set to None (default), the size of the input is used
+
+        wts       [numpy array] Weights multiplied to the input before the 
+                  transform. Must be broadcastable to the shape of input. If 
+                  set to None (default), no weights are applied
+
+        label     [string] Label of the work buffer. Default='fft'
+
+        inverse   [boolean] If True, the inverse transform (normalized as 
+                  numpy.fft.ifft2) is performed. Default=False (forward)
+
+        Output:
+
+        Complex work buffer holding the transform of size shape x nchan
+        ------------------------------------------------------------------------
+        """
+
+        if shape is None:
+            shape = inp.shape[:2]
+        nv, nu = inp.shape[:2]
+        if (shape[0] < nv) or (shape[1] < nu):
+            raise ValueError('Input shape must not be smaller than that of the input array')
+        buf = self.buffer(label, tuple(shape)+inp.shape[2:])
+        buf[:nv,:nu,...] = inp
+        if wts is not None:
+            buf[:nv,:nu,...] *= wts
+        buf[nv:,...] = 0.0
+        buf[:nv,nu:,...] = 0.0
+
+        if self.backend == 'pyfftw':
+            direction = 'FFTW_BACKWARD' if inverse else 'FFTW_FORWARD'
+            self._local.plans[(label, buf.shape, direction)]()
+        elif (self.backend == 'scipy') and scipy_fft_workers:
+            if inverse:
+                buf[...] = SCFFT.ifft2(buf, axes=(0,1), overwrite_x=True, workers=self.nthreads)
+            else:
+                buf[...] = SCFFT.fft2(buf, axes=(0,1), overwrite_x=True, workers=self.nthreads)
+        else:
+            if (self.nthreads > 1) and (buf.ndim > 2) and (buf.shape[2] > 1):
+                with self._pool_lock:
+                    if self._pool is None:
+                        self._pool = ThreadPool(processes=self.nthreads)
+                    pool = self._pool
+                slabs = NP.array_split(NP.arange(buf.shape[2]), min(self.nthreads, buf.shape[2]))
+                pool.map(lambda chans: self._transform_slab(buf, chans[0], chans[-1]+1, inverse), slabs)
+            else:
+                self._transform_slab(buf, 0, None, inverse)
+        return buf
+
+    ############################################################################
+
+    def _transform_slab(self, buf, start, stop, inverse):
+
+        """
+        ------------------------------------------------------------------------
+        Transforms the channels start:stop of the work buffer in place
+        ------------------------------------------------------------------------
+        """
+
+        if self.backend == 'scipy':
+            fftfunc = SCFFT.ifft2 if inverse else SCFFT.fft2
+        else:
+            fftfunc = NP.fft.ifft2 if inverse else NP.fft.fft2
+        buf[...,start:stop] = fftfunc(buf[...,start:stop], axes=(0,1))
+
+    ############################################################################
+
+    def close(self):
+
+        """
+        ------------------------------------------------------------------------
+        Terminates the pool of threads if it was started
+        ------------------------------------------------------------------------
+        """
+
+        with self._pool_lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+################################################################################
+
+ant2grid_spmm_lock = threading.Lock() # Guards lazy construction of ThreadedSparseMapper instances in AntennaArray
+
+class ThreadedSparseMapper(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to perform products of a sparse CSR matrix with dense vectors or 
+    matrices in a pool of threads. The rows of the sparse matrix are split 
+    into contiguous partitions holding nearly equal numbers of non-zero 
+    elements, each of which is a CSR matrix sharing the data and indices of
+    the parent matrix. The partitions are multiplied concurrently by scipy 
+    (which releases the GIL in its sparse kernels) and every output element 
+    is accumulated in the same order as in the product with the parent 
+    matrix, so that the results are identical to it.
+
+    Attributes:
+
+    spmat     [scipy sparse matrix] Parent sparse matrix in CSR format
+
+    shape     [tuple] Shape of the sparse matrix
+
+    nthreads  [integer] Number of threads used in the products
+
+    rowbounds [numpy array] Row indices bounding the partitions. Partition i
+              contains rows rowbounds[i]:rowbounds[i+1]
+
+    blocks    [list] Partitions of the sparse matrix as CSR matrices
+
+    Member functions:
+
+    __init__()     Initializes an instance of class ThreadedSparseMapper
+
+    dot()          Returns the product of the sparse matrix with a dense 
+                   vector or matrix
+
+    close()        Terminates the pool of threads
+
+    Read the member function docstrings for details.
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, spmat, nthreads=1):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the ThreadedSparseMapper class
+
+        Class attributes initialized are:
+        spmat, shape, nthreads, rowbounds, blocks
+
+        Inputs:
+
+        spmat     [scipy sparse matrix] Sparse matrix. It is converted to CSR
+                  format if it is not already in that format
+
+        nthreads  [integer] Number of threads used in the products. Default=1
+        ------------------------------------------------------------------------
+        """
+
+        if not SpM.issparse(spmat):
+            raise TypeError('Input spmat must be a scipy sparse matrix')
+        if not isinstance(nthreads, int):
+            raise TypeError('Input nthreads must be an integer')
+        if nthreads < 1:
+            raise ValueError('Input nthreads must be positive')
+
+        self.spmat = spmat.tocsr()
+        self.shape = self.spmat.shape
+        self.nthreads = nthreads
+
+        indptr = self.spmat.indptr
+        nnz_cuts = NP.linspace(0, indptr[-1], nthreads+1)[1:-1]
+        self.rowbounds = NP.unique(NP.concatenate(([0], NP.searchsorted(indptr, nnz_cuts), [self.shape[0]])))
+        self.blocks = []
+        for r0, r1 in zip(self.rowbounds[:-1], self.rowbounds[1:]):
+            i0 = indptr[r0]
+            i1 = indptr[r1]
+            self.blocks += [SpM.csr_matrix((self.spmat.data[i0:i1], self.spmat.indices[i0:i1], indptr[r0:r1+1]-i0), shape=(r1-r0, self.shape[1]), copy=False)]
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    ############################################################################
+
+    def dot(self, dns):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the product of the sparse matrix with a dense vector or matrix
+
+        Inputs:
+
+        dns       [numpy array] Dense vector of size ncols or matrix of size 
+                  ncols x nvec where ncols is the number of columns of the 
+                  sparse matrix
+
+        Output:
+
+        Numpy array of size nrows or nrows x nvec
+        ------------------------------------------------------------------------
+        """
+
+        dns = NP.asarray(dns)
+        if dns.shape[0] != self.shape[1]:
+            raise ValueError('Input dns must have {0:0d} rows'.format(self.shape[1]))
+        if len(self.blocks) == 1:
+            return self.spmat.dot(dns)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPool(processes=self.nthreads)
+            pool = self._pool
+        return NP.concatenate(pool.map(lambda block: block.dot(dns), self.blocks), axis=0)
+
+    ############################################################################
+
+    def close(self):
+
+        """
+        ------------------------------------------------------------------------
+        Terminates the pool of threads if it was started
+        ------------------------------------------------------------------------
+        """
+
+        with self._pool_lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+################################################################################
+
+class ColumnarPolView(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to provide a dictionary-like view of the polarization-wise data of
+    a single antenna held in the columnar (array-backed) buffers of an
+    instance of class AntennaArray. Values read under keys 'P1' and 'P2' are
+    views into the shared buffer and values assigned under these keys are
+    written in place into the shared buffer.
+
+    Attributes:
+
+    buf      [numpy array] shared buffer of shape n_ant x ... x npol where the
+             first axis is the antenna axis and the last axis is the
+             polarization axis
+
+    index    [integer] index of the antenna along the first axis of buf
+
+    pols     [list] polarization strings along the last axis of buf
+
+    scalar   [boolean] If True, the values under each polarization are
+             boolean scalars (such as flags). If False (default), they are
+             numpy arrays (such as electric field spectra)
+
+    Member functions:
+
+    __init__()     Initializes an instance of class ColumnarPolView
+
+    __getitem__()  Returns the view (or boolean scalar) under a polarization
+
+    __setitem__()  Writes in place into the shared buffer under a polarization
+
+    __deepcopy__() Returns a dictionary copy detached from the shared buffer
+
+    keys()         Returns the list of polarizations
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, buf, index, pols=['P1', 'P2'], scalar=False):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the ColumnarPolView class.
+
+        Class attributes initialized are:
+        buf, index, pols, scalar
+
+        Read docstring of class ColumnarPolView for details on these
+        attributes.
+        ------------------------------------------------------------------------
+        """
+
+        if not isinstance(buf, NP.ndarray):
+            raise TypeError('Input buf must be a numpy array')
+        if buf.shape[-1] != len(pols):
+            raise ValueError('Last axis of input buf must match the number of polarizations')
+        self.buf = buf
+        self.index = index
+        self.pols = list(pols)
+        self.scalar = scalar
+
+    ############################################################################
+
+    def __getitem__(self, pol):
+        if pol not in self.pols:
+            raise KeyError('Polarization {0} not found'.format(pol))
+        val = self.buf[self.index,...,self.pols.index(pol)]
+        if self.scalar:
+            return bool(val)
+        return val
+
+    ############################################################################
+
+    def __setitem__(self, pol, value):
+        if pol not in self.pols:
+            raise KeyError('Polarization {0} not found'.format(pol))
+        if self.scalar:
+            self.buf[self.index,...,self.pols.index(pol)] = bool(value)
+        else:
+            self.buf[self.index,...,self.pols.index(pol)] = NP.asarray(value).reshape(self.buf.shape[1:-1])
+
+    ############################################################################
+
+    def __contains__(self, pol):
+        return pol in self.pols
+
+    ############################################################################
+
+    def __iter__(self):
+        return iter(self.pols)
+
+    ############################################################################
+
+    def __len__(self):
+        return len(self.pols)
 
-        hdu = fits.HDUList(hdulst)
-        hdu.writeto(filename, clobber=overwrite)
+    ############################################################################
 
-        if verbose:
-            print '\tImage information written successfully to FITS file on disk:\n\t\t{0}\n'.format(filename)
+    def __deepcopy__(self, memo):
+        return {pol: copy.deepcopy(self[pol]) for pol in self.pols}
+
+    ############################################################################
+
+    def keys(self):
+        return list(self.pols)
 
 ################################################################################
 
@@ -8988,7 +11509,8 @@ class PolInfo(object):
                             # self.Et[pol] = NP.nan
                             flags[pol] = True
                             # self.flag[pol] = True
-                self.FT()  # Update the spectrum
+                if not isinstance(Ef, dict) or ('P1' not in Ef) or ('P2' not in Ef): # Otherwise the spectra are replaced below
+                    self.FT()  # Update the spectrum
             else:
                 raise TypeError('Input parameter Et must be a dictionary')
 
@@ -9066,6 +11588,12 @@ class Antenna(object):
                 time stamps as a numpy array under 2 polarizations which are 
                 stored under keys 'P1' and 'P2'
 
+    stack_depth [NoneType or integer] Maximum number of most recent timestamps
+                held in Et_stack, Ef_stack, flag_stack and timestamps. If None
+                (default), the stacks grow without bound. The stacks are held 
+                in preallocated instances of class StackBuffer and attributes
+                Et_stack, Ef_stack and flag_stack are views into them
+
     wts:        [dictionary] The gridding weights for antenna. Different 
                 polarizations 'P1' and 'P2' form the keys 
                 of this dictionary. These values are in general complex. Under 
@@ -9101,6 +11629,18 @@ class Antenna(object):
                  antenna contributes non-zero weight to the grid. Same 
                  for all polarizations
 
+    columnar     [NoneType or dictionary] If None (default), the antenna 
+                 holds its own electric fields and stacks. If the parent 
+                 instance of class AntennaArray is in columnar mode, it is a
+                 dictionary with keys 'data' (reference to the columnar 
+                 buffers of the antenna array) and 'index' (index of this 
+                 antenna along the antenna axis of the buffers). In that case
+                 antpol.Ef and antpol.flag are views into the shared buffers
+                 and the stacks are held collectively by the antenna array.
+                 Attributes timestamp and timestamps then refer to those held
+                 in the columnar buffers under keys 'timestamp' and 
+                 'timestamps' which are common to all antennas
+
     Member Functions:
 
     __init__():  Initializes an instance of class Antenna
@@ -9151,7 +11691,7 @@ class Antenna(object):
     """
 
     def __init__(self, label, typetag, latitude, longitude, location, 
-                 center_freq, nsamples=1, aperture=None):
+                 center_freq, nsamples=1, aperture=None, stack_depth=None):
 
         """
         ------------------------------------------------------------------------
@@ -9160,7 +11700,7 @@ class Antenna(object):
         Class attributes initialized are:
         label, latitude, longitude, location, pol, t, timestamp, f0, f, wts, 
         wtspos, wtspos_scale, blc, trc, timestamps, antpol, Et_stack, Ef_stack, 
-        flag_stack, aperture, typetag
+        flag_stack, aperture, typetag, columnar, stack_depth
      
         Read docstring of class Antenna for details on these attributes.
         ------------------------------------------------------------------------
@@ -9228,9 +11768,13 @@ class Antenna(object):
         self.f0 = center_freq
         self.f = self.f0
 
+        self.stack_depth = stack_depth
         self.Et_stack = {}
         self.Ef_stack = {}
         self.flag_stack = {} 
+        self._Et_buffer = {}
+        self._Ef_buffer = {}
+        self._flag_buffer = {}
 
         self.wts = {}
         self.wtspos = {}
@@ -9238,9 +11782,12 @@ class Antenna(object):
         self._gridinfo = {}
 
         for pol in ['P1', 'P2']:
+            self._Et_buffer[pol] = StackBuffer(depth=stack_depth)
+            self._Ef_buffer[pol] = StackBuffer(depth=stack_depth)
+            self._flag_buffer[pol] = StackBuffer(depth=stack_depth, shape=(), dtype=NP.bool)
             self.Et_stack[pol] = None
             self.Ef_stack[pol] = None
-            self.flag_stack[pol] = NP.asarray([])
+            self.flag_stack[pol] = self._flag_buffer[pol].view()
 
             self.wtspos[pol] = []
             self.wts[pol] = []
@@ -9250,6 +11797,38 @@ class Antenna(object):
         self.blc = NP.asarray([self.location.x, self.location.y]).reshape(1,-1)
         self.trc = NP.asarray([self.location.x, self.location.y]).reshape(1,-1)
 
+        self.columnar = None
+
+    ############################################################################
+
+    @property
+    def timestamp(self):
+        if getattr(self, 'columnar', None) is not None:
+            return self.columnar['data']['timestamp']
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, value):
+        if getattr(self, 'columnar', None) is not None:
+            self.columnar['data']['timestamp'] = value
+        else:
+            self._timestamp = value
+
+    ############################################################################
+
+    @property
+    def timestamps(self):
+        if getattr(self, 'columnar', None) is not None:
+            return self.columnar['data']['timestamps']
+        return self._timestamps
+
+    @timestamps.setter
+    def timestamps(self, value):
+        if getattr(self, 'columnar', None) is not None:
+            self.columnar['data']['timestamps'] = value
+        else:
+            self._timestamps = value
+
     ############################################################################
 
     def __str__(self):
@@ -9362,16 +11941,16 @@ class Antenna(object):
 
         self.antpol.update_flags(flags=flags, verify=verify)
 
+        if self.columnar is not None: # Stack is held by the antenna array
+            return
+
         # Stack on to last value or update last value in stack
         for pol in ['P1', 'P2']: 
             if stack is True:
-                self.flag_stack[pol] = NP.append(self.flag_stack[pol], self.antpol.flag[pol])
+                self._flag_buffer[pol].append(self.antpol.flag[pol])
             else:
-                if self.flag_stack[pol].size == 0:
-                    self.flag_stack[pol] = NP.asarray(self.antpol.flag[pol]).reshape(-1)
-                else:
-                    self.flag_stack[pol][-1] = self.antpol.flag[pol]
-            self.flag_stack[pol] = self.flag_stack[pol].astype(NP.bool)
+                self._flag_buffer[pol].update_last(self.antpol.flag[pol])
+            self.flag_stack[pol] = self._flag_buffer[pol].view()
 
     ############################################################################
 
@@ -9532,7 +12111,10 @@ class Antenna(object):
         if location is not None: self.location = location
         if timestamp is not None:
             self.timestamp = timestamp
-            self.timestamps += [copy.deepcopy(timestamp)]
+            if self.columnar is None: # Stack is held by the antenna array otherwise
+                self.timestamps += [copy.deepcopy(timestamp)]
+                if self.stack_depth is not None:
+                    del self.timestamps[:-self.stack_depth]
 
         if t is not None:
             self.t = t
@@ -9545,16 +12127,16 @@ class Antenna(object):
         # Stack flags and data
         self.update_flags(flags=None, stack=stack, verify=True)  
         for pol in ['P1', 'P2']:
-            if self.Et_stack[pol] is None:
-                self.Et_stack[pol] = copy.deepcopy(self.antpol.Et[pol].reshape(1,-1))
-                self.Ef_stack[pol] = copy.deepcopy(self.antpol.Ef[pol].reshape(1,-1))
+            if self.columnar is not None: # Stack is held by the antenna array
+                break
+            if stack or (self.Et_stack[pol] is None):
+                self._Et_buffer[pol].append(self.antpol.Et[pol].ravel())
+                self._Ef_buffer[pol].append(self.antpol.Ef[pol].ravel())
             else:
-                if stack:
-                    self.Et_stack[pol] = NP.vstack((self.Et_stack[pol], self.antpol.Et[pol].reshape(1,-1)))
-                    self.Ef_stack[pol] = NP.vstack((self.Ef_stack[pol], self.antpol.Ef[pol].reshape(1,-1)))
-                else:
-                    self.Et_stack[pol][-1,:] = copy.deepcopy(self.antpol.Et[pol].reshape(1,-1))
-                    self.Ef_stack[pol][-1,:] = copy.deepcopy(self.antpol.Ef[pol].reshape(1,-1))
+                self._Et_buffer[pol].update_last(self.antpol.Et[pol].ravel())
+                self._Ef_buffer[pol].update_last(self.antpol.Ef[pol].ravel())
+            self.Et_stack[pol] = self._Et_buffer[pol].view()
+            self.Ef_stack[pol] = self._Ef_buffer[pol].view()
         
         blc_orig = NP.copy(self.blc)
         trc_orig = NP.copy(self.trc)
@@ -9771,7 +12353,13 @@ class Antenna(object):
         outdict['label'] = self.label
         outdict['E-fields'] = None
         
-        if datapool == 'current':
+        if self.columnar is not None:
+            if datapool == 'current':
+                tsind = None
+            Ef, twts = columnar_E_fields(self.columnar['data'], pol, antind=self.columnar['index'], tselect=tsind, fselect=chans, datapool=datapool)
+            outdict['E-fields'] = Ef[:,0,:]
+            outdict['twts'] = twts[:,0,0]
+        elif datapool == 'current':
             if self.Ef_stack[pol] is not None:
                 outdict['E-fields'] = self.Ef_stack[pol][-1,chans].reshape(1,chans.size)
                 outdict['twts'] = NP.logical_not(NP.asarray(self.flag_stack[pol][-1]).astype(NP.bool).reshape(-1)).astype(NP.float)
@@ -9780,7 +12368,10 @@ class Antenna(object):
                 outdict['twts'] = NP.logical_not(NP.asarray(self.antpol.flag[pol]).astype(NP.bool).reshape(-1)).astype(NP.float)
         else:
             if self.Ef_stack[pol] is not None:
-                outdict['E-fields'] = self.Ef_stack[pol][select_ind].reshape(tsind.size,chans.size)
+                if (fselect is None) and (tsind.size == self.Ef_stack[pol].shape[0]) and NP.all(tsind == NP.arange(tsind.size)):
+                    outdict['E-fields'] = self.Ef_stack[pol] # Entire stack as a view without copying
+                else:
+                    outdict['E-fields'] = self.Ef_stack[pol][select_ind].reshape(tsind.size,chans.size)
                 outdict['twts'] = NP.logical_not(NP.asarray(self.flag_stack[pol][tsind]).astype(NP.bool).reshape(-1)).astype(NP.float)
             else:
                 raise ValueError('Attribute Ef_stack has not been initialized to obtain electric fields from. Consider running method stack()')
@@ -9961,7 +12552,24 @@ class AntennaArray(object):
                  polarization keys is a complex numpy array of size 
                  nv x nu x nchan. It is obtained by correlating the aperture
                  illumination weights of one antenna type with the complex
-                 conjugate of another.
+                 conjugate of another. It is an ordered dictionary with the 
+                 least recently used typetag pair first, from which entries
+                 are evicted beyond attribute crosswts_cache_size
+
+    crosswts_cachedir
+                 [NoneType or string] Directory holding the on-disk cache of
+                 the correlated aperture weights in attribute 
+                 pairwise_typetag_crosswts_vuf, keyed by the aperture and 
+                 grid configuration. Set by member function 
+                 setCrossWtsCache(). Default=None means no on-disk caching
+
+    crosswts_cache_size
+                 [NoneType or integer] Maximum number of typetag pairs held 
+                 in attribute pairwise_typetag_crosswts_vuf. Least recently 
+                 used ones are evicted beyond it and reloaded from the 
+                 on-disk cache (or evaluated again) when required. Set by 
+                 member function setCrossWtsCache(). Default=None means no 
+                 limit
 
     antennas_center
                  [Numpy array] geometrical center of the antenna array locations
@@ -10013,6 +12621,12 @@ class AntennaArray(object):
 
     timestamps   [list] list of all timestamps to be held in the stack 
 
+    stack_depth  [NoneType or integer] Maximum number of most recent 
+                 timestamps held in attribute timestamps and in the columnar 
+                 stack (if columnar mode is set up). If None (default), they 
+                 grow without bound. It should match the attribute stack_depth
+                 of the antennas in the array
+
     tbinsize     [scalar or dictionary] Contains bin size of timestamps while
                  averaging after stacking. Default = None means all antenna 
                  E-field auto-correlation spectra over all timestamps are 
@@ -10217,6 +12831,81 @@ class AntennaArray(object):
                 weights will give the 3D cubes of gridded electric fields and 
                 antenna array illumination respectively
 
+    ant2grid_spmm
+                [dictionary] contains for each polarization the instance of 
+                class ThreadedSparseMapper partitioning ant2grid_mapper for 
+                threaded products in member functions applyMappingMatrix() and
+                applyMappingMatrixBlock(). It is None until the mapping matrix
+                is applied with more than one thread
+
+    grid_illumination_cache
+                [dictionary] contains for each polarization the gridded 
+                aperture illumination of the most recent snapshot gridded by 
+                member function applyMappingMatrix() along with the antenna 
+                weights (flags) it was determined from. It is reused as long 
+                as the weights and the mapping matrix do not change. It is 
+                None until determined, else a dictionary with the following 
+                keys and values:
+                'twts'      [numpy array] antenna weights of size 
+                            1 x n_ant x 1 
+                'mapper'    [scipy sparse matrix] ant2grid_mapper from 
+                            which the illumination was determined
+                'grid_illumination'
+                            [numpy array] gridded aperture illumination of 
+                            size nv x nu x nchan
+                'version'   [integer] incremented every time the gridded 
+                            illumination is determined anew, so that 
+                            quantities derived from it (such as the 
+                            synthesized beam in class Image) can be cached
+
+    columnar    [NoneType or dictionary] If None (default), the electric 
+                fields, flags and stacks are held by the individual instances
+                of class Antenna. If set by member function initColumnar(), 
+                the state of all antennas is held in contiguous numpy buffers 
+                and the instances of class Antenna are lightweight views into 
+                these buffers. It is a dictionary with the following keys and 
+                values:
+                'labels'        [list] sorted antenna labels which define the
+                                order along the antenna axis of all buffers
+                'index'         [dictionary] antenna label to index along the
+                                antenna axis
+                'pols'          [list] polarizations ['P1', 'P2'] which 
+                                define the order along the polarization axis
+                'positions'     [numpy array] antenna positions (in m) of 
+                                size n_ant x 3 in local ENU coordinates
+                'delays'        [numpy array] delays (in seconds) to be
+                                compensated of size n_ant x npol
+                'phasor'        [NoneType or numpy array] complex phase 
+                                factors compensating 'delays' of size 
+                                n_ant x nchan x npol. Set to None whenever
+                                the delays change and evaluated again on 
+                                the next call to member function ingest()
+                'Ef_current'    [numpy array] complex electric field spectra
+                                of the most recent timestamp of size 
+                                n_ant x nchan x npol
+                'flags_current' [numpy array] boolean flags of the most recent 
+                                timestamp of size n_ant x npol
+                'Ef_buffer'     [instance of class StackBuffer] holds the 
+                                stacked electric field spectra of size 
+                                n_ant x nchan x npol per timestamp
+                'flags_buffer'  [instance of class StackBuffer] holds the 
+                                stacked flags of size n_ant x npol per 
+                                timestamp
+                'Ef'            [numpy array] complex stacked electric field 
+                                spectra of size n_time x n_ant x nchan x npol 
+                                in chronological order. It is a view into 
+                                'Ef_buffer'
+                'flags'         [numpy array] boolean stacked flags of size 
+                                n_time x n_ant x npol in chronological order.
+                                It is a view into 'flags_buffer'
+                'nstack'        [integer] number of timestamps in the stack
+
+    pool        [NoneType or instance of class SharedArrayPool] long-lived 
+                pool of worker processes and shared memory arrays used in 
+                parallel processing. It is created on first use and retained
+                for subsequent calls until member function closePool() is 
+                invoked
+
     Member Functions:
 
     __init__()        Initializes an instance of class AntennaArray which 
@@ -10240,6 +12929,20 @@ class AntennaArray(object):
     remove_antennas() Routine to remove antenna(s) from the antenna array 
                       instance. A wrapper for operator overloading __sub__()
                       
+    initColumnar()    Sets up the columnar (array-backed) mode in which the 
+                      electric fields, flags, positions and delays of all 
+                      antennas are held in contiguous numpy buffers
+
+    ingest()          Updates the electric fields and flags of all antennas for 
+                      a timestamp from a single block of electric field spectra
+                      with vectorized delay compensation and flagging
+
+    FT()              Computes the Fourier transform of the time series of the 
+                      antennas in the antenna array
+
+    closePool()       Shuts down the worker processes of the pool used in 
+                      parallel processing and drops its shared memory arrays
+
     grid()            Routine to produce a grid based on the antenna array 
 
     grid_convolve()   Routine to project the electric field illumination pattern
@@ -10256,7 +12959,8 @@ class AntennaArray(object):
                       Routine to construct sparse antenna-to-grid mapping matrix 
                       that will be used in projecting illumination and electric 
                       fields from the array of antennas onto the grid. It has 
-                      elements very common to grid_convolve_new()
+                      elements very common to grid_convolve_new(). Can be 
+                      cached on disk and reused across runs
 
     applyMappingMatrix()
                       Constructs the grid of complex field illumination and 
@@ -10264,6 +12968,11 @@ class AntennaArray(object):
                       matrix. Intended to serve as a "matrix" alternative to 
                       make_grid_cube_new() 
 
+    applyMappingMatrixBlock()
+                      Maps a block of electric field spectra over multiple 
+                      timestamps on to the grid in a single sparse-dense 
+                      product with the sparse antenna-to-grid mapping matrix
+
     grid_unconvolve() Routine to de-project the electric field illumination 
                       pattern and the electric fields on the grid. It can 
                       operate on the entire antenna array or incrementally 
@@ -10293,6 +13002,17 @@ class AntennaArray(object):
                       computed or stored in attribute 
                       pairwise_typetag_crosswts_vuf earlier
 
+    getAntennaPairCorrWts()
+                      Returns the correlation of pair of antenna illumination 
+                      weights on grid from attribute 
+                      pairwise_typetag_crosswts_vuf, evaluating or loading it 
+                      from the on-disk cache if it is not held there
+
+    setCrossWtsCache()
+                      Sets up the on-disk cache and the maximum in-memory 
+                      size of attribute pairwise_typetag_crosswts_vuf and 
+                      optionally preloads it from the on-disk cache
+
     evalAntennaPairPBeam()
                       Evaluate power pattern response on sky of an antenna pair
 
@@ -10338,7 +13058,7 @@ class AntennaArray(object):
     ----------------------------------------------------------------------------
     """
 
-    def __init__(self, antenna_array=None):
+    def __init__(self, antenna_array=None, stack_depth=None):
 
         """
         ------------------------------------------------------------------------
@@ -10350,7 +13070,8 @@ class AntennaArray(object):
         grid_illumination, grid_Ef, f, f0, t, ordered_labels, grid_mapper, 
         antennas_center, latitude, longitude, tbinsize, auto_corr_data, 
         antenna_autowts_set, typetags, pairwise_typetags, antenna_crosswts_set,
-        pairwise_typetag_crosswts_vuf, antenna_pair_to_typetag
+        pairwise_typetag_crosswts_vuf, antenna_pair_to_typetag, columnar,
+        stack_depth, pool, crosswts_cachedir, crosswts_cache_size
      
         Read docstring of class AntennaArray for details on these attributes.
 
@@ -10363,6 +13084,11 @@ class AntennaArray(object):
                    Read docstring of member funtion __add__() for more details 
                    on this input. If provided, this will be used to initialize 
                    the instance.
+
+        stack_depth
+                   [NoneType or integer] Maximum number of most recent 
+                   timestamps to be held in the stack. Default=None means no 
+                   limit. Read docstring of class AntennaArray for details
         ------------------------------------------------------------------------
         """
 
@@ -10384,12 +13110,15 @@ class AntennaArray(object):
         self.t = None
         self.timestamp = None
         self.timestamps = []
+        self.stack_depth = stack_depth
         self.typetags = {}
         self.pairwise_typetags = {}
         self.antenna_pair_to_typetag = {}
 
         self.auto_corr_data = {}
-        self.pairwise_typetag_crosswts_vuf = {}
+        self.pairwise_typetag_crosswts_vuf = collections.OrderedDict()
+        self.crosswts_cachedir = None
+        self.crosswts_cache_size = None
         self.antenna_autowts_set = False
         self.antenna_crosswts_set = False
 
@@ -10398,6 +13127,10 @@ class AntennaArray(object):
         self.ordered_labels = [] # Usually output from member function baseline_vectors() or get_visibilities()
         self.grid_mapper = {}
         self.ant2grid_mapper = {}  # contains the sparse mapping matrix
+        self.ant2grid_spmm = {}
+        self.grid_illumination_cache = {}
+        self.columnar = None
+        self.pool = None
 
         for pol in ['P1', 'P2']:
             self.grid_mapper[pol] = {}
@@ -10424,6 +13157,8 @@ class AntennaArray(object):
             self.caldata[pol] = None
 
             self.ant2grid_mapper[pol] = None
+            self.ant2grid_spmm[pol] = None
+            self.grid_illumination_cache[pol] = None
 
         if antenna_array is not None:
             self += antenna_array
@@ -10802,6 +13537,209 @@ class AntennaArray(object):
 
     ############################################################################
 
+    def initColumnar(self, delays=None, verbose=True):
+
+        """
+        ------------------------------------------------------------------------
+        Sets up the columnar (array-backed) mode in which the electric fields, 
+        flags, positions and delays of all antennas are held in contiguous 
+        numpy buffers (see attribute columnar). The current electric fields and
+        flags of the antennas are copied into the buffers and the attributes 
+        antpol.Ef and antpol.flag of each instance of class Antenna are 
+        replaced by views into these buffers. The stacks, including the 
+        timestamps, are thereafter held by the antenna array and not by 
+        individual antennas. Must be 
+        re-invoked if antennas are added or removed.
+
+        Inputs:
+
+        delays  [dictionary] delays (in seconds) to be compensated under keys
+                'P1' and 'P2'. Under each key is a numpy array of size n_ant
+                in the order of sorted antenna labels. Default=None sets
+                zero delays. 
+
+        verbose [boolean] If True (default), prints diagnostic and progress 
+                messages. If False, suppress printing such messages.
+        ------------------------------------------------------------------------
+        """
+
+        if len(self.antennas) == 0:
+            raise ValueError('No antennas found to set up columnar mode')
+
+        labels = sorted(self.antennas.keys())
+        pols = ['P1', 'P2']
+        nant = len(labels)
+        npol = len(pols)
+        if self.f is None:
+            self.f = NP.copy(self.antennas[labels[0]].f)
+        nchan = NP.asarray(self.f).size
+
+        cdata = {}
+        cdata['labels'] = labels
+        cdata['index'] = {label: ai for ai,label in enumerate(labels)}
+        cdata['pols'] = pols
+        cdata['positions'] = NP.asarray([[self.antennas[label].location.x, self.antennas[label].location.y, self.antennas[label].location.z] for label in labels])
+        cdata['delays'] = NP.zeros((nant,npol), dtype=NP.float64)
+        if delays is not None:
+            if not isinstance(delays, dict):
+                raise TypeError('Input delays must be a dictionary')
+            for pi,pol in enumerate(pols):
+                if pol in delays:
+                    cdata['delays'][:,pi] = NP.asarray(delays[pol]).ravel() + NP.zeros(nant)
+        cdata['phasor'] = None
+        cdata['Ef_current'] = NP.empty((nant,nchan,npol), dtype=NP.complex128)
+        cdata['Ef_current'].fill(NP.nan)
+        cdata['flags_current'] = NP.ones((nant,npol), dtype=NP.bool)
+        cdata['Ef_buffer'] = StackBuffer(depth=self.stack_depth, shape=(nant,nchan,npol), dtype=NP.complex128)
+        cdata['flags_buffer'] = StackBuffer(depth=self.stack_depth, shape=(nant,npol), dtype=NP.bool)
+        cdata['Ef'] = cdata['Ef_buffer'].view()
+        cdata['flags'] = cdata['flags_buffer'].view()
+        cdata['nstack'] = 0
+        cdata['timestamp'] = copy.deepcopy(self.antennas[labels[0]].timestamp)
+        cdata['timestamps'] = []
+
+        for ai,label in enumerate(labels):
+            ant = self.antennas[label]
+            for pi,pol in enumerate(pols):
+                Ef = NP.asarray(ant.antpol.Ef[pol]).ravel()
+                if Ef.size == nchan:
+                    cdata['Ef_current'][ai,:,pi] = Ef
+                cdata['flags_current'][ai,pi] = bool(ant.antpol.flag[pol])
+            ant.antpol.Ef = ColumnarPolView(cdata['Ef_current'], ai, pols=pols, scalar=False)
+            ant.antpol.flag = ColumnarPolView(cdata['flags_current'], ai, pols=pols, scalar=True)
+            ant.columnar = {'data': cdata, 'index': ai}
+
+        self.columnar = cdata
+        if verbose:
+            print 'Columnar mode set up for {0:0d} antennas, {1:0d} channels and {2:0d} polarizations'.format(nant, nchan, npol)
+
+    ############################################################################
+
+    def _pushColumnar(self, stack=True):
+
+        """
+        ------------------------------------------------------------------------
+        Copies the current electric fields, flags and timestamp in the 
+        columnar buffers on to the stack. If stack is True, they are appended as a new 
+        timestamp (discarding the oldest timestamp if the stack depth is 
+        reached), otherwise the last timestamp in the stack is overwritten. 
+        Not meant to be accessed directly by the user.
+        ------------------------------------------------------------------------
+        """
+
+        cdata = self.columnar
+        if stack or (len(cdata['timestamps']) == 0):
+            cdata['timestamps'] += [copy.deepcopy(cdata['timestamp'])]
+            if self.stack_depth is not None:
+                del cdata['timestamps'][:-self.stack_depth]
+        else:
+            cdata['timestamps'][-1] = copy.deepcopy(cdata['timestamp'])
+        if stack:
+            cdata['Ef_buffer'].append(cdata['Ef_current'])
+            cdata['flags_buffer'].append(cdata['flags_current'])
+        else:
+            cdata['Ef_buffer'].update_last(cdata['Ef_current'])
+            cdata['flags_buffer'].update_last(cdata['flags_current'])
+        cdata['Ef'] = cdata['Ef_buffer'].view()
+        cdata['flags'] = cdata['flags_buffer'].view()
+        cdata['nstack'] = len(cdata['Ef_buffer'])
+
+    ############################################################################
+
+    def ingest(self, timestamp, Ef, flags=None, delays=None, stack=True):
+
+        """
+        ------------------------------------------------------------------------
+        Updates the electric field spectra and flags of all antennas for a 
+        timestamp from a single block of data. Delay compensation and flagging
+        of NaN or all-zero spectra are applied as vectorized operations over 
+        the entire block, which is then pushed on to the stack in one step. 
+        This is a faster alternative to member function update() when the 
+        electric field spectra of all the antennas are available together. 
+        Sets up the columnar mode (see member function initColumnar()) if not 
+        already set up. The timestamp is recorded once in the columnar buffers
+        for all the antennas and not per antenna.
+
+        Inputs:
+
+        timestamp  [scalar] Unique identifier of the electric field spectra
+
+        Ef         [numpy array] Complex electric field spectra of size 
+                   n_ant x nchan x npol where the antennas are in the order of 
+                   sorted antenna labels (key 'labels' in attribute columnar) 
+                   and polarizations are in the order 'P1' and 'P2'
+
+        flags      [NoneType or numpy array] Boolean flags of size n_ant x npol
+                   in the same order as Ef. If True, the antenna and 
+                   polarization is flagged. Default=None means no flagging 
+                   other than that of NaN or all-zero spectra, which are 
+                   always flagged
+
+        delays     [NoneType or dictionary] delays (in seconds) to be 
+                   compensated under keys 'P1' and 'P2'. Under each key is a 
+                   scalar or numpy array of size n_ant in the order of sorted
+                   antenna labels. Delays specified are retained for 
+                   subsequent calls. Default=None means the delays currently
+                   held in key 'delays' of attribute columnar are used
+
+        stack      [boolean] If True (default), appends the updated flags and
+                   data to the end of the stack as a new timestamp. If False,
+                   updates the last flags and data in the stack and does not 
+                   append
+        ------------------------------------------------------------------------
+        """
+
+        if self.columnar is None:
+            self.initColumnar(verbose=False)
+        cdata = self.columnar
+        nant, nchan, npol = cdata['Ef_current'].shape
+
+        Ef = NP.asarray(Ef)
+        if Ef.shape != (nant, nchan, npol):
+            raise ValueError('Input Ef must be of shape {0}'.format((nant, nchan, npol)))
+
+        if flags is None:
+            flags = NP.zeros((nant,npol), dtype=NP.bool)
+        else:
+            flags = NP.asarray(flags)
+            if flags.dtype != NP.bool:
+                raise TypeError('Input flags must be of boolean type')
+            if flags.shape != (nant, npol):
+                raise ValueError('Input flags must be of shape {0}'.format((nant, npol)))
+
+        if delays is not None:
+            if not isinstance(delays, dict):
+                raise TypeError('Input delays must be a dictionary')
+            for pi,pol in enumerate(cdata['pols']):
+                if pol in delays:
+                    cdata['delays'][:,pi] = NP.asarray(delays[pol]).ravel() + NP.zeros(nant)
+            cdata['phasor'] = None
+
+        if (cdata['phasor'] is None) and NP.any(cdata['delays'] != 0.0):
+            phases = 2 * NP.pi * cdata['delays'][:,NP.newaxis,:] * NP.asarray(self.f).reshape(1,-1,1)
+            cdata['phasor'] = NP.exp(1j * phases)
+
+        cdata['Ef_current'][...] = Ef
+        if cdata['phasor'] is not None:
+            cdata['Ef_current'] *= cdata['phasor']
+
+        cdata['flags_current'][...] = flags
+        cdata['flags_current'] |= NP.any(NP.isnan(cdata['Ef_current']), axis=1)
+        cdata['flags_current'] |= NP.sum(NP.abs(cdata['Ef_current']), axis=1) < 1e-10
+
+        self.timestamp = timestamp
+        if stack or (len(self.timestamps) == 0):
+            self.timestamps += [copy.deepcopy(timestamp)]
+            if self.stack_depth is not None:
+                del self.timestamps[:-self.stack_depth]
+        else:
+            self.timestamps[-1] = copy.deepcopy(timestamp)
+        cdata['timestamp'] = timestamp # Common to all antennas
+
+        self._pushColumnar(stack=stack)
+
+    ############################################################################
+
     def get_E_fields_old(self, pol, flag=False, sort=True):
 
         """
@@ -10967,6 +13905,25 @@ class AntennaArray(object):
         if sort:
             labels = sorted(labels)
 
+        if self.columnar is not None:
+            if (aselect is None) and sort:
+                antind = None
+            else:
+                antind = [self.columnar['index'][label] for label in labels]
+            if datapool == 'stack':
+                if tselect is None:
+                    tselect = -1
+            Ef, twts = columnar_E_fields(self.columnar, pol, antind=antind, tselect=tselect, fselect=fselect, datapool=datapool)
+            outdict = {}
+            outdict['labels'] = labels
+            if flag is None:
+                outdict['E-fields'] = Ef
+                outdict['twts'] = twts
+            else:
+                outdict['E-fields'] = list(NP.swapaxes(Ef, 0, 1))
+                outdict['twts'] = list(NP.swapaxes(twts[:,:,0], 0, 1))
+            return outdict
+
         efinfo = [self.antennas[label].get_E_fields(pol, flag=flag, tselect=tselect, fselect=fselect, datapool=datapool) for label in labels]
       
         outdict = {}
@@ -11133,31 +14090,109 @@ class AntennaArray(object):
 
     ############################################################################
 
+    def _getPool(self, nproc=None):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the long-lived pool of worker processes in attribute pool, 
+        creating it if it does not exist or if a different number of 
+        processes is requested. Not meant to be accessed directly by the user.
+
+        Input:
+
+        nproc      [integer] specifies number of independent processes to 
+                   spawn. Default = None, means automatically determines the 
+                   number of process cores in the system and use one less than 
+                   that. Read docstring of class SharedArrayPool for details
+        ------------------------------------------------------------------------
+        """
+
+        if self.pool is not None:
+            if (nproc is not None) and (min(max(nproc, 1), max(MP.cpu_count()-1, 1)) != self.pool.nproc):
+                self.closePool()
+        if self.pool is None:
+            self.pool = SharedArrayPool(nproc=nproc)
+        return self.pool
+
+    ############################################################################
+
+    def closePool(self):
+
+        """
+        ------------------------------------------------------------------------
+        Shuts down the worker processes of the pool used in parallel 
+        processing once they have finished their pending tasks and drops the
+        pool together with its shared memory arrays. Results of parallel 
+        processing are copies and remain valid. A new pool is created on the
+        next call with parallel processing
+        ------------------------------------------------------------------------
+        """
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.release()
+            self.pool = None
+
+    ############################################################################
+
     def FT(self, pol=None, parallel=False, nproc=None):
 
         """
         ------------------------------------------------------------------------
         Computes the Fourier transform of the time series of the antennas in the 
-        antenna array to compute the visibility spectra
+        antenna array to compute the visibility spectra. In parallel 
+        processing, the time series of all antennas are placed in a shared 
+        memory array and the worker processes of attribute pool Fourier 
+        transform ranges of antennas in place. Electric field spectra of the 
+        antennas are then views into a copy of the results made once per call.
+
+        Inputs:
+
+        pol        [scalar or list] Scalar string or list of strings specifying 
+                   polarization. Accepted values are 'P1' and/or 'P2'. 
+                   Default=None means both time series of electric fields of 
+                   both polarizations are Fourier transformed
+
+        parallel   [boolean] specifies if parallelization is to be invoked. 
+                   False (default) means only serial processing
+
+        nproc      [integer] specifies number of independent processes to spawn.
+                   Default = None, means automatically determines the number of 
+                   process cores in the system and use one less than that to 
+                   avoid locking the system for other processes. Applies only 
+                   if input parameter 'parallel' (see above) is set to True. 
+                   If nproc is set to a value more than the number of process
+                   cores in the system, it will be reset to number of process 
+                   cores in the system minus one to avoid locking the system out 
+                   for other processes
         ------------------------------------------------------------------------
         """
         
         if not parallel:
             for label in self.antennas:
-                self.antennas[label].FX()
-        elif parallel or (nproc is not None):
-            if nproc is None:
-                nproc = max(MP.cpu_count()-1, 1) 
-            else:
-                nproc = min(nproc, max(MP.cpu_count()-1, 1))
-            pool = MP.Pool(processes=nproc)
-            updated_antennas = pool.map(unwrap_antenna_FT, IT.izip(self.antennas.values()))
-            pool.close()
-            pool.join()
-
-            for antenna in updated_antennas: 
-                self.antennas[antenna.label] = antenna
-            del updated_antennas
+                self.antennas[label].FT(pol=pol)
+        else:
+            if pol is None:
+                pol = ['P1', 'P2']
+            elif not isinstance(pol, list):
+                pol = [pol]
+            for p in pol:
+                if p not in ['P1', 'P2']:
+                    raise ValueError('polarization string "{0}" unrecognized. Verify inputs. Aborting {1}.{2}()'.format(p, self.__class__.__name__, 'FT'))
+
+            labels = sorted(self.antennas.keys())
+            nsamples = NP.asarray(self.antennas[labels[0]].antpol.Et[pol[0]]).size
+            pool = self._getPool(nproc=nproc)
+            Et = pool.allocate('Et', (len(labels), nsamples, len(pol)), NP.complex128)
+            Ef = pool.allocate('Ef', (len(labels), 2*nsamples, len(pol)), NP.complex128)
+            for ai,label in enumerate(labels):
+                for pi,p in enumerate(pol):
+                    Et[ai,:,pi] = NP.asarray(self.antennas[label].antpol.Et[p]).ravel()
+            pool.map(shared_antenna_FT_arg_splitter, pool.ranges(len(labels)))
+            Ef = NP.copy(Ef) # Shared array is overwritten by the next call
+            for ai,label in enumerate(labels):
+                for pi,p in enumerate(pol):
+                    self.antennas[label].antpol.Ef[p] = Ef[ai,:,pi]
         
     ############################################################################
 
@@ -12049,15 +15084,11 @@ class AntennaArray(object):
                 if wts_change or (not self.grid_mapper[apol]['all_ant2grid']):
                     self.grid_mapper[apol]['per_ant2grid'] = []
                     self.grid_mapper[apol]['all_ant2grid'] = {}
-                    gridlocs = NP.hstack((self.gridu.reshape(-1,1), self.gridv.reshape(-1,1)))
                     if gridfunc_freq == 'scale':
-                        grid_xy = gridlocs[NP.newaxis,:,:] * wavelength.reshape(-1,1,1)   # nchan x nv x nu
-                        wl = NP.ones(gridlocs.shape[0])[NP.newaxis,:] * wavelength.reshape(-1,1)
-                        grid_xy = grid_xy.reshape(-1,2)
-                        wl = wl.reshape(-1)
-                        indNN_list, antind, fvu_gridind = LKP.find_NN(ant_xy, grid_xy, distance_ULIM=2.0*distNN, flatten=True, parallel=False)
-                        dxy = grid_xy[fvu_gridind,:] - ant_xy[antind,:]
-                        fvu_gridind_unraveled = NP.unravel_index(fvu_gridind, (self.f.size,)+self.gridu.shape)   # f-v-u order since temporary grid was created as nchan x nv x nu
+                        indNN_list, antind, fvu_gridind = find_grid_footprints(ant_xy, self.gridu, self.gridv, wavelength, distance_ULIM=2.0*distNN)
+                        grid_xy, wl = grid_footprint_locations(fvu_gridind, self.gridu, self.gridv, wavelength)
+                        dxy = grid_xy - ant_xy[antind,:]
+                        fvu_gridind_unraveled = NP.unravel_index(fvu_gridind, (self.f.size,)+self.gridu.shape)   # f-v-u order of the grid footprints
                         self.grid_mapper[apol]['all_ant2grid']['antind'] = NP.copy(antind)
                         self.grid_mapper[apol]['all_ant2grid']['u_gridind'] = NP.copy(fvu_gridind_unraveled[2])
                         self.grid_mapper[apol]['all_ant2grid']['v_gridind'] = NP.copy(fvu_gridind_unraveled[1])                            
@@ -12066,15 +15097,15 @@ class AntennaArray(object):
 
                         if identical_antennas:
                             arbitrary_antenna_aperture = self.antennas.itervalues().next().aperture
-                            krn = arbitrary_antenna_aperture.compute(dxy, wavelength=wl[fvu_gridind], pol=apol, rmaxNN=rmaxNN, load_lookup=False)
+                            krn = arbitrary_antenna_aperture.compute(dxy, wavelength=wl, pol=apol, rmaxNN=rmaxNN, load_lookup=False)
                         else:
                             # This block #1 is one way to go about per antenna
                             for ai,gi in enumerate(indNN_list):
                                 if len(gi) > 0:
                                     label = self.ordered_labels[ai]
-                                    ind = NP.asarray(gi)
-                                    diffxy = grid_xy[ind,:].reshape(-1,2) - ant_xy[ai,:].reshape(-1,2)
-                                    krndict = self.antennas[label].aperture.compute(diffxy, wavelength=wl[ind], pol=apol, rmaxNN=rmaxNN, load_lookup=False)
+                                    ind_xy, ind_wl = grid_footprint_locations(gi, self.gridu, self.gridv, wavelength)
+                                    diffxy = ind_xy - ant_xy[ai,:].reshape(-1,2)
+                                    krndict = self.antennas[label].aperture.compute(diffxy, wavelength=ind_wl, pol=apol, rmaxNN=rmaxNN, load_lookup=False)
                                     if krn[apol] is None:
                                         krn[apol] = NP.copy(krndict[apol])
                                     else:
@@ -12097,34 +15128,18 @@ class AntennaArray(object):
                         pass
                         
                     # Determine weights that can normalize sum of kernel per antenna per frequency to unity
-                    per_ant_per_freq_norm_wts = NP.zeros(antind.size, dtype=NP.complex64)
-                    # per_ant_per_freq_norm_wts = NP.ones(antind.size, dtype=NP.complex64)                    
+                    per_ant_per_freq_norm_wts = self._perAntPerFreqNormWts(antind, fvu_gridind_unraveled[0], krn[apol], n_ant)
                     
-                    runsum = 0
-                    for ai,gi in enumerate(indNN_list):
-                        if len(gi) > 0:
-                            fvu_ind = NP.asarray(gi)
-                            unraveled_fvu_ind = NP.unravel_index(fvu_ind, (self.f.size,)+self.gridu.shape)
-                            f_ind = unraveled_fvu_ind[0]
-                            v_ind = unraveled_fvu_ind[1]
-                            u_ind = unraveled_fvu_ind[2]
-                            chanhist, chanbe, chanbn, chanri = OPS.binned_statistic(f_ind, statistic='count', bins=NP.arange(self.f.size+1))
-                            for ci in xrange(self.f.size):
-                                if chanhist[ci] > 0.0:
-                                    select_chan_ind = chanri[chanri[ci]:chanri[ci+1]]
-                                    per_ant_per_freq_kernel_sum = NP.sum(krn[apol][runsum:runsum+len(gi)][select_chan_ind])
-                                    per_ant_per_freq_norm_wts[runsum:runsum+len(gi)][select_chan_ind] = 1.0 / per_ant_per_freq_kernel_sum
-
+                    bounds = NP.append(0, NP.cumsum(NP.bincount(antind, minlength=n_ant)))
+                    for ai in xrange(n_ant):
                         per_ant2grid_info = {}
                         per_ant2grid_info['label'] = self.ordered_labels[ai]
-                        per_ant2grid_info['f_gridind'] = NP.copy(f_ind)
-                        per_ant2grid_info['u_gridind'] = NP.copy(u_ind)
-                        per_ant2grid_info['v_gridind'] = NP.copy(v_ind)
-                        # per_ant2grid_info['fvu_gridind'] = NP.copy(gi)
-                        per_ant2grid_info['per_ant_per_freq_norm_wts'] = per_ant_per_freq_norm_wts[runsum:runsum+len(gi)]
-                        per_ant2grid_info['illumination'] = krn[apol][runsum:runsum+len(gi)]
-                        self.grid_mapper[apol]['per_ant2grid'] += [copy.deepcopy(per_ant2grid_info)]
-                        runsum += len(gi)
+                        per_ant2grid_info['f_gridind'] = NP.copy(fvu_gridind_unraveled[0][bounds[ai]:bounds[ai+1]])
+                        per_ant2grid_info['u_gridind'] = NP.copy(fvu_gridind_unraveled[2][bounds[ai]:bounds[ai+1]])
+                        per_ant2grid_info['v_gridind'] = NP.copy(fvu_gridind_unraveled[1][bounds[ai]:bounds[ai+1]])
+                        per_ant2grid_info['per_ant_per_freq_norm_wts'] = per_ant_per_freq_norm_wts[bounds[ai]:bounds[ai+1]]
+                        per_ant2grid_info['illumination'] = krn[apol][bounds[ai]:bounds[ai+1]]
+                        self.grid_mapper[apol]['per_ant2grid'] += [per_ant2grid_info]
 
                     self.grid_mapper[apol]['all_ant2grid']['per_ant_per_freq_norm_wts'] = NP.copy(per_ant_per_freq_norm_wts)
 
@@ -12142,7 +15157,7 @@ class AntennaArray(object):
     def genMappingMatrix(self, pol=None, normalize=True, method='NN',
                          distNN=NP.inf, identical_antennas=True,
                          gridfunc_freq=None, wts_change=False, parallel=False,
-                         nproc=None, verbose=True):
+                         nproc=None, cachedir=None, verbose=True):
 
         """
         ------------------------------------------------------------------------
@@ -12215,6 +15230,14 @@ class AntennaArray(object):
                    cores in the system minus one to avoid locking the system out 
                    for other processes
 
+        cachedir   [NoneType or string] Directory holding the on-disk cache of 
+                   the mapping matrix and illumination values. If set, they are
+                   loaded from the cache whenever they have to be determined 
+                   and a cached version exists for the same antenna labels and 
+                   positions, aperture parameters, grid, channel frequencies 
+                   and gridding inputs. Otherwise they are determined and saved
+                   to the cache. Default=None means no caching
+
         verbose    [boolean] If True, prints diagnostic and progress messages. 
                    If False (default), suppress printing such messages.
 
@@ -12230,6 +15253,10 @@ class AntennaArray(object):
         elif not isinstance(pol, list):
             pol = [pol]
 
+        if cachedir is not None:
+            if not isinstance(cachedir, str):
+                raise TypeError('Input cachedir must be a string')
+
         if not self.grid_ready:
             self.grid()
 
@@ -12258,15 +15285,21 @@ class AntennaArray(object):
                     self.ant2grid_mapper[apol] = None
                     self.grid_mapper[apol]['per_ant2grid'] = []
                     self.grid_mapper[apol]['all_ant2grid'] = {}
-                    gridlocs = NP.hstack((self.gridu.reshape(-1,1), self.gridv.reshape(-1,1)))
+
+                    cachefile = None
+                    if cachedir is not None:
+                        cachekey = self._mappingCacheKey(apol, ant_dict, method=method, distNN=distNN, identical_antennas=identical_antennas, gridfunc_freq=gridfunc_freq)
+                        cachefile = os.path.join(cachedir, 'ant2grid_mapper_{0}.hdf5'.format(cachekey))
+                        if self._loadMappingMatrix(cachefile, apol):
+                            if verbose:
+                                print 'Loaded antenna-to-grid mapping matrix for polarization {0} from cache {1}'.format(apol, cachefile)
+                            continue
+
                     if gridfunc_freq == 'scale':
-                        grid_xy = gridlocs[NP.newaxis,:,:] * wavelength.reshape(-1,1,1)   # nchan x nv x nu
-                        wl = NP.ones(gridlocs.shape[0])[NP.newaxis,:] * wavelength.reshape(-1,1)
-                        grid_xy = grid_xy.reshape(-1,2)
-                        wl = wl.reshape(-1)
-                        indNN_list, antind, fvu_gridind = LKP.find_NN(ant_xy, grid_xy, distance_ULIM=2.0*distNN, flatten=True, parallel=False)
-                        dxy = grid_xy[fvu_gridind,:] - ant_xy[antind,:]
-                        fvu_gridind_unraveled = NP.unravel_index(fvu_gridind, (self.f.size,)+self.gridu.shape)   # f-v-u order since temporary grid was created as nchan x nv x nu
+                        indNN_list, antind, fvu_gridind = find_grid_footprints(ant_xy, self.gridu, self.gridv, wavelength, distance_ULIM=2.0*distNN)
+                        grid_xy, wl = grid_footprint_locations(fvu_gridind, self.gridu, self.gridv, wavelength)
+                        dxy = grid_xy - ant_xy[antind,:]
+                        fvu_gridind_unraveled = NP.unravel_index(fvu_gridind, (self.f.size,)+self.gridu.shape)   # f-v-u order of the grid footprints
                         self.grid_mapper[apol]['all_ant2grid']['antind'] = NP.copy(antind)
                         self.grid_mapper[apol]['all_ant2grid']['u_gridind'] = NP.copy(fvu_gridind_unraveled[2])
                         self.grid_mapper[apol]['all_ant2grid']['v_gridind'] = NP.copy(fvu_gridind_unraveled[1])                            
@@ -12275,15 +15308,15 @@ class AntennaArray(object):
 
                         if identical_antennas:
                             arbitrary_antenna_aperture = self.antennas.itervalues().next().aperture
-                            krn = arbitrary_antenna_aperture.compute(dxy, wavelength=wl[fvu_gridind], pol=apol, rmaxNN=rmaxNN, load_lookup=False)
+                            krn = arbitrary_antenna_aperture.compute(dxy, wavelength=wl, pol=apol, rmaxNN=rmaxNN, load_lookup=False)
                         else:
                             # This block #1 is one way to go about per antenna
                             for ai,gi in enumerate(indNN_list):
                                 if len(gi) > 0:
                                     label = self.ordered_labels[ai]
-                                    ind = NP.asarray(gi)
-                                    diffxy = grid_xy[ind,:].reshape(-1,2) - ant_xy[ai,:].reshape(-1,2)
-                                    krndict = self.antennas[label].aperture.compute(diffxy, wavelength=wl[ind], pol=apol, rmaxNN=rmaxNN, load_lookup=False)
+                                    ind_xy, ind_wl = grid_footprint_locations(gi, self.gridu, self.gridv, wavelength)
+                                    diffxy = ind_xy - ant_xy[ai,:].reshape(-1,2)
+                                    krndict = self.antennas[label].aperture.compute(diffxy, wavelength=ind_wl, pol=apol, rmaxNN=rmaxNN, load_lookup=False)
                                     if krn[apol] is None:
                                         krn[apol] = NP.copy(krndict[apol])
                                     else:
@@ -12301,94 +15334,245 @@ class AntennaArray(object):
                             #     else:
                             #         krn[apol] = NP.append(krn[apol], krndict[apol])
 
-                        self.grid_mapper[apol]['all_ant2grid']['illumination'] = NP.copy(krn[apol])
-                    else: # Weights do not scale with frequency (needs serious development)
-                        pass
-                        
-                    # Determine weights that can normalize sum of kernel per antenna per frequency to unity
-                    per_ant_per_freq_norm_wts = NP.zeros(antind.size, dtype=NP.complex64)
-                    # per_ant_per_freq_norm_wts = NP.ones(antind.size, dtype=NP.complex64)                    
-                    
-                    if parallel or (nproc is not None):
-                        list_of_val = []
-                        list_of_rowcol_tuple = []
-                    else:
-                        spval = []
-                        sprow = []
-                        spcol = []
-                        
-                    runsum = 0
-                    if verbose:
-                        progress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Antennas '.format(n_ant), PGB.ETA()], maxval=n_ant).start()
-                    for ai,gi in enumerate(indNN_list):
-                        if len(gi) > 0:
-                            fvu_ind = NP.asarray(gi)
-                            unraveled_fvu_ind = NP.unravel_index(fvu_ind, (self.f.size,)+self.gridu.shape)
-                            f_ind = unraveled_fvu_ind[0]
-                            v_ind = unraveled_fvu_ind[1]
-                            u_ind = unraveled_fvu_ind[2]
-                            chanhist, chanbe, chanbn, chanri = OPS.binned_statistic(f_ind, statistic='count', bins=NP.arange(self.f.size+1))
-                            for ci in xrange(self.f.size):
-                                if chanhist[ci] > 0.0:
-                                    select_chan_ind = chanri[chanri[ci]:chanri[ci+1]]
-                                    per_ant_per_freq_kernel_sum = NP.sum(krn[apol][runsum:runsum+len(gi)][select_chan_ind])
-                                    per_ant_per_freq_norm_wts[runsum:runsum+len(gi)][select_chan_ind] = 1.0 / per_ant_per_freq_kernel_sum
+                        self.grid_mapper[apol]['all_ant2grid']['illumination'] = NP.copy(krn[apol])
+                    else: # Weights do not scale with frequency (needs serious development)
+                        pass
+                        
+                    # Determine weights that can normalize sum of kernel per antenna per frequency to unity
+                    per_ant_per_freq_norm_wts = self._perAntPerFreqNormWts(antind, fvu_gridind_unraveled[0], krn[apol], n_ant)
+
+                    # determine the sparse antenna-to-grid mapping matrix pre-requisites
+                    spval = per_ant_per_freq_norm_wts * krn[apol]
+                    sprow = NP.ravel_multi_index((fvu_gridind_unraveled[1], fvu_gridind_unraveled[2], fvu_gridind_unraveled[0]), (self.gridu.shape+(self.f.size,)))
+                    spcol = fvu_gridind_unraveled[0] + antind*self.f.size
+
+                    if parallel or (nproc is not None):
+                        list_of_val = []
+                        list_of_rowcol_tuple = []
+                        
+                    bounds = NP.append(0, NP.cumsum(NP.bincount(antind, minlength=n_ant)))
+                    for ai in xrange(n_ant):
+                        per_ant2grid_info = {}
+                        per_ant2grid_info['label'] = self.ordered_labels[ai]
+                        per_ant2grid_info['f_gridind'] = NP.copy(fvu_gridind_unraveled[0][bounds[ai]:bounds[ai+1]])
+                        per_ant2grid_info['u_gridind'] = NP.copy(fvu_gridind_unraveled[2][bounds[ai]:bounds[ai+1]])
+                        per_ant2grid_info['v_gridind'] = NP.copy(fvu_gridind_unraveled[1][bounds[ai]:bounds[ai+1]])
+                        per_ant2grid_info['per_ant_per_freq_norm_wts'] = per_ant_per_freq_norm_wts[bounds[ai]:bounds[ai+1]]
+                        per_ant2grid_info['illumination'] = krn[apol][bounds[ai]:bounds[ai+1]]
+                        self.grid_mapper[apol]['per_ant2grid'] += [per_ant2grid_info]
+
+                        if parallel or (nproc is not None):
+                            list_of_val += [spval[bounds[ai]:bounds[ai+1]]]
+                            list_of_rowcol_tuple += [(sprow[bounds[ai]:bounds[ai+1]], per_ant2grid_info['f_gridind'])]
+
+                    # determine the sparse antenna-to-grid mapping matrix
+                    if parallel or (nproc is not None):
+                        list_of_shapes = [(self.gridu.size*self.f.size, self.f.size)] * n_ant
+                        if nproc is None:
+                            nproc = max(MP.cpu_count()-1, 1) 
+                        else:
+                            nproc = min(nproc, max(MP.cpu_count()-1, 1))
+                        pool = MP.Pool(processes=nproc)
+                        list_of_spmat = pool.map(genMatrixMapper_arg_splitter, IT.izip(list_of_val, list_of_rowcol_tuple, list_of_shapes))
+                        self.ant2grid_mapper[apol] = SpM.hstack(list_of_spmat, format='csr')
+                    else:
+                        self.ant2grid_mapper[apol] = SpM.csr_matrix((spval, (sprow, spcol)), shape=(self.gridu.size*self.f.size, n_ant*self.f.size))
+
+                    self.grid_mapper[apol]['all_ant2grid']['per_ant_per_freq_norm_wts'] = NP.copy(per_ant_per_freq_norm_wts)
+
+                    if cachefile is not None:
+                        self._saveMappingMatrix(cachefile, apol)
+                        if verbose:
+                            print 'Saved antenna-to-grid mapping matrix for polarization {0} to cache {1}'.format(apol, cachefile)
+
+    ############################################################################
+
+    def _perAntPerFreqNormWts(self, antind, f_gridind, krn, n_ant):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the weights that normalize the sum of the gridding kernel of
+        every antenna in every frequency channel to unity. The kernel sums are
+        evaluated as segment sums over the flattened antenna-to-grid mapping.
+        Not meant to be accessed directly by the user.
+
+        Inputs:
+
+        antind     [numpy array] Antenna indices of the flattened 
+                   antenna-to-grid mapping
+
+        f_gridind  [numpy array] Frequency channel indices of the flattened 
+                   antenna-to-grid mapping. Same size as antind
+
+        krn        [numpy array] Gridding kernel values of the flattened 
+                   antenna-to-grid mapping. Same size as antind
+
+        n_ant      [integer] Number of antennas
+
+        Output:
+
+        Numpy array of type complex64 and same size as antind
+        ------------------------------------------------------------------------
+        """
+
+        segind = antind * self.f.size + f_gridind
+        per_ant_per_freq_kernel_sum = grid_scatter_add(segind, krn, n_ant*self.f.size)
+        return (1.0 / per_ant_per_freq_kernel_sum[segind]).astype(NP.complex64)
+
+    ############################################################################
+
+    def _mappingCacheKey(self, pol, ant_dict, method='NN', distNN=NP.inf,
+                         identical_antennas=True, gridfunc_freq=None):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the key identifying the antenna-to-grid mapping matrix in the 
+        on-disk cache. It is a hash of a key version, the antenna labels and 
+        positions, the aperture parameters including the contents of any 
+        lookup table file, the grid, the channel frequencies and the gridding
+        inputs. Flags do not enter the key since all antennas are 
+        mapped irrespective of flags. Not meant to be accessed directly by the
+        user.
+
+        Inputs:
+
+        pol        [string] polarization, 'P1' or 'P2'
+
+        ant_dict   [dictionary] output of member function antenna_positions()
+
+        Read docstring of member function genMappingMatrix() for details on 
+        other inputs
+
+        Output:
+
+        Hexadecimal string
+        ------------------------------------------------------------------------
+        """
+
+        hashobj = hashlib.sha1()
+        hashobj.update('ant2grid_mapper-v2|{0}|{1}|{2!r}|{3}|{4}'.format(pol, method, float(distNN), identical_antennas, gridfunc_freq))
+        hashobj.update('|'.join([str(label) for label in ant_dict['labels']]))
+        for arr in [ant_dict['positions'], self.gridu, self.gridv, self.f]:
+            hashobj.update(NP.ascontiguousarray(arr, dtype=NP.float64).tostring())
+        if identical_antennas:
+            apertures = [self.antennas.itervalues().next().aperture]
+        else:
+            apertures = [self.antennas[label].aperture for label in ant_dict['labels']]
+        for aperture in apertures:
+            hashobj.update('|'.join([repr(aprinfo.get(pol)) for aprinfo in [aperture.kernel_type, aperture.shape, aperture.rmin, aperture.rmax, aperture.xmax, aperture.ymax, aperture.rotangle, aperture.lkpinfo]]))
+            hashobj.update(lookup_file_digest(aperture.lkpinfo.get(pol)))
+        return hashobj.hexdigest()
+
+    ############################################################################
+
+    def _saveMappingMatrix(self, cachefile, pol):
+
+        """
+        ------------------------------------------------------------------------
+        Saves the antenna-to-grid mapping matrix and illumination values of a 
+        polarization determined by member function genMappingMatrix() to the
+        on-disk cache. The file is written under a temporary name and renamed 
+        so that a partially written file is never read. Not meant to be 
+        accessed directly by the user.
+
+        Inputs:
+
+        cachefile  [string] Full path to the cache file
+
+        pol        [string] polarization, 'P1' or 'P2'
+        ------------------------------------------------------------------------
+        """
+
+        cachedir = os.path.dirname(cachefile)
+        if (cachedir != '') and (not os.path.isdir(cachedir)):
+            os.makedirs(cachedir)
+        tmpfile = cachefile + '.{0:0d}.tmp'.format(os.getpid())
+        spmat = self.ant2grid_mapper[pol].tocsr()
+        per_ant2grid = self.grid_mapper[pol]['per_ant2grid']
+        with h5py.File(tmpfile, 'w') as fileobj:
+            fileobj['labels'] = NP.asarray([str(label) for label in self.ordered_labels])
+            mapper_group = fileobj.create_group('mapper')
+            mapper_group['data'] = spmat.data
+            mapper_group['indices'] = spmat.indices
+            mapper_group['indptr'] = spmat.indptr
+            mapper_group['shape'] = NP.asarray(spmat.shape)
+            all_group = fileobj.create_group('all_ant2grid')
+            for key in ['antind', 'u_gridind', 'v_gridind', 'f_gridind', 'illumination', 'per_ant_per_freq_norm_wts']:
+                all_group[key] = self.grid_mapper[pol]['all_ant2grid'][key]
+            per_group = fileobj.create_group('per_ant2grid')
+            per_group['labels'] = NP.asarray([str(info['label']) for info in per_ant2grid])
+            per_group['nind'] = NP.asarray([info['f_gridind'].size for info in per_ant2grid], dtype=NP.int64)
+            per_group['nval'] = NP.asarray([info['illumination'].size for info in per_ant2grid], dtype=NP.int64)
+            for key in ['f_gridind', 'u_gridind', 'v_gridind', 'per_ant_per_freq_norm_wts', 'illumination']:
+                per_group[key] = NP.concatenate([NP.asarray(info[key]).ravel() for info in per_ant2grid])
+        os.rename(tmpfile, cachefile)
+
+    ############################################################################
+
+    def _loadMappingMatrix(self, cachefile, pol):
+
+        """
+        ------------------------------------------------------------------------
+        Loads the antenna-to-grid mapping matrix and illumination values of a 
+        polarization from the on-disk cache into attributes ant2grid_mapper 
+        and grid_mapper. Not meant to be accessed directly by the user.
+
+        Inputs:
 
-                        per_ant2grid_info = {}
-                        per_ant2grid_info['label'] = self.ordered_labels[ai]
-                        per_ant2grid_info['f_gridind'] = NP.copy(f_ind)
-                        per_ant2grid_info['u_gridind'] = NP.copy(u_ind)
-                        per_ant2grid_info['v_gridind'] = NP.copy(v_ind)
-                        # per_ant2grid_info['fvu_gridind'] = NP.copy(gi)
-                        per_ant2grid_info['per_ant_per_freq_norm_wts'] = per_ant_per_freq_norm_wts[runsum:runsum+len(gi)]
-                        per_ant2grid_info['illumination'] = krn[apol][runsum:runsum+len(gi)]
-                        self.grid_mapper[apol]['per_ant2grid'] += [copy.deepcopy(per_ant2grid_info)]
-                        runsum += len(gi)
+        cachefile  [string] Full path to the cache file
 
-                        # determine the sparse interferometer-to-grid mapping matrix pre-requisites
-                        val = per_ant2grid_info['per_ant_per_freq_norm_wts']*per_ant2grid_info['illumination']
-                        vuf_gridind_unraveled = (per_ant2grid_info['v_gridind'],per_ant2grid_info['u_gridind'],per_ant2grid_info['f_gridind'])
-                        vuf_gridind_raveled = NP.ravel_multi_index(vuf_gridind_unraveled, (self.gridu.shape+(self.f.size,)))
-                        
-                        if (not parallel) and (nproc is None):
-                            spval += val.tolist()
-                            sprow += vuf_gridind_raveled.tolist()
-                            spcol += (per_ant2grid_info['f_gridind'] + ai*self.f.size).tolist()
-                        else:
-                            list_of_val += [per_ant2grid_info['per_ant_per_freq_norm_wts']*per_ant2grid_info['illumination']]
-                            list_of_rowcol_tuple += [(vuf_gridind_raveled, per_ant2grid_info['f_gridind'])]
-                        if verbose:
-                            progress.update(ai+1)
+        pol        [string] polarization, 'P1' or 'P2'
 
-                    if verbose:
-                        progress.finish()
+        Output:
 
-                    # determine the sparse interferometer-to-grid mapping matrix
-                    if parallel or (nproc is not None):
-                        list_of_shapes = [(self.gridu.size*self.f.size, self.f.size)] * n_ant
-                        if nproc is None:
-                            nproc = max(MP.cpu_count()-1, 1) 
-                        else:
-                            nproc = min(nproc, max(MP.cpu_count()-1, 1))
-                        pool = MP.Pool(processes=nproc)
-                        list_of_spmat = pool.map(genMatrixMapper_arg_splitter, IT.izip(list_of_val, list_of_rowcol_tuple, list_of_shapes))
-                        self.ant2grid_mapper[apol] = SpM.hstack(list_of_spmat, format='csr')
-                    else:
-                        spval = NP.asarray(spval)
-                        sprowcol = (NP.asarray(sprow), NP.asarray(spcol))
-                        self.ant2grid_mapper[apol] = SpM.csr_matrix((spval, sprowcol), shape=(self.gridu.size*self.f.size, n_ant*self.f.size))
+        Boolean. True if loaded from cache, False if the cache file does not
+        exist or does not match the current antenna labels
+        ------------------------------------------------------------------------
+        """
 
-                    self.grid_mapper[apol]['all_ant2grid']['per_ant_per_freq_norm_wts'] = NP.copy(per_ant_per_freq_norm_wts)
+        if not os.path.isfile(cachefile):
+            return False
+
+        with h5py.File(cachefile, 'r') as fileobj:
+            if fileobj['labels'].value.tolist() != [str(label) for label in self.ordered_labels]:
+                return False
+            self.ant2grid_mapper[pol] = SpM.csr_matrix((fileobj['mapper/data'].value, fileobj['mapper/indices'].value, fileobj['mapper/indptr'].value), shape=tuple(fileobj['mapper/shape'].value))
+            self.grid_mapper[pol]['all_ant2grid'] = {}
+            for key in fileobj['all_ant2grid']:
+                self.grid_mapper[pol]['all_ant2grid'][key] = fileobj['all_ant2grid'][key].value
+            per_group = fileobj['per_ant2grid']
+            per_labels = per_group['labels'].value.tolist()
+            ind_bounds = NP.concatenate(([0], NP.cumsum(per_group['nind'].value)))
+            val_bounds = NP.concatenate(([0], NP.cumsum(per_group['nval'].value)))
+            per_data = {key: per_group[key].value for key in ['f_gridind', 'u_gridind', 'v_gridind', 'per_ant_per_freq_norm_wts', 'illumination']}
+            ordered_labels = {str(label): label for label in self.ordered_labels}
+            self.grid_mapper[pol]['per_ant2grid'] = []
+            for ai,label in enumerate(per_labels):
+                per_ant2grid_info = {}
+                per_ant2grid_info['label'] = ordered_labels[label]
+                for key in ['f_gridind', 'u_gridind', 'v_gridind']:
+                    per_ant2grid_info[key] = per_data[key][ind_bounds[ai]:ind_bounds[ai+1]]
+                for key in ['per_ant_per_freq_norm_wts', 'illumination']:
+                    per_ant2grid_info[key] = per_data[key][val_bounds[ai]:val_bounds[ai+1]]
+                self.grid_mapper[pol]['per_ant2grid'] += [per_ant2grid_info]
+
+        return True
 
     ############################################################################
 
-    def applyMappingMatrix(self, pol=None, cal_loop=False, verbose=True):
+    def applyMappingMatrix(self, pol=None, cal_loop=False, tselect=None,
+                           datapool='current', nthreads=1, verbose=True):
 
         """
         ------------------------------------------------------------------------
         Constructs the grid of complex field illumination and electric fields 
         using the sparse antenna-to-grid mapping matrix. Intended to serve as a 
-        "matrix" alternative to make_grid_cube_new() 
+        "matrix" alternative to make_grid_cube_new(). Gridding is done in one
+        sparse-dense product (see member function applyMappingMatrixBlock()) 
+        and the gridded quantities are dense numpy arrays. For the current
+        datapool, the gridded illumination is cached in attribute 
+        grid_illumination_cache and only the electric fields are gridded 
+        while the antenna weights (flags) remain unchanged
 
         Inputs:
 
@@ -12402,7 +15586,25 @@ class AntennaArray(object):
                 calibration loop. If False (default), the calibration loop is
                 assumed to be OFF and the current electric fields are assumed 
                 to be the calibrated data to be mapped to the grid 
-                via gridding convolution.
+                via gridding convolution. Applies only if datapool is set to
+                'current'
+
+        tselect [scalar, list, numpy array] timestamp indices in the stack to 
+                be gridded. Applies only if datapool is set to 'stack'. 
+                Default=None means all the timestamps in the stack are 
+                gridded
+
+        datapool
+                [string] If set to 'current' (default), the most recent 
+                electric fields are gridded and the gridded quantities are of
+                size nv x nu x nchan. If set to 'stack', the electric fields 
+                of the timestamps in tselect are gridded together in a batch 
+                and the gridded quantities are of size 
+                nv x nu x nchan x n_time
+
+        nthreads
+                [integer] Number of threads used in the sparse-dense product. 
+                See member function applyMappingMatrixBlock(). Default=1
 
         verbose [boolean] If True, prints diagnostic and progress messages. 
                 If False (default), suppress printing such messages.
@@ -12413,6 +15615,9 @@ class AntennaArray(object):
             pol = ['P1', 'P2']
 
         pol = NP.unique(NP.asarray(pol))
+
+        if datapool not in ['current', 'stack']:
+            raise ValueError('Invalid datapool specified')
         
         for apol in pol:
 
@@ -12422,40 +15627,150 @@ class AntennaArray(object):
             if apol not in ['P1', 'P2']:
                 raise ValueError('Invalid specification for input parameter pol')
 
-            if not cal_loop:
-                self.caldata[apol] = self.get_E_fields(apol, flag=None, tselect=-1, fselect=None, aselect=None, datapool='current', sort=True)
-            else:
-                if self.caldata[apol] is None:
+            if datapool == 'current':
+                if not cal_loop:
                     self.caldata[apol] = self.get_E_fields(apol, flag=None, tselect=-1, fselect=None, aselect=None, datapool='current', sort=True)
+                else:
+                    if self.caldata[apol] is None:
+                        self.caldata[apol] = self.get_E_fields(apol, flag=None, tselect=-1, fselect=None, aselect=None, datapool='current', sort=True)
+                efinfo = self.caldata[apol]
+            else:
+                if tselect is None:
+                    if self.columnar is not None:
+                        nstack = self.columnar['nstack']
+                    else:
+                        nstack = self.antennas[sorted(self.antennas.keys())[0]].Ef_stack[apol].shape[0]
+                    tselect = NP.arange(nstack)
+                efinfo = self.get_E_fields(apol, flag=None, tselect=tselect, fselect=None, aselect=None, datapool='stack', sort=True)
 
-            Ef = self.caldata[apol]['E-fields'].astype(NP.complex64)  #  (n_ts=1) x n_ant x nchan
-            Ef = NP.squeeze(Ef, axis=0)  # n_ant x nchan
+            Ef = efinfo['E-fields'].astype(NP.complex64)  #  n_ts x n_ant x nchan
+            twts = efinfo['twts']  # n_ts x n_ant x 1
+            n_ts = Ef.shape[0]
 
-            twts = self.caldata[apol]['twts']  # (n_ts=1) x n_ant x 1
-            twts = NP.squeeze(twts, axis=0)  # n_ant x 1
+            Ef = Ef * twts    # applies antenna flagging, n_ts x n_ant x nchan
+            wts = twts * NP.ones(self.f.size).reshape(1,1,-1)  # n_ts x n_ant x nchan
 
-            Ef = Ef * twts    # applies antenna flagging, n_ant x nchan
-            wts = twts * NP.ones(self.f.size).reshape(1,-1)  # n_ant x nchan
+            Ef = NP.ascontiguousarray(Ef.reshape(n_ts,-1).T)  # (n_ant x nchan) x n_ts
+            wts = NP.ascontiguousarray(wts.reshape(n_ts,-1).T)  # (n_ant x nchan) x n_ts
 
-            wts[NP.isnan(Ef)] = 0.0
-            Ef[NP.isnan(Ef)] = 0.0
+            illum_cache = self.grid_illumination_cache.get(apol, None)
+            reuse_illumination = (datapool == 'current') and (illum_cache is not None) and (illum_cache['mapper'] is self.ant2grid_mapper[apol]) and NP.array_equal(illum_cache['twts'], twts)
 
-            Ef = Ef.ravel()
-            wts = wts.ravel()
+            grid_Ef, grid_illumination = self.applyMappingMatrixBlock(apol, Ef, wts=wts, nthreads=nthreads, illumination=not reuse_illumination)
+            if datapool == 'current':
+                self.grid_Ef[apol] = grid_Ef[:,:,:,0]
+                if reuse_illumination:
+                    self.grid_illumination[apol] = illum_cache['grid_illumination']
+                else:
+                    self.grid_illumination[apol] = grid_illumination[:,:,:,0]
+                    self.grid_illumination_cache[apol] = {'twts': NP.copy(twts), 'mapper': self.ant2grid_mapper[apol], 'grid_illumination': self.grid_illumination[apol], 'version': 0 if illum_cache is None else illum_cache['version']+1}
+            else:
+                self.grid_Ef[apol] = grid_Ef
+                self.grid_illumination[apol] = grid_illumination
+            
+            if verbose:
+                print 'Gridded aperture illumination and electric fields for polarization {0} from {1:0d} unflagged contributing antennas in {2:0d} timestamp(s)'.format(apol, NP.sum(twts[-1]).astype(int), n_ts)
 
-            sparse_Ef = SpM.csr_matrix(Ef)
-            sparse_wts = SpM.csr_matrix(wts)
+    ############################################################################
 
-            # Store as sparse matrices
-            self.grid_illumination[apol] = self.ant2grid_mapper[apol].dot(sparse_wts.T)
-            self.grid_Ef[apol] = self.ant2grid_mapper[apol].dot(sparse_Ef.T)
+    def applyMappingMatrixBlock(self, pol, Ef, wts=None, nthreads=1,
+                                illumination=True):
 
-            # # Store as dense matrices
-            # self.grid_illumination[apol] = self.ant2grid_mapper[apol].dot(wts).reshape(self.gridu.shape+(self.f.size,))
-            # self.grid_Ef[apol] = self.ant2grid_mapper[apol].dot(Ef).reshape(self.gridu.shape+(self.f.size,))   
-            
-            if verbose:
-                print 'Gridded aperture illumination and electric fields for polarization {0} from {1:0d} unflagged contributing antennas'.format(apol, NP.sum(twts).astype(int))
+        """
+        ------------------------------------------------------------------------
+        Maps a block of electric field spectra of all antennas over multiple 
+        timestamps on to the grid in a single sparse-dense product with the 
+        sparse antenna-to-grid mapping matrix determined by member function 
+        genMappingMatrix(). The electric fields and weights are stacked 
+        together so that the mapping matrix is traversed only once
+
+        Inputs:
+
+        pol     [String] The polarization to be gridded. Can be set to 'P1' or 
+                'P2'
+
+        Ef      [numpy array] Complex electric field spectra of size 
+                (n_ant x nchan) x n_time where the first axis is the 
+                flattened n_ant x nchan axes (antennas in the order of sorted
+                antenna labels). A one-dimensional array is treated as 
+                n_time=1. NaN values are treated as zeros with zero weight
+
+        wts     [numpy array] Weights of the same size as Ef. Default=None 
+                means unit weights
+
+        nthreads
+                [integer] Number of threads used in the sparse-dense product.
+                If greater than 1, the rows of the mapping matrix are 
+                partitioned and multiplied concurrently by an instance of 
+                class ThreadedSparseMapper (stored in attribute 
+                ant2grid_spmm). The results are identical to the serial 
+                product. Default=1
+
+        illumination
+                [boolean] If True (default), the aperture illumination is 
+                gridded from wts. If False, only the electric fields are 
+                gridded and None is returned in place of the gridded 
+                illumination
+
+        Outputs:
+
+        Tuple (grid_Ef, grid_illumination) of dense complex numpy arrays, each
+        of size nv x nu x nchan x n_time, containing the gridded electric 
+        fields and gridded aperture illumination respectively
+        ------------------------------------------------------------------------
+        """
+
+        if pol not in ['P1', 'P2']:
+            raise ValueError('Invalid specification for input parameter pol')
+
+        if self.ant2grid_mapper[pol] is None:
+            raise ValueError('Antenna-to-grid mapping matrix for polarization {0} not determined. Run member function genMappingMatrix() first'.format(pol))
+
+        Ef = NP.asarray(Ef)
+        if Ef.ndim == 1:
+            Ef = Ef.reshape(-1,1)
+        if (Ef.ndim != 2) or (Ef.shape[0] != self.ant2grid_mapper[pol].shape[1]):
+            raise ValueError('Input Ef must be of size {0:0d} x n_time'.format(self.ant2grid_mapper[pol].shape[1]))
+
+        if wts is None:
+            wts = NP.ones(Ef.shape, dtype=NP.float32)
+        else:
+            wts = NP.asarray(wts).reshape(Ef.shape)
+
+        nan_ind = NP.isnan(Ef)
+        if NP.any(nan_ind):
+            Ef = NP.where(nan_ind, 0.0, Ef)
+            wts = NP.where(nan_ind, 0.0, wts)
+
+        if nthreads is None:
+            nthreads = 1
+        if nthreads > 1:
+            with ant2grid_spmm_lock: # Gridding may run in concurrent threads
+                spmm = self.ant2grid_spmm.get(pol, None)
+                if (spmm is None) or (spmm.spmat is not self.ant2grid_mapper[pol]) or (spmm.nthreads != nthreads):
+                    if spmm is not None:
+                        spmm.close()
+                    spmm = ThreadedSparseMapper(self.ant2grid_mapper[pol], nthreads=nthreads)
+                    self.ant2grid_spmm[pol] = spmm
+            mapper = spmm
+        else:
+            mapper = self.ant2grid_mapper[pol]
+
+        n_time = Ef.shape[1]
+        grid_shape = self.gridu.shape + (self.f.size, n_time)
+        mapper_dtype = self.ant2grid_mapper[pol].dtype
+        if not illumination:
+            grid_Ef = mapper.dot(Ef).reshape(grid_shape)
+            grid_illumination = None
+        elif NP.result_type(mapper_dtype, Ef.dtype) == NP.result_type(mapper_dtype, wts.dtype):
+            gridded = mapper.dot(NP.hstack((Ef, wts)))
+            grid_Ef = gridded[:,:n_time].reshape(grid_shape)
+            grid_illumination = gridded[:,n_time:].reshape(grid_shape)
+        else:
+            grid_Ef = mapper.dot(Ef).reshape(grid_shape)
+            grid_illumination = mapper.dot(wts).reshape(grid_shape)
+
+        return (grid_Ef, grid_illumination)
 
     ############################################################################
 
@@ -12497,25 +15812,15 @@ class AntennaArray(object):
             self.grid_illumination[apol] = NP.zeros((self.gridu.shape + (self.f.size,)), dtype=NP.complex_)
             self.grid_Ef[apol] = NP.zeros((self.gridu.shape + (self.f.size,)), dtype=NP.complex_)
     
-            labels = self.grid_mapper[apol]['labels'].keys()
-            if verbose:
-                progress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Antennas '.format(len(labels)), PGB.ETA()], maxval=len(labels)).start()
-            loopcount = 0
-            num_unflagged = 0
-            # while loopcount < len(labels):
-            #     antinfo = self.grid_mapper[apol]['labels'].itervalues().next()
-            for antlabel, antinfo in self.grid_mapper[apol]['labels'].iteritems():
-                if not self.antennas[antlabel].antpol.flag[apol]:
-                    num_unflagged += 1
-                    gridind_unraveled = NP.unravel_index(antinfo['gridind'], self.gridu.shape+(self.f.size,))
-                    self.grid_illumination[apol][gridind_unraveled] += antinfo['illumination']
-                    self.grid_Ef[apol][gridind_unraveled] += antinfo['Ef']
-
-                if verbose:
-                    progress.update(loopcount+1)
-                    loopcount += 1
-            if verbose:
-                progress.finish()
+            unflagged_labels = [antlabel for antlabel in self.grid_mapper[apol]['labels'] if not self.antennas[antlabel].antpol.flag[apol]]
+            num_unflagged = len(unflagged_labels)
+            if num_unflagged > 0:
+                gridind = NP.concatenate([self.grid_mapper[apol]['labels'][antlabel]['gridind'] for antlabel in unflagged_labels])
+                illumination = NP.concatenate([self.grid_mapper[apol]['labels'][antlabel]['illumination'] for antlabel in unflagged_labels])
+                Ef = NP.concatenate([self.grid_mapper[apol]['labels'][antlabel]['Ef'] for antlabel in unflagged_labels])
+                gridsize = self.grid_illumination[apol].size
+                self.grid_illumination[apol] += grid_scatter_add(gridind, illumination, gridsize).reshape(self.grid_illumination[apol].shape)
+                self.grid_Ef[apol] += grid_scatter_add(gridind, Ef, gridsize).reshape(self.grid_Ef[apol].shape)
                 
             if verbose:
                 print 'Gridded aperture illumination and electric fields for polarization {0} from {1:0d} unflagged contributing antennas'.format(apol, num_unflagged)
@@ -12560,24 +15865,21 @@ class AntennaArray(object):
             self.grid_illumination[apol] = NP.zeros((self.gridu.shape + (self.f.size,)), dtype=NP.complex_)
             self.grid_Ef[apol] = NP.zeros((self.gridu.shape + (self.f.size,)), dtype=NP.complex_)
     
-            nlabels = len(self.grid_mapper[apol]['per_ant2grid'])
-            loopcount = 0
-            num_unflagged = 0
-            if verbose:
-                progress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Antennas '.format(nlabels), PGB.ETA()], maxval=nlabels).start()
-            for ai,per_ant2grid_info in enumerate(self.grid_mapper[apol]['per_ant2grid']):
-                antlabel = per_ant2grid_info['label']
-                if not self.antennas[antlabel].antpol.flag[apol]:
-                    num_unflagged += 1
-                    vuf_gridind_unraveled = (per_ant2grid_info['v_gridind'],per_ant2grid_info['u_gridind'],per_ant2grid_info['f_gridind'])
-                    self.grid_illumination[apol][vuf_gridind_unraveled] += per_ant2grid_info['per_ant_per_freq_norm_wts'] * per_ant2grid_info['illumination']
-                    self.grid_Ef[apol][vuf_gridind_unraveled] += per_ant2grid_info['per_ant_per_freq_norm_wts'] * per_ant2grid_info['Ef'] * per_ant2grid_info['illumination']
-
-                if verbose:
-                    progress.update(loopcount+1)
-                    loopcount += 1
-            if verbose:
-                progress.finish()
+            # Flags are applied as a per-antenna mask on the concatenated 
+            # antenna-to-grid mapping and all contributions are accumulated 
+            # with a single scatter-add
+
+            all_ant2grid = self.grid_mapper[apol]['all_ant2grid']
+            if 'Ef' not in all_ant2grid:
+                raise KeyError('Gridded electric fields not found. Run grid_convolve_new() first.')
+            antflags = NP.asarray([self.antennas[antlabel].antpol.flag[apol] for antlabel in self.ordered_labels], dtype=NP.bool)
+            unflagged = NP.logical_not(antflags[all_ant2grid['antind']])
+            num_unflagged = NP.unique(all_ant2grid['antind'][unflagged]).size
+            vuf_gridind = NP.ravel_multi_index((all_ant2grid['v_gridind'][unflagged], all_ant2grid['u_gridind'][unflagged], all_ant2grid['f_gridind'][unflagged]), self.grid_illumination[apol].shape)
+            wtd_illumination = all_ant2grid['per_ant_per_freq_norm_wts'][unflagged] * all_ant2grid['illumination'][unflagged]
+            gridsize = self.grid_illumination[apol].size
+            self.grid_illumination[apol] += grid_scatter_add(vuf_gridind, wtd_illumination, gridsize).reshape(self.grid_illumination[apol].shape)
+            self.grid_Ef[apol] += grid_scatter_add(vuf_gridind, wtd_illumination * all_ant2grid['Ef'][unflagged], gridsize).reshape(self.grid_Ef[apol].shape)
                 
             if verbose:
                 print 'Gridded aperture illumination and electric fields for polarization {0} from {1:0d} unflagged contributing antennas'.format(apol, num_unflagged)
@@ -12590,7 +15892,9 @@ class AntennaArray(object):
         ------------------------------------------------------------------------
         Evaluate correlation of pair of antenna illumination weights on grid. 
         It will be computed only if it was not computed or stored in attribute 
-        pairwise_typetag_crosswts_vuf earlier
+        pairwise_typetag_crosswts_vuf earlier. If attribute crosswts_cachedir 
+        is set, it is loaded from the on-disk cache if available there, and 
+        saved to it otherwise
 
         Inputs:
 
@@ -12644,6 +15948,12 @@ class AntennaArray(object):
             if typetag_pair not in self.pairwise_typetag_crosswts_vuf:
                 do_update = True
         if do_update:
+            cachefile = None
+            if self.crosswts_cachedir is not None:
+                cachefile = os.path.join(self.crosswts_cachedir, 'crosswts_{0}.hdf5'.format(self._crossWtsCacheKey(label1, label2)))
+                if self._loadCrossWts(cachefile, typetag_pair):
+                    self._touchCrossWts(typetag_pair)
+                    return
             pol = ['P1', 'P2']
             self.pairwise_typetag_crosswts_vuf[typetag_pair] = {}
             self.pairwise_typetag_crosswts_vuf[typetag_pair]['last_updated'] = self.timestamp
@@ -12719,11 +16029,250 @@ class AntennaArray(object):
                         antpair_grid_wts_vuf = NP.fft.ifftshift(antpair_grid_wts_vuf, axes=(0,1))
                         antpair_grid_wts_vuf[NP.abs(antpair_grid_wts_vuf) < eps] = 0.0
                         self.pairwise_typetag_crosswts_vuf[typetag_pair][p] = SpM.csr_matrix(antpair_grid_wts_vuf.reshape(-1,self.f.size))
+            if cachefile is not None:
+                self._saveCrossWts(cachefile, typetag_pair)
+            self._touchCrossWts(typetag_pair)
         else:
+            self._touchCrossWts(typetag_pair)
             print 'Specified antenna pair correlation weights have already been evaluated'
 
     ############################################################################ 
 
+    def getAntennaPairCorrWts(self, label1, label2=None):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the correlation of pair of antenna illumination weights on 
+        grid held in attribute pairwise_typetag_crosswts_vuf for the typetag 
+        pair of the antennas. If it is not held there (not evaluated yet or 
+        evicted), it is evaluated or loaded from the on-disk cache by member
+        function evalAntennaPairCorrWts()
+
+        Inputs:
+
+        label1  [string] Label of first antenna. Must be specified (no default)
+
+        label2  [string] Label of second antenna. If specified as None 
+                (default), it will be set equal to label1
+
+        Output:
+
+        Dictionary with keys 'last_updated', 'P1' and 'P2' as described in 
+        attribute pairwise_typetag_crosswts_vuf
+        ------------------------------------------------------------------------
+        """
+
+        if label2 is None:
+            label2 = label1
+
+        if (label1, label2) in self.antenna_pair_to_typetag:
+            typetag_pair = self.antenna_pair_to_typetag[(label1,label2)]
+        elif (label2, label1) in self.antenna_pair_to_typetag:
+            typetag_pair = self.antenna_pair_to_typetag[(label2,label1)]
+        else:
+            raise KeyError('Antenna pair not found in attribute antenna_pair_to_type')
+
+        if typetag_pair in self.pairwise_typetag_crosswts_vuf:
+            self._touchCrossWts(typetag_pair)
+        else:
+            self.evalAntennaPairCorrWts(label1, label2=label2)
+        return self.pairwise_typetag_crosswts_vuf[typetag_pair]
+
+    ############################################################################ 
+
+    def setCrossWtsCache(self, cachedir=None, maxsize=None, preload=True):
+
+        """
+        ------------------------------------------------------------------------
+        Sets up the on-disk cache and the maximum in-memory size of attribute
+        pairwise_typetag_crosswts_vuf. The correlated aperture weights depend 
+        only on the aperture and grid configuration, so that with the on-disk
+        cache they are evaluated once and reused across runs
+
+        Inputs:
+
+        cachedir  [NoneType or string] Directory holding the on-disk cache. It 
+                  is created if it does not exist. Default=None means no 
+                  on-disk caching
+
+        maxsize   [NoneType or integer] Maximum number of typetag pairs held 
+                  in memory. The least recently used ones are evicted beyond
+                  it. Default=None means no limit
+
+        preload   [boolean] If True (default), the correlated aperture 
+                  weights of all typetag pairs in attribute pairwise_typetags
+                  available in the on-disk cache are loaded (up to maxsize), 
+                  so that member functions such as makeAutoCorrCube() start 
+                  with them already in memory
+        ------------------------------------------------------------------------
+        """
+
+        if cachedir is not None:
+            if not isinstance(cachedir, str):
+                raise TypeError('Input cachedir must be a string')
+            if not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+        if maxsize is not None:
+            if not isinstance(maxsize, int):
+                raise TypeError('Input maxsize must be an integer')
+            if maxsize < 1:
+                raise ValueError('Input maxsize must be positive')
+        if not isinstance(preload, bool):
+            raise TypeError('Input preload must be boolean')
+
+        self.crosswts_cachedir = cachedir
+        self.crosswts_cache_size = maxsize
+        if not isinstance(self.pairwise_typetag_crosswts_vuf, collections.OrderedDict):
+            self.pairwise_typetag_crosswts_vuf = collections.OrderedDict(self.pairwise_typetag_crosswts_vuf)
+        self._touchCrossWts()
+
+        if preload and (cachedir is not None):
+            for typetag_pair in self.pairwise_typetags:
+                if (maxsize is not None) and (len(self.pairwise_typetag_crosswts_vuf) >= maxsize):
+                    break
+                if typetag_pair in self.pairwise_typetag_crosswts_vuf:
+                    continue
+                if 'auto' in self.pairwise_typetags[typetag_pair]:
+                    label1, label2 = list(self.pairwise_typetags[typetag_pair]['auto'])[0]
+                else:
+                    label1, label2 = list(self.pairwise_typetags[typetag_pair]['cross'])[0]
+                cachefile = os.path.join(cachedir, 'crosswts_{0}.hdf5'.format(self._crossWtsCacheKey(label1, label2)))
+                if self._loadCrossWts(cachefile, typetag_pair):
+                    self._touchCrossWts(typetag_pair)
+
+    ############################################################################ 
+
+    def _touchCrossWts(self, typetag_pair=None):
+
+        """
+        ------------------------------------------------------------------------
+        Marks the typetag pair as the most recently used in attribute 
+        pairwise_typetag_crosswts_vuf and evicts the least recently used 
+        typetag pairs beyond attribute crosswts_cache_size. Not meant to be 
+        accessed directly by the user.
+
+        Inputs:
+
+        typetag_pair [tuple] Typetag pair. If set to None (default), only the
+                     eviction is performed
+        ------------------------------------------------------------------------
+        """
+
+        if typetag_pair in self.pairwise_typetag_crosswts_vuf:
+            self.pairwise_typetag_crosswts_vuf[typetag_pair] = self.pairwise_typetag_crosswts_vuf.pop(typetag_pair)
+        if self.crosswts_cache_size is not None:
+            while len(self.pairwise_typetag_crosswts_vuf) > self.crosswts_cache_size:
+                self.pairwise_typetag_crosswts_vuf.popitem(last=False)
+
+    ############################################################################ 
+
+    def _crossWtsCacheKey(self, label1, label2):
+
+        """
+        ------------------------------------------------------------------------
+        Returns the key identifying the correlated aperture weights of an 
+        antenna pair in the on-disk cache. It is a hash of a key version, the 
+        apertures of the two antennas including the contents of any lookup 
+        table file, whether they are of the same type and are the same 
+        antenna, the grid and the channel frequencies. Not meant to be 
+        accessed directly by the user.
+
+        Inputs:
+
+        label1     [string] Label of first antenna
+
+        label2     [string] Label of second antenna
+
+        Output:
+
+        Hexadecimal string
+        ------------------------------------------------------------------------
+        """
+
+        hashobj = hashlib.sha1()
+        hashobj.update('crosswts-v2|{0}|{1}'.format(self.antennas[label1].typetag == self.antennas[label2].typetag, label1 == label2))
+        for arr in [self.gridu, self.gridv, self.f]:
+            hashobj.update(NP.ascontiguousarray(arr, dtype=NP.float64).tostring())
+        for label in [label1, label2]:
+            aperture = self.antennas[label].aperture
+            for pol in ['P1', 'P2']:
+                hashobj.update('|'.join([repr(aprinfo.get(pol)) for aprinfo in [aperture.kernel_type, aperture.shape, aperture.rmin, aperture.rmax, aperture.xmax, aperture.ymax, aperture.rotangle, aperture.lkpinfo]]))
+                hashobj.update(lookup_file_digest(aperture.lkpinfo.get(pol)))
+        return hashobj.hexdigest()
+
+    ############################################################################ 
+
+    def _saveCrossWts(self, cachefile, typetag_pair):
+
+        """
+        ------------------------------------------------------------------------
+        Saves the correlated aperture weights of a typetag pair in attribute 
+        pairwise_typetag_crosswts_vuf to the on-disk cache. The file is 
+        written under a temporary name and renamed so that concurrent runs 
+        never read a partially written file. Not meant to be accessed 
+        directly by the user.
+
+        Inputs:
+
+        cachefile  [string] Full path to the cache file
+
+        typetag_pair 
+                   [tuple] Typetag pair
+        ------------------------------------------------------------------------
+        """
+
+        cachedir = os.path.dirname(cachefile)
+        if (cachedir != '') and (not os.path.isdir(cachedir)):
+            os.makedirs(cachedir)
+        tmpfile = cachefile + '.{0:0d}.tmp'.format(os.getpid())
+        with h5py.File(tmpfile, 'w') as fileobj:
+            for p in ['P1', 'P2']:
+                spmat = SpM.csr_matrix(self.pairwise_typetag_crosswts_vuf[typetag_pair][p])
+                pol_group = fileobj.create_group(p)
+                pol_group['data'] = spmat.data
+                pol_group['indices'] = spmat.indices
+                pol_group['indptr'] = spmat.indptr
+                pol_group['shape'] = NP.asarray(spmat.shape)
+        os.rename(tmpfile, cachefile)
+
+    ############################################################################ 
+
+    def _loadCrossWts(self, cachefile, typetag_pair):
+
+        """
+        ------------------------------------------------------------------------
+        Loads the correlated aperture weights of a typetag pair from the 
+        on-disk cache into attribute pairwise_typetag_crosswts_vuf with the 
+        current timestamp as the time of last update. Not meant to be 
+        accessed directly by the user.
+
+        Inputs:
+
+        cachefile  [string] Full path to the cache file
+
+        typetag_pair 
+                   [tuple] Typetag pair
+
+        Output:
+
+        Boolean. True if loaded from cache, False if the cache file does not
+        exist
+        ------------------------------------------------------------------------
+        """
+
+        if not os.path.isfile(cachefile):
+            return False
+
+        crosswts = {'last_updated': self.timestamp}
+        with h5py.File(cachefile, 'r') as fileobj:
+            for p in ['P1', 'P2']:
+                crosswts[p] = SpM.csr_matrix((fileobj[p+'/data'].value, fileobj[p+'/indices'].value, fileobj[p+'/indptr'].value), shape=tuple(fileobj[p+'/shape'].value))
+        self.pairwise_typetag_crosswts_vuf[typetag_pair] = crosswts
+
+        return True
+
+    ############################################################################ 
+
     def evalAntennaAutoCorrWts(self, forceeval=False):
 
         """
@@ -12914,7 +16463,7 @@ class AntennaArray(object):
                 for antind, antkey in enumerate(data_info[apol]['labels']):
                     typetag_pair = self.antenna_pair_to_typetag[(antkey,antkey)]
                     list_shape_tuple += [tuple(2*NP.asarray(self.gridu.shape))+(self.f.size,)]
-                    list_sparse_crosswts_vuf += [self.pairwise_typetag_crosswts_vuf[typetag_pair][apol]]
+                    list_sparse_crosswts_vuf += [self.getAntennaPairCorrWts(antkey)[apol]]
                     list_twts += [data_info[apol]['twts'][:,antind,:]]
                     list_acorr_data += [data_info[apol]['data'][:,antind,:]]
                 for qty in ['wts', 'data']:
@@ -12934,13 +16483,14 @@ class AntennaArray(object):
                 progress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Antennas '.format(len(data_info[apol]['labels'])), PGB.ETA()], maxval=len(data_info[apol]['labels'])).start()
                 for antind, antkey in enumerate(data_info[apol]['labels']):
                     typetag_pair = self.antenna_pair_to_typetag[(antkey,antkey)] # auto pair
+                    crosswts_vuf = self.getAntennaPairCorrWts(antkey)[apol]
                     shape_tuple = tuple(2*NP.asarray(self.gridu.shape))+(self.f.size,)
                     if autocorr_wts_cube[apol] is None:
-                        autocorr_wts_cube[apol] = self.pairwise_typetag_crosswts_vuf[typetag_pair][apol].toarray().reshape(shape_tuple)[NP.newaxis,:,:,:] * data_info[apol]['twts'][:,antind,:][:,NP.newaxis,NP.newaxis,:] # nt x nv x nu x nchan
-                        autocorr_data_cube[apol] = self.pairwise_typetag_crosswts_vuf[typetag_pair][apol].toarray().reshape(shape_tuple)[NP.newaxis,:,:,:] * data_info[apol]['twts'][:,antind,:][:,NP.newaxis,NP.newaxis,:] * data_info[apol]['data'][:,antind,:][:,NP.newaxis,NP.newaxis,:] # nt x nv x nu x nchan
+                        autocorr_wts_cube[apol] = crosswts_vuf.toarray().reshape(shape_tuple)[NP.newaxis,:,:,:] * data_info[apol]['twts'][:,antind,:][:,NP.newaxis,NP.newaxis,:] # nt x nv x nu x nchan
+                        autocorr_data_cube[apol] = crosswts_vuf.toarray().reshape(shape_tuple)[NP.newaxis,:,:,:] * data_info[apol]['twts'][:,antind,:][:,NP.newaxis,NP.newaxis,:] * data_info[apol]['data'][:,antind,:][:,NP.newaxis,NP.newaxis,:] # nt x nv x nu x nchan
                     else:
-                        autocorr_wts_cube[apol] += self.pairwise_typetag_crosswts_vuf[typetag_pair][apol].toarray().reshape(shape_tuple)[NP.newaxis,:,:,:] * data_info[apol]['twts'][:,antind,:][:,NP.newaxis,NP.newaxis,:] # nt x nv x nu x nchan
-                        autocorr_data_cube[apol] += self.pairwise_typetag_crosswts_vuf[typetag_pair][apol].toarray().reshape(shape_tuple)[NP.newaxis,:,:,:] * data_info[apol]['twts'][:,antind,:][:,NP.newaxis,NP.newaxis,:] * data_info[apol]['data'][:,antind,:][:,NP.newaxis,NP.newaxis,:] # nt x nv x nu x nchan
+                        autocorr_wts_cube[apol] += crosswts_vuf.toarray().reshape(shape_tuple)[NP.newaxis,:,:,:] * data_info[apol]['twts'][:,antind,:][:,NP.newaxis,NP.newaxis,:] # nt x nv x nu x nchan
+                        autocorr_data_cube[apol] += crosswts_vuf.toarray().reshape(shape_tuple)[NP.newaxis,:,:,:] * data_info[apol]['twts'][:,antind,:][:,NP.newaxis,NP.newaxis,:] * data_info[apol]['data'][:,antind,:][:,NP.newaxis,NP.newaxis,:] # nt x nv x nu x nchan
                     progress.update(antind+1)
                 progress.finish()
             sum_wts = NP.sum(data_info[apol]['twts'], axis=1) # nt x 1
@@ -13004,10 +16554,12 @@ class AntennaArray(object):
             for typetag_pair in self.pairwise_typetags:
                 if 'cross' in self.pairwise_typetags[typetag_pair]:
                     n_bl = len(self.pairwise_typetags[typetag_pair]['cross'])
+                    label1, label2 = list(self.pairwise_typetags[typetag_pair]['cross'] or self.pairwise_typetags[typetag_pair]['auto'])[0]
+                    crosswts_vuf = self.getAntennaPairCorrWts(label1, label2=label2)[apol]
                     if centered_crosscorr_wts_cube[apol] is None:
-                        centered_crosscorr_wts_cube[apol] = n_bl * self.pairwise_typetag_crosswts_vuf[typetag_pair][apol]
+                        centered_crosscorr_wts_cube[apol] = n_bl * crosswts_vuf
                     else:
-                        centered_crosscorr_wts_cube[apol] += n_bl * self.pairwise_typetag_crosswts_vuf[typetag_pair][apol]
+                        centered_crosscorr_wts_cube[apol] += n_bl * crosswts_vuf
 
         return centered_crosscorr_wts_cube
                     
@@ -13112,9 +16664,7 @@ class AntennaArray(object):
             label1, label2 = label_tuple
             typetag_tuple = self.antenna_pair_to_typetag[label_tuple]
 
-        if typetag_tuple not in self.pairwise_typetag_crosswts_vuf:
-            self.evalAntennaPairCorrWts(label1, label2=label2)
-        centered_crosscorr_wts_vuf = self.pairwise_typetag_crosswts_vuf[typetag_tuple]
+        centered_crosscorr_wts_vuf = self.getAntennaPairCorrWts(label1, label2=label2)
 
         du = self.gridu[0,1] - self.gridu[0,0]
         dv = self.gridv[1,0] - self.gridv[0,0]
@@ -13455,6 +17005,19 @@ class AntennaArray(object):
         ------------------------------------------------------------------------
         """
 
+        if self.columnar is not None:
+            cdata = self.columnar
+            if verify:
+                cdata['flags_current'] |= NP.any(NP.isnan(cdata['Ef_current']), axis=1)
+            if dictflags is not None:
+                if not isinstance(dictflags, dict):
+                    raise TypeError('Input parameter dictflags must be a dictionary')
+                for label in dictflags:
+                    if label in cdata['index']:
+                        self.antennas[label].antpol.update_flags(flags=dictflags[label], verify=True)
+            self._pushColumnar(stack=stack)
+            return
+
         for label in self.antennas:
             self.antennas[label].update_flags(stack=stack, verify=verify)
 
@@ -13468,6 +17031,65 @@ class AntennaArray(object):
 
     ############################################################################
 
+    def _sharedFT(self, antenna_updates, nproc=None):
+
+        """
+        ------------------------------------------------------------------------
+        Fourier transforms the electric field time series in a list of 
+        antenna updates in the worker processes of attribute pool. The time 
+        series are placed in a shared memory array and ranges of antennas 
+        are transformed in place. Not meant to be accessed directly by the 
+        user.
+
+        Inputs:
+
+        antenna_updates
+                   [list] Dictionaries of antenna updates with key 'Et'. Read
+                   docstring of member function update()
+
+        nproc      [integer] Number of worker processes. Read docstring of 
+                   member function update()
+
+        Output:
+
+        List of antenna updates in which the updates with time series carry 
+        the spectra of both polarizations under key 'Ef' (unless already 
+        specified there), so that they are not Fourier transformed again by
+        member function update() of class Antenna. Updates are left as they
+        are if the time series differ in length
+        ------------------------------------------------------------------------
+        """
+
+        indices = [i for i,dictitem in enumerate(antenna_updates) if isinstance(dictitem['Et'], dict)]
+        if len(indices) == 0:
+            return antenna_updates
+        list_of_Et = []
+        for i in indices:
+            antpol = self.antennas[antenna_updates[i]['label']].antpol
+            list_of_Et += [[NP.asarray(antenna_updates[i]['Et'].get(pol, antpol.Et[pol])).ravel() for pol in ['P1', 'P2']]]
+        nsamples = list_of_Et[0][0].size
+        if any([Et.size != nsamples for item in list_of_Et for Et in item]):
+            return antenna_updates
+
+        pool = self._getPool(nproc=nproc)
+        Et = pool.allocate('Et', (len(indices), nsamples, 2), NP.complex128)
+        Ef = pool.allocate('Ef', (len(indices), 2*nsamples, 2), NP.complex128)
+        for ai,item in enumerate(list_of_Et):
+            for pi in range(2):
+                Et[ai,:,pi] = item[pi]
+        pool.map(shared_antenna_FT_arg_splitter, pool.ranges(len(indices)))
+        Ef = NP.copy(Ef) # Shared array is overwritten by the next call
+
+        antenna_updates = list(antenna_updates)
+        for ai,i in enumerate(indices):
+            spectra = {pol: Ef[ai,:,pi] for pi,pol in enumerate(['P1', 'P2'])}
+            if isinstance(antenna_updates[i]['Ef'], dict):
+                spectra.update(antenna_updates[i]['Ef'])
+            antenna_updates[i] = dict(antenna_updates[i], Ef=spectra)
+        return antenna_updates
+
+    ############################################################################
+
     def update(self, updates=None, parallel=False, nproc=None, verbose=False):
 
         """
@@ -13671,7 +17293,12 @@ class AntennaArray(object):
                                               lookup table. 
 
         parallel   [boolean] specifies if parallelization is to be invoked. 
-                   False (default) means only serial processing
+                   False (default) means only serial processing. In parallel
+                   processing, the time series in the antenna updates are 
+                   placed in a shared memory array and Fourier transformed in
+                   the worker processes of attribute pool. The rest of the 
+                   updates are applied in this process, so that antennas are
+                   not sent between processes
 
         nproc      [integer] specifies number of independent processes to spawn.
                    Default = None, means automatically determines the number of 
@@ -13696,9 +17323,10 @@ class AntennaArray(object):
             if 'antennas' in updates: # contains updates at level of individual antennas
                 if not isinstance(updates['antennas'], list):
                     updates['antennas'] = [updates['antennas']]
+                if self.columnar is not None:
+                    columnar_stack = False
                 if parallel:
                     list_of_antenna_updates = []
-                    list_of_antennas = []
 
                 for dictitem in updates['antennas']:
                     if not isinstance(dictitem, dict):
@@ -13756,8 +17384,9 @@ class AntennaArray(object):
                             
                             if not parallel:
                                 self.antennas[dictitem['label']].update(dictitem, verbose)
+                                if self.columnar is not None:
+                                    columnar_stack = columnar_stack or dictitem['stack']
                             else:
-                                list_of_antennas += [self.antennas[dictitem['label']]]
                                 list_of_antenna_updates += [dictitem]
 
                             if 'grid_action' in dictitem:
@@ -13766,19 +17395,14 @@ class AntennaArray(object):
                         raise ValueError('Update action should be set to "add", "remove" or "modify".')
 
                 if parallel:
-                    if nproc is None:
-                        nproc = max(MP.cpu_count()-1, 1) 
-                    else:
-                        nproc = min(nproc, max(MP.cpu_count()-1, 1))
-                    pool = MP.Pool(processes=nproc)
-                    updated_antennas = pool.map(unwrap_antenna_update, IT.izip(list_of_antennas, list_of_antenna_updates))
-                    pool.close()
-                    pool.join()
-
-                    # Necessary to make the returned and updated antennas current, otherwise they stay unrelated
-                    for antenna in updated_antennas: 
-                        self.antennas[antenna.label] = antenna
-                    del updated_antennas
+                    for dictitem in self._sharedFT(list_of_antenna_updates, nproc=nproc):
+                        self.antennas[dictitem['label']].update(dictitem, verbose)
+                        if self.columnar is not None:
+                            columnar_stack = columnar_stack or dictitem['stack']
+
+                if self.columnar is not None:
+                    if columnar_stack:
+                        self._pushColumnar(stack=True)
                     
             if 'antenna_array' in updates: # contains updates at 'antenna array' level
                 if not isinstance(updates['antenna_array'], dict):
@@ -13787,6 +17411,8 @@ class AntennaArray(object):
                 if 'timestamp' in updates['antenna_array']:
                     self.timestamp = updates['antenna_array']['timestamp']
                     self.timestamps += [copy.deepcopy(self.timestamp)] # Stacks new timestamp
+                    if self.stack_depth is not None:
+                        del self.timestamps[:-self.stack_depth]
 
                 if 'do_grid' in updates['antenna_array']:
                     if isinstance(updates['antenna_array']['do_grid'], boolean):
@@ -6,6 +6,7 @@ from astropy.time import TimeDelta
 from astropy.coordinates import SkyCoord
 from astropy.coordinates import FK5
 import time
+import threading, Queue
 import h5py
 import progressbar as PGB
 import warnings
@@ -620,8 +621,13 @@ class DataContainer(object):
                             init_parms[ekey] = {}
                             for pol in fileobj[dpkey][ekey]:
                                 init_parms[ekey][pol] = {}
-                                for qty in ['real', 'imag']:
-                                    init_parms[ekey][pol][qty] = fileobj[dpkey][ekey][pol][qty].value
+                                if 'complex' in fileobj[dpkey][ekey][pol]:
+                                    cdata = fileobj[dpkey][ekey][pol]['complex'].value
+                                    init_parms[ekey][pol]['real'] = cdata.real
+                                    init_parms[ekey][pol]['imag'] = cdata.imag
+                                else:
+                                    for qty in ['real', 'imag']:
+                                        init_parms[ekey][pol][qty] = fileobj[dpkey][ekey][pol][qty].value
         self.load_parms(inp_parms=init_parms)
 
         n_noninit_E_vals = [0, 0] # For Ef and Et respectively
@@ -706,13 +712,29 @@ class DataContainer(object):
 
     ############################################################################
 
-    def save(self, outfile, overwrite=False, compress=True, compress_format='gzip', compress_opts=9):
+    def save(self, outfile, overwrite=False, compress=True, compress_format='gzip', compress_opts=9, layout='split', chunk_ntimes=1):
 
         try:
             outfile
         except NameError:
             raise NameError('outfile not specified')
 
+        if layout not in ['split', 'complex']:
+            raise ValueError('Input layout must be set to "split" or "complex"')
+        if not isinstance(chunk_ntimes, int):
+            raise TypeError('Input chunk_ntimes must be an integer')
+        if chunk_ntimes < 1:
+            raise ValueError('Input chunk_ntimes must be positive')
+        if compress:
+            if compress_format not in ['gzip', 'lzf']:
+                raise ValueError('Input compress_format must be set to "gzip" or "lzf"')
+            dset_kwargs = {'compression': compress_format}
+            if compress_format == 'gzip':
+                dset_kwargs['compression_opts'] = compress_opts
+        else:
+            dset_kwargs = {}
+        chunks = (min(chunk_ntimes, self.ntimes), self.nant, self.nchan)
+
         filename = outfile + '.hdf5'
 
         if overwrite:
@@ -758,14 +780,16 @@ class DataContainer(object):
                 if self.datatype[key]:
                     for pol in self.pol:
                         dgroup = data_group.create_group('{0}/{1}'.format(key, pol))
-                        for qty in ['real', 'imag']:
-                            if compress:
-                                if compress_format == 'gzip':
-                                    dset = dgroup.create_dataset(qty, data=getattr(self, key)[pol][qty], chunks=(1,self.nant,self.nchan), compression=compress_format, compression_opts=compress_opts)
-                                elif compress_format == 'lzf':
-                                    dset = dgroup.create_dataset(qty, data=getattr(self, key)[pol][qty], chunks=(1,self.nant,self.nchan), compression=compress_format)
-                            else:
-                                dset = dgroup.create_dataset(qty, data=getattr(self, key)[pol][qty], chunks=(1,self.nant,self.nchan))
+                        dgroup.attrs['layout'] = layout
+                        if layout == 'complex':
+                            cdata = NP.empty((self.ntimes, self.nant, self.nchan), dtype=NP.complex64)
+                            cdata.real = getattr(self, key)[pol]['real']
+                            cdata.imag = getattr(self, key)[pol]['imag']
+                            qtydata = {'complex': cdata}
+                        else:
+                            qtydata = getattr(self, key)[pol]
+                        for qty in sorted(qtydata.keys()):
+                            dset = dgroup.create_dataset(qty, data=qtydata[qty], chunks=chunks, **dset_kwargs)
                             dset.dims[0].label = 'time'
                             dset.dims[1].label = 'antenna'
                             if key == 'Ef':
@@ -792,14 +816,714 @@ class DataStreamer(object):
                 for p in pol:
                     if p in fileobj['data/{0}'.format(datatype)]:
                         self.data[p] = {}
-                        for qty in ['real', 'imag']:
-                            self.data[p][qty] = fileobj['data/{0}/{1}/{2}'.format(datatype, p, qty)][tindx,:,:]
+                        dgroup = fileobj['data/{0}/{1}'.format(datatype, p)]
+                        if 'complex' in dgroup:
+                            cdata = dgroup['complex'][tindx,:,:]
+                            self.data[p]['real'] = cdata.real
+                            self.data[p]['imag'] = cdata.imag
+                        else:
+                            for qty in ['real', 'imag']:
+                                self.data[p][qty] = dgroup[qty][tindx,:,:]
                 ant_parms = ['ant_labels', 'ant_id', 'antpos']
                 for aparm in ant_parms:
                     self.antinfo[aparm] = fileobj['antenna_parms/{0}'.format(aparm)].value
             else:
                 raise KeyError('Datatype {0} not found in datafile {1}'.format(datatype, datafile))
 
+#################################################################################
+
+class BlockDataStreamer(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to stream electric field data from a file written by member 
+    function save() of class DataContainer, one timestamp at a time. The 
+    file is kept open, the antenna information is read only once and the 
+    data is read in blocks of timestamps aligned with the chunks of the
+    datasets. Files that are still being written by class DataStreamWriter
+    can be followed in SWMR (single writer multiple reader) mode.
+
+    Attributes:
+
+    datafile    [string] Name of the HDF5 file containing the data
+
+    datatype    [string] Type of data streamed. Accepted values are 'Ef' and
+                'Et'
+
+    pol         [list] Polarizations streamed
+
+    ntimes      [integer] Number of timestamps in the file. In SWMR mode, 
+                it is the number of timestamps written so far
+
+    timestamps  [numpy array] Timestamps of the ntimes snapshots
+
+    swmr        [boolean] If True, the file is read in SWMR mode
+
+    timeout     [scalar] Time (in seconds) to wait in SWMR mode for a 
+                timestamp that has not been written yet. If None, no wait
+
+    blocksize   [integer] Number of timestamps read together in a block. 
+                Always a multiple of the chunk size along the time axis
+
+    antinfo     [dictionary] Antenna information under keys 'ant_labels',
+                'ant_id' and 'antpos'
+
+    layout      [dictionary] Storage layout of the data for each 
+                polarization, detected from the file. 'split' denotes 
+                separate 'real' and 'imag' datasets and 'complex' denotes a 
+                single complex64 dataset as written by DataContainer.save()
+                with layout='complex'
+
+    data        [dictionary] Complex data of the most recently loaded 
+                timestamp with polarizations as keys. Under each key is a 
+                complex64 numpy array of shape nant x nchan
+
+    tindx       [integer] Index of the most recently loaded timestamp
+
+    Member functions:
+
+    __init__()  Open the data file and read the antenna information
+
+    refresh()   Update the number of timestamps and the timestamps in SWMR
+                mode
+
+    load()      Load the data of a timestamp from the current block, reading
+                a new block if required
+
+    iterate()   Generator over timestamps yielding the complex data 
+
+    close()     Close the data file
+
+    Read the member function docstrings for more details
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, datafile, datatype='Ef', pol=None, blocksize=16,
+                 swmr=False, timeout=None):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the BlockDataStreamer class
+
+        Inputs:
+
+        datafile    [string] Name of the HDF5 file written by member function
+                    save() of class DataContainer
+
+        datatype    [string] Type of data to be streamed. Accepted values are
+                    'Ef' (default) and 'Et'
+
+        pol         [string or list] Polarization(s) to be streamed. Default
+                    (None) streams all the polarizations in the file
+
+        blocksize   [integer] Minimum number of timestamps to be read in one
+                    block. It is rounded up to a multiple of the chunk size 
+                    of the datasets along the time axis. Default=16
+
+        swmr        [boolean] If set to True, the file is opened in SWMR mode 
+                    so that it can be read while it is being written by an
+                    instance of class DataStreamWriter. Default=False
+
+        timeout     [scalar] Time (in seconds) to wait in SWMR mode for a 
+                    timestamp that has not been written yet, before raising 
+                    an IndexError. If set to None (default), there is no wait
+        ------------------------------------------------------------------------
+        """
+
+        if not isinstance(datafile, basestring):
+            raise TypeError('Input datafile must be a string')
+        if datatype not in ['Ef', 'Et']:
+            raise ValueError('Input datatype must be set to "Ef" or "Et"')
+        if not isinstance(blocksize, int):
+            raise TypeError('Input blocksize must be an integer')
+        if blocksize < 1:
+            raise ValueError('Input blocksize must be positive')
+        if not isinstance(swmr, bool):
+            raise TypeError('Input swmr must be a boolean')
+        if timeout is not None:
+            if not isinstance(timeout, (int,float)):
+                raise TypeError('Input timeout must be a scalar')
+            if timeout < 0.0:
+                raise ValueError('Input timeout must not be negative')
+
+        self.datafile = datafile
+        self.datatype = datatype
+        self.swmr = swmr
+        self.timeout = timeout
+        if swmr:
+            self.fileobj = h5py.File(datafile, 'r', swmr=True)
+        else:
+            self.fileobj = h5py.File(datafile, 'r')
+        if 'data/{0}'.format(datatype) not in self.fileobj:
+            self.close()
+            raise KeyError('Datatype {0} not found in datafile {1}'.format(datatype, datafile))
+
+        dgroup = self.fileobj['data/{0}'.format(datatype)]
+        if pol is None:
+            pol = dgroup.keys()
+        elif isinstance(pol, str):
+            pol = [pol]
+        self.pol = [p for p in pol if p in dgroup]
+
+        self.antinfo = {}
+        for aparm in ['ant_labels', 'ant_id', 'antpos']:
+            self.antinfo[aparm] = self.fileobj['antenna_parms/{0}'.format(aparm)].value
+
+        self.layout = {}
+        self.dsets = {}
+        for p in self.pol:
+            if 'complex' in dgroup[p]:
+                self.layout[p] = 'complex'
+                self.dsets[p] = {'complex': dgroup['{0}/complex'.format(p)]}
+            else:
+                self.layout[p] = 'split'
+                self.dsets[p] = {qty: dgroup['{0}/{1}'.format(p, qty)] for qty in ['real', 'imag']}
+        dset = self.dsets[self.pol[0]].values()[0]
+        if dset.chunks is None:
+            tchunk = 1
+        else:
+            tchunk = dset.chunks[0]
+        self.blocksize = int(NP.ceil(blocksize / float(tchunk))) * tchunk
+
+        self.block = {}
+        self.block_start = None
+        self.block_stop = None
+        self.data = {}
+        self.tindx = None
+
+        self.ntimes = 0
+        self.timestamps = NP.zeros(0, dtype=NP.float64)
+        self.refresh()
+
+    ############################################################################
+
+    def __enter__(self):
+        return self
+
+    ############################################################################
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    ############################################################################
+
+    def refresh(self):
+
+        """
+        ------------------------------------------------------------------------
+        Update the number of timestamps available and the timestamps. In SWMR
+        mode, the datasets are refreshed first and the number of timestamps is
+        taken from the header which the writer updates only after the data 
+        of the snapshots are flushed
+
+        Output:
+
+        Number of timestamps available
+        ------------------------------------------------------------------------
+        """
+
+        dsets = [dset for p in self.pol for dset in self.dsets[p].values()]
+        ntimes = min([dset.shape[0] for dset in dsets])
+        if self.swmr:
+            for dset in dsets:
+                dset.refresh()
+            ntimes = min([dset.shape[0] for dset in dsets])
+            if 'header/ntimes' in self.fileobj:
+                self.fileobj['header/ntimes'].refresh()
+                ntimes = min(ntimes, int(self.fileobj['header/ntimes'][()]))
+        if 'temporal_info/timestamps' in self.fileobj:
+            tdset = self.fileobj['temporal_info/timestamps']
+            if self.swmr:
+                tdset.refresh()
+            ntimes = min(ntimes, tdset.shape[0])
+            if ntimes != self.timestamps.size:
+                self.timestamps = NP.asarray(tdset[:ntimes], dtype=NP.float64)
+        if (self.block_start is not None) and (self.block_stop < min(self.block_start + self.blocksize, ntimes)):
+            self.block_start = None # Current block has grown
+        self.ntimes = ntimes
+        return self.ntimes
+
+    ############################################################################
+
+    def _readBlock(self, tindx):
+
+        """
+        ------------------------------------------------------------------------
+        Read the block of timestamps containing the given timestamp index into
+        complex64 arrays of shape n_times x nant x nchan
+        ------------------------------------------------------------------------
+        """
+
+        start = (tindx // self.blocksize) * self.blocksize
+        stop = min(start + self.blocksize, self.ntimes)
+        for p in self.pol:
+            if self.layout[p] == 'complex':
+                self.block[p] = NP.asarray(self.dsets[p]['complex'][start:stop,:,:], dtype=NP.complex64)
+            else:
+                real = self.dsets[p]['real']
+                blk = NP.empty((stop-start,)+real.shape[1:], dtype=NP.complex64)
+                blk.real = real[start:stop,:,:]
+                blk.imag = self.dsets[p]['imag'][start:stop,:,:]
+                self.block[p] = blk
+        self.block_start = start
+        self.block_stop = stop
+
+    ############################################################################
+
+    def load(self, tindx, pol=None):
+
+        """
+        ------------------------------------------------------------------------
+        Load the data of a timestamp into attribute data, reading the block 
+        of timestamps containing it if it is not the current block
+
+        Inputs:
+
+        tindx       [integer] Index of the timestamp
+
+        pol         [string or list] Polarization(s) to be loaded. Default
+                    (None) loads all the polarizations streamed
+
+        Output:
+
+        Attribute data, a dictionary with polarizations as keys holding 
+        complex64 arrays of shape nant x nchan. The arrays are views into
+        the current block and must be copied if they are to be modified. 
+        In SWMR mode, a timestamp not written yet is waited for up to 
+        attribute timeout
+        ------------------------------------------------------------------------
+        """
+
+        if not isinstance(tindx, (int, NP.integer)):
+            raise TypeError('Input tindx must be an integer')
+        if tindx < 0:
+            tindx += self.ntimes
+        if self.swmr and (tindx >= self.ntimes):
+            waitstart = time.time()
+            while self.refresh() <= tindx:
+                if (self.timeout is None) or (time.time() - waitstart > self.timeout):
+                    break
+                time.sleep(0.1)
+        if (tindx < 0) or (tindx >= self.ntimes):
+            raise IndexError('Input tindx out of range')
+        if pol is None:
+            pol = self.pol
+        elif isinstance(pol, str):
+            pol = [pol]
+
+        if (self.block_start is None) or (tindx < self.block_start) or (tindx >= self.block_stop):
+            self._readBlock(tindx)
+        self.data = {p: self.block[p][tindx-self.block_start] for p in pol if p in self.block}
+        self.tindx = tindx
+        return self.data
+
+    ############################################################################
+
+    def iterate(self, tstart=0, tstop=None):
+
+        """
+        ------------------------------------------------------------------------
+        Generator over timestamps yielding tuples (tindx, data) where data is
+        the attribute data after loading timestamp index tindx
+
+        Inputs:
+
+        tstart      [integer] Index of the first timestamp. Default=0
+
+        tstop       [integer] Index one beyond the last timestamp. Default
+                    (None) streams up to the last timestamp in the file. In 
+                    SWMR mode, timestamps up to tstop are waited for as in 
+                    member function load()
+        ------------------------------------------------------------------------
+        """
+
+        if tstop is None:
+            tstop = self.ntimes
+        elif not self.swmr:
+            tstop = min(tstop, self.ntimes)
+        for tindx in xrange(tstart, tstop):
+            yield (tindx, self.load(tindx))
+
+    ############################################################################
+
+    def close(self):
+
+        """
+        ------------------------------------------------------------------------
+        Close the data file and release the current block
+        ------------------------------------------------------------------------
+        """
+
+        if self.fileobj is not None:
+            self.fileobj.close()
+            self.fileobj = None
+        self.block = {}
+        self.block_start = None
+        self.block_stop = None
+
+#################################################################################
+
+class DataStreamWriter(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to write electric field data to a HDF5 file in the layout of member
+    function save() of class DataContainer by appending blocks of snapshots 
+    as they are produced. The datasets are chunked along time and extended 
+    on every append, and the writing is done by a background thread so that
+    the producer does not wait for the disk. The header entry 'ntimes' holds
+    the number of snapshots written so far and is updated after their data.
+    In SWMR (single writer multiple reader) mode the file can be read by 
+    class BlockDataStreamer while it is being written.
+
+    Attributes:
+
+    filename    [string] Name of the HDF5 file
+
+    datatypes   [list] Types of data written. Accepted values are 'Ef' and 
+                'Et'
+
+    pol         [list] Polarizations written
+
+    nant        [integer] Number of antennas
+
+    nchan       [integer] Number of frequency channels
+
+    ntimes      [integer] Number of snapshots written to the file so far
+
+    layout      [string] Storage layout of the data. 'split' denotes 
+                separate 'real' and 'imag' float32 datasets and 'complex' a
+                single complex64 dataset
+
+    swmr        [boolean] If True, the file is written in SWMR mode
+
+    Member functions:
+
+    __init__()  Create the file with the header and empty data sets and 
+                start the writer thread
+
+    write()     Queue a block of snapshots to be appended to the file
+
+    flush()     Wait until all the queued snapshots are written
+
+    close()     Write the remaining snapshots and close the file
+
+    Read the member function docstrings for more details
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, outfile, hdr_parms, datatypes=['Ef'], layout='complex',
+                 compress_format=None, compress_opts=4, chunk_ntimes=16,
+                 ntimes_total=None, overwrite=False, swmr=True, queuesize=4):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the DataStreamWriter class
+
+        Inputs:
+
+        outfile     [string] Name of the output file. The extension '.hdf5'
+                    is appended
+
+        hdr_parms   [dictionary] Header information with the following keys
+                    as described in class DataContainer: 'f0', 'ant_labels',
+                    'ant_id', 'antpos', 'pol', 'f', 'df', 'bw', 'dT', 'dts'
+                    and optionally 'cable_delays' (zeros if absent)
+
+        datatypes   [list] Types of data to be written. Accepted values are 
+                    'Ef' and 'Et'. Default=['Ef']
+
+        layout      [string] Storage layout. Accepted values are 'complex' 
+                    (default) and 'split'
+
+        compress_format
+                    [string] Compression of the datasets. Accepted values are
+                    'gzip', 'lzf' and None (default, no compression)
+
+        compress_opts
+                    [integer] Compression level if compress_format is 'gzip'.
+                    Default=4
+
+        chunk_ntimes
+                    [integer] Number of snapshots in a chunk of the datasets.
+                    Default=16
+
+        ntimes_total
+                    [integer] Number of snapshots expected to be written. It 
+                    is recorded in the header under 'ntimes_total' so that 
+                    readers of a file being written know how many to expect.
+                    Default=None (unknown)
+
+        overwrite   [boolean] If True, overwrite an existing file. Default=False
+
+        swmr        [boolean] If True (default), the file is written in SWMR 
+                    mode
+
+        queuesize   [integer] Number of blocks of snapshots that can be queued
+                    for writing before write() blocks. Default=4
+        ------------------------------------------------------------------------
+        """
+
+        if not isinstance(outfile, basestring):
+            raise TypeError('Input outfile must be a string')
+        if not isinstance(hdr_parms, dict):
+            raise TypeError('Input hdr_parms must be a dictionary')
+        for key in ['f0', 'ant_labels', 'ant_id', 'antpos', 'pol', 'f', 'df', 'bw', 'dT', 'dts']:
+            if key not in hdr_parms:
+                raise KeyError('Key {0} not found in input hdr_parms'.format(key))
+        if not isinstance(datatypes, list):
+            raise TypeError('Input datatypes must be a list')
+        if (len(datatypes) == 0) or (not all([dtype in ['Ef', 'Et'] for dtype in datatypes])):
+            raise ValueError('Input datatypes must contain "Ef" and/or "Et"')
+        if layout not in ['split', 'complex']:
+            raise ValueError('Input layout must be set to "split" or "complex"')
+        if compress_format not in [None, 'gzip', 'lzf']:
+            raise ValueError('Input compress_format must be set to "gzip", "lzf" or None')
+        if not isinstance(chunk_ntimes, int):
+            raise TypeError('Input chunk_ntimes must be an integer')
+        if chunk_ntimes < 1:
+            raise ValueError('Input chunk_ntimes must be positive')
+        if ntimes_total is not None:
+            if not isinstance(ntimes_total, int):
+                raise TypeError('Input ntimes_total must be an integer')
+            if ntimes_total < 1:
+                raise ValueError('Input ntimes_total must be positive')
+        if not isinstance(queuesize, int):
+            raise TypeError('Input queuesize must be an integer')
+        if queuesize < 1:
+            raise ValueError('Input queuesize must be positive')
+
+        self.filename = outfile + '.hdf5'
+        self.datatypes = sorted(datatypes)
+        self.pol = list(hdr_parms['pol'])
+        self.nant = len(hdr_parms['ant_labels'])
+        self.nchan = NP.asarray(hdr_parms['f']).size
+        self.ntimes = 0
+        self.layout = layout
+        self.swmr = swmr
+
+        dset_kwargs = {}
+        if compress_format is not None:
+            dset_kwargs['compression'] = compress_format
+            if compress_format == 'gzip':
+                dset_kwargs['compression_opts'] = compress_opts
+
+        if overwrite:
+            write_str = 'w'
+        else:
+            write_str = 'w-'
+        if swmr:
+            self.fileobj = h5py.File(self.filename, write_str, libver='latest')
+        else:
+            self.fileobj = h5py.File(self.filename, write_str)
+
+        hdr_group = self.fileobj.create_group('header')
+        hdr_group.create_dataset('ntimes', data=0, dtype=NP.int64)
+        if ntimes_total is not None:
+            hdr_group['ntimes_total'] = ntimes_total
+        hdr_group['nant'] = self.nant
+        hdr_group['nchan'] = self.nchan
+        hdr_group['npol'] = len(self.pol)
+        for key, units in [('f0', 'Hz'), ('df', 'Hz'), ('bw', 'Hz'), ('dT', 's'), ('dts', 's')]:
+            hdr_group[key] = hdr_parms[key]
+            hdr_group[key].attrs['units'] = units
+        hdr_group['pol'] = hdr_parms['pol']
+        ant_group = self.fileobj.create_group('antenna_parms')
+        ant_group['ant_id'] = hdr_parms['ant_id']
+        ant_group['ant_labels'] = hdr_parms['ant_labels']
+        ant_group['antpos'] = hdr_parms['antpos']
+        ant_group['antpos'].attrs['units'] = 'm'
+        ant_group['antpos'].attrs['coords'] = 'ENU'
+        cdgroup = ant_group.create_group('cable_delays')
+        for pol in self.pol:
+            if ('cable_delays' in hdr_parms) and (pol in hdr_parms['cable_delays']):
+                cddset = cdgroup.create_dataset(pol, data=hdr_parms['cable_delays'][pol])
+            else:
+                cddset = cdgroup.create_dataset(pol, data=NP.zeros(self.nant))
+            cddset.attrs['units'] = 's'
+        spec_group = self.fileobj.create_group('spectral_info')
+        spec_group['f'] = hdr_parms['f']
+        spec_group['f'].attrs['units'] = 'Hz'
+        time_group = self.fileobj.create_group('temporal_info')
+        tdset = time_group.create_dataset('timestamps', shape=(0,), maxshape=(None,), chunks=(chunk_ntimes,), dtype=NP.float64)
+        tdset.attrs['units'] = 's'
+
+        self.dsets = {}
+        data_group = self.fileobj.create_group('data')
+        for key in self.datatypes:
+            self.dsets[key] = {}
+            for pol in self.pol:
+                dgroup = data_group.create_group('{0}/{1}'.format(key, pol))
+                dgroup.attrs['layout'] = layout
+                if layout == 'complex':
+                    qtys = [('complex', NP.complex64)]
+                else:
+                    qtys = [('imag', NP.float32), ('real', NP.float32)]
+                self.dsets[key][pol] = {}
+                for qty, qtytype in qtys:
+                    dset = dgroup.create_dataset(qty, shape=(0,self.nant,self.nchan), maxshape=(None,self.nant,self.nchan), chunks=(chunk_ntimes,self.nant,self.nchan), dtype=qtytype, **dset_kwargs)
+                    dset.dims[0].label = 'time'
+                    dset.dims[1].label = 'antenna'
+                    if key == 'Ef':
+                        dset.dims[2].label = 'frequency'
+                    else:
+                        dset.dims[2].label = 'lag'
+                    self.dsets[key][pol][qty] = dset
+        if swmr:
+            self.fileobj.swmr_mode = True
+        self.fileobj.flush()
+
+        self._error = None
+        self._queue = Queue.Queue(maxsize=queuesize)
+        self._thread = threading.Thread(target=self._run, name='DataStreamWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    ############################################################################
+
+    def __enter__(self):
+        return self
+
+    ############################################################################
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    ############################################################################
+
+    def _run(self):
+
+        """
+        ------------------------------------------------------------------------
+        Main loop of the writer thread. Errors are recorded and raised in the
+        calling thread by the next call to write(), flush() or close()
+        ------------------------------------------------------------------------
+        """
+
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                if self._error is None:
+                    self._append(*item)
+            except Exception as err:
+                self._error = err
+            finally:
+                self._queue.task_done()
+
+    ############################################################################
+
+    def _append(self, data, timestamps):
+
+        """
+        ------------------------------------------------------------------------
+        Append a block of snapshots to the datasets and then update the 
+        timestamps and the number of snapshots in the header
+        ------------------------------------------------------------------------
+        """
+
+        tstart = self.ntimes
+        tstop = tstart + timestamps.size
+        for key in self.datatypes:
+            for pol in self.pol:
+                for qty, dset in self.dsets[key][pol].iteritems():
+                    dset.resize(tstop, axis=0)
+                    if qty == 'complex':
+                        dset[tstart:tstop,:,:] = data[key][pol]
+                    else:
+                        dset[tstart:tstop,:,:] = getattr(data[key][pol], qty)
+                    if self.swmr:
+                        dset.flush()
+        tdset = self.fileobj['temporal_info/timestamps']
+        tdset.resize(tstop, axis=0)
+        tdset[tstart:tstop] = timestamps
+        self.fileobj['header/ntimes'][()] = tstop
+        if self.swmr:
+            tdset.flush()
+            self.fileobj['header/ntimes'].flush()
+        self.ntimes = tstop
+
+    ############################################################################
+
+    def _raise(self):
+        if self._error is not None:
+            err = self._error
+            self._error = None
+            raise err
+
+    ############################################################################
+
+    def write(self, data, timestamps):
+
+        """
+        ------------------------------------------------------------------------
+        Queue a block of snapshots to be appended to the file by the writer
+        thread. Blocks only if the queue is full
+
+        Inputs:
+
+        data        [dictionary] Data under the keys in attribute datatypes.
+                    Under each of these keys is a dictionary with the 
+                    polarizations in attribute pol as keys holding complex 
+                    numpy arrays of shape ntimes x nant x nchan. The arrays 
+                    must not be modified after they are queued
+
+        timestamps  [list or numpy array] Timestamps of the ntimes snapshots
+        ------------------------------------------------------------------------
+        """
+
+        self._raise()
+        if self.fileobj is None:
+            raise ValueError('File already closed')
+        if not isinstance(data, dict):
+            raise TypeError('Input data must be a dictionary')
+        timestamps = NP.asarray(timestamps, dtype=NP.float64).reshape(-1)
+        for key in self.datatypes:
+            if key not in data:
+                raise KeyError('Datatype {0} not found in input data'.format(key))
+            for pol in self.pol:
+                if pol not in data[key]:
+                    raise KeyError('Polarization {0} not found in input data[{1}]'.format(pol, key))
+                if data[key][pol].shape != (timestamps.size, self.nant, self.nchan):
+                    raise ValueError('Input data[{0}][{1}] must be of shape ntimes x nant x nchan'.format(key, pol))
+        self._queue.put((data, timestamps))
+
+    ############################################################################
+
+    def flush(self):
+
+        """
+        ------------------------------------------------------------------------
+        Wait until all the queued snapshots are written and flush the file
+        ------------------------------------------------------------------------
+        """
+
+        self._queue.join()
+        self._raise()
+        if self.fileobj is not None:
+            self.fileobj.flush()
+
+    ############################################################################
+
+    def close(self):
+
+        """
+        ------------------------------------------------------------------------
+        Write the remaining queued snapshots, stop the writer thread and close
+        the file
+        ------------------------------------------------------------------------
+        """
+
+        if self.fileobj is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self.fileobj.close()
+        self.fileobj = None
+        self._raise()
+
+#################################################################################
 
 def epic2fits(filename, data, hdr, image_nums):
     '''Function to dump EPIC images into FITs file
@@ -1,4 +1,7 @@
 import copy
+import os
+import hashlib
+import collections
 import numpy as NP
 import scipy.sparse as SpM
 import scipy.constants as FCNST
@@ -7,6 +10,12 @@ import multiprocessing as MP
 import itertools as IT
 from astropy.io import fits, ascii
 import h5py
+try:
+    import finufft
+except ImportError:
+    finufft_module_found = False
+else:
+    finufft_module_found = True
 import progressbar as PGB
 from astroutils import writer_module as WM
 from astroutils import DSP_modules as DSP
@@ -18,6 +27,7 @@ from astroutils import gridding_modules as GRD
 from astroutils import lookup_operations as LKP
 import antenna_array as AA
 import antenna_beams as AB
+import data_interface as DI
 
 sday = CNST.sday
 sday_correction = 1 / sday
@@ -93,17 +103,17 @@ def interp_beam(beamfile, theta_phi, freqs):
     if 'BEAM' not in extnames:
         raise KeyError('Key "BEAM" not found in file containing antenna voltage pattern')
 
-    if 'FREQS' not in extanmes:
+    if 'FREQS' not in extnames:
         if freqs is not None:
             vbfreqs = freqs
         else:
             raise ValueError('Frequencies not specified in file containing antenna voltage pattern')
     else:
-        vbfreqs = hdulist['FREQS']
+        vbfreqs = hdulist['FREQS'].data
         if not isinstance(vbfreqs, NP.ndarray):
             raise TypeError('Frequencies in antenna voltage pattern must be a numpy array')
 
-    vbeam = hdulist['BEAM']
+    vbeam = hdulist['BEAM'].data
     if not isinstance(vbeam, NP.ndarray):
         raise TypeError('Reference antenna voltage pattern must be a numpy array')
 
@@ -123,6 +133,76 @@ def interp_beam(beamfile, theta_phi, freqs):
 
 ###############################################################################
 
+def altaz_lookup_grid(resolution):
+
+    """
+    ---------------------------------------------------------------------------
+    Return the locations of a regular lookup grid in altitude (0 to 90 
+    degrees) and azimuth (0 to 360 degrees, both ends included) on which 
+    voltage patterns are tabulated for interpolation by 
+    interp_altaz_lookup()
+
+    Inputs:
+
+    resolution  [scalar] Grid spacing (in degrees) along altitude and azimuth.
+                It must divide 90 degrees into an integer number of steps
+
+    Outputs:
+
+    Alt-Az (in degrees) of the grid locations as a (nalt x naz) x 2 numpy 
+    array with azimuth varying fastest
+    ---------------------------------------------------------------------------
+    """
+
+    if not isinstance(resolution, (int,float)):
+        raise TypeError('Input resolution must be a scalar')
+    nsteps = 90.0 / resolution
+    if (resolution <= 0.0) or (NP.abs(nsteps - NP.round(nsteps)) > 1e-6):
+        raise ValueError('Input resolution must be positive and divide 90 degrees into an integer number of steps')
+    nsteps = int(NP.round(nsteps))
+    alt = NP.arange(nsteps+1) * resolution
+    az = NP.arange(4*nsteps+1) * resolution
+    alt, az = NP.meshgrid(alt, az, indexing='ij')
+    return NP.hstack((alt.reshape(-1,1), az.reshape(-1,1)))
+
+###############################################################################
+
+def interp_altaz_lookup(vbeam_grid, resolution, altaz):
+
+    """
+    ---------------------------------------------------------------------------
+    Bilinearly interpolate a voltage pattern tabulated on the lookup grid of
+    altaz_lookup_grid() to the specified locations
+
+    Inputs:
+
+    vbeam_grid  [numpy array] Voltage pattern on the lookup grid of shape 
+                nalt x naz x nchan
+
+    resolution  [scalar] Grid spacing (in degrees) of the lookup grid
+
+    altaz       [numpy array] Alt-Az (in degrees) of the locations as a 
+                nsrc x 2 numpy array. Altitudes below the horizon are 
+                clipped to zero
+
+    Outputs:
+
+    Voltage pattern interpolated at the locations as a nsrc x nchan numpy 
+    array
+    ---------------------------------------------------------------------------
+    """
+
+    nalt, naz = vbeam_grid.shape[:2]
+    altind = NP.clip(altaz[:,0], 0.0, 90.0) / resolution
+    azind = NP.mod(altaz[:,1], 360.0) / resolution
+    alt0 = NP.clip(NP.floor(altind).astype(NP.int), 0, nalt-2)
+    az0 = NP.clip(NP.floor(azind).astype(NP.int), 0, naz-2)
+    altwts = (altind - alt0).reshape(-1,1)
+    azwts = (azind - az0).reshape(-1,1)
+    return (1.0 - altwts) * ((1.0 - azwts) * vbeam_grid[alt0,az0,:] + azwts * vbeam_grid[alt0,az0+1,:]) + altwts * ((1.0 - azwts) * vbeam_grid[alt0+1,az0,:] + azwts * vbeam_grid[alt0+1,az0+1,:])
+
+###############################################################################
+
 def generate_E_spectrum(freqs, skypos=[0.0,0.0,1.0], flux_ref=1.0,
                         freq_ref=None, spectral_index=0.0, spectrum=None,
                         antpos=[0.0,0.0,0.0], voltage_pattern=None,
@@ -1400,6 +1480,233 @@ def monochromatic_E_timeseries(freq_center, nchan, channel_width, flux_ref=1.0,
     return dictout
 
 #################################################################################
+
+class SkyApertureNUFFT(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Class to propagate electric fields of point sources on the sky to sampled
+    locations on the aperture plane, i.e. to evaluate 
+
+        F(u,v) = sum_j c_j exp(+i 2 pi (u l_j + v m_j)) 
+
+    for many sets of source strengths c_j, using a non-uniform FFT instead of 
+    the explicit DFT over all pairs of aperture and source locations. 
+
+    Attributes:
+
+    uvlocs    [numpy array] Locations (in units of wavelength) on the aperture
+              plane at which the electric fields are evaluated. It is of size
+              nuv x 2
+
+    eps       [scalar] Requested relative tolerance of the transform
+
+    backend   [string] Backend used in the transform. Accepted values are 
+              'finufft' (type-3 NUFFT of module finufft), 'numpy' (Gaussian 
+              gridding type-1 NUFFT in pure numpy which requires uvlocs to 
+              lie on a regular lattice) and 'dft' (explicit DFT used as 
+              reference)
+
+    Member functions:
+
+    __init__()     Initializes an instance of class SkyApertureNUFFT
+
+    set_sources()  Sets the source locations for subsequent transforms
+
+    transform()    Propagates source strengths to the aperture locations
+
+    Read the member function docstrings for details.
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, uvlocs, eps=1e-6, backend=None):
+
+        """
+        ------------------------------------------------------------------------
+        Initialize the SkyApertureNUFFT class
+
+        Class attributes initialized are:
+        uvlocs, eps, backend
+
+        Inputs:
+
+        uvlocs    [numpy array] Locations (in units of wavelength) on the 
+                  aperture plane at which the electric fields are evaluated. 
+                  It must be of size nuv x 2
+
+        eps       [scalar] Requested relative tolerance of the transform. 
+                  Must lie in the range 0 < eps < 1. Default=1e-6
+
+        backend   [string] Backend used in the transform. Accepted values are
+                  'finufft', 'numpy' and 'dft'. If set to None (default), 
+                  'finufft' is used if the module is available, otherwise 
+                  'numpy' if uvlocs lie on a regular lattice, otherwise 'dft'
+        ------------------------------------------------------------------------
+        """
+
+        if not isinstance(uvlocs, NP.ndarray):
+            raise TypeError('Input uvlocs must be a numpy array')
+        if uvlocs.ndim != 2:
+            raise ValueError('Input uvlocs must be a 2D numpy array')
+        if uvlocs.shape[1] != 2:
+            raise ValueError('Input uvlocs must be a 2-column array')
+        if not isinstance(eps, (int,float)):
+            raise TypeError('Input eps must be a scalar')
+        if (eps <= 0.0) or (eps >= 1.0):
+            raise ValueError('Input eps must lie in the range 0 < eps < 1')
+        if backend not in [None, 'finufft', 'numpy', 'dft']:
+            raise ValueError('Input backend must be set to "finufft", "numpy", "dft" or None')
+        if (backend == 'finufft') and (not finufft_module_found):
+            raise ImportError('Module finufft not found. Cannot use finufft backend')
+
+        self.uvlocs = uvlocs.astype(NP.float64)
+        self.eps = float(eps)
+
+        # Check if the aperture locations lie on a regular lattice not much
+        # larger than the number of locations
+
+        lattice = []
+        for axis in range(2):
+            uniq = NP.unique(self.uvlocs[:,axis])
+            if uniq.size == 1:
+                spacing = 1.0
+            else:
+                spacing = NP.diff(uniq)
+                if not NP.allclose(spacing, spacing[0], rtol=1e-6, atol=0.0):
+                    lattice = None
+                    break
+                spacing = spacing[0]
+            lattice += [(uniq.size, spacing, uniq[uniq.size//2])]
+        if lattice is not None:
+            if lattice[0][0] * lattice[1][0] > 4 * self.uvlocs.shape[0]:
+                lattice = None
+
+        if backend is None:
+            if finufft_module_found:
+                backend = 'finufft'
+            elif lattice is not None:
+                backend = 'numpy'
+            else:
+                backend = 'dft'
+        elif (backend == 'numpy') and (lattice is None):
+            raise ValueError('Input uvlocs must lie on a regular lattice for the numpy backend')
+        self.backend = backend
+
+        if self.backend == 'numpy':
+
+            # Gaussian gridding parameters (Greengard & Lee 2004) for an
+            # oversampling factor of 2 along each axis
+
+            self._msp = min(max(int(NP.ceil(-NP.log10(self.eps))) + 1, 2), 16)
+            self._lattice = lattice
+            self._tau = []
+            self._gridind = []
+            deconv = NP.ones(self.uvlocs.shape[0])
+            for axis in range(2):
+                nmodes, spacing, center = lattice[axis]
+                tau = NP.pi * self._msp / (3.0 * nmodes**2)
+                modes = NP.rint((self.uvlocs[:,axis] - center) / spacing).astype(NP.int)
+                self._tau += [tau]
+                self._gridind += [NP.mod(modes, 2*nmodes)]
+                deconv = deconv * NP.sqrt(NP.pi / tau) * NP.exp(modes**2 * tau)
+            self._deconv = deconv
+        self._sources = None
+
+    ############################################################################
+
+    def set_sources(self, srcdircos):
+
+        """
+        ------------------------------------------------------------------------
+        Set the source locations for subsequent transforms. The spreading 
+        operator of the numpy backend is computed here so that it is shared by
+        all the transforms of the same set of sources
+
+        Inputs:
+
+        srcdircos [numpy array] Direction cosines of the sources. Only the 
+                  first two columns (l and m) are used. It is of size 
+                  nsrc x 2 (or nsrc x 3)
+        ------------------------------------------------------------------------
+        """
+
+        if not isinstance(srcdircos, NP.ndarray):
+            raise TypeError('Input srcdircos must be a numpy array')
+        if (srcdircos.ndim != 2) or (srcdircos.shape[1] < 2):
+            raise ValueError('Input srcdircos must be a 2D numpy array with at least two columns')
+
+        srcdircos = srcdircos[:,:2].astype(NP.float64)
+        nsrc = srcdircos.shape[0]
+        if self.backend == 'finufft':
+            self._sources = {'x': NP.ascontiguousarray(2 * NP.pi * srcdircos[:,0]), 'y': NP.ascontiguousarray(2 * NP.pi * srcdircos[:,1])}
+        elif self.backend == 'numpy':
+            wts = []
+            inds = []
+            center = NP.asarray([self._lattice[axis][2] for axis in range(2)])
+            offsets = NP.arange(-self._msp+1, self._msp+1).reshape(1,-1)
+            for axis in range(2):
+                nmodes, spacing = self._lattice[axis][:2]
+                nover = 2 * nmodes
+                dx = 2 * NP.pi / nover
+                x = NP.mod(2 * NP.pi * spacing * srcdircos[:,axis], 2 * NP.pi)
+                gridind = NP.floor(x / dx).astype(NP.int).reshape(-1,1) + offsets # nsrc x 2msp
+                wts += [NP.exp(-(x.reshape(-1,1) - gridind * dx)**2 / (4 * self._tau[axis]))]
+                inds += [NP.mod(gridind, nover)]
+            nover_u = 2 * self._lattice[0][0]
+            nover_v = 2 * self._lattice[1][0]
+            sprow = inds[1][:,:,NP.newaxis] * nover_u + inds[0][:,NP.newaxis,:] # nsrc x 2msp x 2msp
+            spval = wts[1][:,:,NP.newaxis] * wts[0][:,NP.newaxis,:] # nsrc x 2msp x 2msp
+            spcol = NP.repeat(NP.arange(nsrc), sprow.shape[1]*sprow.shape[2])
+            self._sources = {'spreader': SpM.csr_matrix((spval.ravel(), (sprow.ravel(), spcol)), shape=(nover_v*nover_u, nsrc)), 'shift': NP.exp(1j * 2 * NP.pi * NP.dot(srcdircos, center)), 'shape': (nover_v, nover_u)}
+        else:
+            self._sources = {'matDFT': NP.exp(1j * 2 * NP.pi * NP.dot(self.uvlocs, srcdircos.T))} # nuv x nsrc
+        self._sources['nsrc'] = nsrc
+
+    ############################################################################
+
+    def transform(self, strengths):
+
+        """
+        ------------------------------------------------------------------------
+        Propagate source strengths to the aperture locations
+
+        Inputs:
+
+        strengths [numpy array] Complex strengths of the sources set in 
+                  member function set_sources(). It is of size nsrc or 
+                  nsrc x ntrans for ntrans independent sets of strengths
+
+        Output:
+
+        Complex electric fields at the aperture locations of size nuv (if 
+        strengths is one-dimensional) or nuv x ntrans
+        ------------------------------------------------------------------------
+        """
+
+        if self._sources is None:
+            raise ValueError('Source locations not set. Call member function set_sources() first')
+        if not isinstance(strengths, NP.ndarray):
+            raise TypeError('Input strengths must be a numpy array')
+        if strengths.shape[0] != self._sources['nsrc']:
+            raise ValueError('Input strengths must have the same number of sources as set in set_sources()')
+        vector = strengths.ndim == 1
+        strengths = strengths.reshape(self._sources['nsrc'],-1).astype(NP.complex128)
+
+        if self.backend == 'finufft':
+            Ef = finufft.nufft2d3(self._sources['x'], self._sources['y'], NP.ascontiguousarray(strengths.T), NP.ascontiguousarray(self.uvlocs[:,0]), NP.ascontiguousarray(self.uvlocs[:,1]), eps=self.eps, isign=1)
+            Ef = Ef.reshape(strengths.shape[1],-1).T # nuv x ntrans
+        elif self.backend == 'numpy':
+            grid = self._sources['spreader'].dot(strengths * self._sources['shift'].reshape(-1,1))
+            grid = NP.fft.ifft2(grid.reshape(self._sources['shape']+(-1,)), axes=(0,1))
+            Ef = grid[self._gridind[1],self._gridind[0],:] * self._deconv.reshape(-1,1) # nuv x ntrans
+        else:
+            Ef = NP.dot(self._sources['matDFT'], strengths) # nuv x ntrans
+
+        if vector:
+            Ef = Ef.ravel()
+        return Ef
+
+#################################################################################
  
 class AntennaArraySimulator(object):
 
@@ -1479,6 +1786,26 @@ class AntennaArraySimulator(object):
                     nchan x nant x ntimes. Absent data are represented by 
                     NaN values
 
+    vbeam_cache     [collections.OrderedDict] Voltage patterns tabulated on 
+                    the (alt, az) lookup grid of resolution 
+                    vbeam_cache_res, of shape nalt x naz x nchan, keyed by 
+                    a hash of the antenna beam specification, polarization
+                    and frequencies, in order of least to most recent use
+
+    vbeam_cache_res [NoneType or scalar] Resolution (in degrees) of the 
+                    lookup grid of the voltage pattern cache. None means 
+                    that the cache is not used and voltage patterns are 
+                    evaluated at every source location
+
+    vbeam_cachedir  [NoneType or string] Directory holding the on-disk store
+                    of the voltage pattern cache. None means no on-disk 
+                    store
+
+    vbeam_cache_size
+                    [NoneType or integer] Maximum number of voltage patterns
+                    held in attribute vbeam_cache and in the on-disk store 
+                    each. None means no limit
+
     Member function:
 
     __init__()      Initialize the AntennaArraySimulator class which manages 
@@ -1546,11 +1873,22 @@ class AntennaArraySimulator(object):
                     electric fields as a function of polarization, 
                     frequencies and antennas.
 
+    observe_block() Simulate a block of observations at several LSTs in 
+                    one vectorized pass
+
     observing_run() Simulate a observing run made of multiple contiguous 
                     observations and record antenna electric fields as a 
                     function of polarization, frequencies, antennas, and 
                     time.
 
+    stream_writer() Create an instance of class DataStreamWriter to which
+                    the snapshots of an observing run are appended as they
+                    are simulated
+
+    set_voltage_pattern_cache()
+                    Set up the cache of voltage patterns tabulated on a 
+                    lookup grid with LRU eviction and an on-disk store
+
     save()          Save information instance of class 
                     AntennaArraySimulator to external file in HDF5 format
     ------------------------------------------------------------------------
@@ -1565,7 +1903,8 @@ class AntennaArraySimulator(object):
 
         Class attributes initialized are:
         antenna_array, skymodel, latitude, f, f0, antinfo, observer, Ef_stack,
-        Ef_info, t, timestamp, timestamps
+        Ef_info, t, timestamp, timestamps, vbeam_cache, vbeam_cache_res, 
+        vbeam_cachedir, vbeam_cache_size
 
         Read docstring of class AntennaArray for details on these attributes.
 
@@ -1614,6 +1953,11 @@ class AntennaArraySimulator(object):
         self.timestamp = None
         self.timestamps = []
         self.obsmode = 'custom'
+        self.vbeam_cache = collections.OrderedDict()
+        self.vbeam_cache_res = None
+        self.vbeam_cachedir = None
+        self.vbeam_cache_size = None
+        self._vbeam_last_pointing = {}
 
         self.latitude = self.antenna_array.latitude
         self.longitude = self.antenna_array.longitude
@@ -1795,6 +2139,244 @@ class AntennaArraySimulator(object):
 
     ############################################################################
     
+    def set_voltage_pattern_cache(self, resolution=1.0, cachedir=None,
+                                  maxsize=None):
+
+        """
+        ------------------------------------------------------------------------
+        Set up the cache of voltage patterns used by member functions 
+        generate_voltage_pattern() and load_voltage_pattern(). Each distinct 
+        voltage pattern (antenna beam specification, polarization and 
+        frequencies) is evaluated once on a regular (alt, az) lookup grid 
+        and the patterns at the source locations of every snapshot are 
+        obtained by bilinear interpolation on this grid. Analytic voltage 
+        patterns depend on the pointing, so they are only tabulated once the
+        same pointing is requested in consecutive calls. While the pointing
+        changes between calls, as in tracking, they are evaluated directly 
+        at the source locations
+
+        Inputs:
+
+        resolution  [NoneType or scalar] Resolution (in degrees) of the lookup
+                    grid. It must divide 90 degrees into an integer number of
+                    steps. If set to None, the cache is disabled and cleared.
+                    Default=1.0
+
+        cachedir    [NoneType or string] Directory holding the on-disk store
+                    of the lookup grids. It is created if it does not exist. 
+                    Default=None means no on-disk store
+
+        maxsize     [NoneType or integer] Maximum number of voltage patterns 
+                    held in memory and in the on-disk store each. The least 
+                    recently used ones are evicted beyond it. Default=None 
+                    means no limit
+        ------------------------------------------------------------------------
+        """
+
+        if resolution is not None:
+            altaz_lookup_grid(resolution) # Validates resolution
+        if cachedir is not None:
+            if not isinstance(cachedir, str):
+                raise TypeError('Input cachedir must be a string')
+            if not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+        if maxsize is not None:
+            if not isinstance(maxsize, int):
+                raise TypeError('Input maxsize must be an integer')
+            if maxsize < 1:
+                raise ValueError('Input maxsize must be positive')
+
+        if resolution != self.vbeam_cache_res:
+            self.vbeam_cache.clear()
+        self.vbeam_cache_res = resolution
+        self.vbeam_cachedir = cachedir
+        self.vbeam_cache_size = maxsize
+        self._vbeam_last_pointing = {}
+        self._touch_voltage_pattern()
+        self._evict_voltage_pattern_store()
+
+    ############################################################################
+
+    def _touch_voltage_pattern(self, key=None):
+
+        """
+        ------------------------------------------------------------------------
+        Mark the voltage pattern as the most recently used in attribute 
+        vbeam_cache and evict the least recently used ones beyond attribute
+        vbeam_cache_size. Not meant to be accessed directly by the user.
+        ------------------------------------------------------------------------
+        """
+
+        if key in self.vbeam_cache:
+            self.vbeam_cache[key] = self.vbeam_cache.pop(key)
+        if self.vbeam_cache_size is not None:
+            while len(self.vbeam_cache) > self.vbeam_cache_size:
+                self.vbeam_cache.popitem(last=False)
+
+    ############################################################################
+
+    def _evict_voltage_pattern_store(self):
+
+        """
+        ------------------------------------------------------------------------
+        Remove the least recently used files from the on-disk store of the 
+        voltage pattern cache beyond attribute vbeam_cache_size. Use is 
+        tracked by the file modification times. Not meant to be accessed 
+        directly by the user.
+        ------------------------------------------------------------------------
+        """
+
+        if (self.vbeam_cachedir is None) or (self.vbeam_cache_size is None):
+            return
+        cachefiles = [os.path.join(self.vbeam_cachedir, fname) for fname in os.listdir(self.vbeam_cachedir) if fname.startswith('vbeam_') and fname.endswith('.hdf5')]
+        if len(cachefiles) <= self.vbeam_cache_size:
+            return
+        cachefiles = sorted(cachefiles, key=os.path.getmtime)
+        for cachefile in cachefiles[:len(cachefiles)-self.vbeam_cache_size]:
+            try:
+                os.remove(cachefile)
+            except OSError: # Removed by another process sharing the store
+                pass
+
+    ############################################################################
+
+    def _evaluate_voltage_pattern(self, beaminfo, altaz):
+
+        """
+        ------------------------------------------------------------------------
+        Evaluate a voltage pattern at the given locations. Not meant to be 
+        accessed directly by the user.
+
+        Inputs:
+
+        beaminfo    [dictionary] Beam specification. See member function
+                    _lookup_voltage_pattern()
+
+        altaz       [numpy array] Alt-Az (in degrees) of the locations as a 
+                    nsrc x 2 numpy array
+
+        Output:
+
+        Voltage pattern as a nsrc x nchan numpy array
+        ------------------------------------------------------------------------
+        """
+
+        if 'beamfile' in beaminfo:
+            return interp_beam(beaminfo['beamfile'], NP.radians(altaz), self.f)
+        telescope = beaminfo['telescope']
+        return AB.antenna_beam_generator(altaz, self.f, telescope, freq_scale='Hz', skyunits='altaz', east2ax1=telescope['orientation'], pointing_info=beaminfo['pointing_info'], pointing_center=beaminfo['pointing_center'], short_dipole_approx=beaminfo['short_dipole_approx'], half_wave_dipole_approx=beaminfo['half_wave_dipole_approx'], power=False)
+
+    ############################################################################
+
+    def _voltage_pattern_cache_key(self, pol, beaminfo):
+
+        """
+        ------------------------------------------------------------------------
+        Return the key identifying a voltage pattern in attribute vbeam_cache
+        and in the on-disk store. It is a hash of the beam specification, the 
+        polarization, the frequencies and the lookup grid resolution. Not 
+        meant to be accessed directly by the user.
+
+        Inputs:
+
+        pol         [string] Polarization
+
+        beaminfo    [dictionary] Beam specification. See member function
+                    _lookup_voltage_pattern()
+
+        Output:
+
+        Hexadecimal string
+        ------------------------------------------------------------------------
+        """
+
+        def update(hashobj, obj):
+            if isinstance(obj, dict):
+                for key in sorted(obj.keys()):
+                    hashobj.update('{0}:'.format(key))
+                    update(hashobj, obj[key])
+            elif isinstance(obj, (list, tuple)):
+                hashobj.update('[')
+                for item in obj:
+                    update(hashobj, item)
+                hashobj.update(']')
+            elif isinstance(obj, NP.ndarray):
+                hashobj.update('{0}{1}'.format(obj.dtype.str, obj.shape))
+                hashobj.update(NP.ascontiguousarray(obj).tostring())
+            else:
+                hashobj.update(repr(obj))
+            hashobj.update('|')
+
+        hashobj = hashlib.sha1()
+        update(hashobj, ['vbeam-v1', pol, self.vbeam_cache_res, NP.asarray(self.f, dtype=NP.float64), beaminfo])
+        return hashobj.hexdigest()
+
+    ############################################################################
+
+    def _lookup_voltage_pattern(self, pol, beaminfo, altaz):
+
+        """
+        ------------------------------------------------------------------------
+        Return the voltage pattern at the given locations by interpolation 
+        on its lookup grid, which is taken from attribute vbeam_cache, loaded
+        from the on-disk store or evaluated and stored in both. An analytic 
+        voltage pattern whose pointing differs from that of the previous 
+        call is evaluated directly at the locations instead, since its 
+        lookup grid is unlikely to be used again. Not meant to be accessed 
+        directly by the user.
+
+        Inputs:
+
+        pol         [string] Polarization
+
+        beaminfo    [dictionary] Beam specification. Under key 'beamfile' is 
+                    the full path to a file read by interp_beam(). Otherwise,
+                    under key 'telescope' is the telescope dictionary and 
+                    under keys 'pointing_center', 'pointing_info', 
+                    'short_dipole_approx' and 'half_wave_dipole_approx' the 
+                    inputs to antenna_beam_generator()
+
+        altaz       [numpy array] Alt-Az (in degrees) of the locations as a 
+                    nsrc x 2 numpy array
+
+        Output:
+
+        Voltage pattern as a nsrc x nchan numpy array
+        ------------------------------------------------------------------------
+        """
+
+        key = self._voltage_pattern_cache_key(pol, beaminfo)
+        if key not in self.vbeam_cache:
+            cachefile = None
+            if self.vbeam_cachedir is not None:
+                cachefile = os.path.join(self.vbeam_cachedir, 'vbeam_{0}.hdf5'.format(key))
+            if (cachefile is not None) and os.path.isfile(cachefile):
+                with h5py.File(cachefile, 'r') as fileobj:
+                    vbeam_grid = fileobj['vbeam'].value
+                os.utime(cachefile, None) # Mark as recently used in the on-disk store
+            else:
+                if 'beamfile' not in beaminfo:
+                    beamkey = self._voltage_pattern_cache_key(pol, {bkey: beaminfo[bkey] for bkey in beaminfo if bkey not in ['pointing_center', 'pointing_info']})
+                    if self._vbeam_last_pointing.get(beamkey, None) != key:
+                        self._vbeam_last_pointing[beamkey] = key
+                        return self._evaluate_voltage_pattern(beaminfo, altaz)
+                nalt = int(NP.round(90.0 / self.vbeam_cache_res)) + 1
+                vbeam_grid = self._evaluate_voltage_pattern(beaminfo, altaz_lookup_grid(self.vbeam_cache_res))
+                vbeam_grid = NP.asarray(vbeam_grid).reshape(nalt, -1, self.f.size)
+                if cachefile is not None:
+                    tmpfile = cachefile + '.{0:0d}.tmp'.format(os.getpid())
+                    with h5py.File(tmpfile, 'w') as fileobj:
+                        dset = fileobj.create_dataset('vbeam', data=vbeam_grid)
+                        dset.attrs['resolution'] = self.vbeam_cache_res
+                    os.rename(tmpfile, cachefile)
+                    self._evict_voltage_pattern_store()
+            self.vbeam_cache[key] = vbeam_grid
+        self._touch_voltage_pattern(key)
+
+        return interp_altaz_lookup(self.vbeam_cache[key], self.vbeam_cache_res, altaz)
+
+    ############################################################################
+
     def load_voltage_pattern(self, vbeam_files, altaz, parallel=False,
                              nproc=None):
 
@@ -1802,7 +2384,10 @@ class AntennaArraySimulator(object):
         ------------------------------------------------------------------------
         Generates (by interpolating if necessary) voltage pattern at the 
         location of catalog sources based on external voltage pattern files
-        specified. Parallel processing can be performed.
+        specified. Parallel processing can be performed. If the voltage 
+        pattern cache is set up by member function 
+        set_voltage_pattern_cache(), each file is interpolated once onto the 
+        lookup grid and parallel processing is not used
 
         Inputs:
 
@@ -1879,7 +2464,17 @@ class AntennaArraySimulator(object):
                 if (commonkeys.size != 1) and (commonkeys.size != antkeys.size):
                     raise ValueError('Number of voltage pattern files incompatible with number of antennas')
         
-                if (commonkeys.size == 1) or self.identical_antennas:
+                if self.vbeam_cache_res is not None:
+                    if (commonkeys.size == 1) or self.identical_antennas:
+                        commonkeys = commonkeys[:1]
+                    for key in commonkeys:
+                        beamfile = os.path.abspath(vbeam_files[pol][key])
+                        vbeam = self._lookup_voltage_pattern(pol, {'beamfile': beamfile, 'mtime': os.path.getmtime(beamfile)}, altaz)
+                        if vbeams[pol] is None:
+                            vbeams[pol] = vbeam[:,:,NP.newaxis] # nsrc x nchan x 1
+                        else:
+                            vbeams[pol] = NP.dstack((vbeams[pol], vbeam[:,:,NP.newaxis])) # nsrc x nchan x nant
+                elif (commonkeys.size == 1) or self.identical_antennas:
                     vbeams[pol] = interp_beam(vbeam_files[pol][commonkeys[0]], theta_phi, self.f)
                     vbeams[pol] = vbeams[pol][:,:,NP.newaxis] # nsrc x nchan x 1
                 else:
@@ -1916,7 +2511,11 @@ class AntennaArraySimulator(object):
         """
         ------------------------------------------------------------------------
         Generate voltage pattern analytically based on antenna shapes. Can be
-        parallelized
+        parallelized. If the voltage pattern cache is set up by member 
+        function set_voltage_pattern_cache(), each distinct pattern is 
+        evaluated once on the lookup grid unless pointing_info specifies 
+        random gain or delay jitters or the pointing changes between calls,
+        and parallel processing is not used
 
         Inputs:
 
@@ -2068,11 +2667,24 @@ class AntennaArraySimulator(object):
                     else:
                         raise ValueError('Antenna aperture shape currently not supported for analytic antenna beam estimation')
                     
+        use_cache = self.vbeam_cache_res is not None
+        if use_cache and (pointing_info is not None):
+            if (pointing_info.get('gainerr', 0.0) > 0.0) or (pointing_info.get('delayerr', 0.0) > 0.0):
+                use_cache = False # Random jitters differ between calls
+
         vbeams = {}
         for pol in ['P1', 'P2']:
             vbeams[pol] = None
             antkeys = sorted(telescopes[pol].keys())
-            if len(antkeys) == 1:
+            if use_cache:
+                for key in antkeys:
+                    beaminfo = {'telescope': telescopes[pol][key], 'pointing_center': pointing_center, 'pointing_info': pointing_info, 'short_dipole_approx': short_dipole_approx, 'half_wave_dipole_approx': half_wave_dipole_approx}
+                    vbeam = self._lookup_voltage_pattern(pol, beaminfo, altaz)
+                    if vbeams[pol] is None:
+                        vbeams[pol] = vbeam[:,:,NP.newaxis] # nsrc x nchan x 1
+                    else:
+                        vbeams[pol] = NP.dstack((vbeams[pol], vbeam[:,:,NP.newaxis])) # nsrc x nchan x nant
+            elif len(antkeys) == 1:
                 vbeams[pol] = AB.antenna_beam_generator(altaz, self.f, telescopes[pol][antkeys[0]], freq_scale='Hz', skyunits='altaz', east2ax1=telescopes[pol][antkeys[0]]['orientation'], pointing_info=pointing_info, pointing_center=pointing_center, short_dipole_approx=short_dipole_approx, half_wave_dipole_approx=half_wave_dipole_approx, power=False)
                 vbeams[pol] = vbeams[pol][:,:,NP.newaxis] # nsrc x nchan x 1
             else:
@@ -2453,7 +3065,8 @@ class AntennaArraySimulator(object):
     ############################################################################
     
     def propagate_sky_E_spectrum(self, sky_Ef_info, altaz, uvlocs=None, 
-                                 pol=None):
+                                 pol=None, src_chunksize=1024, method='dft',
+                                 nufft_eps=1e-6):
 
         """
         ------------------------------------------------------------------------
@@ -2486,6 +3099,24 @@ class AntennaArraySimulator(object):
         pol         [list] List of polarizations to process. The polarizations
                     are specified as strings 'P1' and 'P2. If set to None
                     (default), both polarizations are processed
+
+        src_chunksize
+                    [integer] Number of sources propagated together in one 
+                    block. The sources are streamed in blocks of this size 
+                    and their contributions accumulated in the output, so that
+                    the memory required is bounded by the block size and not 
+                    by the number of sources. Default=1024
+
+        method      [string] Method used to propagate the sources to the 
+                    aperture. Accepted values are 'dft' (default) for the
+                    explicit DFT which is the reference, and 'nufft' for the 
+                    non-uniform FFT implemented in class SkyApertureNUFFT. 
+                    The latter uses module finufft if available, otherwise a 
+                    gridding NUFFT in numpy if uvlocs lie on a regular 
+                    lattice (as is the case when uvlocs is set to None)
+
+        nufft_eps   [scalar] Requested relative tolerance of the transform if
+                    method is set to 'nufft'. Default=1e-6
     
         Output:
     
@@ -2493,7 +3124,7 @@ class AntennaArraySimulator(object):
         a dictionary containing electric field information at the sampled 
         aperture locations. This dictionary consists of two keys 'P1' and 'P2', 
         one for each polarization. Under each of these keys the complex electric 
-        fields spectra of shape nuv x nant x nchan are stored. nchan is the 
+        fields spectra (complex64) of shape nuv x nant x nchan are stored. nchan is the 
         number of channels in the spectrum, nuv is the number of gridded points 
         in the aperture footprint and nant is the number of antennas. The order 
         of antennas in nant is given by the first element of the tuple returned 
@@ -2535,6 +3166,13 @@ class AntennaArraySimulator(object):
         pol = sorted(pol)
         npol = len(pol)
 
+        if not isinstance(src_chunksize, int):
+            raise TypeError('Input src_chunksize must be an integer')
+        if src_chunksize < 1:
+            raise ValueError('Input src_chunksize must be positive')
+        if method not in ['dft', 'nufft']:
+            raise ValueError('Input method must be set to "dft" or "nufft"')
+
         wl = FCNST.c / self.f
         if uvlocs is None:
             typetags = self.antenna_array.typetags
@@ -2563,18 +3201,38 @@ class AntennaArraySimulator(object):
                 raise ValueError('Input uvlocs must be a 2-column array')
 
         antpos_info = self.antenna_array.antenna_positions(pol=None, flag=False, sort=True, centering=False)
-        skypos_dot_antpos = NP.dot(antpos_info['positions'], srcdircos.T) # nant x nsrc
-        skypos_dot_antpos = skypos_dot_antpos[:,:,NP.newaxis] / wl.reshape(1,1,-1) # nant x nsrc x nchan
-        skypos_dot_antpos = NP.exp(1j * 2 * NP.pi * skypos_dot_antpos) # nant x nsrc x nchan
+        nant = antpos_info['positions'].shape[0]
+        nuv = uvlocs.shape[0]
+        nchan = wl.size
 
         # if not apply_aprtr_wts:
         #     aprtr_wts = {p: 1.0 for p in pol}
 
-        aperture_Ef_info = {}
-        u_dot_l = NP.dot(uvlocs, srcdircos_2d.T) # nuv x nsrc
-        matDFT = NP.exp(1j * 2 * NP.pi * u_dot_l) # nuv x nsrc
-        for polind, p in enumerate(pol):
-            aperture_Ef_info[p] = NP.dot(matDFT, sky_Ef_info[p][NP.newaxis,:,:]*skypos_dot_antpos) # nuv x nant x nchan
+        # Stream over blocks of sources and accumulate their contributions
+
+        if method == 'nufft':
+            nufft = SkyApertureNUFFT(uvlocs, eps=nufft_eps)
+
+        aperture_Ef_info = {p: NP.zeros((nuv, nant*nchan), dtype=NP.complex64) for p in pol}
+        for srcind in xrange(0, nsrc, src_chunksize):
+            srcslice = slice(srcind, min(srcind+src_chunksize, nsrc))
+            skypos_dot_antpos = NP.dot(srcdircos[srcslice,:], antpos_info['positions'].T) # nblk x nant
+            skypos_dot_antpos = skypos_dot_antpos[:,:,NP.newaxis] / wl.reshape(1,1,-1) # nblk x nant x nchan
+            skypos_dot_antpos = NP.exp(1j * 2 * NP.pi * skypos_dot_antpos).astype(NP.complex64) # nblk x nant x nchan
+            if method == 'nufft':
+                nufft.set_sources(srcdircos_2d[srcslice,:])
+                for polind, p in enumerate(pol):
+                    src_Ef = sky_Ef_info[p][srcslice,NP.newaxis,:].astype(NP.complex64) * skypos_dot_antpos # nblk x nant x nchan
+                    for chan in xrange(nchan):
+                        aperture_Ef_info[p][:,chan::nchan] += nufft.transform(src_Ef[:,:,chan]) # nuv x nant
+            else:
+                u_dot_l = NP.dot(uvlocs, srcdircos_2d[srcslice,:].T) # nuv x nblk
+                matDFT = NP.exp(1j * 2 * NP.pi * u_dot_l).astype(NP.complex64) # nuv x nblk
+                for polind, p in enumerate(pol):
+                    src_Ef = sky_Ef_info[p][srcslice,NP.newaxis,:].astype(NP.complex64) * skypos_dot_antpos # nblk x nant x nchan
+                    aperture_Ef_info[p] += NP.dot(matDFT, src_Ef.reshape(src_Ef.shape[0],-1)) # nuv x (nant x nchan)
+        for p in pol:
+            aperture_Ef_info[p] = aperture_Ef_info[p].reshape(nuv, nant, nchan) # nuv x nant x nchan
 
         return (antpos_info['labels'], aperture_Ef_info)
         
@@ -2681,7 +3339,9 @@ class AntennaArraySimulator(object):
     
     def generate_antenna_E_spectrum(self, altaz, ctlgind=None, uvlocs=None, 
                                     pol=None, randomseed=None, randvals=None,
-                                    phase_center_dircos=None, action='return'):
+                                    phase_center_dircos=None, action='return',
+                                    src_chunksize=1024, method='dft',
+                                    nufft_eps=1e-6):
 
         """
         ------------------------------------------------------------------------
@@ -2736,6 +3396,18 @@ class AntennaArraySimulator(object):
         action      [string] If set to 'store' (default), the attribute Ef_info
                     is updated but no value is returned. If set to 'return', 
                     the output described below is returned
+
+        src_chunksize
+                    [integer] Number of sources propagated together in one 
+                    block. See member function propagate_sky_E_spectrum(). 
+                    Default=1024
+
+        method      [string] Method used to propagate the sources to the 
+                    aperture. Accepted values are 'dft' (default) and 'nufft'.
+                    See member function propagate_sky_E_spectrum()
+
+        nufft_eps   [scalar] Requested relative tolerance of the transform if
+                    method is set to 'nufft'. Default=1e-6
     
         Outputs:
 
@@ -2773,7 +3445,7 @@ class AntennaArraySimulator(object):
         phase_center_dot_antpos = NP.exp(-1j * 2 * NP.pi * phase_center_dot_antpos) # nchan x nant
 
         sky_Ef_info = self.generate_sky_E_spectrum(altaz, ctlgind=ctlgind, pol=pol, randomseed=randomseed, randvals=randvals)
-        antlabels, aperture_Ef_info = self.propagate_sky_E_spectrum(sky_Ef_info, altaz, uvlocs=uvlocs, pol=pol)
+        antlabels, aperture_Ef_info = self.propagate_sky_E_spectrum(sky_Ef_info, altaz, uvlocs=uvlocs, pol=pol, src_chunksize=src_chunksize, method=method, nufft_eps=nufft_eps)
         antwts_dict = self.generate_antenna_wts_spectrum(uvlocs=uvlocs, pol=pol)
         antenna_Ef_info = {p: None for p in sky_Ef_info}
         for p in pol:
@@ -2887,6 +3559,92 @@ class AntennaArraySimulator(object):
                 
     ############################################################################
     
+    def _snapshot_geometry(self, lst, obs_date, phase_center_coords,
+                           pointing_center_coords, phase_center=None,
+                           pointing_center=None):
+
+        """
+        ------------------------------------------------------------------------
+        Compute the timestamp, the phase center and the pointing center of a 
+        single observation. Used by member functions observe() and 
+        observe_block()
+
+        Inputs:
+
+        lst        [scalar] Local Sidereal Time (in hours) in the range 0--24
+                   on the date specified by obs_date.
+
+        obs_date   [string] Date of observation in YYYY/MM/DD format
+
+        phase_center_coords, pointing_center_coords, phase_center, 
+        pointing_center
+                   See member function observe()
+
+        Output:
+
+        Dictionary with the following keys and values:
+        'lst'       [scalar] Local sidereal time (in degrees) precessed to the
+                    date of observation
+        'timestamp' [float] Dublin Julian Date of the observation
+        'phase_center_dircos'
+                    [numpy array] Direction cosines of the phase center of 
+                    size 1 x 3
+        'pointing_center_altaz'
+                    [numpy array] Alt-Az (in degrees) of the pointing center 
+                    of size 1 x 2
+        ------------------------------------------------------------------------
+        """
+
+        lstobj = EP.FixedBody()
+        lstobj._epoch = obs_date
+        lstobj._ra = NP.radians(lst * 15.0)
+        lstobj._dec = NP.radians(self.latitude)
+        lstobj.compute(self.observer)
+        lst_temp = NP.degrees(lstobj.ra) # in degrees
+        dec_temp = NP.degrees(lstobj.dec) # in degrees
+
+        obsrvr = EP.Observer()
+        obsrvr.lat = self.observer.lat
+        obsrvr.lon = self.observer.lon
+        obsrvr.date = obs_date
+        timestamp = obsrvr.next_transit(lstobj)
+
+        if phase_center is None:
+            phase_center_dircos = NP.asarray([0.0, 0.0, 1.0]).reshape(1,-1)
+        else:
+            if phase_center_coords == 'dircos':
+                phase_center_dircos = phase_center
+            elif phase_center_coords == 'altaz':
+                phase_center_dircos = GEOM.altaz2dircos(phase_center, units='degrees')
+            elif phase_center_coords == 'hadec':
+                phase_center_altaz = GEOM.hadec2altaz(phase_center, self.latitude, units='degrees')
+                phase_center_dircos = GEOM.altaz2dircos(phase_center_altaz, units='degrees')
+            elif phase_center_coords == 'radec':
+                phase_center_hadec = NP.asarray([lst_temp - phase_center[0,0], phase_center[0,1]]).reshape(1,-1)
+                phase_center_altaz = GEOM.hadec2altaz(phase_center_hadec, self.latitude, units='degrees')
+                phase_center_dircos = GEOM.altaz2dircos(phase_center_altaz, units='degrees')
+            else:
+                raise ValueError('Invalid value specified in phase_center_coords')
+
+        if pointing_center is None:
+            pointing_center_altaz = NP.asarray([90.0, 270.0]).reshape(1,-1)
+        else:
+            if pointing_center_coords == 'altaz':
+                pointing_center_altaz = pointing_center
+            elif pointing_center_coords == 'dircos':
+                pointing_center_altaz = GEOM.dircos2altaz(pointing_center, units='degrees')
+            elif pointing_center_coords == 'hadec':
+                pointing_center_altaz = GEOM.hadec2altaz(pointing_center, self.latitude, units='degrees')
+            elif pointing_center_coords == 'radec':
+                pointing_center_hadec = NP.asarray([lst_temp - pointing_center[0,0], pointing_center[0,1]]).reshape(1,-1)
+                pointing_center_altaz = GEOM.hadec2altaz(pointing_center_hadec, self.latitude, units='degrees')
+            else:
+                raise ValueError('Invalid value specified in pointing_center_coords')
+            
+        return {'lst': lst_temp, 'timestamp': timestamp, 'phase_center_dircos': phase_center_dircos, 'pointing_center_altaz': pointing_center_altaz}
+
+    ############################################################################
+    
     def observe(self, lst, phase_center_coords, pointing_center_coords,
                 obs_date=None, phase_center=None, pointing_center=None,
                 pointing_info=None, domain_type='sky', aperture_info=None,
@@ -3166,52 +3924,11 @@ class AntennaArraySimulator(object):
         if obs_date is None:
             obs_date = self.observer.date
 
-        lstobj = EP.FixedBody()
-        lstobj._epoch = obs_date
-        lstobj._ra = NP.radians(lst * 15.0)
-        lstobj._dec = NP.radians(self.latitude)
-        lstobj.compute(self.observer)
-        lst_temp = NP.degrees(lstobj.ra) # in degrees
-        dec_temp = NP.degrees(lstobj.dec) # in degrees
+        geometry = self._snapshot_geometry(lst, obs_date, phase_center_coords, pointing_center_coords, phase_center=phase_center, pointing_center=pointing_center)
+        self.timestamp = geometry['timestamp']
+        phase_center_dircos = geometry['phase_center_dircos']
+        pointing_center_altaz = geometry['pointing_center_altaz']
 
-        obsrvr = EP.Observer()
-        obsrvr.lat = self.observer.lat
-        obsrvr.lon = self.observer.lon
-        obsrvr.date = obs_date
-        self.timestamp = obsrvr.next_transit(lstobj)
-
-        if phase_center is None:
-            phase_center_dircos = NP.asarray([0.0, 0.0, 1.0]).reshape(1,-1)
-        else:
-            if phase_center_coords == 'dircos':
-                phase_center_dircos = phase_center
-            elif phase_center_coords == 'altaz':
-                phase_center_dircos = GEOM.altaz2dircos(phase_center, units='degrees')
-            elif phase_center_coords == 'hadec':
-                phase_center_altaz = GEOM.hadec2altaz(phase_center, self.latitude, units='degrees')
-                phase_center_dircos = GEOM.altaz2dircos(phase_center_altaz, units='degrees')
-            elif phase_center_coords == 'radec':
-                phase_center_hadec = NP.asarray([lst_temp - phase_center[0,0], phase_center[0,1]]).reshape(1,-1)
-                phase_center_altaz = GEOM.hadec2altaz(phase_center_hadec, self.latitude, units='degrees')
-                phase_center_dircos = GEOM.altaz2dircos(phase_center_altaz, units='degrees')
-            else:
-                raise ValueError('Invalid value specified in phase_center_coords')
-
-        if pointing_center is None:
-            pointing_center_altaz = NP.asarray([90.0, 270.0]).reshape(1,-1)
-        else:
-            if pointing_center_coords == 'altaz':
-                pointing_center_altaz = pointing_center
-            elif pointing_center_coords == 'dircos':
-                pointing_center_altaz = GEOM.dircos2altaz(pointing_center, units='degrees')
-            elif pointing_center_coords == 'hadec':
-                pointing_center_altaz = GEOM.hadec2altaz(pointing_center, self.latitude, units='degrees')
-            elif pointing_center_coords == 'radec':
-                pointing_center_hadec = NP.asarray([lst_temp - pointing_center[0,0], pointing_center[0,1]]).reshape(1,-1)
-                pointing_center_altaz = GEOM.hadec2altaz(pointing_center_hadec, self.latitude, units='degrees')
-            else:
-                raise ValueError('Invalid value specified in pointing_center_coords')
-            
         self.update_apertures(aperture_info=aperture_info)
 
         hemind, altaz = self.upper_hemisphere(lst, obs_date=obs_date)
@@ -3222,7 +3939,7 @@ class AntennaArraySimulator(object):
         else:
             if domain_type == 'sky':
                 if vbeam_files is not None:
-                    vbeams = self.load_voltage_patterns(vbeam_files, altaz, parallel=parallel, nproc=nproc)
+                    vbeams = self.load_voltage_pattern(vbeam_files, altaz, parallel=parallel_genvb, nproc=nproc)
                 else:
                     vbeams = self.generate_voltage_pattern(altaz, pointing_center=pointing_center_altaz, pointing_info=pointing_info, short_dipole_approx=short_dipole_approx, half_wave_dipole_approx=half_wave_dipole_approx, parallel=parallel_genvb, nproc=nproc)
                 self.generate_E_spectrum(altaz, vbeams, ctlgind=hemind, pol=['P1','P2'], ref_point=phase_center_dircos, randomseed=randomseed, parallel=parallel_genEf, nproc=nproc, action='store')
@@ -3243,11 +3960,179 @@ class AntennaArraySimulator(object):
 
     ############################################################################
 
+    def observe_block(self, lsts, phase_center_coords, pointing_center_coords,
+                      obs_dates=None, phase_center=None, pointing_center=None,
+                      pointing_info=None, randomseeds=None, 
+                      short_dipole_approx=False, half_wave_dipole_approx=False,
+                      parallel_genvb=False, nproc=None, src_chunksize=1024):
+
+        """
+        ------------------------------------------------------------------------
+        Simulate a block of observations at several LSTs in one vectorized 
+        pass and return antenna electric fields as a function of polarization,
+        frequencies, antennas and time. The sky rotation and the upper 
+        hemisphere selection for all the LSTs are computed as one array 
+        operation, the analytic voltage patterns are evaluated in one call 
+        per distinct pointing center, and the antenna phases of all the 
+        (time, source) pairs are computed together in chunks. The antenna 
+        beams are applied in the 'sky' domain as in member function observe().
+        With the same random seeds, the electric fields are identical (up to 
+        the order of summation) to those from calls to observe() at each LST.
+
+        Inputs:
+
+        lsts       [list or numpy array] Local Sidereal Times (in hours) in 
+                   the range 0--24 on the dates specified by obs_dates. It is 
+                   of size ntime
+
+        phase_center_coords, pointing_center_coords
+                   See member function observe()
+
+        Keyword Inputs:
+
+        obs_dates  [list] Dates of observation in YYYY/MM/DD format, one for 
+                   each LST. If set to None (default), the epoch in the sky 
+                   model will be assumed to be the date of all observations
+
+        phase_center, pointing_center, pointing_info, short_dipole_approx, 
+        half_wave_dipole_approx, parallel_genvb, nproc
+                   See member function observe()
+
+        randomseeds
+                   [list or numpy array] Seeds to initialize the random 
+                   generator, one for each LST. If set to None (default), the 
+                   random sequences generated are not reproducible
+
+        src_chunksize
+                   [integer] Number of (time, source) pairs whose antenna 
+                   phases are computed together. It bounds the memory 
+                   required to nchan x nant times this number. Default=1024
+
+        Outputs:
+
+        Tuple with first element being a dictionary containing electric 
+        fields under keys 'P1' and 'P2' each of which is a numpy array of 
+        shape nchan x nant x ntime, and the second element the list of ntime
+        timestamps. The attributes Ef_info and timestamp are set to those of 
+        the last observation in the block
+        ------------------------------------------------------------------------
+        """
+
+        try:
+            lsts, phase_center_coords, pointing_center_coords
+        except NameError:
+            raise NameError('Input LSTs must be specified')
+
+        if isinstance(lsts, (int,float)):
+            lsts = [lsts]
+        lsts = NP.asarray(lsts, dtype=NP.float).ravel()
+        ntime = lsts.size
+        if ntime == 0:
+            raise ValueError('Input lsts must contain at least one value')
+
+        if phase_center_coords not in ['hadec', 'radec', 'altaz', 'dircos']:
+            raise ValueError('Input phase_center_coords must be set tp "radec", "hadec", "altaz" or "dircos"')
+
+        if pointing_center_coords not in ['hadec', 'radec', 'altaz', 'dircos']:
+            raise ValueError('Input pointing_center_coords must be set tp "radec", "hadec", "altaz" or "dircos"')
+
+        if obs_dates is None:
+            obs_dates = [self.observer.date] * ntime
+        elif not isinstance(obs_dates, list):
+            raise TypeError('Input obs_dates must be a list')
+        elif len(obs_dates) != ntime:
+            raise ValueError('Input obs_dates must have as many elements as lsts')
+
+        if randomseeds is None:
+            randomseeds = NP.random.randint(1000000, size=ntime)
+        elif len(randomseeds) != ntime:
+            raise ValueError('Input randomseeds must have as many elements as lsts')
+
+        if not isinstance(src_chunksize, int):
+            raise TypeError('Input src_chunksize must be an integer')
+        if src_chunksize < 1:
+            raise ValueError('Input src_chunksize must be positive')
+
+        geometry = [self._snapshot_geometry(lsts[ti], obs_dates[ti], phase_center_coords, pointing_center_coords, phase_center=phase_center, pointing_center=pointing_center) for ti in xrange(ntime)]
+        timestamps = [geom['timestamp'] for geom in geometry]
+        phase_center_dircos = NP.vstack([NP.asarray(geom['phase_center_dircos']).reshape(1,-1) for geom in geometry]) # ntime x 3
+
+        # Rotate the sky to all the LSTs in one pass and select the (time,
+        # source) pairs in the upper hemisphere. The pairs are ordered by 
+        # time and then by catalog index as in member function observe()
+
+        nsrc = self.skymodel.location.shape[0]
+        lst_deg = NP.asarray([geom['lst'] for geom in geometry])
+        ha = lst_deg.reshape(-1,1) - self.skymodel.location[:,0].reshape(1,-1) # ntime x nsrc
+        dec = NP.zeros((ntime,1)) + self.skymodel.location[:,1].reshape(1,-1) # ntime x nsrc
+        altaz = GEOM.hadec2altaz(NP.hstack((ha.reshape(-1,1), dec.reshape(-1,1))), self.latitude, units='degrees') # (ntime x nsrc) x 2
+        visible, = NP.where(altaz[:,0] >= 0.0)
+        altaz = altaz[visible,:]
+        tind, srcind = NP.unravel_index(visible, (ntime, nsrc))
+        srcdircos = GEOM.altaz2dircos(altaz, units='degrees') # nvis x 3
+
+        # Evaluate the voltage patterns in one call for each run of 
+        # consecutive LSTs with the same pointing center
+
+        vbeams = {'P1': [], 'P2': []}
+        tstart = 0
+        while tstart < ntime:
+            tstop = tstart + 1
+            while (tstop < ntime) and NP.array_equal(geometry[tstop]['pointing_center_altaz'], geometry[tstart]['pointing_center_altaz']):
+                tstop += 1
+            rowind = NP.arange(NP.searchsorted(tind, tstart), NP.searchsorted(tind, tstop))
+            if rowind.size > 0:
+                vb = self.generate_voltage_pattern(altaz[rowind,:], pointing_center=geometry[tstart]['pointing_center_altaz'], pointing_info=pointing_info, short_dipole_approx=short_dipole_approx, half_wave_dipole_approx=half_wave_dipole_approx, parallel=parallel_genvb, nproc=nproc)
+                for apol in ['P1', 'P2']:
+                    vbeams[apol] += [vb[apol]]
+            tstart = tstop
+        for apol in ['P1', 'P2']:
+            if len(vbeams[apol]) > 0:
+                vbeams[apol] = NP.concatenate(vbeams[apol], axis=0) # nvis x nchan x (nant or 1)
+
+        # Source amplitudes are computed once for the whole catalog
+
+        nchan = self.f.size
+        nant = len(self.antinfo['labels'])
+        antkeys_sortind = NP.argsort(NP.asarray(self.antinfo['labels'], dtype='|S0'))
+        antpos_sorted = self.antinfo['positions'][antkeys_sortind,:]
+        spec_parms = self.skymodel.spec_parms
+        freq_ratio = self.f.reshape(1,-1) / NP.asarray(spec_parms['freq-ref']).reshape(-1,1) # nsrc x nchan
+        sigmas = NP.sqrt(NP.asarray(spec_parms['flux-scale']).reshape(-1,1) * freq_ratio ** NP.asarray(spec_parms['power-law-index']).reshape(-1,1)) / NP.sqrt(2) # nsrc x nchan
+        nvis_per_time = NP.bincount(tind, minlength=ntime)
+
+        Ef_info = {}
+        for apol in ['P1', 'P2']:
+            Ef_info[apol] = NP.zeros((nchan, nant, ntime), dtype=NP.complex)
+            if visible.size == 0:
+                continue
+            randvals = []
+            for ti in xrange(ntime):
+                randomseed = randomseeds[ti] if apol == 'P1' else randomseeds[ti] + 1000000
+                randstate = NP.random.RandomState(randomseed)
+                randvals += [randstate.normal(loc=0.0, scale=1.0, size=(nvis_per_time[ti],nchan)) + 1j * randstate.normal(loc=0.0, scale=1.0, size=(nvis_per_time[ti],nchan))]
+            randvals = NP.concatenate(randvals, axis=0) # nvis x nchan
+            for rowstart in xrange(0, visible.size, src_chunksize):
+                rowslice = slice(rowstart, min(rowstart+src_chunksize, visible.size))
+                skypos_dot_antpos = NP.dot(srcdircos[rowslice,:], antpos_sorted.T) - NP.dot(phase_center_dircos[tind[rowslice],:], antpos_sorted.T) # nrow x nant
+                k_dot_r_phase = 2.0 * NP.pi * self.f.reshape(1,-1,1) / FCNST.c * skypos_dot_antpos[:,NP.newaxis,:] # nrow x nchan x nant
+                Ef = (sigmas[srcind[rowslice],:] * randvals[rowslice,:])[:,:,NP.newaxis] * vbeams[apol][rowslice,:,:] * NP.exp(1j * k_dot_r_phase) # nrow x nchan x nant
+                uniq_tind, segstart = NP.unique(tind[rowslice], return_index=True)
+                Ef_info[apol][:,:,uniq_tind] += NP.rollaxis(NP.add.reduceat(Ef, segstart, axis=0), 0, 3) # nchan x nant x nuniq
+
+        self.Ef_info = {apol: Ef_info[apol][:,:,-1] for apol in ['P1', 'P2']}
+        self.timestamp = timestamps[-1]
+
+        return (Ef_info, timestamps)
+
+    ############################################################################
+
     def observing_run(self, init_parms, obsmode='track', domain_type='sky',
                       duration=None, pointing_info=None, aperture_updates=None,
                       vbeam_files=None, randomseed=None, 
                       short_dipole_approx=False, half_wave_dipole_approx=False, 
-                      parallel_genvb=False, parallel_genEf=False, nproc=None):
+                      parallel_genvb=False, parallel_genEf=False, nproc=None,
+                      time_blocksize=None, src_chunksize=1024, sink=None):
 
         """
         ------------------------------------------------------------------------
@@ -3512,6 +4397,31 @@ class AntennaArraySimulator(object):
                    number of process cores in the system, it will be reset to 
                    number of process cores in the system minus one to avoid 
                    locking the system out for other processes
+
+        time_blocksize
+                   [integer] If set to None (default), each snapshot is 
+                   simulated by a call to member function observe() and 
+                   appended to the attribute Ef_stack. If set to a positive 
+                   integer, the stack is preallocated for the whole run and 
+                   the snapshots are simulated in blocks of this many LSTs by
+                   member function observe_block(). Blocks with aperture 
+                   updates, with vbeam_files specified, or with domain_type 
+                   set to 'aperture' are simulated one snapshot at a time but
+                   still written into the preallocated stack. Larger blocks 
+                   use more memory for the voltage patterns
+
+        src_chunksize
+                   [integer] Number of (time, source) pairs whose antenna 
+                   phases are computed together in block mode. See member 
+                   function observe_block(). Default=1024
+
+        sink       [instance of class DataStreamWriter] If specified, the 
+                   E-field spectra of each snapshot (or block of snapshots
+                   if time_blocksize is set) are appended to this writer, 
+                   created for instance by member function stream_writer(),
+                   instead of being stacked in the attribute Ef_stack. The 
+                   writer is not closed here. If set to None (default), the
+                   spectra are stacked in memory
         ------------------------------------------------------------------------
         """
 
@@ -3650,22 +4560,146 @@ class AntennaArraySimulator(object):
         elif not isinstance(randomseed, int):
             raise TypeError('If input randomseed is not None, it must be an integer')
 
+        if time_blocksize is not None:
+            if not isinstance(time_blocksize, int):
+                raise TypeError('Input time_blocksize must be an integer')
+            if time_blocksize < 1:
+                raise ValueError('Input time_blocksize must be positive')
+
+        if sink is not None:
+            if not isinstance(sink, DI.DataStreamWriter):
+                raise TypeError('Input sink must be an instance of class DataStreamWriter')
+
         progressbar_loc = (0, WM.term.height)
         writer = WM.Writer(progressbar_loc)
         progress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Iterations '.format(n_nyqseries), PGB.ETA()], maxval=n_nyqseries, fd=writer).start()
-        for i in range(n_nyqseries):
-            self.observe(updated_sdrltime, phase_center_coords, pointing_center_coords, obs_date=updated_obsdate, phase_center=phase_center, pointing_center=pointing_center, pointing_info=pointing_info, domain_type=domain_type, aperture_info=aperture_updates[i], vbeam_files=vbeam_files, randomseed=randomseed+i, stack=True, short_dipole_approx=short_dipole_approx, half_wave_dipole_approx=half_wave_dipole_approx, parallel_genvb=parallel_genvb, parallel_genEf=parallel_genEf, nproc=nproc)
-            obsrvr.date = obsrvr.date + EP.second * self.t.max()
-            updated_sdrltime = NP.degrees(obsrvr.sidereal_time()) / 15.0
-            updated_slrtime = copy.copy(obsrvr.date)
-            updated_obsdate = EP.Date(NP.floor(obsrvr.date - 0.5) + 0.5) # Round it down to beginning of the day
-
-            progress.update(i+1)
+        if time_blocksize is None:
+            for i in range(n_nyqseries):
+                self.observe(updated_sdrltime, phase_center_coords, pointing_center_coords, obs_date=updated_obsdate, phase_center=phase_center, pointing_center=pointing_center, pointing_info=pointing_info, domain_type=domain_type, aperture_info=aperture_updates[i], vbeam_files=vbeam_files, randomseed=randomseed+i, stack=sink is None, short_dipole_approx=short_dipole_approx, half_wave_dipole_approx=half_wave_dipole_approx, parallel_genvb=parallel_genvb, parallel_genEf=parallel_genEf, nproc=nproc)
+                if sink is not None:
+                    self._stream_snapshots(sink, {apol: self.Ef_info[apol][:,:,NP.newaxis] for apol in ['P1', 'P2']}, [self.timestamp])
+                    self.timestamps += [self.timestamp]
+                obsrvr.date = obsrvr.date + EP.second * self.t.max()
+                updated_sdrltime = NP.degrees(obsrvr.sidereal_time()) / 15.0
+                updated_slrtime = copy.copy(obsrvr.date)
+                updated_obsdate = EP.Date(NP.floor(obsrvr.date - 0.5) + 0.5) # Round it down to beginning of the day
+
+                progress.update(i+1)
+        else:
+            sdrltimes = []
+            obsdates = []
+            for i in range(n_nyqseries):
+                sdrltimes += [updated_sdrltime]
+                obsdates += [updated_obsdate]
+                obsrvr.date = obsrvr.date + EP.second * self.t.max()
+                updated_sdrltime = NP.degrees(obsrvr.sidereal_time()) / 15.0
+                updated_obsdate = EP.Date(NP.floor(obsrvr.date - 0.5) + 0.5) # Round it down to beginning of the day
+
+            # Preallocate the stack for the whole run after any existing 
+            # snapshots unless they are streamed to the sink
+
+            if sink is None:
+                nstack = 0
+                for apol in ['P1', 'P2']:
+                    if apol in self.Ef_stack:
+                        nstack = max(nstack, self.Ef_stack[apol].shape[2])
+                for apol in ['P1', 'P2']:
+                    Ef_stack = NP.empty((self.f.size,len(self.antinfo['labels']),nstack+n_nyqseries), dtype=NP.complex)
+                    Ef_stack.fill(NP.nan)
+                    if apol in self.Ef_stack:
+                        Ef_stack[:,:,:self.Ef_stack[apol].shape[2]] = self.Ef_stack[apol]
+                    self.Ef_stack[apol] = Ef_stack
+
+            for i0 in range(0, n_nyqseries, time_blocksize):
+                i1 = min(i0+time_blocksize, n_nyqseries)
+                if (domain_type == 'sky') and (vbeam_files is None) and all([aperture_updates[i] is None for i in range(i0,i1)]):
+                    Ef_block, timestamps = self.observe_block(sdrltimes[i0:i1], phase_center_coords, pointing_center_coords, obs_dates=obsdates[i0:i1], phase_center=phase_center, pointing_center=pointing_center, pointing_info=pointing_info, randomseeds=range(randomseed+i0, randomseed+i1), short_dipole_approx=short_dipole_approx, half_wave_dipole_approx=half_wave_dipole_approx, parallel_genvb=parallel_genvb, nproc=nproc, src_chunksize=src_chunksize)
+                    if sink is None:
+                        for apol in ['P1', 'P2']:
+                            self.Ef_stack[apol][:,:,nstack+i0:nstack+i1] = Ef_block[apol]
+                    else:
+                        self._stream_snapshots(sink, Ef_block, timestamps)
+                    self.timestamps += timestamps
+                else:
+                    for i in range(i0, i1):
+                        self.observe(sdrltimes[i], phase_center_coords, pointing_center_coords, obs_date=obsdates[i], phase_center=phase_center, pointing_center=pointing_center, pointing_info=pointing_info, domain_type=domain_type, aperture_info=aperture_updates[i], vbeam_files=vbeam_files, randomseed=randomseed+i, stack=False, short_dipole_approx=short_dipole_approx, half_wave_dipole_approx=half_wave_dipole_approx, parallel_genvb=parallel_genvb, parallel_genEf=parallel_genEf, nproc=nproc)
+                        if sink is None:
+                            for apol in ['P1', 'P2']:
+                                if apol in self.Ef_info:
+                                    self.Ef_stack[apol][:,:,nstack+i] = self.Ef_info[apol]
+                        else:
+                            self._stream_snapshots(sink, {apol: self.Ef_info[apol][:,:,NP.newaxis] for apol in ['P1', 'P2']}, [self.timestamp])
+                        self.timestamps += [self.timestamp]
+
+                progress.update(i1)
         progress.finish()
 
     ############################################################################
 
-    def save(self, filename, compress=True):
+    def stream_writer(self, outfile, datatypes=['Ef'], layout='complex',
+                      compress_format=None, compress_opts=4, chunk_ntimes=16,
+                      ntimes_total=None, overwrite=False, swmr=True,
+                      queuesize=4):
+
+        """
+        ------------------------------------------------------------------------
+        Create an instance of class DataStreamWriter with the header 
+        information of the simulator, to which an observing run can append 
+        its snapshots as they are simulated (see input sink of member 
+        function observing_run()). The file has the layout written by class
+        DataContainer and can be read by run_EPIC.py, also while the run is 
+        in progress in SWMR mode. Timestamps are written in seconds 
+        (Dublin Julian Date times 86400)
+
+        Inputs:
+
+        outfile     [string] Full path to the output file. The extension 
+                    '.hdf5' is appended
+
+        datatypes, layout, compress_format, compress_opts, chunk_ntimes,
+        ntimes_total, overwrite, swmr, queuesize
+                    See class DataStreamWriter. 'Et' in datatypes writes the
+                    timeseries obtained from the spectra as in member 
+                    function generate_E_timeseries()
+
+        Output:
+
+        Instance of class DataStreamWriter. It must be closed by the caller
+        ------------------------------------------------------------------------
+        """
+
+        nant = len(self.antinfo['labels'])
+        df = self.f[1] - self.f[0]
+        hdr_parms = {'f0': self.f0, 'ant_labels': NP.asarray(self.antinfo['labels']), 'ant_id': NP.arange(nant), 'antpos': self.antinfo['positions'], 'pol': NP.asarray(['P1', 'P2']), 'f': self.f, 'df': df, 'bw': self.f.size * df, 'dT': 1.0 / df, 'dts': 1.0 / (self.f.size * df)}
+        return DI.DataStreamWriter(outfile, hdr_parms, datatypes=datatypes, layout=layout, compress_format=compress_format, compress_opts=compress_opts, chunk_ntimes=chunk_ntimes, ntimes_total=ntimes_total, overwrite=overwrite, swmr=swmr, queuesize=queuesize)
+
+    ############################################################################
+
+    def _stream_snapshots(self, sink, Ef_block, timestamps):
+
+        """
+        ------------------------------------------------------------------------
+        Append a block of E-field spectra of shape nchan x nant x ntime under
+        keys 'P1' and 'P2' with their timestamps (Dublin Julian Date) to an 
+        instance of class DataStreamWriter
+        ------------------------------------------------------------------------
+        """
+
+        data = {}
+        for key in sink.datatypes:
+            data[key] = {}
+            for apol in ['P1', 'P2']:
+                if key == 'Ef':
+                    qty = Ef_block[apol]
+                else:
+                    qty = NP.fft.ifft(NP.fft.ifftshift(Ef_block[apol], axes=0), axis=0)
+                data[key][apol] = NP.ascontiguousarray(NP.transpose(qty, (2,1,0)), dtype=NP.complex64) # ntime x nant x nchan
+        sink.write(data, NP.asarray(timestamps, dtype=NP.float64) * 86400.0)
+
+    ############################################################################
+
+    def save(self, filename, compress=True, compress_format='gzip',
+             compress_opts=9):
         
         """
         ------------------------------------------------------------------------
@@ -3682,10 +4716,25 @@ class AntennaArraySimulator(object):
         Keyword Inputs:
 
         compress    [boolean] If set to True (default), will compress the data
-                    arrays in GZIP format
+                    arrays in the format given by compress_format
+
+        compress_format
+                    [string] Compression format of the data arrays. Accepted
+                    values are 'gzip' (default) and 'lzf'
+
+        compress_opts
+                    [integer] Compression level if compress_format is 'gzip'.
+                    Default=9
         ------------------------------------------------------------------------
         """
 
+        if compress:
+            if compress_format not in ['gzip', 'lzf']:
+                raise ValueError('Input compress_format must be set to "gzip" or "lzf"')
+            dset_kwargs = {'compression': compress_format}
+            if compress_format == 'gzip':
+                dset_kwargs['compression_opts'] = compress_opts
+
         with h5py.File(filename+'.hdf5', 'w') as fileobj:
             obsparm_group = fileobj.create_group('obsparm')
             obsparm_group['f0'] = self.f0
@@ -3719,7 +4768,7 @@ class AntennaArraySimulator(object):
                 for pol in ['P1', 'P2']:
                     if pol in self.Ef_info:
                         if compress:
-                            dset = spec_group.create_dataset('current/'+pol, data=self.Ef_info[pol], compression="gzip", compression_opts=9)
+                            dset = spec_group.create_dataset('current/'+pol, data=self.Ef_info[pol], **dset_kwargs)
                         else:
                             spec_group['current/'+pol] = self.Ef_info[pol]
                 spec_group['current'].attrs['timestamp'] = self.timestamp
@@ -3727,7 +4776,7 @@ class AntennaArraySimulator(object):
                 for pol in ['P1', 'P2']:
                     if pol in self.Ef_stack:
                         if compress:
-                            dset = spec_group.create_dataset('tstack/'+pol, data=self.Ef_stack[pol], compression="gzip", compression_opts=9)
+                            dset = spec_group.create_dataset('tstack/'+pol, data=self.Ef_stack[pol], **dset_kwargs)
                         else:
                             spec_group['tstack/'+pol] = self.Ef_stack[pol]
 
@@ -3736,7 +4785,7 @@ class AntennaArraySimulator(object):
                 for pol in ['P1', 'P2']:
                     if pol in self.Et_info:
                         if compress:
-                            dset = time_group.create_dataset('current/'+pol, data=self.Et_info[pol], compression="gzip", compression_opts=9)
+                            dset = time_group.create_dataset('current/'+pol, data=self.Et_info[pol], **dset_kwargs)
                         else:
                             time_group['current/'+pol] = self.Et_info[pol]
                 time_group['current'].attrs['timestamp'] = self.timestamp
@@ -3744,7 +4793,7 @@ class AntennaArraySimulator(object):
                 for pol in ['P1', 'P2']:
                     if pol in self.Et_stack:
                         if compress:
-                            dset = time_group.create_dataset('tstack/'+pol, data=self.Et_stack[pol], compression="gzip", compression_opts=9)
+                            dset = time_group.create_dataset('tstack/'+pol, data=self.Et_stack[pol], **dset_kwargs)
                         else:
                             time_group['tstack/'+pol] = self.Et_stack[pol]
                         
@@ -0,0 +1,58 @@
+#!python
+
+import numpy as NP
+import os
+import tempfile
+import time
+import argparse
+from epic import data_interface as DI
+
+if __name__ == '__main__':
+
+    ## Parse input arguments
+
+    parser = argparse.ArgumentParser(description='Program to compare the read throughput of the storage layouts of EPIC-format data files')
+
+    input_group = parser.add_argument_group('Input parameters', 'Input specifications')
+    input_group.add_argument('--ntimes', dest='ntimes', default=256, type=int, required=False, help='Number of timestamps in the synthetic data')
+    input_group.add_argument('--nant', dest='nant', default=256, type=int, required=False, help='Number of antennas in the synthetic data')
+    input_group.add_argument('--nchan', dest='nchan', default=64, type=int, required=False, help='Number of frequency channels in the synthetic data')
+    input_group.add_argument('--chunks', dest='chunks', default=[1, 16, 64], type=int, nargs='+', required=False, help='Number of timestamps per chunk to test')
+    input_group.add_argument('--blocksize', dest='blocksize', default=16, type=int, required=False, help='Minimum number of timestamps read in a block by the streamer')
+    input_group.add_argument('--tmpdir', dest='tmpdir', default=None, type=str, required=False, help='Directory in which the test files are written')
+
+    args = vars(parser.parse_args())
+    ntimes = args['ntimes']
+    nant = args['nant']
+    nchan = args['nchan']
+    npol = 2
+
+    ## Synthetic 4-bit like electric fields
+
+    randstate = NP.random.RandomState(0)
+    pols = ['P{0}'.format(polind+1) for polind in range(npol)]
+    Ef = {pol: {qty: randstate.randint(-8, 8, size=(ntimes,nant,nchan)).astype(NP.float32) for qty in ['real', 'imag']} for pol in pols}
+    bw = 100e3
+    f0 = 74e6
+    init_parms = {'f0': f0, 'ant_labels': NP.asarray(map(str, range(nant))), 'ant_id': NP.arange(nant), 'antpos': randstate.uniform(-50.0, 50.0, size=(nant,3)), 'pol': NP.asarray(pols), 'f': f0 + (NP.arange(nchan) - nchan/2) * bw / nchan, 'df': bw/nchan, 'bw': bw, 'dT': nchan/bw, 'dts': 1/bw, 'timestamps': NP.arange(ntimes) * nchan / bw, 'Ef': Ef, 'cable_delays': {pol: NP.zeros(nant) for pol in pols}}
+    dc = DI.DataContainer(ntimes, nant, nchan, npol, init_parms=init_parms, init_file=None)
+
+    options = [('split', 'gzip'), ('split', 'lzf'), ('split', None), ('complex', 'lzf'), ('complex', None)]
+    nbytes = ntimes * nant * nchan * npol * NP.dtype(NP.complex64).itemsize
+    tmpdir = tempfile.mkdtemp(dir=args['tmpdir'])
+
+    print '{0:>8s} {1:>6s} {2:>6s} {3:>10s} {4:>10s} {5:>10s} {6:>10s}'.format('layout', 'codec', 'chunk', 'size [MB]', 'write [s]', 'read [s]', 'read MB/s')
+    for chunk_ntimes in args['chunks']:
+        for layout, codec in options:
+            outfile = tmpdir + '/{0}_{1}_{2:0d}'.format(layout, codec, chunk_ntimes)
+            t1 = time.time()
+            dc.save(outfile, overwrite=True, compress=codec is not None, compress_format=codec, compress_opts=9, layout=layout, chunk_ntimes=chunk_ntimes)
+            t2 = time.time()
+            with DI.BlockDataStreamer(outfile+'.hdf5', datatype='Ef', blocksize=args['blocksize']) as dstream:
+                for ti, data in dstream.iterate():
+                    pass
+            t3 = time.time()
+            fsize = os.path.getsize(outfile+'.hdf5') / 1e6
+            os.remove(outfile+'.hdf5')
+            print '{0:>8s} {1:>6s} {2:6d} {3:10.2f} {4:10.3f} {5:10.3f} {6:10.1f}'.format(layout, str(codec), chunk_ntimes, fsize, t2-t1, t3-t2, nbytes/1e6/(t3-t2))
+    os.rmdir(tmpdir)
@@ -0,0 +1,70 @@
+#!python
+
+import numpy as NP
+import scipy.sparse as SpM
+import time
+import argparse
+from epic import antenna_array as AA
+
+if __name__ == '__main__':
+
+    ## Parse input arguments
+
+    parser = argparse.ArgumentParser(description='Program to compare the serial and threaded sparse antenna-to-grid mapping products')
+
+    input_group = parser.add_argument_group('Input parameters', 'Input specifications')
+    input_group.add_argument('--nant', dest='nant', default=256, type=int, required=False, help='Number of antennas')
+    input_group.add_argument('--nchan', dest='nchan', default=128, type=int, required=False, help='Number of frequency channels')
+    input_group.add_argument('--ngrid', dest='ngrid', default=128, type=int, required=False, help='Number of grid cells along u and v')
+    input_group.add_argument('--footprint', dest='footprint', default=5, type=int, required=False, help='Width (in grid cells) of the square kernel footprint of an antenna')
+    input_group.add_argument('--ntimes', dest='ntimes', default=1, type=int, required=False, help='Number of timestamps gridded in a block')
+    input_group.add_argument('--nthreads', dest='nthreads', default=[1, 2, 4, 8], type=int, nargs='+', required=False, help='Numbers of threads to test')
+    input_group.add_argument('--nrepeat', dest='nrepeat', default=5, type=int, required=False, help='Number of repetitions of each product')
+
+    args = vars(parser.parse_args())
+    nant = args['nant']
+    nchan = args['nchan']
+    ngrid = args['ngrid']
+    fpw = args['footprint']
+    ntimes = args['ntimes']
+    nrepeat = args['nrepeat']
+
+    ## Synthetic antenna-to-grid mapping matrix with a square footprint per antenna per channel
+
+    randstate = NP.random.RandomState(0)
+    ant_u = randstate.randint(0, ngrid-fpw, size=nant)
+    ant_v = randstate.randint(0, ngrid-fpw, size=nant)
+    du, dv = NP.meshgrid(NP.arange(fpw), NP.arange(fpw))
+    antind = NP.repeat(NP.arange(nant), nchan*fpw*fpw)
+    chanind = NP.tile(NP.repeat(NP.arange(nchan), fpw*fpw), nant)
+    u_gridind = ant_u[antind] + NP.tile(du.ravel(), nant*nchan)
+    v_gridind = ant_v[antind] + NP.tile(dv.ravel(), nant*nchan)
+    sprow = NP.ravel_multi_index((v_gridind, u_gridind, chanind), (ngrid, ngrid, nchan))
+    spcol = chanind + antind * nchan
+    spval = (randstate.uniform(size=sprow.size) + 1j * randstate.uniform(size=sprow.size)) / (fpw * fpw)
+    spmat = SpM.csr_matrix((spval, (sprow, spcol)), shape=(ngrid*ngrid*nchan, nant*nchan))
+
+    Ef = (randstate.standard_normal(size=(nant*nchan,ntimes)) + 1j * randstate.standard_normal(size=(nant*nchan,ntimes))).astype(NP.complex64)
+    wts = NP.ones(Ef.shape, dtype=NP.float32)
+
+    print 'Mapping matrix of size {0:0d} x {1:0d} with {2:0d} non-zero elements'.format(spmat.shape[0], spmat.shape[1], spmat.nnz)
+
+    ## Reference: separate serial products for electric fields and weights
+
+    t1 = time.time()
+    for i in xrange(nrepeat):
+        ref_Ef = spmat.dot(Ef)
+        ref_wts = spmat.dot(wts)
+    t_ref = (time.time() - t1) / nrepeat
+
+    print '{0:>10s} {1:>10s} {2:>10s} {3:>10s}'.format('nthreads', 'time [s]', 'speedup', 'identical')
+    print '{0:>10s} {1:10.4f} {2:10.2f} {3:>10s}'.format('serial', t_ref, 1.0, 'True')
+    for nthreads in args['nthreads']:
+        spmm = AA.ThreadedSparseMapper(spmat, nthreads=nthreads)
+        t1 = time.time()
+        for i in xrange(nrepeat):
+            gridded = spmm.dot(NP.hstack((Ef, wts)))
+        t_spmm = (time.time() - t1) / nrepeat
+        spmm.close()
+        identical = NP.array_equal(gridded[:,:ntimes], ref_Ef) and NP.array_equal(gridded[:,ntimes:], ref_wts)
+        print '{0:10d} {1:10.4f} {2:10.2f} {3:>10s}'.format(nthreads, t_spmm, t_ref/t_spmm, str(identical))
@@ -34,6 +34,12 @@ if __name__ == '__main__':
     outfile = outdir + ioparms['outfile']
     compress_fmt = ioparms['compress_fmt']
     compress_opts = ioparms['compress_opts']
+    data_layout = ioparms.get('layout', None)
+    if data_layout is None:
+        data_layout = 'split'
+    chunk_ntimes = ioparms.get('chunk_ntimes', None)
+    if chunk_ntimes is None:
+        chunk_ntimes = 1
 
     instrumentinfo = parms['instrumentinfo']
     station_name = instrumentinfo['station']
@@ -96,7 +102,7 @@ if __name__ == '__main__':
     if channelize:
         init_parms['Ef'] = {'P{0}'.format(polind+1): {'real': Ef['P{0}'.format(polind+1)].real, 'imag': Ef['P{0}'.format(polind+1)].imag} for polind in range(npol)}
     dc = DI.DataContainer(ntimetags, len(antennas)/2, nchan, npol, init_parms=init_parms, init_file=None)
-    dc.save(outfile, overwrite=True, compress=True, compress_format=compress_fmt, compress_opts=compress_opts)
+    dc.save(outfile, overwrite=True, compress=compress_fmt is not None, compress_format=compress_fmt, compress_opts=compress_opts, layout=data_layout, chunk_ntimes=chunk_ntimes)
     
     PDB.set_trace()
     
@@ -2,6 +2,7 @@
 
 import sys, copy
 import subprocess
+import threading, Queue
 import numpy as NP
 import yaml, argparse, warnings
 import h5py
@@ -55,6 +56,121 @@ def h5repack(infile, h5repack_path, fs_strategy='FSM_AGGR', outfile=None):
     else:
         return (mv_result, h5repack_result, rm_result, None)
 
+def queue_put(queue, entry, abort):
+    while not abort.is_set():
+        try:
+            queue.put(entry, timeout=0.1)
+        except Queue.Full:
+            continue
+        else:
+            return True
+    return False
+
+def queue_get(queue, abort):
+    while not abort.is_set():
+        try:
+            return (True, queue.get(timeout=0.1))
+        except Queue.Empty:
+            continue
+    return (False, None)
+
+class PipelineStage(object):
+
+    """
+    ----------------------------------------------------------------------------
+    Stage of the streaming imaging pipeline. Worker threads take (seq, item)
+    entries from a bounded input queue, process them with a function and 
+    put the results on a bounded output queue. A None entry marks the end 
+    of the stream and is passed on once all the workers have finished. 
+
+    func        [function] called as func(seq, item) by the workers. Its
+                return value is put on the output queue unless it is None
+
+    finalize    [function] called as finalize() by the last worker to 
+                finish. Its return value, a (seq, item) tuple, is put on the
+                output queue before the end of the stream unless it is None
+
+    nworkers    [integer] Number of worker threads
+
+    ordered     [boolean] If True, entries are processed in increasing order 
+                of seq (which must be consecutive) with a single worker 
+                thread, irrespective of the order of arrival
+    ----------------------------------------------------------------------------
+    """
+
+    def __init__(self, name, func, iqueue, oqueue=None, nworkers=1,
+                 ordered=False, finalize=None, abort=None):
+        if not isinstance(nworkers, int):
+            raise TypeError('Number of workers in pipeline stage {0} must be an integer'.format(name))
+        if nworkers < 1:
+            raise ValueError('Number of workers in pipeline stage {0} must be positive'.format(name))
+        if ordered and (nworkers > 1):
+            raise ValueError('Pipeline stage {0} holds order-dependent state and accepts only one worker'.format(name))
+        self.name = name
+        self.func = func
+        self.finalize = finalize
+        self.iqueue = iqueue
+        self.oqueue = oqueue
+        self.nworkers = nworkers
+        self.ordered = ordered
+        if abort is None:
+            abort = threading.Event()
+        self.abort = abort
+        self.error = None
+        self.lock = threading.Lock()
+        self.nactive = nworkers
+        self.threads = [threading.Thread(target=self.main, name='{0}-{1:0d}'.format(name, i)) for i in xrange(nworkers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def process(self, seq, item):
+        out = self.func(seq, item)
+        if (out is not None) and (self.oqueue is not None):
+            queue_put(self.oqueue, (seq, out), self.abort)
+
+    def main(self):
+        pending = {}
+        next_seq = 0
+        try:
+            while True:
+                ok, entry = queue_get(self.iqueue, self.abort)
+                if not ok:
+                    break
+                if entry is None:
+                    queue_put(self.iqueue, None, self.abort) # Let sibling workers see the end of the stream too
+                    break
+                if self.ordered:
+                    pending[entry[0]] = entry[1]
+                    while next_seq in pending:
+                        self.process(next_seq, pending.pop(next_seq))
+                        next_seq += 1
+                else:
+                    self.process(*entry)
+        except Exception:
+            self.error = sys.exc_info()
+            self.abort.set()
+        finally:
+            with self.lock:
+                self.nactive -= 1
+                last = self.nactive == 0
+            if last and (self.oqueue is not None):
+                if (self.error is None) and (self.finalize is not None) and (not self.abort.is_set()):
+                    try:
+                        entry = self.finalize()
+                        if entry is not None:
+                            queue_put(self.oqueue, entry, self.abort)
+                    except Exception:
+                        self.error = sys.exc_info()
+                        self.abort.set()
+                queue_put(self.oqueue, None, self.abort)
+
 if __name__ == '__main__':
     
     ## Parse input arguments
@@ -87,8 +203,17 @@ if __name__ == '__main__':
             raise ValueError('Invalid value specified in h5fs_strategy')
         h5info['h5fs_strategy'] = h5info['h5fs_strategy'].upper()
 
-    with h5py.File(infile, 'r') as fileobj:
+    stream_timeout = parms['procinfo'].get('stream_timeout', None)
+    if stream_timeout is not None:
+        if not isinstance(stream_timeout, (int,float)):
+            raise TypeError('Input stream_timeout must be a scalar')
+        if stream_timeout <= 0.0:
+            raise ValueError('Input stream_timeout must be positive')
+
+    with h5py.File(infile, 'r', swmr=stream_timeout is not None) as fileobj:
         ntimes = fileobj['header']['ntimes'].value
+        if (stream_timeout is not None) and ('ntimes_total' in fileobj['header']):
+            ntimes = fileobj['header']['ntimes_total'].value # File still being written
         nant = fileobj['header']['nant'].value
         nchan = fileobj['header']['nchan'].value
         npol = fileobj['header']['npol'].value
@@ -204,6 +329,80 @@ if __name__ == '__main__':
         parallelize_update = True
     imgnproc = procinfo['imgnproc']
     acorrnproc = procinfo['acorrgrid_nproc']
+    mapping_cachedir = procinfo.get('mapping_cachedir', None)
+    crosswts_cachedir = procinfo.get('crosswts_cachedir', None)
+    crosswts_cache_size = procinfo.get('crosswts_cache_size', None)
+    if crosswts_cache_size is not None:
+        if not isinstance(crosswts_cache_size, int):
+            raise TypeError('Input crosswts_cache_size must be an integer')
+        if crosswts_cache_size < 1:
+            raise ValueError('Input crosswts_cache_size must be positive')
+    stack_depth = procinfo.get('stack_depth', None)
+    if stack_depth is None:
+        stack_depth = n_t_acc
+    else:
+        if not isinstance(stack_depth, int):
+            raise TypeError('Input stack_depth must be an integer')
+        if stack_depth < n_t_acc:
+            raise ValueError('Input stack_depth must not be less than number of snapshots in t_acc')
+    stream_blocksize = procinfo.get('stream_blocksize', None)
+    if stream_blocksize is None:
+        stream_blocksize = 16
+    else:
+        if not isinstance(stream_blocksize, int):
+            raise TypeError('Input stream_blocksize must be an integer')
+        if stream_blocksize < 1:
+            raise ValueError('Input stream_blocksize must be positive')
+    fft_backend = procinfo.get('fft_backend', None)
+    if fft_backend is not None:
+        if fft_backend not in ['numpy', 'scipy', 'pyfftw']:
+            raise ValueError('Input fft_backend must be set to "numpy", "scipy" or "pyfftw"')
+    fft_nthreads = procinfo.get('fft_nthreads', None)
+    if fft_nthreads is not None:
+        if not isinstance(fft_nthreads, int):
+            raise TypeError('Input fft_nthreads must be an integer')
+        if fft_nthreads < 1:
+            raise ValueError('Input fft_nthreads must be positive')
+    extfile_flush_interval = procinfo.get('extfile_flush_interval', None)
+    if extfile_flush_interval is not None:
+        if not isinstance(extfile_flush_interval, int):
+            raise TypeError('Input extfile_flush_interval must be an integer')
+        if extfile_flush_interval < 1:
+            raise ValueError('Input extfile_flush_interval must be positive')
+    accumulator_parms = procinfo.get('accumulator', None)
+    if accumulator_parms is not None:
+        if not isinstance(accumulator_parms, dict):
+            raise TypeError('Input accumulator must be a dictionary')
+        for key in accumulator_parms:
+            if key not in ['checkpoint', 'precision']:
+                raise KeyError('Invalid accumulator parameter {0} specified'.format(key))
+        accumulator_parms = {'checkpoint_interval': accumulator_parms.get('checkpoint', None), 'precision': accumulator_parms.get('precision', 'single')}
+    pipeline_workers = procinfo.get('pipeline', None)
+    pipeline_depth = 4
+    if pipeline_workers is not None:
+        if not isinstance(pipeline_workers, dict):
+            raise TypeError('Input pipeline must be a dictionary')
+        if grid_map_method != 'sparse':
+            raise ValueError('Input pipeline applies only if grid_map is set to "sparse"')
+        pipeline_workers = copy.copy(pipeline_workers)
+        pipeline_depth = pipeline_workers.pop('depth', pipeline_depth)
+        if not isinstance(pipeline_depth, int):
+            raise TypeError('Input pipeline depth must be an integer')
+        if pipeline_depth < 1:
+            raise ValueError('Input pipeline depth must be positive')
+        for stagename in pipeline_workers:
+            if stagename not in ['reader', 'calibrate', 'grid', 'accumulate', 'writer']:
+                raise KeyError('Invalid pipeline stage {0} specified'.format(stagename))
+        for stagename in ['reader', 'calibrate', 'grid', 'accumulate', 'writer']:
+            if pipeline_workers.get(stagename, None) is None:
+                pipeline_workers[stagename] = 1
+            if not isinstance(pipeline_workers[stagename], int):
+                raise TypeError('Number of workers in pipeline stage {0} must be an integer'.format(stagename))
+            if pipeline_workers[stagename] < 1:
+                raise ValueError('Number of workers in pipeline stage {0} must be positive'.format(stagename))
+        for stagename in ['reader', 'calibrate', 'accumulate', 'writer']:
+            if pipeline_workers[stagename] > 1: # Serialized on the open input file, the antenna array, the accumulated products and the external file respectively
+                raise ValueError('Pipeline stage {0} accepts only one worker'.format(stagename))
     
     if h5info['h5repack_path'] is not None:
         if h5info['h5repack_interval'] is None:
@@ -222,9 +421,9 @@ if __name__ == '__main__':
     aprtr = APR.Aperture(pol_type=ant_pol_type, kernel_type=ant_kerntype, shape=ant_kernshape, parms=ant_kernshapeparms, lkpinfo=lookup_file, load_lookup=True)
 
     ants = []
-    aar = AA.AntennaArray()
+    aar = AA.AntennaArray(stack_depth=stack_depth)
     for ai in xrange(nant):
-        ant = AA.Antenna('{0}'.format(ant_id[ai]), '0', latitude, longitude, antpos[ai,:], f0, nsamples=nchan, aperture=aprtr)
+        ant = AA.Antenna('{0}'.format(ant_id[ai]), '0', latitude, longitude, antpos[ai,:], f0, nsamples=nchan, aperture=aprtr, stack_depth=stack_depth)
         ant.f = channels
         ants += [ant]
         aar = aar + ant
@@ -234,90 +433,265 @@ if __name__ == '__main__':
 
     antpos_info = aar.antenna_positions(sort=True, centering=True)
     
-    dstream = DI.DataStreamer()
+    if (data_type.lower() == 'ef') and (lookup_file is not None): # Bulk ingest does not carry antenna weights, so set them once
+        wts_update = {'antennas': [{'label': label, 'action': 'modify', 'gridfunc_freq': 'scale', 'stack': False, 'wtsinfo': {pol: [{'orientation':0.0, 'lookup':lookup_file}] for pol in ['P1', 'P2']}} for label in aar.antennas]}
+        aar.update(wts_update, parallel=False, verbose=False)
 
-    tprogress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Timestamps '.format(len(range(mintime_ind, maxtime_ind+1))), PGB.ETA()], maxval=len(range(mintime_ind, maxtime_ind+1))).start()
-    for ti in range(mintime_ind, maxtime_ind+1):
-        timestamp = timestamps[ti]
-        update_info = {}
-        update_info['antennas'] = []
-        update_info['antenna_array'] = {}
-        update_info['antenna_array']['timestamp'] = timestamp
-        
-        dstream.load(infile, ti, datatype=data_type, pol=None)
-        print 'Consolidating Antenna updates at timestamp (#{0}) {1:.7f}'.format(ti, timestamp)
-        aprogress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Antennas '.format(nant), PGB.ETA()], maxval=nant).start()
-        antnum = 0
-
-        for label in aar.antennas:
-            adict = {}
-            adict['label'] = label
-            adict['action'] = 'modify'
-            adict['timestamp'] = timestamp
-            # ind = antpos_info['labels'].index(label)
-            ind = NP.where(dstream.antinfo['ant_labels'] == label)[0]
-            adict['gridfunc_freq'] = 'scale'    
-            adict['gridmethod'] = 'NN'
-            adict['distNN'] = 3.0
-            adict['tol'] = 1.0e-6
-            adict['maxmatch'] = 1
-            adict[data_type] = {}
-            adict['flags'] = {}
-            adict['stack'] = True
-            if lookup_file is None:
-                adict['wtsinfo'] = None
+    ingest_info = {}
+    def calibrate_snapshot(ti, timestamp, data, antinfo, parallel=parallelize_update):
+        if data_type.lower() == 'ef': # Bulk ingest of all antennas in one step
+            print 'Ingesting Antenna updates at timestamp (#{0}) {1:.7f}'.format(ti, timestamp)
+            if 'ind' not in ingest_info:
+                file_ant_labels = list(antinfo['ant_labels'])
+                ingest_info['ind'] = NP.asarray([file_ant_labels.index(label) for label in sorted(aar.antennas.keys())])
+                ingest_delays = {pol: stand_cable_delays[pol][ingest_info['ind']] for pol in ['P1', 'P2']}
             else:
-                adict['wtsinfo'] = {}
-            adict['delaydict'] = {}
-            for pol in ['P1', 'P2']:
-                adict['flags'][pol] = False
-                adict['delaydict'][pol] = {}
-                adict['delaydict'][pol]['frequencies'] = channels
-                adict['delaydict'][pol]['delays'] = stand_cable_delays[pol][ind]
-                adict[data_type][pol] = dstream.data[pol]['real'][ind,:].astype(NP.float32) + 1j * dstream.data[pol]['imag'][ind,:].astype(NP.float32)
-                if lookup_file is not None:
-                    adict['wtsinfo'][pol] = [{'orientation':0.0, 'lookup':lookup_file}]
-                if (NP.sum(NP.abs(adict[data_type][pol])) < 1e-10) or (NP.any(NP.isnan(adict[data_type][pol]))):
-                    adict['flags'][pol] = True
+                ingest_delays = None
+            ingest_ind = ingest_info['ind']
+            Ef = NP.dstack([data[pol][ingest_ind,:] for pol in ['P1', 'P2']])
+            aar.ingest(timestamp, Ef, flags=None, delays=ingest_delays, stack=True)
+        else:
+            update_info = {}
+            update_info['antennas'] = []
+            update_info['antenna_array'] = {}
+            update_info['antenna_array']['timestamp'] = timestamp
+        
+            print 'Consolidating Antenna updates at timestamp (#{0}) {1:.7f}'.format(ti, timestamp)
+            aprogress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Antennas '.format(nant), PGB.ETA()], maxval=nant).start()
+            antnum = 0
+
+            for label in aar.antennas:
+                adict = {}
+                adict['label'] = label
+                adict['action'] = 'modify'
+                adict['timestamp'] = timestamp
+                # ind = antpos_info['labels'].index(label)
+                ind = NP.where(antinfo['ant_labels'] == label)[0]
+                adict['gridfunc_freq'] = 'scale'    
+                adict['gridmethod'] = 'NN'
+                adict['distNN'] = 3.0
+                adict['tol'] = 1.0e-6
+                adict['maxmatch'] = 1
+                adict[data_type] = {}
+                adict['flags'] = {}
+                adict['stack'] = True
+                if lookup_file is None:
+                    adict['wtsinfo'] = None
                 else:
+                    adict['wtsinfo'] = {}
+                adict['delaydict'] = {}
+                for pol in ['P1', 'P2']:
                     adict['flags'][pol] = False
+                    adict['delaydict'][pol] = {}
+                    adict['delaydict'][pol]['frequencies'] = channels
+                    adict['delaydict'][pol]['delays'] = stand_cable_delays[pol][ind]
+                    adict[data_type][pol] = data[pol][ind,:]
+                    if lookup_file is not None:
+                        adict['wtsinfo'][pol] = [{'orientation':0.0, 'lookup':lookup_file}]
+                    if (NP.sum(NP.abs(adict[data_type][pol])) < 1e-10) or (NP.any(NP.isnan(adict[data_type][pol]))):
+                        adict['flags'][pol] = True
+                    else:
+                        adict['flags'][pol] = False
                 
-            update_info['antennas'] += [copy.copy(adict)]
+                update_info['antennas'] += [copy.copy(adict)]
             
-            aprogress.update(antnum+1)
-            antnum += 1
-        aprogress.finish()
+                aprogress.update(antnum+1)
+                antnum += 1
+            aprogress.finish()
         
-        aar.update(update_info, parallel=parallelize_update, nproc=updatenproc, verbose=True)
-        if grid_map_method == 'regular':
-            aar.grid_convolve_new(pol='P1', method='NN', distNN=0.5*NP.sqrt(ant_sizex**2+ant_sizey**2), identical_antennas=antennas_identical, cal_loop=False, gridfunc_freq='scale', wts_change=False, parallel=False, pp_method='pool')    
-        else:
+            aar.update(update_info, parallel=parallel, nproc=updatenproc, verbose=True)
+
+    tprogress = PGB.ProgressBar(widgets=[PGB.Percentage(), PGB.Bar(marker='-', left=' |', right='| '), PGB.Counter(), '/{0:0d} Timestamps '.format(len(range(mintime_ind, maxtime_ind+1))), PGB.ETA()], maxval=len(range(mintime_ind, maxtime_ind+1))).start()
+
+    dstream = DI.BlockDataStreamer(infile, datatype=data_type, pol=None, blocksize=stream_blocksize, swmr=stream_timeout is not None, timeout=stream_timeout)
+    if pipeline_workers is None:
+        for ti, data in dstream.iterate(mintime_ind, maxtime_ind+1):
+            timestamp = dstream.timestamps[ti]
+            calibrate_snapshot(ti, timestamp, data, dstream.antinfo)
+            if grid_map_method == 'regular':
+                aar.grid_convolve_new(pol='P1', method='NN', distNN=0.5*NP.sqrt(ant_sizex**2+ant_sizey**2), identical_antennas=antennas_identical, cal_loop=False, gridfunc_freq='scale', wts_change=False, parallel=False, pp_method='pool')    
+            else:
+                if ti == mintime_ind:
+                    aar.genMappingMatrix(pol='P1', method='NN', distNN=0.5*NP.sqrt(ant_sizex**2+ant_sizey**2), identical_antennas=antennas_identical, gridfunc_freq='scale', wts_change=False, parallel=False, cachedir=mapping_cachedir)
+
             if ti == mintime_ind:
-                aar.genMappingMatrix(pol='P1', method='NN', distNN=0.5*NP.sqrt(ant_sizex**2+ant_sizey**2), identical_antennas=antennas_identical, gridfunc_freq='scale', wts_change=False, parallel=False)
+                ti_evalACwts = mintime_ind - 1
+                ti_h5repack = mintime_ind - 1
+                aar.setCrossWtsCache(cachedir=crosswts_cachedir, maxsize=crosswts_cache_size)
+                aar.evalAntennaAutoCorrWts(forceeval=True)
+                efimgobj = AA.Image(antenna_array=aar, pol='P1', extfile=outfile)
+                if extfile_flush_interval is not None:
+                    efimgobj.open_extwriter(flush_interval=extfile_flush_interval)
+                if accumulator_parms is not None:
+                    efimgobj.open_accumulator(**accumulator_parms)
+            else:
+                efimgobj.update(antenna_array=aar, reset=True)
+            efimgobj.imagr(pol='P1', weighting='natural', pad=0, stack=False, grid_map_method=grid_map_method, cal_loop=False, nproc=imgnproc, fft_backend=fft_backend, fft_nthreads=fft_nthreads)
+
+            if ti-ti_evalACwts == n_t_acc:
+                efimgobj.evalAutoCorr(pol='P1', datapool='avg', forceeval_autowts=False, forceeval_autocorr=True, nproc=acorrnproc, save=True, verbose=True)
+                efimgobj.average(pol='P1', datapool='accumulate', autocorr_op='mask', verbose=True)
+                efimgobj.reset_extfile(datapool=None)
+                ti_evalACwts = ti
+
+            if h5info['h5repack_path'] is not None:
+                if ti - ti_h5repack == n_t_h5repack:
+                    efimgobj.close_extwriter()
+                    mv_result, h5repack_result, rm_result, x = h5repack(efimgobj.extfile, h5info['h5repack_path'], fs_strategy=h5info['h5fs_strategy'], outfile=None)
+                    if x is not None:
+                        warnings.warn(str(x))
+                    if extfile_flush_interval is not None:
+                        efimgobj.open_extwriter(flush_interval=extfile_flush_interval)
+                    ti_h5repack = ti
+
+            tprogress.update(ti+1)
+        if maxtime_ind >= mintime_ind:
+            efimgobj.close_accumulator()
+            efimgobj.close_extwriter()
+    else:
+
+        # Streaming pipeline: reader -> calibrate/phase -> grid+FFT -> 
+        # accumulate -> writer, connected by bounded queues. The antenna
+        # array is only modified in the calibrate stage and the external 
+        # file only in the writer stage. Auto-correlations are evaluated 
+        # in the calibrate stage when an accumulation interval ends, since
+        # the antenna array stacks move on before the writer gets there.
+
+        pipeline_state = {'ti_evalACwts': mintime_ind - 1, 'ti_h5repack': mintime_ind - 1, 'twts': None, 'illum_version': -1}
+        reader_lock = threading.Lock()
+
+        def read_snapshot(seq, ti):
+            with reader_lock: # Readers share the open file and its current block
+                data = dict(dstream.load(ti))
+                timestamp = dstream.timestamps[ti]
+            return {'ti': ti, 'timestamp': timestamp, 'data': data, 'antinfo': dstream.antinfo}
+
+        def calibrate_and_phase(seq, item):
+            ti = item['ti']
+            calibrate_snapshot(ti, item['timestamp'], item['data'], item['antinfo'], parallel=False)
+            if seq == 0:
+                aar.genMappingMatrix(pol='P1', method='NN', distNN=0.5*NP.sqrt(ant_sizex**2+ant_sizey**2), identical_antennas=antennas_identical, gridfunc_freq='scale', wts_change=False, parallel=False, cachedir=mapping_cachedir)
+                aar.setCrossWtsCache(cachedir=crosswts_cachedir, maxsize=crosswts_cache_size)
+                aar.evalAntennaAutoCorrWts(forceeval=True)
+                pipeline_state['efimgobj'] = AA.Image(antenna_array=aar, pol='P1', extfile=outfile)
+            efinfo = aar.get_E_fields('P1', flag=None, tselect=-1, fselect=None, aselect=None, datapool='current', sort=True)
+            twts = efinfo['twts']  # 1 x n_ant x 1
+            if (pipeline_state['twts'] is None) or (not NP.array_equal(pipeline_state['twts'], twts)): # Gridded illumination and PSF change with antenna flags
+                pipeline_state['twts'] = NP.copy(twts)
+                pipeline_state['illum_version'] += 1
+            Ef = (efinfo['E-fields'] * twts).astype(NP.complex64)  # 1 x n_ant x nchan
+            wts = twts * NP.ones(aar.f.size).reshape(1,1,-1)
+            autocorr = None
+            if ti - pipeline_state['ti_evalACwts'] == n_t_acc:
+                autocorr = aar.makeAutoCorrCube(pol=['P1'], datapool='avg', tbinsize=pipeline_state['efimgobj'].tbinsize, forceeval_autowts=False, forceeval_autocorr=True, nproc=acorrnproc)
+                pipeline_state['ti_evalACwts'] = ti
+            return {'ti': ti, 'timestamp': item['timestamp'], 'Ef': Ef.reshape(-1), 'wts': wts.reshape(-1), 'illum_version': pipeline_state['illum_version'], 'autocorr': autocorr}
+
+        # Gridded illumination and PSF are reused while the antenna flags
+        # are unchanged, as in Image.imagr(). Entries are keyed by the
+        # version set in the calibrate stage and shared by the grid workers
+        illum_cache = {}
+        illum_lock = threading.Lock()
+
+        def grid_and_image(seq, item):
+            version = item['illum_version']
+            with illum_lock:
+                cached = illum_cache.get(version, None)
+            grid_Ef, grid_illumination = aar.applyMappingMatrixBlock('P1', item['Ef'], wts=item['wts'], nthreads=1 if imgnproc is None else imgnproc, illumination=cached is None)
+            if cached is None:
+                grid_illumination = grid_illumination[:,:,:,0]
+                psf = {}
+            else:
+                grid_illumination = cached['grid_illumination']
+                psf = cached['psf'] if cached['psf'] is not None else {} # A complete PSF is only read by imagr_block()
+            products = pipeline_state['efimgobj'].imagr_block(grid_Ef[:,:,:,0], grid_illumination, weighting='natural', pad=0, nproc=1, fft_backend=fft_backend, fft_nthreads=fft_nthreads, products=['img', 'beam'], psf=psf)
+            if (cached is None) or (cached['psf'] is None):
+                with illum_lock:
+                    entry = illum_cache.setdefault(version, {'grid_illumination': grid_illumination, 'psf': None})
+                    if entry['psf'] is None:
+                        entry['psf'] = psf
+                    for oldversion in [v for v in illum_cache if v < max(illum_cache)-1]:
+                        del illum_cache[oldversion]
+            return {'ti': item['ti'], 'timestamp': item['timestamp'], 'products': products, 'autocorr': item['autocorr']}
+
+        accumulated = {}
+        def accumulate_products(seq, item):
+            if 'products' not in accumulated:
+                accumulated['products'] = item['products']
+                accumulated['timestamps'] = [item['timestamp']]
+            else:
+                for key in item['products']:
+                    if key in ['img', 'beam', 'wts_vuf', 'vis_vuf']:
+                        accumulated['products'][key] += item['products'][key]
+                    else:
+                        accumulated['products'][key] = item['products'][key]
+                accumulated['timestamps'] += [item['timestamp']]
+            if item['autocorr'] is not None:
+                return flush_accumulated(item['ti'], item['autocorr'])
+
+        def flush_accumulated(ti, autocorr):
+            if 'products' not in accumulated:
+                return None
+            out = {'ti': ti, 'products': accumulated.pop('products'), 'timestamps': accumulated.pop('timestamps'), 'autocorr': autocorr}
+            return out
+
+        def finalize_accumulated():
+            out = flush_accumulated(maxtime_ind, None)
+            if out is None:
+                return None
+            return (maxtime_ind - mintime_ind, out)
+
+        def write_products(seq, item):
+            efimgobj = pipeline_state['efimgobj']
+            ti = item['ti']
+            if (extfile_flush_interval is not None) and (efimgobj.extwriter is None):
+                efimgobj.open_extwriter(flush_interval=extfile_flush_interval)
+            if (accumulator_parms is not None) and (efimgobj.accumulator is None):
+                efimgobj.open_accumulator(**accumulator_parms)
+            efimgobj.set_products('P1', item['products'], timestamp=item['timestamps'][-1])
+            efimgobj.init_extfile(['P1'])
+            if accumulator_parms is None:
+                efimgobj.evalApertureProducts(pol='P1', fft_backend=fft_backend, fft_nthreads=fft_nthreads)
+            efimgobj.accumulate_inplace(pol=['P1'], timestamps=item['timestamps'], verbose=True)
+            if item['autocorr'] is not None:
+                efimgobj.evalAutoCorr(pol='P1', datapool='avg', forceeval_autowts=False, forceeval_autocorr=True, nproc=acorrnproc, save=True, autocorr=item['autocorr'], verbose=True)
+                efimgobj.average(pol='P1', datapool='accumulate', autocorr_op='mask', verbose=True)
+                efimgobj.reset_extfile(datapool=None)
+
+            if h5info['h5repack_path'] is not None:
+                if ti - pipeline_state['ti_h5repack'] >= n_t_h5repack:
+                    efimgobj.close_extwriter()
+                    mv_result, h5repack_result, rm_result, x = h5repack(efimgobj.extfile, h5info['h5repack_path'], fs_strategy=h5info['h5fs_strategy'], outfile=None)
+                    if x is not None:
+                        warnings.warn(str(x))
+                    pipeline_state['ti_h5repack'] = ti
+
+            tprogress.update(ti-mintime_ind+1)
+
+        abort = threading.Event()
+        queues = [Queue.Queue(maxsize=pipeline_depth) for i in range(5)]
+        stages = [PipelineStage('reader', read_snapshot, queues[0], queues[1], nworkers=1, abort=abort),
+                  PipelineStage('calibrate', calibrate_and_phase, queues[1], queues[2], nworkers=pipeline_workers['calibrate'], ordered=True, abort=abort),
+                  PipelineStage('grid', grid_and_image, queues[2], queues[3], nworkers=pipeline_workers['grid'], abort=abort),
+                  PipelineStage('accumulate', accumulate_products, queues[3], queues[4], nworkers=pipeline_workers['accumulate'], ordered=True, finalize=finalize_accumulated, abort=abort),
+                  PipelineStage('writer', write_products, queues[4], None, nworkers=1, abort=abort)]
+        for stage in stages:
+            stage.start()
+        for seq, ti in enumerate(range(mintime_ind, maxtime_ind+1)):
+            if not queue_put(queues[0], (seq, ti), abort):
+                break
+        queue_put(queues[0], None, abort)
+        for stage in stages:
+            stage.join()
+        if 'efimgobj' in pipeline_state:
+            pipeline_state['efimgobj'].close_accumulator()
+            pipeline_state['efimgobj'].close_extwriter()
+        for stage in stages:
+            if stage.error is not None:
+                raise stage.error[0], stage.error[1], stage.error[2]
 
-        if ti == mintime_ind:
-            ti_evalACwts = mintime_ind - 1
-            ti_h5repack = mintime_ind - 1
-            aar.evalAntennaAutoCorrWts(forceeval=True)
-            efimgobj = AA.Image(antenna_array=aar, pol='P1', extfile=outfile)
-        else:
-            efimgobj.update(antenna_array=aar, reset=True)
-        efimgobj.imagr(pol='P1', weighting='natural', pad=0, stack=False, grid_map_method=grid_map_method, cal_loop=False, nproc=imgnproc)
-
-        if ti-ti_evalACwts == n_t_acc:
-            efimgobj.evalAutoCorr(pol='P1', datapool='avg', forceeval_autowts=False, forceeval_autocorr=True, nproc=acorrnproc, save=True, verbose=True)
-            efimgobj.average(pol='P1', datapool='accumulate', autocorr_op='mask', verbose=True)
-            efimgobj.reset_extfile(datapool=None)
-            ti_evalACwts = ti
-
-        if h5info['h5repack_path'] is not None:
-            if ti - ti_h5repack == n_t_h5repack:
-                mv_result, h5repack_result, rm_result, x = h5repack(efimgobj.extfile, h5info['h5repack_path'], fs_strategy=h5info['h5fs_strategy'], outfile=None)
-                if x is not None:
-                    warnings.warn(str(x))
-                ti_h5repack = ti
-
-        tprogress.update(ti+1)
     tprogress.finish()
+    dstream.close()
+    aar.closePool()
 
     PDB.set_trace()
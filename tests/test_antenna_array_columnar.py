@@ -0,0 +1,63 @@
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+
+def new_array(nant=4, nsamples=4):
+    antennas = [AA.Antenna('A{0:0d}'.format(i), 'dipole', 0.0, 0.0, [1.0*i, -0.5*i, 0.0], 50e6, nsamples=nsamples, stack_depth=3) for i in range(nant)]
+    aar = AA.AntennaArray(stack_depth=3) + antennas
+    aar.f = 50e6 + 25e3 * NP.arange(2*nsamples)
+    for ant in antennas:
+        ant.f = NP.copy(aar.f)
+    return aar
+
+class TestAntennaArrayColumnar(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(1)
+        self.Ef = rng.randn(4,4,8,2) + 1j * rng.randn(4,4,8,2) # time, ant, chan, pol
+        self.Ef[2,1,3,1] = NP.nan
+        self.flags = NP.zeros((4,4,2), dtype=NP.bool)
+        self.flags[1,3,0] = True
+        self.labels = ['A{0:0d}'.format(i) for i in range(4)]
+
+        self.objarray = new_array()
+        for ti in range(self.Ef.shape[0]):
+            for ai,label in enumerate(self.labels):
+                update = {'timestamp': float(ti), 'Ef': {pol: self.Ef[ti,ai,:,pi] for pi,pol in enumerate(['P1', 'P2'])}, 'flags': {pol: bool(self.flags[ti,ai,pi]) for pi,pol in enumerate(['P1', 'P2'])}, 'stack': True}
+                self.objarray.antennas[label].update(update, verbose=False)
+
+        self.colarray = new_array()
+        self.colarray.initColumnar(verbose=False)
+        for ti in range(self.Ef.shape[0]):
+            self.colarray.ingest(float(ti), self.Ef[ti], flags=self.flags[ti])
+
+    def test_views_into_buffers(self):
+        cdata = self.colarray.columnar
+        ant = self.colarray.antennas['A2']
+        self.assertTrue(NP.array_equal(ant.antpol.Ef['P2'], self.Ef[-1,2,:,1]))
+        ant.antpol.Ef['P1'] = NP.arange(8.0)
+        self.assertTrue(NP.array_equal(cdata['Ef_current'][2,:,0], NP.arange(8.0)))
+        ant.antpol.flag['P2'] = True
+        self.assertTrue(cdata['flags_current'][2,1])
+        self.assertEqual(sorted(ant.antpol.Ef.keys()), ['P1', 'P2'])
+
+    def test_E_fields_match_object_mode(self):
+        for pol in ['P1', 'P2']:
+            for kwargs in [{'datapool': 'current'}, {'datapool': 'stack', 'tselect': [0,2]}, {'datapool': 'stack', 'tselect': [1], 'fselect': [2,5], 'aselect': ['A3', 'A1']}]:
+                colinfo = self.colarray.get_E_fields(pol, **kwargs)
+                objinfo = self.objarray.get_E_fields(pol, **kwargs)
+                self.assertEqual(colinfo['labels'], objinfo['labels'])
+                self.assertEqual(colinfo['E-fields'].shape, objinfo['E-fields'].shape)
+                self.assertTrue(NP.allclose(colinfo['E-fields'], objinfo['E-fields'], equal_nan=True))
+                self.assertTrue(NP.array_equal(colinfo['twts'], objinfo['twts']))
+
+    def test_stack_and_flags(self):
+        cdata = self.colarray.columnar
+        self.assertEqual(cdata['Ef'].shape, (3,4,8,2))
+        self.assertTrue(NP.allclose(cdata['Ef'], self.Ef[-3:], equal_nan=True))
+        self.assertTrue(cdata['flags'][1,1,1]) # NaN in the spectrum
+        self.assertTrue(cdata['flags'][0,3,0])
+        self.assertEqual(NP.sum(cdata['flags']), 2)
+
+if __name__ == '__main__':
+    unittest.main()
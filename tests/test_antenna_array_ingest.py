@@ -0,0 +1,58 @@
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+
+class TestAntennaArrayIngest(unittest.TestCase):
+
+    def setUp(self):
+        antennas = [AA.Antenna('A{0:0d}'.format(i), 'dipole', 0.0, 0.0, [1.0*i, 0.5*i, 0.0], 50e6, nsamples=4) for i in range(3)]
+        self.aar = AA.AntennaArray(stack_depth=3) + antennas
+        self.aar.f = 50e6 + 25e3 * NP.arange(8)
+        self.rng = NP.random.RandomState(3)
+
+    def block(self):
+        return (self.rng.randn(3,8,2) + 1j * self.rng.randn(3,8,2)).astype(NP.complex64)
+
+    def test_stack_and_timestamps(self):
+        blocks = []
+        for ti in range(5):
+            blocks += [self.block()]
+            self.aar.ingest(float(ti), blocks[-1])
+        cdata = self.aar.columnar
+        self.assertEqual(cdata['nstack'], 3)
+        self.assertTrue(NP.array_equal(cdata['Ef'], NP.asarray(blocks[-3:])))
+        self.assertEqual(cdata['Ef'].dtype, NP.complex128)
+        self.assertEqual(self.aar.timestamps, [2.0, 3.0, 4.0])
+        for label in cdata['labels']:
+            self.assertEqual(self.aar.antennas[label].timestamp, 4.0)
+            self.assertEqual(self.aar.antennas[label].timestamps, [2.0, 3.0, 4.0])
+
+        last = self.block()
+        self.aar.ingest(9.0, last, stack=False)
+        self.assertEqual(cdata['nstack'], 3)
+        self.assertTrue(NP.array_equal(cdata['Ef'][-1], last))
+        self.assertEqual(self.aar.timestamps, [2.0, 3.0, 9.0])
+        self.assertEqual(self.aar.antennas['A1'].timestamps, [2.0, 3.0, 9.0])
+
+    def test_flags_and_delays(self):
+        Ef = self.block()
+        Ef[0,3,0] = NP.nan
+        Ef[1,:,1] = 0.0
+        flags = NP.zeros((3,2), dtype=NP.bool)
+        flags[2,0] = True
+        delays = {'P1': NP.asarray([1e-7, 0.0, 2e-7])}
+        self.aar.ingest(0.0, Ef, flags=flags, delays=delays)
+        cdata = self.aar.columnar
+        self.assertTrue(NP.array_equal(cdata['flags_current'], [[True, False], [False, True], [True, False]]))
+        phasor = NP.exp(1j * 2 * NP.pi * delays['P1'].reshape(-1,1) * self.aar.f.reshape(1,-1))
+        self.assertTrue(NP.allclose(cdata['Ef_current'][1:,:,0], Ef[1:,:,0] * phasor[1:], rtol=1e-12))
+        self.assertTrue(NP.array_equal(cdata['Ef_current'][:,:,1], Ef[:,:,1]))
+
+    def test_invalid_inputs(self):
+        with self.assertRaises(ValueError):
+            self.aar.ingest(0.0, NP.zeros((3,8,1)))
+        with self.assertRaises(TypeError):
+            self.aar.ingest(0.0, self.block(), flags=NP.zeros((3,2)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+from epic import aperture as APR
+
+def new_array(nant=4, nsamples=4):
+    aprtr = APR.Aperture(pol_type='dual', kernel_type={'P1': 'func', 'P2': 'func'}, shape={'P1': 'circular', 'P2': 'circular'}, parms={'P1': {'rmax': 1.0}, 'P2': {'rmax': 1.0}})
+    antennas = [AA.Antenna('A{0:0d}'.format(i), 'dipole', 0.0, 0.0, [2.0*i, -1.5*i, 0.0], 50e6, nsamples=nsamples, aperture=aprtr, stack_depth=3) for i in range(nant)]
+    aar = AA.AntennaArray(stack_depth=3) + antennas
+    aar.f = 50e6 + 25e3 * NP.arange(2*nsamples)
+    for ant in antennas:
+        ant.f = NP.copy(aar.f)
+    aar.gridu, aar.gridv = NP.meshgrid(0.1*NP.arange(-16,16), 0.1*NP.arange(-16,16))
+    aar.grid_ready = True
+    return aar
+
+class TestBatchedMapping(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(2)
+        self.Ef = rng.randn(3,4,8,2) + 1j * rng.randn(3,4,8,2) # time, ant, chan, pol
+        self.flags = NP.zeros((3,4,2), dtype=NP.bool)
+        self.flags[1,2,0] = True
+
+        self.aar = new_array()
+        self.aar.initColumnar(verbose=False)
+        self.aar.genMappingMatrix(pol=None, method='NN', distNN=1.0, identical_antennas=True, gridfunc_freq='scale', verbose=False)
+
+        self.grid_Ef = []
+        self.grid_illumination = []
+        for ti in range(self.Ef.shape[0]):
+            self.aar.ingest(float(ti), self.Ef[ti], flags=self.flags[ti])
+            self.aar.applyMappingMatrix(pol='P1', datapool='current', verbose=False)
+            self.grid_Ef += [self.aar.grid_Ef['P1']]
+            self.grid_illumination += [self.aar.grid_illumination['P1']]
+        self.grid_Ef = NP.stack(self.grid_Ef, axis=-1)
+        self.grid_illumination = NP.stack(self.grid_illumination, axis=-1)
+
+    def test_stack_matches_snapshots(self):
+        self.aar.applyMappingMatrix(pol='P1', datapool='stack', verbose=False)
+        self.assertEqual(self.aar.grid_Ef['P1'].shape, (32,32,8,3))
+        self.assertTrue(NP.allclose(self.aar.grid_Ef['P1'], self.grid_Ef))
+        self.assertTrue(NP.allclose(self.aar.grid_illumination['P1'], self.grid_illumination))
+        self.assertFalse(NP.allclose(self.grid_illumination[...,0], self.grid_illumination[...,1]))
+
+        self.aar.applyMappingMatrix(pol='P1', datapool='stack', tselect=[2,0], verbose=False)
+        self.assertTrue(NP.allclose(self.aar.grid_Ef['P1'], self.grid_Ef[...,[2,0]]))
+
+    def test_threaded_product(self):
+        self.aar.applyMappingMatrix(pol='P1', datapool='stack', nthreads=3, verbose=False)
+        self.assertTrue(NP.allclose(self.aar.grid_Ef['P1'], self.grid_Ef))
+        self.assertTrue(NP.allclose(self.aar.grid_illumination['P1'], self.grid_illumination))
+
+    def test_illumination_cache(self):
+        cache = self.aar.grid_illumination_cache['P1']
+        self.assertEqual(cache['version'], 2) # flags changed in every snapshot
+        self.aar.ingest(3.0, self.Ef[0], flags=self.flags[2])
+        self.aar.applyMappingMatrix(pol='P1', datapool='current', verbose=False)
+        self.assertIs(self.aar.grid_illumination_cache['P1'], cache)
+        self.assertTrue(NP.allclose(self.aar.grid_Ef['P1'], self.grid_Ef[...,0]))
+        self.assertTrue(NP.allclose(self.aar.grid_illumination['P1'], self.grid_illumination[...,2]))
+
+if __name__ == '__main__':
+    unittest.main()
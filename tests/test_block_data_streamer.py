@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+from epic import data_interface as DI
+
+class TestBlockDataStreamer(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(9)
+        self.ntimes = 10
+        self.nant = 3
+        self.nchan = 4
+        self.pol = ['P1', 'P2']
+        self.Ef = {p: {qty: rng.randn(self.ntimes,self.nant,self.nchan).astype(NP.float32) for qty in ['real', 'imag']} for p in self.pol}
+        init_parms = {'f0': 50e6, 'ant_labels': NP.asarray(['A{0:0d}'.format(i) for i in range(self.nant)]), 'ant_id': NP.arange(self.nant), 'antpos': rng.randn(self.nant,3), 'pol': NP.asarray(self.pol), 'f': 50e6 + 25e3 * NP.arange(self.nchan), 'df': 25e3, 'bw': 25e3 * self.nchan, 'dT': 40e-6, 'dts': 1e-8, 'timestamps': 1000.0 + 0.04 * NP.arange(self.ntimes), 'cable_delays': {p: NP.zeros(self.nant) for p in self.pol}, 'Ef': self.Ef}
+        self.dc = DI.DataContainer(self.ntimes, self.nant, self.nchan, len(self.pol), init_parms=init_parms)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def save(self, layout, chunk_ntimes):
+        outfile = os.path.join(self.tmpdir, 'data_{0}_{1:0d}'.format(layout, chunk_ntimes))
+        self.dc.save(outfile, layout=layout, chunk_ntimes=chunk_ntimes)
+        return outfile + '.hdf5'
+
+    def expected(self, p, tindx):
+        return self.Ef[p]['real'][tindx] + 1j * self.Ef[p]['imag'][tindx]
+
+    def test_blocks_aligned_to_chunks(self):
+        for layout in ['split', 'complex']:
+            with DI.BlockDataStreamer(self.save(layout, 4), blocksize=3) as streamer:
+                self.assertEqual(streamer.layout, {p: layout for p in self.pol})
+                self.assertEqual(streamer.blocksize, 4)
+                blocks = []
+                for tindx, data in streamer.iterate():
+                    if (streamer.block_start, streamer.block_stop) not in blocks:
+                        blocks += [(streamer.block_start, streamer.block_stop)]
+                    for p in self.pol:
+                        self.assertTrue(NP.array_equal(data[p], self.expected(p, tindx)))
+                self.assertEqual(blocks, [(0,4), (4,8), (8,10)])
+
+    def test_reads_cached_block(self):
+        with DI.BlockDataStreamer(self.save('complex', 2), pol='P2', blocksize=4) as streamer:
+            nreads = [0]
+            readBlock = streamer._readBlock
+            def counted_readBlock(tindx):
+                nreads[0] += 1
+                readBlock(tindx)
+            streamer._readBlock = counted_readBlock
+
+            for tindx in [5, 4, 7, 6, -4]:
+                data = streamer.load(tindx)
+                self.assertEqual(data.keys(), ['P2'])
+                self.assertTrue(NP.array_equal(data['P2'], self.expected('P2', tindx)))
+            self.assertEqual(nreads[0], 1)
+            streamer.load(3)
+            streamer.load(8)
+            self.assertEqual(nreads[0], 3)
+            self.assertEqual(streamer.tindx, 8)
+        self.assertIsNone(streamer.fileobj)
+        self.assertEqual(streamer.block, {})
+
+    def test_invalid_inputs(self):
+        datafile = self.save('split', 1)
+        with self.assertRaises(KeyError):
+            DI.BlockDataStreamer(datafile, datatype='Et')
+        with self.assertRaises(ValueError):
+            DI.BlockDataStreamer(datafile, blocksize=0)
+        with self.assertRaises(TypeError):
+            DI.BlockDataStreamer(None)
+        with DI.BlockDataStreamer(unicode(datafile), blocksize=1) as streamer:
+            with self.assertRaises(IndexError):
+                streamer.load(self.ntimes)
+            with self.assertRaises(TypeError):
+                streamer.load(1.0)
+
+if __name__ == '__main__':
+    unittest.main()
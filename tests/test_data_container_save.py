@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+import h5py
+from epic import data_interface as DI
+
+class TestDataContainerSave(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(10)
+        self.ntimes = 5
+        self.nant = 3
+        self.nchan = 4
+        self.pol = ['P1', 'P2']
+        self.Ef = {p: {qty: rng.randn(self.ntimes,self.nant,self.nchan).astype(NP.float32) for qty in ['real', 'imag']} for p in self.pol}
+        init_parms = {'f0': 50e6, 'ant_labels': NP.asarray(['A{0:0d}'.format(i) for i in range(self.nant)]), 'ant_id': NP.arange(self.nant), 'antpos': rng.randn(self.nant,3), 'pol': NP.asarray(self.pol), 'f': 50e6 + 25e3 * NP.arange(self.nchan), 'df': 25e3, 'bw': 25e3 * self.nchan, 'dT': 40e-6, 'dts': 1e-8, 'timestamps': 1000.0 + 0.04 * NP.arange(self.ntimes), 'cable_delays': {p: NP.zeros(self.nant) for p in self.pol}, 'Ef': self.Ef}
+        self.dc = DI.DataContainer(self.ntimes, self.nant, self.nchan, len(self.pol), init_parms=init_parms)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip(self):
+        for layout in ['split', 'complex']:
+            for compress, compress_format in [(True, 'gzip'), (True, 'lzf'), (False, 'gzip')]:
+                outfile = os.path.join(self.tmpdir, 'data_{0}_{1}_{2}'.format(layout, compress, compress_format))
+                self.dc.save(outfile, compress=compress, compress_format=compress_format, layout=layout, chunk_ntimes=2)
+                dc = DI.DataContainer(self.ntimes, self.nant, self.nchan, len(self.pol), init_file=outfile+'.hdf5')
+                self.assertTrue(dc.datatype['Ef'])
+                self.assertFalse(dc.datatype['Et'])
+                self.assertTrue(NP.array_equal(dc.timestamps, self.dc.timestamps))
+                streamer = DI.DataStreamer()
+                for p in self.pol:
+                    for qty in ['real', 'imag']:
+                        self.assertTrue(NP.array_equal(dc.Ef[p][qty], self.Ef[p][qty]))
+                    streamer.load(outfile+'.hdf5', 3, pol=p)
+                    self.assertTrue(NP.array_equal(streamer.data[p]['imag'], self.Ef[p]['imag'][3]))
+
+    def test_layout_and_chunks(self):
+        for layout, qtys, dtype in [('split', ['imag', 'real'], NP.float32), ('complex', ['complex'], NP.complex64)]:
+            for chunk_ntimes, tchunk in [(1,1), (2,2), (16,self.ntimes)]:
+                outfile = os.path.join(self.tmpdir, 'data_{0}_{1:0d}'.format(layout, chunk_ntimes))
+                self.dc.save(outfile, compress=False, layout=layout, chunk_ntimes=chunk_ntimes)
+                with h5py.File(outfile+'.hdf5', 'r') as fileobj:
+                    for p in self.pol:
+                        dgroup = fileobj['data/Ef/{0}'.format(p)]
+                        self.assertEqual(dgroup.attrs['layout'], layout)
+                        self.assertEqual(sorted(dgroup.keys()), qtys)
+                        for qty in qtys:
+                            self.assertEqual(dgroup[qty].dtype, dtype)
+                            self.assertEqual(dgroup[qty].chunks, (tchunk, self.nant, self.nchan))
+                            self.assertIsNone(dgroup[qty].compression)
+
+    def test_invalid_inputs(self):
+        outfile = os.path.join(self.tmpdir, 'data')
+        with self.assertRaises(ValueError):
+            self.dc.save(outfile, layout='interleaved')
+        with self.assertRaises(TypeError):
+            self.dc.save(outfile, chunk_ntimes=2.0)
+        with self.assertRaises(ValueError):
+            self.dc.save(outfile, chunk_ntimes=0)
+        with self.assertRaises(ValueError):
+            self.dc.save(outfile, compress_format='bzip2')
+        self.assertFalse(os.path.exists(outfile+'.hdf5'))
+
+if __name__ == '__main__':
+    unittest.main()
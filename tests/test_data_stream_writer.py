@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+from epic import data_interface as DI
+
+class TestDataStreamWriter(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(24)
+        self.nant = 5
+        self.nchan = 4
+        self.ntimes = 11
+        self.pol = ['P1', 'P2']
+        self.hdr_parms = {'f0': 50e6, 'ant_labels': NP.asarray(['A{0:0d}'.format(i) for i in range(self.nant)]), 'ant_id': NP.arange(self.nant), 'antpos': rng.randn(self.nant,3), 'pol': self.pol, 'f': 50e6 + 25e3 * NP.arange(self.nchan), 'df': 25e3, 'bw': 25e3 * self.nchan, 'dT': 40e-6, 'dts': 1e-8}
+        self.data = {p: (rng.randn(self.ntimes,self.nant,self.nchan) + 1j * rng.randn(self.ntimes,self.nant,self.nchan)).astype(NP.complex64) for p in self.pol}
+        self.timestamps = 1000.0 + 0.04 * NP.arange(self.ntimes)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, blocks, **kwargs):
+        outfile = os.path.join(self.tmpdir, name)
+        with DI.DataStreamWriter(outfile, self.hdr_parms, ntimes_total=self.ntimes, **kwargs) as writer:
+            for start, stop in blocks:
+                writer.write({'Ef': {p: self.data[p][start:stop] for p in self.pol}}, self.timestamps[start:stop])
+            writer.flush()
+            self.assertEqual(writer.ntimes, blocks[-1][1])
+        return outfile + '.hdf5'
+
+    def test_round_trip(self):
+        blocks = [(0,1), (1,4), (4,9), (9,11)]
+        for layout in ['complex', 'split']:
+            for swmr in [False, True]:
+                for chunk_ntimes, blocksize in [(1,1), (4,3), (16,16)]:
+                    name = u'stream_{0}_{1}_{2:0d}'.format(layout, swmr, chunk_ntimes)
+                    datafile = self.write(name, blocks, layout=layout, swmr=swmr, chunk_ntimes=chunk_ntimes)
+                    with DI.BlockDataStreamer(datafile, datatype='Ef', blocksize=blocksize, swmr=swmr) as streamer:
+                        self.assertEqual(streamer.ntimes, self.ntimes)
+                        self.assertEqual(sorted(streamer.pol), self.pol)
+                        self.assertEqual(streamer.layout, {p: layout for p in self.pol})
+                        self.assertEqual(streamer.blocksize % chunk_ntimes, 0)
+                        self.assertTrue(NP.array_equal(streamer.timestamps, self.timestamps))
+                        self.assertTrue(NP.array_equal(streamer.antinfo['ant_labels'], self.hdr_parms['ant_labels']))
+                        self.assertTrue(NP.array_equal(streamer.antinfo['antpos'], self.hdr_parms['antpos']))
+                        ntimes = 0
+                        for tindx, data in streamer.iterate():
+                            for p in self.pol:
+                                self.assertEqual(data[p].dtype, NP.complex64)
+                                self.assertTrue(NP.array_equal(data[p], self.data[p][tindx]))
+                            ntimes += 1
+                        self.assertEqual(ntimes, self.ntimes)
+                        self.assertTrue(NP.array_equal(streamer.load(-1)['P2'], self.data['P2'][-1]))
+                        with self.assertRaises(IndexError):
+                            streamer.load(self.ntimes)
+
+    def test_read_while_writing(self):
+        outfile = os.path.join(self.tmpdir, 'stream_swmr')
+        writer = DI.DataStreamWriter(outfile, self.hdr_parms, chunk_ntimes=2, swmr=True)
+        try:
+            writer.write({'Ef': {p: self.data[p][:3] for p in self.pol}}, self.timestamps[:3])
+            writer.flush()
+            with DI.BlockDataStreamer(writer.filename, blocksize=2, swmr=True, timeout=0.0) as streamer:
+                self.assertEqual(streamer.ntimes, 3)
+                self.assertTrue(NP.array_equal(streamer.load(2)['P1'], self.data['P1'][2]))
+                writer.write({'Ef': {p: self.data[p][3:] for p in self.pol}}, self.timestamps[3:])
+                writer.flush()
+                self.assertEqual(streamer.refresh(), self.ntimes)
+                self.assertTrue(NP.array_equal(streamer.timestamps, self.timestamps))
+                for tindx in range(self.ntimes):
+                    self.assertTrue(NP.array_equal(streamer.load(tindx)['P1'], self.data['P1'][tindx]))
+        finally:
+            writer.close()
+
+    def test_invalid_blocks(self):
+        outfile = os.path.join(self.tmpdir, 'stream_invalid')
+        with DI.DataStreamWriter(outfile, self.hdr_parms, swmr=False) as writer:
+            with self.assertRaises(KeyError):
+                writer.write({'Ef': {'P1': self.data['P1']}}, self.timestamps)
+            with self.assertRaises(ValueError):
+                writer.write({'Ef': self.data}, self.timestamps[:-1])
+        with self.assertRaises(ValueError):
+            writer.write({'Ef': self.data}, self.timestamps)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+import h5py
+from epic import antenna_array as AA
+
+class TestExtFileWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.extfile = os.path.join(self.tmpdir, 'image.hdf5')
+        with h5py.File(self.extfile, 'w') as fileobj:
+            fileobj.create_dataset('sum', data=NP.zeros((3,4), dtype=NP.float64))
+            fileobj.create_dataset('timestamps', data=NP.zeros(0), maxshape=(None,), dtype=NP.float64)
+            fileobj.create_dataset('stack', data=NP.nan*NP.ones((1,2)), maxshape=(None,2), dtype=NP.float32)
+            fileobj.create_dataset('vlen', shape=(1,), maxshape=(None,), dtype=h5py.special_dtype(vlen=NP.dtype('int64')))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read(self, path):
+        with h5py.File(self.extfile, 'r') as fileobj:
+            return fileobj[path][...]
+
+    def test_flush_interval(self):
+        writer = AA.ExtFileWriter(self.extfile, flush_interval=3)
+        try:
+            for i in range(1,7):
+                writer.add('sum', NP.ones((3,4)))
+                writer.append('timestamps', [float(i)])
+                writer.tick()
+                writer.fileobj.flush()
+                nflushed = 3 * (i // 3)
+                self.assertTrue(NP.all(self.read('sum') == nflushed))
+                self.assertTrue(NP.array_equal(self.read('timestamps'), NP.arange(1, nflushed+1)))
+        finally:
+            writer.close()
+
+    def test_pending_written_on_access(self):
+        writer = AA.ExtFileWriter(unicode(self.extfile), flush_interval=100)
+        try:
+            writer.add('sum', 2.0)
+            writer.add('sum', NP.arange(4))
+            writer.append('timestamps', [1.0, 2.0])
+            writer.append('timestamps', NP.asarray([3.0]))
+            self.assertTrue(NP.array_equal(writer['sum'][...], 2.0 + NP.arange(4).reshape(1,-1) + NP.zeros((3,1))))
+            self.assertTrue(NP.array_equal(writer['timestamps'][...], [1.0, 2.0, 3.0]))
+            self.assertEqual(writer._sums, {})
+            self.assertEqual(writer._appends, {})
+        finally:
+            writer.close()
+
+    def test_close_flushes(self):
+        writer = AA.ExtFileWriter(self.extfile, flush_interval=100)
+        writer.add('sum', 5.0)
+        writer.append('timestamps', [7.0])
+        writer.close()
+        self.assertIsNone(writer.fileobj)
+        self.assertTrue(NP.all(self.read('sum') == 5.0))
+        self.assertTrue(NP.array_equal(self.read('timestamps'), [7.0]))
+
+    def test_placeholder_replaced(self):
+        writer = AA.ExtFileWriter(self.extfile)
+        try:
+            writer.append('stack', [NP.asarray([1.0, 2.0])], placeholder=True)
+            writer.append('vlen', [NP.arange(3)], placeholder=True)
+            writer.flush()
+            writer.append('stack', [NP.asarray([3.0, 4.0])], placeholder=True)
+            writer.append('vlen', [NP.arange(5)], placeholder=True)
+            writer.flush()
+        finally:
+            writer.close()
+        self.assertTrue(NP.array_equal(self.read('stack'), [[1.0, 2.0], [3.0, 4.0]]))
+        vlen = self.read('vlen')
+        self.assertEqual(vlen.shape, (2,))
+        self.assertTrue(NP.array_equal(vlen[0], NP.arange(3)))
+        self.assertTrue(NP.array_equal(vlen[1], NP.arange(5)))
+
+    def test_appended_without_placeholder(self):
+        writer = AA.ExtFileWriter(self.extfile)
+        try:
+            writer.append('stack', [NP.asarray([1.0, 2.0])])
+        finally:
+            writer.close()
+        stack = self.read('stack')
+        self.assertEqual(stack.shape, (2,2))
+        self.assertTrue(NP.all(NP.isnan(stack[0])))
+
+    def test_invalid_inputs(self):
+        with self.assertRaises(TypeError):
+            AA.ExtFileWriter(self.extfile, flush_interval=1.0)
+        with self.assertRaises(ValueError):
+            AA.ExtFileWriter(self.extfile, flush_interval=0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import threading
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+
+class TestFFTPlanner(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(11)
+        self.cube = (rng.randn(6,5,4) + 1j * rng.randn(6,5,4)).astype(NP.complex64)
+        self.wts = rng.rand(6,5,1)
+
+    def reference(self, shape, inverse):
+        padded = NP.zeros(shape+(self.cube.shape[2],), dtype=NP.complex128)
+        padded[:self.cube.shape[0],:self.cube.shape[1],:] = self.cube * self.wts
+        if inverse:
+            return NP.fft.ifft2(padded, axes=(0,1))
+        return NP.fft.fft2(padded, axes=(0,1))
+
+    def check(self, planner):
+        for shape in [(6,5), (12,10), (16,16)]:
+            for inverse in [False, True]:
+                out = planner.fft2(self.cube, shape=shape, wts=self.wts, inverse=inverse)
+                self.assertEqual(out.shape, shape+(self.cube.shape[2],))
+                ref = self.reference(shape, inverse)
+                self.assertTrue(NP.allclose(out, ref, rtol=1e-4, atol=1e-4*NP.abs(ref).max()))
+
+    def test_numpy_backend(self):
+        for nthreads in [1, 3]:
+            planner = AA.FFTPlanner(backend='numpy', nthreads=nthreads)
+            try:
+                self.check(planner)
+            finally:
+                planner.close()
+
+    def test_scipy_backend(self):
+        planner = AA.FFTPlanner(backend='scipy', nthreads=2)
+        try:
+            self.check(planner)
+        finally:
+            planner.close()
+
+    @unittest.skipUnless(AA.pyfftw_module_found, 'Module pyfftw not found')
+    def test_pyfftw_backend(self):
+        planner = AA.FFTPlanner(backend='pyfftw', nthreads=2)
+        try:
+            self.check(planner)
+        finally:
+            planner.close()
+
+    def test_buffers_reused_and_padding_cleared(self):
+        planner = AA.FFTPlanner(backend='numpy')
+        out = planner.fft2(NP.ones((8,8,2)), shape=(8,8))
+        self.assertIs(planner.fft2(self.cube[:,:,:2], shape=(8,8), wts=self.wts), out)
+        ref = self.reference((8,8), False)[:,:,:2]
+        self.assertTrue(NP.allclose(out, ref, rtol=1e-4, atol=1e-4*NP.abs(ref).max()))
+        with self.assertRaises(ValueError):
+            planner.fft2(self.cube, shape=(4,4))
+
+    def test_concurrent_callers(self):
+        planner = AA.FFTPlanner(backend='numpy', nthreads=2)
+        ref = self.reference((12,10), False)
+        results = []
+        def worker():
+            for i in range(5):
+                out = planner.fft2(self.cube, shape=(12,10), wts=self.wts)
+                results.append(NP.allclose(out, ref, rtol=1e-4, atol=1e-4*NP.abs(ref).max()))
+        threads = [threading.Thread(target=worker) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        planner.close()
+        self.assertEqual(results, [True] * 20)
+
+    def test_shared_planners(self):
+        self.assertIs(AA.get_fft_planner('numpy', 2), AA.get_fft_planner('numpy', 2))
+        self.assertIsNot(AA.get_fft_planner('numpy', 1), AA.get_fft_planner('numpy', 2))
+
+if __name__ == '__main__':
+    unittest.main()
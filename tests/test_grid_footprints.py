@@ -0,0 +1,34 @@
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+
+class TestGridFootprints(unittest.TestCase):
+
+    def setUp(self):
+        self.gridu, self.gridv = NP.meshgrid(0.5*NP.arange(-6,6), 0.5*NP.arange(-5,5))
+        self.wavelength = NP.asarray([6.0, 5.0, 4.0])
+        self.xy = NP.asarray([[0.0, 0.0], [3.5, -2.0], [-7.0, 4.0]])
+        gridlocs = NP.hstack((self.gridu.reshape(-1,1), self.gridv.reshape(-1,1)))
+        self.grid_xy = (gridlocs[NP.newaxis,:,:] * self.wavelength.reshape(-1,1,1)).reshape(-1,2)   # nchan x nv x nu
+        self.grid_wl = (NP.ones(gridlocs.shape[0])[NP.newaxis,:] * self.wavelength.reshape(-1,1)).ravel()
+
+    def test_footprints_match_brute_force(self):
+        distance_ULIM = 4.0
+        indNN_list, xyind, fvu_gridind = AA.find_grid_footprints(self.xy, self.gridu, self.gridv, self.wavelength, distance_ULIM=distance_ULIM)
+        self.assertEqual(len(indNN_list), self.xy.shape[0])
+        for i in range(self.xy.shape[0]):
+            dist = NP.sqrt(NP.sum((self.grid_xy - self.xy[i])**2, axis=1))
+            self.assertEqual(sorted(indNN_list[i].tolist()), NP.where(dist <= distance_ULIM)[0].tolist())
+        self.assertTrue(NP.array_equal(NP.concatenate(indNN_list), fvu_gridind))
+        self.assertTrue(NP.all(NP.diff(xyind) >= 0))
+
+    def test_locations_match_full_grid(self):
+        indNN_list, xyind, fvu_gridind = AA.find_grid_footprints(self.xy, self.gridu, self.gridv, self.wavelength, distance_ULIM=4.0)
+        xy, wl = AA.grid_footprint_locations(fvu_gridind, self.gridu, self.gridv, self.wavelength)
+        self.assertTrue(NP.array_equal(xy, self.grid_xy[fvu_gridind,:]))
+        self.assertTrue(NP.array_equal(wl, self.grid_wl[fvu_gridind]))
+        xy, wl = AA.grid_footprint_locations(indNN_list[1], self.gridu, self.gridv, self.wavelength)
+        self.assertTrue(NP.array_equal(xy, self.grid_xy[indNN_list[1],:]))
+
+if __name__ == '__main__':
+    unittest.main()
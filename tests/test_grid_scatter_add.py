@@ -0,0 +1,62 @@
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+from epic import aperture as APR
+
+def new_array(nant=4, nsamples=4):
+    aprtr = APR.Aperture(pol_type='dual', kernel_type={'P1': 'func', 'P2': 'func'}, shape={'P1': 'circular', 'P2': 'circular'}, parms={'P1': {'rmax': 1.0}, 'P2': {'rmax': 1.0}})
+    antennas = [AA.Antenna('A{0:0d}'.format(i), 'dipole', 0.0, 0.0, [2.0*i, -1.5*i, 0.0], 50e6, nsamples=nsamples, aperture=aprtr) for i in range(nant)]
+    aar = AA.AntennaArray() + antennas
+    aar.f = 50e6 + 25e3 * NP.arange(2*nsamples)
+    for ant in antennas:
+        ant.f = NP.copy(aar.f)
+    aar.gridu, aar.gridv = NP.meshgrid(0.1*NP.arange(-16,16), 0.1*NP.arange(-16,16))
+    aar.grid_ready = True
+    return aar
+
+class TestGridScatterAdd(unittest.TestCase):
+
+    def test_repeated_indices(self):
+        rng = NP.random.RandomState(16)
+        gridind = rng.randint(0, 20, size=200)
+        values = rng.randn(200) + 1j * rng.randn(200)
+        ref = NP.zeros(25, dtype=NP.complex128)
+        NP.add.at(ref, gridind, values)
+        out = AA.grid_scatter_add(gridind, values, 25)
+        self.assertEqual(out.shape, (25,))
+        self.assertEqual(out.dtype, NP.complex128)
+        self.assertTrue(NP.allclose(out, ref))
+        self.assertTrue(NP.all(out[20:] == 0.0))
+        self.assertTrue(NP.allclose(AA.grid_scatter_add(gridind, values.real, 25), ref.real))
+        with self.assertRaises(ValueError):
+            AA.grid_scatter_add(gridind[1:], values, 25)
+
+    def test_make_grid_cube_new_matches_per_antenna_loop(self):
+        rng = NP.random.RandomState(16)
+        flags = NP.zeros((4,2), dtype=NP.bool)
+        flags[1,0] = True
+        aar = new_array()
+        aar.initColumnar(verbose=False)
+        aar.ingest(0.0, rng.randn(4,8,2) + 1j * rng.randn(4,8,2), flags=flags)
+        aar.grid_convolve_new(pol=None, method='NN', distNN=1.0, identical_antennas=True, gridfunc_freq='scale', verbose=False)
+        aar.make_grid_cube_new(pol=None, verbose=False)
+
+        for pi, apol in enumerate(['P1', 'P2']):
+            all_ant2grid = aar.grid_mapper[apol]['all_ant2grid']
+            shape = aar.gridu.shape + (aar.f.size,)
+            grid_illumination = NP.zeros(shape, dtype=NP.complex128)
+            grid_Ef = NP.zeros(shape, dtype=NP.complex128)
+            for ai, antlabel in enumerate(aar.ordered_labels):
+                if flags[ai,pi]:
+                    continue
+                ind = all_ant2grid['antind'] == ai
+                vuf_gridind = (all_ant2grid['v_gridind'][ind], all_ant2grid['u_gridind'][ind], all_ant2grid['f_gridind'][ind])
+                wtd_illumination = all_ant2grid['per_ant_per_freq_norm_wts'][ind] * all_ant2grid['illumination'][ind]
+                NP.add.at(grid_illumination, vuf_gridind, wtd_illumination)
+                NP.add.at(grid_Ef, vuf_gridind, wtd_illumination * all_ant2grid['Ef'][ind])
+            self.assertTrue(NP.allclose(aar.grid_illumination[apol], grid_illumination))
+            self.assertTrue(NP.allclose(aar.grid_Ef[apol], grid_Ef))
+        self.assertLess(NP.sum(NP.abs(aar.grid_illumination['P1'])), NP.sum(NP.abs(aar.grid_illumination['P2'])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+from epic import aperture as APR
+
+def new_array(nant=4, nsamples=4):
+    aprtr = APR.Aperture(pol_type='dual', kernel_type={'P1': 'func', 'P2': 'func'}, shape={'P1': 'circular', 'P2': 'circular'}, parms={'P1': {'rmax': 1.0}, 'P2': {'rmax': 1.0}})
+    antennas = [AA.Antenna('A{0:0d}'.format(i), 'dipole', 0.0, 0.0, [2.0*i, -1.5*i, 0.0], 50e6, nsamples=nsamples, aperture=aprtr) for i in range(nant)]
+    aar = AA.AntennaArray() + antennas
+    aar.f0 = 50e6
+    aar.f = 50e6 + 25e3 * NP.arange(2*nsamples)
+    for ant in antennas:
+        ant.f = NP.copy(aar.f)
+    aar.gridu, aar.gridv = NP.meshgrid(0.1*NP.arange(-16,16), 0.1*NP.arange(-16,16))
+    aar.grid_ready = True
+    return aar
+
+class TestIlluminationReuse(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(19)
+        self.Ef = rng.randn(5,4,8,2) + 1j * rng.randn(5,4,8,2) # time, ant, chan, pol
+        self.Ef[3,2,5,0] = NP.nan
+        self.aar = new_array()
+        self.aar.initColumnar(verbose=False)
+        self.aar.genMappingMatrix(pol=None, method='NN', distNN=1.0, identical_antennas=True, gridfunc_freq='scale', verbose=False)
+        self.tmpdir = tempfile.mkdtemp()
+        self.efimgobj = AA.Image(antenna_array=self.aar, extfile=os.path.join(self.tmpdir, 'image.hdf5'), verbose=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def snapshot(self, ti):
+        self.aar.ingest(float(ti), self.Ef[ti])
+        self.efimgobj.update(antenna_array=self.aar, reset=True, verbose=False)
+        self.efimgobj.imagr(pol='P1', stack=False, grid_map_method='sparse', nproc=1, verbose=False)
+        illum_cache = self.aar.grid_illumination_cache['P1']
+        fresh = self.efimgobj.imagr_block(self.aar.grid_Ef['P1'], self.aar.grid_illumination['P1'], nproc=1)
+        for qty in ['img', 'beam', 'holbeam', 'wts_vuf']:
+            self.assertTrue(NP.allclose(getattr(self.efimgobj, qty)['P1'], fresh[qty]))
+        self.assertFalse(NP.any(NP.isnan(self.efimgobj.img['P1'])))
+        return illum_cache, self.efimgobj.psf_cache['P1']
+
+    def test_reuse_while_flags_unchanged(self):
+        illum_cache, psf_cache = self.snapshot(0)
+        self.assertEqual(illum_cache['version'], 0)
+        self.assertEqual(psf_cache['key'], (0, 'natural', 0))
+        beam = NP.copy(psf_cache['psf']['beam'])
+        for ti in [1, 2]:
+            self.assertIs(self.snapshot(ti)[0], illum_cache)
+            self.assertEqual(self.efimgobj.psf_cache['P1']['key'], (0, 'natural', 0))
+            self.assertTrue(NP.array_equal(self.efimgobj.beam['P1'], beam))
+
+    def test_nan_flags_invalidate_cache(self):
+        for ti in range(3):
+            self.snapshot(ti)
+        beam = NP.copy(self.efimgobj.beam['P1'])
+
+        illum_cache, psf_cache = self.snapshot(3) # NaN flags antenna A2
+        self.assertEqual(illum_cache['twts'].ravel().tolist(), [1.0, 1.0, 0.0, 1.0])
+        self.assertEqual(illum_cache['version'], 1)
+        self.assertEqual(psf_cache['key'], (1, 'natural', 0))
+        self.assertFalse(NP.any(NP.isnan(self.aar.grid_Ef['P1'])))
+        self.assertFalse(NP.allclose(self.efimgobj.beam['P1'], beam))
+
+        illum_cache, psf_cache = self.snapshot(4)
+        self.assertEqual(illum_cache['version'], 2)
+        self.assertEqual(psf_cache['key'], (2, 'natural', 0))
+        self.assertTrue(NP.allclose(self.efimgobj.beam['P1'], beam))
+
+    def test_block_nan_handling(self):
+        nchan = self.aar.f.size
+        Ef = self.Ef[0,:,:,0].ravel()
+        Ef[nchan+2] = NP.nan
+        wts = NP.ones(Ef.size)
+        grid_Ef, grid_illumination = self.aar.applyMappingMatrixBlock('P1', Ef, wts=wts)
+        Ef[nchan+2] = 0.0
+        wts[nchan+2] = 0.0
+        ref_Ef, ref_illumination = self.aar.applyMappingMatrixBlock('P1', Ef, wts=wts)
+        self.assertTrue(NP.allclose(grid_Ef, ref_Ef))
+        self.assertTrue(NP.allclose(grid_illumination, ref_illumination))
+        grid_Ef, grid_illumination = self.aar.applyMappingMatrixBlock('P1', Ef, wts=wts, illumination=False)
+        self.assertIsNone(grid_illumination)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import copy
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+import h5py
+from epic import antenna_array as AA
+
+class TestImageAccumulator(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(15)
+        self.pol = ['P11', 'P22']
+        self.snapshots = []
+        for ti in range(7):
+            qtys = {'img': {}, 'beam': {}, 'vis_vuf': {}}
+            for p in self.pol:
+                qtys['img'][p] = rng.randn(8,6,3)
+                qtys['beam'][p] = rng.randn(8,6,3)
+                qtys['vis_vuf'][p] = rng.randn(8,6,3) + 1j * rng.randn(8,6,3)
+            self.snapshots += [(float(ti), qtys)]
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def create_file(self, name):
+        extfile = os.path.join(self.tmpdir, name)
+        with h5py.File(extfile, 'w') as fileobj:
+            for qty, dtype in [('img', NP.float64), ('beam', NP.float64), ('vis_vuf', NP.complex128)]:
+                for p in self.pol:
+                    fileobj.create_dataset('{0}/{1}'.format(qty, p), data=NP.zeros((8,6,3), dtype=dtype))
+                    fileobj.create_dataset('{0}/twts/{1}'.format(qty, p), data=0.0)
+            fileobj.create_dataset('timestamps', data=NP.zeros(0), maxshape=(None,), dtype=NP.float64)
+        return extfile
+
+    def write(self, extfile, timestamps, qtys, twts):
+        with h5py.File(extfile, 'a') as fileobj:
+            for qty in qtys:
+                for p in qtys[qty]:
+                    fileobj['{0}/{1}'.format(qty, p)][...] += qtys[qty][p]
+                    fileobj['{0}/twts/{1}'.format(qty, p)][...] += twts[p]
+            tdset = fileobj['timestamps']
+            tdset.resize(tdset.size+len(timestamps), axis=0)
+            tdset[-len(timestamps):] = timestamps
+
+    def read(self, extfile):
+        with h5py.File(extfile, 'r') as fileobj:
+            out = {qty: {p: fileobj['{0}/{1}'.format(qty, p)][...] for p in self.pol} for qty in ['img', 'beam', 'vis_vuf']}
+            out['twts'] = {p: float(fileobj['img/twts/{0}'.format(p)][()]) for p in self.pol}
+            out['timestamps'] = fileobj['timestamps'][...]
+        return out
+
+    def test_sums_match_file_accumulation(self):
+        for checkpoint_interval in [None, 1, 3]:
+            filebased = self.create_file('filebased.hdf5')
+            inmemory = self.create_file('inmemory.hdf5')
+            accumulator = AA.ImageAccumulator(checkpoint_interval=checkpoint_interval, precision='double')
+            for timestamp, qtys in self.snapshots:
+                self.write(filebased, [timestamp], qtys, {p: 1.0 for p in self.pol})
+                accumulator.add(self.pol, [timestamp], qtys)
+                if accumulator.due():
+                    pol, timestamps, sums, twts = accumulator.pop()
+                    self.write(inmemory, timestamps, sums, twts)
+            if len(accumulator) > 0:
+                pol, timestamps, sums, twts = accumulator.pop()
+                self.write(inmemory, timestamps, sums, twts)
+            self.assertEqual(len(accumulator), 0)
+            ref = self.read(filebased)
+            out = self.read(inmemory)
+            for qty in ['img', 'beam', 'vis_vuf']:
+                for p in self.pol:
+                    self.assertTrue(NP.allclose(out[qty][p], ref[qty][p], rtol=1e-12, atol=1e-12))
+            self.assertEqual(out['twts'], ref['twts'])
+            self.assertTrue(NP.array_equal(out['timestamps'], ref['timestamps']))
+
+    def test_precision(self):
+        timestamp, qtys = self.snapshots[0]
+        accumulator = AA.ImageAccumulator()
+        accumulator.add(self.pol, [timestamp], qtys)
+        self.assertEqual(accumulator.sums['img']['P11'].dtype, NP.float32)
+        self.assertEqual(accumulator.sums['vis_vuf']['P11'].dtype, NP.complex64)
+        accumulator = AA.ImageAccumulator(precision='double')
+        accumulator.add(self.pol, [timestamp], qtys)
+        self.assertEqual(accumulator.sums['img']['P11'].dtype, NP.float64)
+        self.assertEqual(accumulator.sums['vis_vuf']['P11'].dtype, NP.complex128)
+
+    def test_sums_not_aliased_to_inputs(self):
+        timestamp, qtys = self.snapshots[0]
+        original = copy.deepcopy(qtys)
+        accumulator = AA.ImageAccumulator(precision='double')
+        accumulator.add(self.pol, [timestamp], qtys)
+        accumulator.add(self.pol, [timestamp+0.5], qtys)
+        self.assertTrue(NP.array_equal(qtys['img']['P11'], original['img']['P11']))
+
+    def test_mismatched_inputs_leave_sums_unchanged(self):
+        timestamp, qtys = self.snapshots[0]
+        accumulator = AA.ImageAccumulator(precision='double')
+        accumulator.add(self.pol, [timestamp], qtys)
+        state = copy.deepcopy((accumulator.pol, accumulator.sums, accumulator.twts, accumulator.timestamps, accumulator.nsnaps))
+        missing = {qty: qtys[qty] for qty in ['img', 'beam']}
+        extra = dict(qtys.items() + [('wts_vuf', qtys['beam'])])
+        reshaped = copy.deepcopy(qtys)
+        reshaped['vis_vuf']['P22'] = reshaped['vis_vuf']['P22'][:,:,:2]
+        nopol = copy.deepcopy(qtys)
+        del nopol['beam']['P22']
+        for badqtys in [missing, extra, reshaped, nopol]:
+            with self.assertRaises(ValueError):
+                accumulator.add(self.pol, [timestamp+1.0], badqtys)
+            self.assertEqual(accumulator.pol, state[0])
+            for qty in state[1]:
+                for p in state[1][qty]:
+                    self.assertTrue(NP.array_equal(accumulator.sums[qty][p], state[1][qty][p]))
+            self.assertEqual((accumulator.twts, accumulator.timestamps, accumulator.nsnaps), state[2:])
+        with self.assertRaises(KeyError):
+            accumulator.add(self.pol, [timestamp+1.0], {'image': qtys['img']})
+
+    def test_due(self):
+        accumulator = AA.ImageAccumulator(checkpoint_interval=2)
+        for ti, (timestamp, qtys) in enumerate(self.snapshots[:3]):
+            accumulator.add(self.pol, [timestamp], qtys)
+            self.assertEqual(accumulator.due(), ti >= 1)
+        self.assertFalse(AA.ImageAccumulator().due())
+
+if __name__ == '__main__':
+    unittest.main()
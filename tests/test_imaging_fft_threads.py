@@ -0,0 +1,57 @@
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+
+class TestImagingFFTThreads(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(13)
+        self.efimgobj = AA.Image(verbose=False)
+        self.efimgobj.gridu, self.efimgobj.gridv = NP.meshgrid(0.5*NP.arange(-4,4), 0.5*NP.arange(-3,3))
+        self.efimgobj.f = 50e6 + 25e3 * NP.arange(7)
+        shape = self.efimgobj.gridu.shape + (self.efimgobj.f.size,)
+        self.grid_illumination = rng.rand(*shape) * (rng.rand(*shape) > 0.3)
+        self.grid_Ef = (rng.randn(*shape) + 1j * rng.randn(*shape)) * (self.grid_illumination > 0.0)
+        self.cpu_count = AA.MP.cpu_count
+        self.pool = AA.MP.Pool
+        AA.MP.cpu_count = lambda: 8
+        AA.MP.Pool = None # No process pools are expected
+
+    def tearDown(self):
+        AA.MP.cpu_count = self.cpu_count
+        AA.MP.Pool = self.pool
+
+    def reference(self):
+        grid_wts = (NP.abs(self.grid_illumination) > 0.0).astype(NP.float64)
+        sum_wts2 = NP.sum(NP.abs(grid_wts * self.grid_illumination), axis=(0,1), keepdims=True)**2
+        padshape = (2*self.grid_Ef.shape[0], 2*self.grid_Ef.shape[1])
+        img = NP.abs(NP.fft.fft2(grid_wts*self.grid_Ef, s=padshape, axes=(0,1)))**2 / sum_wts2
+        beam = NP.abs(NP.fft.fft2(grid_wts*self.grid_illumination, s=padshape, axes=(0,1)))**2 / sum_wts2
+        return {'img': NP.fft.fftshift(img, axes=(0,1)), 'beam': NP.fft.fftshift(beam, axes=(0,1))}
+
+    def test_threads_match_reference(self):
+        ref = self.reference()
+        serial = self.efimgobj.imagr_block(self.grid_Ef, self.grid_illumination, nproc=1)
+        for kwargs in [{'nproc': 3}, {'nproc': 1, 'fft_nthreads': 4}, {'nproc': 3, 'fft_backend': 'numpy', 'fft_nthreads': 2}]:
+            prods = self.efimgobj.imagr_block(self.grid_Ef, self.grid_illumination, **kwargs)
+            for qty in ['img', 'beam']:
+                self.assertTrue(NP.allclose(prods[qty], ref[qty]))
+            for qty in ['holimg', 'holbeam', 'wts_vuf', 'vis_vuf']:
+                self.assertTrue(NP.allclose(prods[qty], serial[qty]))
+
+    def test_channel_slabs(self):
+        planner = AA.get_fft_planner(backend='numpy', nthreads=3)
+        slabs = []
+        transform_slab = planner._transform_slab
+        def recorded_transform_slab(buf, start, stop, inverse):
+            slabs.append((start, stop))
+            transform_slab(buf, start, stop, inverse)
+        planner._transform_slab = recorded_transform_slab
+        try:
+            self.efimgobj.imagr_block(self.grid_Ef, self.grid_illumination, nproc=3, products=['img'])
+        finally:
+            del planner._transform_slab
+        self.assertEqual(sorted(slabs), [(0,3), (3,5), (5,7)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+from epic import aperture as APR
+
+def new_array(nant=4, nsamples=4):
+    aprtr = APR.Aperture(pol_type='dual', kernel_type={'P1': 'func', 'P2': 'func'}, shape={'P1': 'circular', 'P2': 'circular'}, parms={'P1': {'rmax': 1.0}, 'P2': {'rmax': 1.0}})
+    antennas = [AA.Antenna('A{0:0d}'.format(i), 'dipole', 0.0, 0.0, [2.0*i, -1.5*i, 0.0], 50e6, nsamples=nsamples, aperture=aprtr) for i in range(nant)]
+    aar = AA.AntennaArray() + antennas
+    aar.f0 = 50e6
+    aar.f = 50e6 + 25e3 * NP.arange(2*nsamples)
+    for ant in antennas:
+        ant.f = NP.copy(aar.f)
+    aar.gridu, aar.gridv = NP.meshgrid(0.1*NP.arange(-16,16), 0.1*NP.arange(-16,16))
+    aar.grid_ready = True
+    return aar
+
+class TestImagingProducts(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(12)
+        self.aar = new_array()
+        self.aar.initColumnar(verbose=False)
+        self.aar.genMappingMatrix(pol=None, method='NN', distNN=1.0, identical_antennas=True, gridfunc_freq='scale', verbose=False)
+        self.aar.ingest(0.0, rng.randn(4,8,2) + 1j * rng.randn(4,8,2))
+        self.aar.applyMappingMatrix(pol='P1', verbose=False)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def new_image(self, name):
+        return AA.Image(antenna_array=self.aar, extfile=os.path.join(self.tmpdir, name), verbose=False)
+
+    def test_selected_products(self):
+        efimgobj = self.new_image('image.hdf5')
+        grid_Ef = self.aar.grid_Ef['P1']
+        grid_illumination = self.aar.grid_illumination['P1']
+        allprods = efimgobj.imagr_block(grid_Ef, grid_illumination, nproc=1)
+        self.assertEqual(sorted(allprods.keys()), ['beam', 'grid_wts', 'gridl', 'gridm', 'holbeam', 'holimg', 'img', 'vis_vuf', 'wts_vuf'])
+        for products in [['img'], ['holbeam'], ['img', 'beam'], ['vis_vuf', 'holimg']]:
+            prods = efimgobj.imagr_block(grid_Ef, grid_illumination, nproc=1, products=products)
+            self.assertEqual(sorted(prods.keys()), sorted(['grid_wts', 'gridl', 'gridm'] + products))
+            for prod in products:
+                self.assertTrue(NP.allclose(prods[prod], allprods[prod]))
+
+        efimgobj.set_products('P1', allprods)
+        efimgobj.set_products('P1', efimgobj.imagr_block(grid_Ef, grid_illumination, nproc=1, products=['img', 'beam']))
+        self.assertIsNone(efimgobj.wts_vuf['P1'])
+        self.assertIsNone(efimgobj.vis_vuf['P1'])
+        self.assertIs(efimgobj.holimg['P1'], allprods['holimg'])
+        efimgobj.evalApertureProducts(pol='P1')
+        self.assertTrue(NP.allclose(efimgobj.wts_vuf['P1'], allprods['wts_vuf']))
+        self.assertTrue(NP.allclose(efimgobj.vis_vuf['P1'], allprods['vis_vuf']))
+
+        with self.assertRaises(ValueError):
+            efimgobj.imagr_block(grid_Ef, grid_illumination, products=['psf'])
+        with self.assertRaises(TypeError):
+            efimgobj.imagr_block(grid_Ef, grid_illumination, products='img')
+
+    def test_imagr_accumulates_same_products(self):
+        full = self.new_image('full.hdf5')
+        full.imagr(pol='P1', stack=False, grid_map_method='sparse', nproc=1, verbose=False)
+        selected = self.new_image('selected.hdf5')
+        selected.imagr(pol='P1', stack=False, grid_map_method='sparse', nproc=1, products=['img', 'beam'], verbose=False)
+        self.assertIsNone(selected.holimg['P1'])
+        for qty in ['img', 'beam', 'wts_vuf', 'vis_vuf']:
+            self.assertTrue(NP.allclose(getattr(selected, qty)['P1'], getattr(full, qty)['P1']))
+
+if __name__ == '__main__':
+    unittest.main()
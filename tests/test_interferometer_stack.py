@@ -0,0 +1,58 @@
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+
+class TestInterferometerStack(unittest.TestCase):
+
+    def setUp(self):
+        self.ants = [AA.Antenna('A{0:0d}'.format(i), 'dipole', 0.0, 0.0, [1.0*i, 0.5*i, 0.0], 50e6, nsamples=4, stack_depth=3) for i in range(2)]
+        for ant in self.ants:
+            ant.t = 1e-6 * NP.arange(4)
+            ant.f = 50e6 + 125e3 * NP.arange(-4,4)
+        self.ifo = AA.Interferometer(self.ants[0], self.ants[1], stack_depth=3)
+        self.nchan = self.ants[0].f.size
+        self.rng = NP.random.RandomState(5)
+        self.Ef = []
+
+    def update_antennas(self, timestamp):
+        Ef = {}
+        for ant in self.ants:
+            Ef[ant.label] = {pol: self.rng.randn(self.nchan) + 1j * self.rng.randn(self.nchan) for pol in ['P1', 'P2']}
+            ant.update({'timestamp': timestamp, 'Ef': Ef[ant.label], 'flags': {'P1': False, 'P2': False}, 'stack': True}, verbose=False)
+        self.Ef += [Ef]
+
+    def expected_Vf(self, cpol):
+        p1, p2 = 'P' + cpol[1], 'P' + cpol[2]
+        return NP.asarray([Ef['A0'][p1] * Ef['A1'][p2].conjugate() for Ef in self.Ef])
+
+    def test_update_after_stack(self):
+        for ti in range(3):
+            self.update_antennas(float(ti))
+        self.ifo.stack()
+        for cpol in ['P11', 'P12', 'P21', 'P22']:
+            self.assertTrue(NP.allclose(self.ifo.Vf_stack[cpol], self.expected_Vf(cpol)))
+            self.assertEqual(self.ifo.Vf_stack[cpol].dtype, NP.complex128)
+
+        self.update_antennas(3.0)
+        self.ifo.update({'timestamp': 3.0, 'flags': {cpol: False for cpol in ['P11', 'P12', 'P21', 'P22']}, 'do_correlate': 'FX', 'stack': True})
+        self.assertEqual(self.ifo.timestamps, [1.0, 2.0, 3.0])
+        for cpol in ['P11', 'P12', 'P21', 'P22']:
+            self.assertEqual(self.ifo.Vf_stack[cpol].shape, (3, self.nchan))
+            self.assertEqual(self.ifo.Vt_stack[cpol].shape, (3, self.nchan))
+            self.assertTrue(NP.allclose(self.ifo.Vf_stack[cpol], self.expected_Vf(cpol)[-3:]))
+            self.assertEqual(self.ifo.flag_stack[cpol].shape, (3,))
+            self.assertFalse(NP.any(self.ifo.flag_stack[cpol]))
+
+    def test_reset_refills(self):
+        buf = AA.StackBuffer(depth=2)
+        buf.append(NP.zeros(3))
+        records = NP.arange(9.0).reshape(3,3)
+        buf.reset(records)
+        self.assertTrue(NP.array_equal(buf.view(), records[-2:]))
+        buf.append(NP.ones(3))
+        self.assertTrue(NP.array_equal(buf.view(), [records[-1], NP.ones(3)]))
+        buf.reset()
+        self.assertEqual(len(buf), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import logging
+import collections
+import unittest
+import numpy as NP
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LWA'))
+try:
+    import LWA_bifrost as LB
+except ImportError:
+    bifrost_module_found = False
+else:
+    bifrost_module_found = True
+
+Stand = collections.namedtuple('Stand', ['id', 'x', 'y', 'z'])
+Antenna = collections.namedtuple('Antenna', ['stand'])
+Ring = collections.namedtuple('Ring', ['name'])
+
+def new_correlator(grid_size, ntime_gulp, remove_autocorrs=False):
+
+    # The correlator drops every other antenna (one per stand) and expects 
+    # at least 256 stands
+
+    antennas = []
+    for i in range(256):
+        stand = Stand(i+1, 0.0, 0.0, 0.0)
+        antennas += [Antenna(stand), Antenna(stand)]
+    return LB.MOFFCorrelatorOp(logging.getLogger(__name__), Ring('in'), Ring('out'), antennas, grid_size, 1.0, ntime_gulp=ntime_gulp, remove_autocorrs=remove_autocorrs, cpu=True)
+
+def signed_nibble(value):
+    return value - 16 if value >= 8 else value
+
+@unittest.skipUnless(bifrost_module_found, 'Modules bifrost and lsl not found')
+class TestLWABifrostCPU(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = NP.random.RandomState(7)
+
+    def test_unpack_ci4(self):
+        idata = NP.arange(256, dtype=NP.uint8).reshape(4,2,2,16) # time, chan, pol, stand
+        ref = NP.asarray([signed_nibble(b >> 4) + 1j * signed_nibble(b & 0xF) for b in range(256)]).reshape(idata.shape)
+        self.assertTrue(NP.array_equal(LB.UnpackCPU(idata, NP.ones((2,2,16), dtype=NP.complex64)), ref))
+        self.assertEqual((ref.real.min(), ref.real.max(), ref.imag.min(), ref.imag.max()), (-8, 7, -8, 7))
+
+        phases = (self.rng.randn(2,2,16) + 1j * self.rng.randn(2,2,16)).astype(NP.complex64)
+        out = NP.empty(idata.shape, dtype=NP.complex64)
+        udata = LB.UnpackCPU(idata, phases, out=out)
+        self.assertIs(udata, out)
+        self.assertTrue(NP.allclose(udata, ref * phases[NP.newaxis], rtol=1e-6))
+
+    def test_grid_indices(self):
+        grid_size = 8
+        lx = NP.asarray([0.5, 7.9, -0.5, 8.0, 3.2]).reshape(1,1,1,-1) + NP.zeros((3,2,1,1)) # time, pol, chan, stand
+        ly = NP.asarray([0.0, 7.5, 2.0, 1.0, 8.5]).reshape(1,1,1,-1) + NP.zeros((3,2,1,1))
+        lx[:,1,:,:] = lx[:,1,:,:] + 1.0
+        gridind = LB.GridIndices(lx, ly, grid_size)
+        self.assertEqual(gridind.shape, (1,2,5)) # chan, pol, stand
+        self.assertEqual(gridind[0,0].tolist(), [0, 7*8+7, 2*8+0, -1, -1])
+        self.assertEqual(gridind[0,1].tolist(), [1, -1, 2*8+0, -1, -1])
+
+    def test_grid_and_cross_multiply(self):
+        grid_size, ntime, nchan, npol, nstand = 4, 3, 2, 2, 3
+        corr = new_correlator(grid_size, ntime, remove_autocorrs=True)
+        corr.cpu_udata = (self.rng.randn(ntime,nchan,npol,nstand) + 1j * self.rng.randn(ntime,nchan,npol,nstand)).astype(NP.complex64)
+        corr.cpu_gridind = NP.asarray([[[5, 5, -1], [5, 6, -1]], [[0, 15, -1], [3, 6, 9]]], dtype=NP.int32) # chan, pol, stand
+        corr.cpu_gdata = NP.empty((nchan,npol,ntime,grid_size,grid_size), dtype=NP.complex64)
+        corr.cpu_image = NP.zeros((nchan,npol**2,grid_size,grid_size), dtype=NP.complex64)
+        corr.cpu_autocorrs = NP.zeros((nchan,npol**2,nstand), dtype=NP.complex64)
+
+        for c in range(nchan):
+            for p in range(npol):
+                corr.grid_and_transform_cpu((c,p))
+                grid = NP.zeros((ntime,grid_size*grid_size), dtype=NP.complex128)
+                for s in range(nstand):
+                    if corr.cpu_gridind[c,p,s] >= 0:
+                        grid[:,corr.cpu_gridind[c,p,s]] += corr.cpu_udata[:,c,p,s]
+                ref = NP.fft.ifft2(grid.reshape(ntime,grid_size,grid_size), axes=(1,2)) * grid_size**2
+                self.assertTrue(NP.allclose(corr.cpu_gdata[c,p], ref, rtol=1e-5, atol=1e-5))
+
+        for c in range(nchan):
+            for p in range(npol**2):
+                corr.cross_multiply_cpu((c,p))
+                a = corr.cpu_gdata[c,p//npol].astype(NP.complex128)
+                b = corr.cpu_gdata[c,p%npol].astype(NP.complex128)
+                self.assertTrue(NP.allclose(corr.cpu_image[c,p], NP.sum(a*b.conj(), axis=0), rtol=1e-5, atol=1e-4))
+                ua = corr.cpu_udata[:,c,p//npol,:].astype(NP.complex128)
+                ub = corr.cpu_udata[:,c,p%npol,:].astype(NP.complex128)
+                self.assertTrue(NP.allclose(corr.cpu_autocorrs[c,p], NP.sum(ua*ub.conj(), axis=0), rtol=1e-5, atol=1e-5))
+
+        # The stands of the second channel in the second polarization fall
+        # on distinct cells, so removing the autocorrelations as done by the
+        # correlator leaves only cross terms which average to zero over the
+        # image
+
+        autocorr_g = corr.cpu_autocorrs.sum(axis=2)
+        self.assertTrue(NP.allclose(NP.mean(corr.cpu_image[1,3].real), autocorr_g[1,3].real, rtol=1e-5))
+        self.assertTrue(NP.allclose(NP.mean(corr.cpu_image[1,3] - autocorr_g[1,3]), 0.0, atol=1e-3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+from epic import aperture as APR
+
+def new_antenna_array(lkpfile):
+
+    # Only the attributes entering the cache keys are set up
+
+    aperture = APR.Aperture(pol_type='dual', kernel_type={'P1': 'lookup', 'P2': 'lookup'}, lkpinfo={'P1': lkpfile, 'P2': lkpfile}, load_lookup=False)
+    antennas = {}
+    for label in ['A0', 'A1']:
+        antennas[label] = AA.Antenna.__new__(AA.Antenna)
+        antennas[label].aperture = aperture
+        antennas[label].typetag = 'dipole'
+    aar = AA.AntennaArray.__new__(AA.AntennaArray)
+    aar.antennas = antennas
+    aar.gridu, aar.gridv = NP.meshgrid(NP.arange(4.0), NP.arange(3.0))
+    aar.f = NP.asarray([50e6, 60e6])
+    return aar
+
+class TestMappingCacheKey(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.lkpfile = os.path.join(self.tmpdir, 'lookup.txt')
+        self.write_lookup('0.0 0.0 1.0 0.0\n')
+        self.ant_dict = {'labels': ['A0', 'A1'], 'positions': NP.asarray([[0.0, 0.0, 0.0], [3.0, 1.0, 0.0]])}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_lookup(self, contents):
+        with open(self.lkpfile, 'w') as fileobj:
+            fileobj.write(contents)
+
+    def keys(self):
+        aar = new_antenna_array(self.lkpfile)
+        return (aar._mappingCacheKey('P1', self.ant_dict), aar._crossWtsCacheKey('A0', 'A1'))
+
+    def test_lookup_file_digest(self):
+        digest = AA.lookup_file_digest(self.lkpfile)
+        self.assertEqual(digest, AA.lookup_file_digest(self.lkpfile))
+        self.write_lookup('0.0 0.0 0.5 0.0\n')
+        self.assertNotEqual(digest, AA.lookup_file_digest(self.lkpfile))
+        self.assertEqual(AA.lookup_file_digest(None), '')
+        self.assertEqual(AA.lookup_file_digest(os.path.join(self.tmpdir, 'missing.txt')), '')
+
+    def test_keys_follow_lookup_contents(self):
+        keys = self.keys()
+        self.assertEqual(keys, self.keys())
+        self.write_lookup('0.0 0.0 0.5 0.0\n') # Edited in place under the same name
+        edited = self.keys()
+        self.assertNotEqual(keys[0], edited[0])
+        self.assertNotEqual(keys[1], edited[1])
+        self.write_lookup('0.0 0.0 1.0 0.0\n')
+        self.assertEqual(keys, self.keys())
+
+    def test_keys_follow_inputs(self):
+        aar = new_antenna_array(self.lkpfile)
+        key = aar._mappingCacheKey('P1', self.ant_dict)
+        self.assertNotEqual(key, aar._mappingCacheKey('P2', self.ant_dict))
+        self.assertNotEqual(key, aar._mappingCacheKey('P1', self.ant_dict, distNN=1.0))
+        self.assertNotEqual(key, aar._mappingCacheKey('P1', {'labels': self.ant_dict['labels'], 'positions': self.ant_dict['positions'] + 0.5}))
+        aar.f = aar.f + 1.0
+        self.assertNotEqual(key, aar._mappingCacheKey('P1', self.ant_dict))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import numpy as NP
+from astroutils import catalog as SM
+from epic import antenna_array as AA
+from epic import aperture as APR
+from epic import sim_observe as SIM
+
+def new_simulator():
+    f0 = 50e6
+    nts = 4
+    bandwidth = 2 * nts * 100e3
+    parms = {pol: {'xmax': 1.0, 'ymax': 1.0, 'rmin': 0.0, 'rmax': 1.5, 'rotangle': 0.0} for pol in ['P1', 'P2']}
+    aprtr = APR.Aperture(pol_type='dual', kernel_type={pol: 'func' for pol in ['P1', 'P2']}, shape={pol: 'circular' for pol in ['P1', 'P2']}, parms=parms, lkpinfo=None, load_lookup=True)
+    aar = AA.AntennaArray()
+    for i,xy in enumerate([[0.0, 0.0], [4.0, 1.0], [-2.0, 5.0]]):
+        ant = AA.Antenna('A{0:0d}'.format(i), 'dipole', -26.7, 116.7, xy+[0.0], f0, nsamples=nts, aperture=aprtr)
+        ant.f = f0 + NP.fft.fftshift(NP.fft.fftfreq(2*nts, 1.0/bandwidth))
+        aar = aar + ant
+    aar.f = ant.f
+
+    nsrc = 7
+    rng = NP.random.RandomState(23)
+    location = NP.hstack((rng.uniform(0.0, 40.0, size=(nsrc,1)), rng.uniform(-60.0, 10.0, size=(nsrc,1))))
+    spec_parms = {'name': NP.repeat('power-law', nsrc), 'power-law-index': rng.uniform(-1.0, 0.0, size=nsrc), 'freq-ref': f0 + NP.zeros(nsrc), 'flux-scale': rng.uniform(1.0, 10.0, size=nsrc), 'flux-offset': NP.zeros(nsrc), 'freq-width': NP.zeros(nsrc)}
+    skymod = SM.SkyModel(init_parms={'name': NP.repeat('test', nsrc), 'frequency': aar.f, 'location': location, 'spec_type': 'func', 'spec_parms': spec_parms}, init_file=None)
+    return SIM.AntennaArraySimulator(aar, skymod, identical_antennas=True)
+
+class TestObservingRunBlocks(unittest.TestCase):
+
+    def run_obs(self, time_blocksize, src_chunksize=1024):
+        sim = new_simulator()
+        init_parms = {'obs_date': '2015/11/23', 'phase_center': [90.0, 270.0], 'pointing_center': [90.0, 270.0], 'phase_center_coords': 'altaz', 'pointing_center_coords': 'altaz', 'sidereal_time': 1.0}
+        sim.observing_run(init_parms, obsmode='track', duration=5*sim.t.max(), randomseed=100, time_blocksize=time_blocksize, src_chunksize=src_chunksize)
+        return sim
+
+    def test_blocks_match_snapshots(self):
+        ref = self.run_obs(None)
+        self.assertEqual(ref.Ef_stack['P1'].shape[2], 5)
+        self.assertTrue(NP.any(NP.abs(ref.Ef_stack['P1']) > 0.0))
+        for time_blocksize, src_chunksize in [(1, 1024), (2, 1024), (3, 4), (5, 3)]:
+            sim = self.run_obs(time_blocksize, src_chunksize=src_chunksize)
+            self.assertEqual(sim.timestamps, ref.timestamps)
+            for apol in ['P1', 'P2']:
+                self.assertEqual(sim.Ef_stack[apol].shape, ref.Ef_stack[apol].shape)
+                self.assertTrue(NP.allclose(sim.Ef_stack[apol], ref.Ef_stack[apol], rtol=1e-10, atol=1e-12))
+
+if __name__ == '__main__':
+    unittest.main()
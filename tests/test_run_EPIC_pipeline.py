@@ -0,0 +1,92 @@
+import os
+import imp
+import time
+import threading, Queue
+import unittest
+
+try:
+    run_EPIC = imp.load_source('run_EPIC', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts', 'run_EPIC.py'))
+except ImportError:
+    run_EPIC_found = False
+else:
+    run_EPIC_found = True
+
+@unittest.skipUnless(run_EPIC_found, 'Modules required by scripts/run_EPIC.py not found')
+class TestPipelineStages(unittest.TestCase):
+
+    def setUp(self):
+        self.abort = threading.Event()
+        self.queues = [Queue.Queue(maxsize=2) for i in range(4)]
+        self.seen = {'calibrate': [], 'accumulate': [], 'writer': []}
+
+    def run_pipeline(self, nitems, grid_func):
+
+        # Same layout as the stages in scripts/run_EPIC.py
+
+        def calibrate(seq, item):
+            self.seen['calibrate'] += [seq]
+            return item
+
+        def accumulate(seq, item):
+            self.seen['accumulate'] += [seq]
+            return item
+
+        def finalize():
+            return (nitems, 'final')
+
+        def write(seq, item):
+            self.seen['writer'] += [(seq, item)]
+
+        stages = [run_EPIC.PipelineStage('calibrate', calibrate, self.queues[0], self.queues[1], nworkers=1, ordered=True, abort=self.abort),
+                  run_EPIC.PipelineStage('grid', grid_func, self.queues[1], self.queues[2], nworkers=3, abort=self.abort),
+                  run_EPIC.PipelineStage('accumulate', accumulate, self.queues[2], self.queues[3], nworkers=1, ordered=True, finalize=finalize, abort=self.abort),
+                  run_EPIC.PipelineStage('writer', write, self.queues[3], None, nworkers=1, abort=self.abort)]
+        for stage in stages:
+            stage.start()
+        nput = 0
+        for seq in range(nitems):
+            if not run_EPIC.queue_put(self.queues[0], (seq, 10*seq), self.abort):
+                break
+            nput += 1
+        run_EPIC.queue_put(self.queues[0], None, self.abort)
+        for stage in stages:
+            stage.join()
+        return stages, nput
+
+    def test_stage_ordering(self):
+
+        def grid(seq, item):
+            time.sleep(0.001 * ((7 * seq) % 5)) # finish out of order
+            return item + 1
+
+        stages, nput = self.run_pipeline(12, grid)
+        self.assertFalse(self.abort.is_set())
+        self.assertTrue(all([stage.error is None for stage in stages]))
+        self.assertEqual(self.seen['calibrate'], range(12))
+        self.assertEqual(self.seen['accumulate'], range(12))
+        self.assertEqual(self.seen['writer'], [(seq, 10*seq+1) for seq in range(12)] + [(12, 'final')])
+
+    def test_abort_path(self):
+
+        def grid(seq, item):
+            if seq == 3:
+                raise ValueError('bad snapshot')
+            return item
+
+        stages, nput = self.run_pipeline(50, grid)
+        self.assertTrue(self.abort.is_set())
+        self.assertLess(nput, 50)
+        self.assertIs(stages[1].error[0], ValueError)
+        self.assertTrue(all([stage.error is None for stage in stages if stage.name != 'grid']))
+        self.assertNotIn(3, self.seen['accumulate'])
+        self.assertNotIn((50, 'final'), self.seen['writer'])
+        self.assertFalse(any([thread.is_alive() for stage in stages for thread in stage.threads]))
+
+    def test_ordered_stage_with_one_worker_only(self):
+        with self.assertRaises(ValueError):
+            run_EPIC.PipelineStage('calibrate', None, self.queues[0], nworkers=2, ordered=True)
+        with self.assertRaises(TypeError):
+            run_EPIC.PipelineStage('grid', None, self.queues[0], nworkers=1.0)
+
+if __name__ == '__main__':
+    unittest.main()
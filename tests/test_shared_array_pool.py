@@ -0,0 +1,115 @@
+import unittest
+import numpy as NP
+from epic import antenna_array as AA
+
+def scale_rows(args):
+
+    # Worker function operating in place on the shared arrays
+
+    start, stop = args
+    inp = AA.shared_arrays['inp']
+    out = AA.shared_arrays['out']
+    out[start:stop] = inp[start:stop] * NP.arange(start, stop).reshape((-1,)+(1,)*(inp.ndim-1))
+    return (start, stop)
+
+class TestSharedArrayPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = AA.SharedArrayPool(nproc=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.pool.release()
+
+    def run_pool(self, shape):
+        rng = NP.random.RandomState(4)
+        inp = self.pool.allocate('inp', shape, NP.complex128)
+        inp[...] = rng.randn(*shape) + 1j * rng.randn(*shape)
+        out = self.pool.allocate('out', shape, NP.complex128)
+        out[...] = 0.0
+        ranges = self.pool.ranges(shape[0])
+        self.assertEqual(self.pool.map(scale_rows, ranges), ranges)
+        ref = inp * NP.arange(shape[0]).reshape((-1,)+(1,)*(len(shape)-1))
+        self.assertTrue(NP.array_equal(out, ref))
+        return NP.copy(out)
+
+    def test_map_in_place(self):
+        self.run_pool((10,3))
+
+    def test_reuse_and_growth(self):
+        self.pool.allocate('inp', (10,3), NP.complex128)
+        buf = self.pool._buffers['inp']
+        self.assertEqual(len(buf), 10*3*16)
+
+        arr = self.pool.allocate('inp', (4,3), NP.float64) # Smaller shape reuses memory
+        self.assertIs(self.pool._buffers['inp'], buf)
+        self.assertEqual((arr.shape, arr.dtype), ((4,3), NP.dtype(NP.float64)))
+        self.assertEqual(self.pool._layout['inp'], ((4,3), NP.dtype(NP.float64).str))
+
+        self.pool.allocate('inp', (11,3), NP.complex128) # Grows by at least doubling
+        self.assertIsNot(self.pool._buffers['inp'], buf)
+        self.assertEqual(len(self.pool._buffers['inp']), 2*10*3*16)
+
+        self.pool.allocate('inp', (100,3), NP.complex128) # Grows to the shape if larger
+        self.assertEqual(len(self.pool._buffers['inp']), 100*3*16)
+
+    def test_workers_follow_growth(self):
+        small = self.run_pool((6,2))
+        pool = self.pool._pool
+        self.assertIsNotNone(pool)
+        self.run_pool((5,2)) # Memory reused, workers kept
+        self.assertIs(self.pool._pool, pool)
+        large = self.run_pool((40,2,3)) # Memory grown, workers restarted
+        self.assertIsNot(self.pool._pool, pool)
+        self.assertEqual(small.shape, (6,2))
+        self.assertEqual(large.shape, (40,2,3))
+
+    def test_release(self):
+        self.run_pool((6,2))
+        self.pool.close()
+        self.pool.release()
+        self.assertIsNone(self.pool._pool)
+        self.assertEqual((self.pool._buffers, self.pool._layout), ({}, {}))
+        self.run_pool((6,2))
+
+    def test_copy_excludes_workers_and_memory(self):
+        import copy
+        self.run_pool((6,2))
+        pool = copy.deepcopy(self.pool)
+        self.assertEqual(pool.nproc, self.pool.nproc)
+        self.assertIsNone(pool._pool)
+        self.assertEqual(pool._buffers, {})
+
+class TestParallelStack(unittest.TestCase):
+
+    def interferometer_array(self):
+        rng = NP.random.RandomState(6)
+        antennas = [AA.Antenna('A{0:0d}'.format(i), 'dipole', 0.0, 0.0, [1.0*i, 0.5*i, 0.0], 50e6, nsamples=4, stack_depth=3) for i in range(3)]
+        for ant in antennas:
+            ant.t = 1e-6 * NP.arange(4)
+            ant.f = 50e6 + 125e3 * NP.arange(-4,4)
+            for ti in range(3):
+                Ef = {pol: rng.randn(8) + 1j * rng.randn(8) for pol in ['P1', 'P2']}
+                ant.update({'timestamp': float(ti), 'Ef': Ef, 'flags': {'P1': ti == 1, 'P2': False}, 'stack': True}, verbose=False)
+        return AA.InterferometerArray(antenna_array=AA.AntennaArray() + antennas)
+
+    def test_parallel_matches_serial(self):
+        serial = self.interferometer_array()
+        serial.stack()
+        parallel = self.interferometer_array()
+        parallel.stack(parallel=True, nproc=2)
+        parallel.pool.close()
+        parallel.pool.release()
+        self.assertEqual(sorted(serial.interferometers.keys()), sorted(parallel.interferometers.keys()))
+        for label in serial.interferometers:
+            sifo = serial.interferometers[label]
+            pifo = parallel.interferometers[label]
+            self.assertEqual(sifo.timestamps, pifo.timestamps)
+            for cpol in ['P11', 'P12', 'P21', 'P22']:
+                self.assertEqual(pifo.Vf_stack[cpol].dtype, NP.complex128)
+                self.assertTrue(NP.allclose(pifo.Vf_stack[cpol], sifo.Vf_stack[cpol], rtol=1e-14, atol=1e-14))
+                self.assertTrue(NP.allclose(pifo.Vt_stack[cpol], sifo.Vt_stack[cpol], rtol=1e-14, atol=1e-14))
+                self.assertTrue(NP.array_equal(pifo.flag_stack[cpol], sifo.flag_stack[cpol]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import numpy as NP
+from epic import sim_observe as SIM
+
+class TestSkyApertureNUFFT(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(22)
+        gridu, gridv = NP.meshgrid(NP.arange(-8,8) * 0.5, NP.arange(-6,6) * 0.5)
+        self.lattice = NP.hstack((gridu.reshape(-1,1), gridv.reshape(-1,1)))
+        self.scattered = rng.uniform(-4.0, 4.0, size=(50,2))
+        self.srcdircos = rng.uniform(-0.6, 0.6, size=(40,2))
+        self.strengths = rng.randn(40,3) + 1j * rng.randn(40,3)
+
+    def dft(self, uvlocs, strengths):
+        return NP.dot(NP.exp(1j * 2 * NP.pi * NP.dot(uvlocs, self.srcdircos.T)), strengths)
+
+    def check_backend(self, uvlocs, backend, eps):
+        nufft = SIM.SkyApertureNUFFT(uvlocs, eps=eps, backend=backend)
+        nufft.set_sources(self.srcdircos)
+        ref = self.dft(uvlocs, self.strengths)
+        Ef = nufft.transform(self.strengths)
+        self.assertEqual(Ef.shape, ref.shape)
+        self.assertLess(NP.linalg.norm(Ef - ref) / NP.linalg.norm(ref), eps)
+        Ef = nufft.transform(self.strengths[:,0])
+        self.assertEqual(Ef.shape, (uvlocs.shape[0],))
+        self.assertLess(NP.linalg.norm(Ef - ref[:,0]) / NP.linalg.norm(ref[:,0]), eps)
+
+    def test_dft_backend(self):
+        self.check_backend(self.scattered, 'dft', 1e-10)
+
+    def test_numpy_backend(self):
+        for eps in [1e-3, 1e-6]:
+            self.check_backend(self.lattice, 'numpy', eps)
+
+    @unittest.skipUnless(SIM.finufft_module_found, 'Module finufft not found')
+    def test_finufft_backend(self):
+        self.check_backend(self.scattered, 'finufft', 1e-6)
+
+    def test_numpy_backend_requires_lattice(self):
+        with self.assertRaises(ValueError):
+            SIM.SkyApertureNUFFT(self.scattered, backend='numpy')
+
+    def test_transform_requires_sources(self):
+        nufft = SIM.SkyApertureNUFFT(self.lattice, backend='dft')
+        with self.assertRaises(ValueError):
+            nufft.transform(self.strengths)
+
+if __name__ == '__main__':
+    unittest.main()
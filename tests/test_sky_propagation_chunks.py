@@ -0,0 +1,70 @@
+import unittest
+import numpy as NP
+import scipy.constants as FCNST
+from astroutils import catalog as SM
+from astroutils import geometry as GEOM
+from epic import antenna_array as AA
+from epic import aperture as APR
+from epic import sim_observe as SIM
+
+def new_simulator(nsrc=11):
+    f0 = 50e6
+    nts = 4
+    bandwidth = 2 * nts * 100e3
+    parms = {pol: {'xmax': 1.0, 'ymax': 1.0, 'rmin': 0.0, 'rmax': 1.5, 'rotangle': 0.0} for pol in ['P1', 'P2']}
+    aprtr = APR.Aperture(pol_type='dual', kernel_type={pol: 'func' for pol in ['P1', 'P2']}, shape={pol: 'circular' for pol in ['P1', 'P2']}, parms=parms, lkpinfo=None, load_lookup=True)
+    aar = AA.AntennaArray()
+    for i,xy in enumerate([[0.0, 0.0], [4.0, 1.0], [-2.0, 5.0]]):
+        ant = AA.Antenna('A{0:0d}'.format(i), 'dipole', -26.7, 116.7, xy+[0.0], f0, nsamples=nts, aperture=aprtr)
+        ant.f = f0 + NP.fft.fftshift(NP.fft.fftfreq(2*nts, 1.0/bandwidth))
+        aar = aar + ant
+    aar.f = ant.f
+
+    rng = NP.random.RandomState(21)
+    location = NP.hstack((rng.uniform(0.0, 40.0, size=(nsrc,1)), rng.uniform(-60.0, 10.0, size=(nsrc,1))))
+    spec_parms = {'name': NP.repeat('power-law', nsrc), 'power-law-index': rng.uniform(-1.0, 0.0, size=nsrc), 'freq-ref': f0 + NP.zeros(nsrc), 'flux-scale': rng.uniform(1.0, 10.0, size=nsrc), 'flux-offset': NP.zeros(nsrc), 'freq-width': NP.zeros(nsrc)}
+    skymod = SM.SkyModel(init_parms={'name': NP.repeat('test', nsrc), 'frequency': aar.f, 'location': location, 'spec_type': 'func', 'spec_parms': spec_parms}, init_file=None)
+    return SIM.AntennaArraySimulator(aar, skymod, identical_antennas=True)
+
+class TestSkyPropagationChunks(unittest.TestCase):
+
+    def setUp(self):
+        self.nsrc = 11
+        self.sim = new_simulator(nsrc=self.nsrc)
+        rng = NP.random.RandomState(21)
+        nchan = self.sim.f.size
+        self.sky_Ef_info = {p: rng.randn(self.nsrc,nchan) + 1j * rng.randn(self.nsrc,nchan) for p in ['P1', 'P2']}
+        self.altaz = NP.hstack((rng.uniform(10.0, 90.0, size=(self.nsrc,1)), rng.uniform(0.0, 360.0, size=(self.nsrc,1))))
+        uvgrid = NP.meshgrid(0.5*NP.arange(-2,2), 0.5*NP.arange(-2,2))
+        self.uvlocs = NP.hstack((uvgrid[0].reshape(-1,1), uvgrid[1].reshape(-1,1)))
+
+    def reference(self, p):
+
+        # Unchunked sum over all the sources in double precision
+
+        antpos_info = self.sim.antenna_array.antenna_positions(pol=None, flag=False, sort=True, centering=False)
+        wl = FCNST.c / self.sim.f
+        srcdircos = GEOM.altaz2dircos(self.altaz, units='degrees')
+        antphase = NP.exp(1j * 2 * NP.pi * NP.dot(srcdircos, antpos_info['positions'].T)[:,:,NP.newaxis] / wl.reshape(1,1,-1)) # nsrc x nant x nchan
+        uvphase = NP.exp(1j * 2 * NP.pi * NP.dot(self.uvlocs, srcdircos[:,:2].T)) # nuv x nsrc
+        return NP.einsum('us,sac->uac', uvphase, self.sky_Ef_info[p][:,NP.newaxis,:] * antphase)
+
+    def test_chunks_match_reference(self):
+        ref = {p: self.reference(p) for p in ['P1', 'P2']}
+        for src_chunksize in [1, 3, 4, self.nsrc, 1024]:
+            labels, aperture_Ef_info = self.sim.propagate_sky_E_spectrum(self.sky_Ef_info, self.altaz, uvlocs=self.uvlocs, src_chunksize=src_chunksize)
+            self.assertEqual(list(labels), ['A0', 'A1', 'A2'])
+            for p in ['P1', 'P2']:
+                self.assertEqual(aperture_Ef_info[p].shape, (self.uvlocs.shape[0], 3, self.sim.f.size))
+                self.assertEqual(aperture_Ef_info[p].dtype, NP.complex64)
+                self.assertTrue(NP.allclose(aperture_Ef_info[p], ref[p], rtol=1e-4, atol=1e-4*NP.abs(ref[p]).max()))
+
+    def test_pol_and_invalid_chunksize(self):
+        labels, aperture_Ef_info = self.sim.propagate_sky_E_spectrum(self.sky_Ef_info, self.altaz, uvlocs=self.uvlocs, pol='P2', src_chunksize=5)
+        self.assertEqual(aperture_Ef_info.keys(), ['P2'])
+        for src_chunksize, errtype in [(0, ValueError), (2.0, TypeError)]:
+            with self.assertRaises(errtype):
+                self.sim.propagate_sky_E_spectrum(self.sky_Ef_info, self.altaz, uvlocs=self.uvlocs, src_chunksize=src_chunksize)
+
+if __name__ == '__main__':
+    unittest.main()
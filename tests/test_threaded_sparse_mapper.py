@@ -0,0 +1,57 @@
+import unittest
+import threading
+import numpy as NP
+import scipy.sparse as SpM
+from epic import antenna_array as AA
+
+class TestThreadedSparseMapper(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(18)
+        spmat = SpM.random(500, 300, density=0.05, format='csr', random_state=rng)
+        spmat.data = spmat.data + 1j * rng.randn(spmat.nnz)
+        self.spmat = spmat.astype(NP.complex64)
+        self.dnsvec = (rng.randn(300) + 1j * rng.randn(300)).astype(NP.complex64)
+        self.dnsmat = (rng.randn(300,7) + 1j * rng.randn(300,7)).astype(NP.complex64)
+
+    def test_bit_identical_to_serial_product(self):
+        for nthreads in [1, 2, 3, 8]:
+            mapper = AA.ThreadedSparseMapper(self.spmat, nthreads=nthreads)
+            try:
+                for dns in [self.dnsvec, self.dnsmat]:
+                    out = mapper.dot(dns)
+                    ref = self.spmat.dot(dns)
+                    self.assertEqual(out.shape, ref.shape)
+                    self.assertEqual(out.dtype, ref.dtype)
+                    self.assertTrue(NP.array_equal(out, ref))
+            finally:
+                mapper.close()
+
+    def test_partitions_cover_rows(self):
+        mapper = AA.ThreadedSparseMapper(self.spmat, nthreads=4)
+        self.assertEqual(mapper.rowbounds[0], 0)
+        self.assertEqual(mapper.rowbounds[-1], self.spmat.shape[0])
+        self.assertEqual(sum([block.shape[0] for block in mapper.blocks]), self.spmat.shape[0])
+        self.assertEqual(sum([block.nnz for block in mapper.blocks]), self.spmat.nnz)
+
+    def test_concurrent_callers(self):
+        mapper = AA.ThreadedSparseMapper(self.spmat, nthreads=4)
+        ref = self.spmat.dot(self.dnsmat)
+        results = []
+        def worker():
+            results.append(NP.array_equal(mapper.dot(self.dnsmat), ref))
+        threads = [threading.Thread(target=worker) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        mapper.close()
+        self.assertEqual(results, [True] * 6)
+
+    def test_shape_mismatch(self):
+        mapper = AA.ThreadedSparseMapper(self.spmat, nthreads=2)
+        with self.assertRaises(ValueError):
+            mapper.dot(NP.ones(299))
+
+if __name__ == '__main__':
+    unittest.main()
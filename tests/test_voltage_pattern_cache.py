@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as NP
+from astroutils import catalog as SM
+from epic import antenna_array as AA
+from epic import aperture as APR
+from epic import sim_observe as SIM
+
+def new_simulator():
+    f0 = 50e6
+    nts = 2
+    bandwidth = 2 * nts * 10e6
+    parms = {pol: {'xmax': 1.0, 'ymax': 1.0, 'rmin': 0.0, 'rmax': 1.5, 'rotangle': 0.0} for pol in ['P1', 'P2']}
+    aprtr = APR.Aperture(pol_type='dual', kernel_type={pol: 'func' for pol in ['P1', 'P2']}, shape={pol: 'circular' for pol in ['P1', 'P2']}, parms=parms, lkpinfo=None, load_lookup=True)
+    aar = AA.AntennaArray()
+    for i,xy in enumerate([[0.0, 0.0], [4.0, 1.0]]):
+        ant = AA.Antenna('A{0:0d}'.format(i), 'dipole', -26.7, 116.7, xy+[0.0], f0, nsamples=nts, aperture=aprtr)
+        ant.f = f0 + NP.fft.fftshift(NP.fft.fftfreq(2*nts, 1.0/bandwidth))
+        aar = aar + ant
+    aar.f = ant.f
+
+    nsrc = 2
+    spec_parms = {'name': NP.repeat('power-law', nsrc), 'power-law-index': NP.zeros(nsrc), 'freq-ref': f0 + NP.zeros(nsrc), 'flux-scale': NP.ones(nsrc), 'flux-offset': NP.zeros(nsrc), 'freq-width': NP.zeros(nsrc)}
+    skymod = SM.SkyModel(init_parms={'name': NP.repeat('test', nsrc), 'frequency': aar.f, 'location': NP.asarray([[10.0, -30.0], [20.0, -20.0]]), 'spec_type': 'func', 'spec_parms': spec_parms}, init_file=None)
+    sim = SIM.AntennaArraySimulator(aar, skymod, identical_antennas=True)
+
+    # Count the evaluations of the voltage pattern which the cache avoids
+
+    sim.evaluated = []
+    def evaluate(beaminfo, altaz):
+        sim.evaluated += [altaz.shape[0]]
+        return bilinear_pattern(beaminfo, altaz, sim.f)
+    sim._evaluate_voltage_pattern = evaluate
+    return sim
+
+def bilinear_pattern(beaminfo, altaz, freqs):
+
+    # Bilinear in altitude and azimuth so that interpolation on the lookup 
+    # grid is exact
+
+    scale = beaminfo.get('scale', 1.0)
+    alt = altaz[:,0].reshape(-1,1)
+    az = altaz[:,1].reshape(-1,1)
+    return scale * (1.0 + 0.01 * alt + 0.002 * az + 1e-4 * alt * az) * (freqs.reshape(1,-1) / freqs[0])
+
+class TestVoltagePatternCache(unittest.TestCase):
+
+    def setUp(self):
+        rng = NP.random.RandomState(25)
+        self.freqs = new_simulator().f
+        self.altaz = NP.hstack((rng.uniform(0.0, 90.0, size=(30,1)), rng.uniform(0.0, 359.0, size=(30,1))))
+        self.ngrid = SIM.altaz_lookup_grid(2.0).shape[0]
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def beamfile(self, ind):
+        return {'beamfile': 'beam_{0:0d}.hdf5'.format(ind), 'scale': float(ind+1)}
+
+    def check(self, sim, beaminfo, pol='P1'):
+        vbeam = sim._lookup_voltage_pattern(pol, beaminfo, self.altaz)
+        self.assertTrue(NP.allclose(vbeam, bilinear_pattern(beaminfo, self.altaz, self.freqs), rtol=1e-10, atol=1e-10))
+
+    def test_memory_hits(self):
+        sim = new_simulator()
+        sim.set_voltage_pattern_cache(resolution=2.0)
+        for i in range(3):
+            self.check(sim, self.beamfile(0))
+        self.assertEqual(sim.evaluated, [self.ngrid])
+        self.check(sim, self.beamfile(0), pol='P2')
+        self.assertEqual(sim.evaluated, [self.ngrid] * 2)
+        self.assertEqual(len(sim.vbeam_cache), 2)
+
+    def test_memory_evictions(self):
+        sim = new_simulator()
+        sim.set_voltage_pattern_cache(resolution=2.0, maxsize=2)
+        self.check(sim, self.beamfile(0))
+        self.check(sim, self.beamfile(1))
+        self.check(sim, self.beamfile(0)) # Most recently used
+        self.check(sim, self.beamfile(2)) # Evicts beam 1
+        self.assertEqual(len(sim.vbeam_cache), 2)
+        self.assertEqual(len(sim.evaluated), 3)
+        self.check(sim, self.beamfile(0))
+        self.assertEqual(len(sim.evaluated), 3)
+        self.check(sim, self.beamfile(1))
+        self.assertEqual(len(sim.evaluated), 4)
+        sim.set_voltage_pattern_cache(resolution=1.0, maxsize=2)
+        self.assertEqual(len(sim.vbeam_cache), 0)
+
+    def test_disk_store(self):
+        sim = new_simulator()
+        sim.set_voltage_pattern_cache(resolution=2.0, cachedir=self.tmpdir, maxsize=2)
+        self.check(sim, self.beamfile(0))
+        self.check(sim, self.beamfile(1))
+        self.assertEqual(len(os.listdir(self.tmpdir)), 2)
+
+        other = new_simulator()
+        other.set_voltage_pattern_cache(resolution=2.0, cachedir=self.tmpdir, maxsize=2)
+        self.check(other, self.beamfile(0))
+        self.check(other, self.beamfile(1))
+        self.assertEqual(other.evaluated, [])
+
+        files = [os.path.join(self.tmpdir, 'vbeam_{0}.hdf5'.format(sim._voltage_pattern_cache_key('P1', self.beamfile(i)))) for i in range(2)]
+        os.utime(files[0], (1e9, 1e9))
+        os.utime(files[1], (1.5e9, 1.5e9))
+        self.check(sim, self.beamfile(2)) # Evicts beam 0 from the store
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), sorted([os.path.basename(files[1]), 'vbeam_{0}.hdf5'.format(sim._voltage_pattern_cache_key('P1', self.beamfile(2)))]))
+
+        other = new_simulator()
+        other.set_voltage_pattern_cache(resolution=2.0, cachedir=self.tmpdir, maxsize=1)
+        self.assertEqual(len(os.listdir(self.tmpdir)), 1)
+
+    def test_tracking_pointing(self):
+        sim = new_simulator()
+        sim.set_voltage_pattern_cache(resolution=2.0)
+        nsrc = self.altaz.shape[0]
+        for i in range(4):
+            self.check(sim, {'telescope': {'id': 'mwa'}, 'pointing_center': [80.0-i, 10.0], 'pointing_info': None})
+        self.assertEqual(sim.evaluated, [nsrc] * 4)
+        self.assertEqual(len(sim.vbeam_cache), 0)
+        for i in range(3):
+            self.check(sim, {'telescope': {'id': 'mwa'}, 'pointing_center': [90.0, 0.0], 'pointing_info': None})
+        self.assertEqual(sim.evaluated, [nsrc] * 5 + [self.ngrid])
+        self.assertEqual(len(sim.vbeam_cache), 1)
+
+if __name__ == '__main__':
+    unittest.main()